@@ -0,0 +1,147 @@
+"""Local throughput benchmark for the A2A HTTP transport.
+
+Starts an in-process ``HTTPTransport`` echo peer on 127.0.0.1 and measures
+messages/sec and latency for each sending mode:
+
+- ``fresh``:  a new ``aiohttp.ClientSession`` per message (previous behaviour)
+- ``pooled``: ``send_message`` over the shared keep-alive session
+- ``batch``:  ``send_messages`` via the ``/a2a/messages`` endpoint
+- ``ws``:     a WebSocket channel with streamed replies
+
+Usage:
+    python -m open_entity.a2a.benchmark --messages 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+from .protocol import A2AMessage, A2AProtocol, AgentIdentity, MessageType
+from .transport import HTTPTransport
+
+MODES = ("fresh", "pooled", "batch", "ws")
+
+
+def _identity(agent_id: str, endpoint: str = "") -> AgentIdentity:
+    return AgentIdentity(agent_id=agent_id, name=agent_id, public_key="bench", endpoint=endpoint)
+
+
+async def _start_peer(secret: str) -> HTTPTransport:
+    protocol = A2AProtocol(_identity("bench-peer"), secret)
+
+    async def echo(message: A2AMessage) -> A2AMessage:
+        return protocol.create_message(message.sender, MessageType.RESPONSE, message.payload)
+
+    protocol.register_handler(MessageType.REQUEST, echo)
+    peer = HTTPTransport(protocol, host="127.0.0.1", port=0)
+    await peer.start()
+    return peer
+
+
+async def _send_fresh(endpoint: str, message: A2AMessage) -> Optional[A2AMessage]:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(
+            f"{endpoint}/a2a/message",
+            data=message.to_json(),
+            headers={"Content-Type": "application/json"},
+        ) as response:
+            if response.status == 200:
+                return A2AMessage.from_json(await response.text())
+            return None
+
+
+async def _run_concurrent(
+    messages: List[A2AMessage],
+    concurrency: int,
+    send: Callable[[A2AMessage], Awaitable[Optional[A2AMessage]]],
+) -> List[float]:
+    """Send each message with at most ``concurrency`` in flight; returns per-message latency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(message: A2AMessage) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            reply = await send(message)
+            if reply is not None:
+                latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(m) for m in messages))
+    return latencies
+
+
+async def run_benchmark(
+    messages: int = 1000,
+    concurrency: int = 64,
+    batch_size: int = 64,
+    modes: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Run the selected modes against an in-process peer and return one result per mode."""
+    secret = "bench-secret"
+    peer = await _start_peer(secret)
+    endpoint = f"http://127.0.0.1:{peer.port}"
+    protocol = A2AProtocol(_identity("bench-client"), secret)
+    target = _identity("bench-peer", endpoint)
+    client = HTTPTransport(protocol, max_concurrency=concurrency, limit_per_host=concurrency)
+    results = []
+    try:
+        for mode in modes or MODES:
+            batch = [
+                protocol.create_message(target, MessageType.REQUEST, {"seq": i, "content": "ping"})
+                for i in range(messages)
+            ]
+            started = time.perf_counter()
+            if mode == "fresh":
+                latencies = await _run_concurrent(batch, concurrency, lambda m: _send_fresh(endpoint, m))
+            elif mode == "pooled":
+                latencies = await _run_concurrent(batch, concurrency, lambda m: client.send_message(endpoint, m))
+            elif mode == "batch":
+                chunk_started = time.perf_counter()
+                replies = await client.send_messages(endpoint, batch, batch_size=batch_size)
+                # Per-message latency is not observable inside a batch; report the round trip
+                latencies = [time.perf_counter() - chunk_started] * sum(r is not None for r in replies)
+            elif mode == "ws":
+                channel = await client.open_channel(endpoint)
+                latencies = await _run_concurrent(batch, concurrency, channel.request)
+            else:
+                raise ValueError(f"unknown mode: {mode}")
+            elapsed = time.perf_counter() - started
+            ordered = sorted(latencies)
+            results.append({
+                "mode": mode,
+                "messages": messages,
+                "ok": len(latencies),
+                "seconds": round(elapsed, 3),
+                "msgs_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+                "p50_ms": round(statistics.median(ordered) * 1000, 2) if ordered else None,
+                "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2) if ordered else None,
+            })
+    finally:
+        await client.close()
+        await peer.stop()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="A2A HTTPTransport benchmark")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma-separated: {', '.join(MODES)}")
+    args = parser.parse_args(argv)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    results = asyncio.run(run_benchmark(args.messages, args.concurrency, args.batch_size, modes))
+    print(f"{'mode':<8} {'ok':>6} {'seconds':>8} {'msg/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(
+            f"{r['mode']:<8} {r['ok']:>6} {r['seconds']:>8} {r['msgs_per_sec']:>9} "
+            f"{r['p50_ms'] if r['p50_ms'] is not None else '-':>8} {r['p99_ms'] if r['p99_ms'] is not None else '-':>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,159 @@
 """HTTP/WebSocket transport for A2A protocol."""
 import asyncio
+import random
 import aiohttp
 from aiohttp import web
-from typing import Optional, Callable
+from typing import Any, AsyncIterator, Dict, List, Optional, Callable
 import json
 
 from .protocol import A2AProtocol, A2AMessage
 
+# Upper bound on messages accepted by the batch endpoint in one request.
+MAX_BATCH_SIZE = 256
+RETRYABLE_STATUS = {429, 502, 503, 504}
+# Statuses meaning the peer rejected the request without running the handler;
+# the only ones retried for non-idempotent requests (message POSTs).
+REJECTED_STATUS = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _retry_delay(attempt: int, base: float = 0.2, cap: float = 5.0, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when given in seconds."""
+    if retry_after:
+        try:
+            return min(cap, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status: int, retry_after: Optional[str] = None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class A2AChannel:
+    """WebSocket channel to a peer; replies are streamed back as they complete.
+
+    ``send`` returns a future resolved with the reply to that message (or None),
+    and ``replies`` yields every reply in arrival order.
+    """
+
+    def __init__(self, ws: aiohttp.ClientWebSocketResponse):
+        self.ws = ws
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._replies: "asyncio.Queue[Optional[A2AMessage]]" = asyncio.Queue()
+        self._reader = asyncio.create_task(self._read_loop())
+
+    @property
+    def closed(self) -> bool:
+        return self.ws.closed
+
+    async def send(self, message: A2AMessage) -> "asyncio.Future[Optional[A2AMessage]]":
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message.message_id] = future
+        try:
+            await self.ws.send_str(message.to_json())
+        except Exception:
+            self._pending.pop(message.message_id, None)
+            raise
+        return future
+
+    async def request(self, message: A2AMessage, timeout: float = 30) -> Optional[A2AMessage]:
+        """Send a message and wait for its reply."""
+        return await asyncio.wait_for(await self.send(message), timeout)
+
+    async def replies(self) -> AsyncIterator[A2AMessage]:
+        """Yield replies until the channel closes."""
+        while True:
+            reply = await self._replies.get()
+            if reply is None:
+                return
+            yield reply
+
+    async def _read_loop(self) -> None:
+        try:
+            async for frame in self.ws:
+                if frame.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = json.loads(frame.data)
+                response = A2AMessage.from_dict(data["response"]) if data.get("response") else None
+                future = self._pending.pop(data.get("message_id"), None)
+                if future is not None and not future.done():
+                    if data.get("error"):
+                        future.set_exception(Exception(data["error"]))
+                    else:
+                        future.set_result(response)
+                if response is not None:
+                    self._replies.put_nowait(response)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("A2A channel closed"))
+            self._pending.clear()
+            self._replies.put_nowait(None)
+
+    async def close(self) -> None:
+        await self.ws.close()
+        await asyncio.gather(self._reader, return_exceptions=True)
+
 
 class HTTPTransport:
-    """HTTP transport for A2A messaging."""
-    
-    def __init__(self, protocol: A2AProtocol, host: str = "0.0.0.0", port: int = 8000):
+    """HTTP transport for A2A messaging.
+
+    Outgoing requests share one ``aiohttp.ClientSession`` per event loop
+    (keep-alive connection pool with a per-host limit), a concurrency cap, and
+    retries with jittered backoff: GETs on connection errors and 429/502/503/504,
+    message POSTs only on connect failures and 429/503 so a handler never runs twice.
+    Besides ``/a2a/message`` the server accepts batches on ``/a2a/messages``
+    and a WebSocket channel on ``/a2a/ws``.
+    """
+
+    def __init__(
+        self,
+        protocol: A2AProtocol,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        pool_limit: int = 100,
+        limit_per_host: int = 16,
+        keepalive_timeout: float = 30.0,
+        max_concurrency: int = 64,
+        max_retries: int = 2,
+        timeout: float = 30.0,
+    ):
         self.protocol = protocol
         self.host = host
         self.port = port
+        self.pool_limit = pool_limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
         self.app = web.Application()
         self.app.router.add_post("/a2a/message", self.handle_message)
+        self.app.router.add_post("/a2a/messages", self.handle_batch)
+        self.app.router.add_get("/a2a/ws", self.handle_websocket)
         self.app.router.add_get("/a2a/identity", self.get_identity)
         self.runner: Optional[web.AppRunner] = None
         self.site: Optional[web.TCPSite] = None
-    
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._channels: Dict[str, A2AChannel] = {}
+        # Peers that answered 404/405 on the batch endpoint
+        self._no_batch: set = set()
+
     async def handle_message(self, request: web.Request) -> web.Response:
         """Handle incoming A2A message."""
         try:
             body = await request.text()
             message = A2AMessage.from_json(body)
-            
+
             response = await self.protocol.handle_message(message)
-            
+
             if response:
                 return web.Response(
                     text=response.to_json(),
@@ -41,56 +166,233 @@ class HTTPTransport:
                 text=json.dumps({"error": str(e)}),
                 content_type="application/json"
             )
-    
+
+    async def handle_batch(self, request: web.Request) -> web.Response:
+        """Handle an array of A2A messages; replies keep the request order."""
+        try:
+            items = json.loads(await request.text())
+            if not isinstance(items, list):
+                raise ValueError("expected a JSON array of messages")
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=400)
+        if len(items) > MAX_BATCH_SIZE:
+            return web.json_response({"error": f"batch exceeds {MAX_BATCH_SIZE} messages"}, status=413)
+
+        async def handle(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            try:
+                response = await self.protocol.handle_message(A2AMessage.from_dict(item))
+            except Exception as e:
+                return {"error": str(e)}
+            return response.to_dict() if response else None
+
+        results = await asyncio.gather(*(handle(item) for item in items))
+        return web.json_response(results)
+
+    async def handle_websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """Handle a WebSocket channel; each reply is sent as soon as it is ready."""
+        ws = web.WebSocketResponse(heartbeat=self.keepalive_timeout)
+        await ws.prepare(request)
+        send_lock = asyncio.Lock()
+        tasks = set()
+
+        async def handle(raw: str) -> None:
+            message_id = None
+            try:
+                data = json.loads(raw)
+                message_id = data.get("message_id")
+                response = await self.protocol.handle_message(A2AMessage.from_dict(data))
+                reply = {"message_id": message_id, "response": response.to_dict() if response else None}
+            except Exception as e:
+                reply = {"message_id": message_id, "error": str(e)}
+            async with send_lock:
+                if not ws.closed:
+                    await ws.send_str(json.dumps(reply))
+
+        async for frame in ws:
+            if frame.type == aiohttp.WSMsgType.TEXT:
+                task = asyncio.create_task(handle(frame.data))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return ws
+
     async def get_identity(self, request: web.Request) -> web.Response:
         """Return agent identity."""
         return web.json_response(self.protocol.identity.to_dict())
-    
+
     async def start(self):
         """Start HTTP server."""
         self.runner = web.AppRunner(self.app)
         await self.runner.setup()
         self.site = web.TCPSite(self.runner, self.host, self.port)
         await self.site.start()
-    
+        if self.port == 0:
+            # Ephemeral port: expose the one actually bound
+            server = getattr(self.site, "_server", None)
+            if server is not None and server.sockets:
+                self.port = server.sockets[0].getsockname()[1]
+
     async def stop(self):
-        """Stop HTTP server."""
+        """Stop HTTP server and close outgoing connections."""
+        await self.close()
         if self.runner:
             await self.runner.cleanup()
-    
+
+    # -- client side -------------------------------------------------------
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Shared client session for the running loop (recreated if the loop changed)."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._channels = {}
+        return self._session
+
+    async def close(self):
+        """Close WebSocket channels and the pooled client session."""
+        for channel in list(self._channels.values()):
+            await channel.close()
+        self._channels.clear()
+        if self._session is not None and not self._session.closed:
+            if self._session_loop is asyncio.get_running_loop():
+                await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    async def __aenter__(self) -> "HTTPTransport":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def _request(self, method: str, url: str, timeout: float, handle: Callable, **kwargs) -> Any:
+        """Issue a request with the concurrency cap and retries; ``handle`` reads the response.
+
+        Non-idempotent requests are only retried when the peer cannot have run the
+        handler yet: connection failures and 429/503. Timeouts, dropped connections
+        and 502/504 are passed to ``handle`` / raised instead of replaying the send.
+        """
+        session = self._get_session()
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_status = RETRYABLE_STATUS if idempotent else REJECTED_STATUS
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    async with session.request(
+                        method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+                    ) as response:
+                        if response.status in retry_status:
+                            raise _RetryableStatus(response.status, response.headers.get("Retry-After"))
+                        return await handle(response)
+            except (_RetryableStatus, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                if not idempotent and not isinstance(e, (_RetryableStatus, aiohttp.ClientConnectorError)):
+                    raise
+                await asyncio.sleep(_retry_delay(attempt, retry_after=getattr(e, "retry_after", None)))
+                attempt += 1
+
     async def send_message(self, endpoint: str, message: A2AMessage) -> Optional[A2AMessage]:
         """Send message to remote agent."""
         url = f"{endpoint}/a2a/message"
-        
-        async with aiohttp.ClientSession() as session:
+
+        async def read(response: aiohttp.ClientResponse) -> Optional[A2AMessage]:
+            if response.status == 200:
+                body = await response.text()
+                return A2AMessage.from_json(body)
+            elif response.status == 204:
+                return None
+            else:
+                raise Exception(f"HTTP {response.status}")
+
+        try:
+            return await self._request(
+                "POST",
+                url,
+                self.timeout,
+                read,
+                data=message.to_json(),
+                headers={"Content-Type": "application/json"},
+            )
+        except Exception as e:
+            print(f"Failed to send message: {e}")
+            return None
+
+    async def send_messages(
+        self, endpoint: str, messages: List[A2AMessage], batch_size: int = 64
+    ) -> List[Optional[A2AMessage]]:
+        """Send many messages to one peer, batched via ``/a2a/messages`` when supported.
+
+        Replies keep the order of ``messages``. Peers without the batch endpoint
+        get individual requests over the pooled session instead.
+        """
+        if not messages:
+            return []
+        batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        if endpoint in self._no_batch:
+            return list(await asyncio.gather(*(self.send_message(endpoint, m) for m in messages)))
+
+        url = f"{endpoint}/a2a/messages"
+
+        async def read(response: aiohttp.ClientResponse) -> Optional[List[Any]]:
+            if response.status in (404, 405):
+                return None
+            if response.status != 200:
+                raise Exception(f"HTTP {response.status}")
+            return await response.json()
+
+        async def send_chunk(chunk: List[A2AMessage]) -> List[Optional[A2AMessage]]:
             try:
-                async with session.post(
+                items = await self._request(
+                    "POST",
                     url,
-                    data=message.to_json(),
+                    self.timeout,
+                    read,
+                    data=json.dumps([m.to_dict() for m in chunk]),
                     headers={"Content-Type": "application/json"},
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status == 200:
-                        body = await response.text()
-                        return A2AMessage.from_json(body)
-                    elif response.status == 204:
-                        return None
-                    else:
-                        raise Exception(f"HTTP {response.status}")
+                )
             except Exception as e:
-                print(f"Failed to send message: {e}")
-                return None
-    
+                print(f"Failed to send message batch: {e}")
+                return [None] * len(chunk)
+            if items is None:
+                self._no_batch.add(endpoint)
+                return list(await asyncio.gather(*(self.send_message(endpoint, m) for m in chunk)))
+            return [A2AMessage.from_dict(item) if item and "message_id" in item else None for item in items]
+
+        chunks = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+        results = await asyncio.gather(*(send_chunk(chunk) for chunk in chunks))
+        return [reply for chunk in results for reply in chunk]
+
+    async def open_channel(self, endpoint: str) -> A2AChannel:
+        """Open (or reuse) a WebSocket channel to ``endpoint``."""
+        channel = self._channels.get(endpoint)
+        if channel is not None and not channel.closed:
+            return channel
+        session = self._get_session()
+        ws = await session.ws_connect(f"{endpoint}/a2a/ws", heartbeat=self.keepalive_timeout)
+        channel = self._channels[endpoint] = A2AChannel(ws)
+        return channel
+
     async def discover_agent(self, endpoint: str) -> Optional[dict]:
         """Discover agent at endpoint."""
         url = f"{endpoint}/a2a/identity"
-        
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    return None
-            except Exception as e:
-                print(f"Failed to discover agent: {e}")
-                return None
+
+        async def read(response: aiohttp.ClientResponse) -> Optional[dict]:
+            if response.status == 200:
+                return await response.json()
+            return None
+
+        try:
+            return await self._request("GET", url, 10, read)
+        except Exception as e:
+            print(f"Failed to discover agent: {e}")
+            return None
@@ -39,9 +39,8 @@ def discover_agent(
             endpoint="",
         )
         protocol = A2AProtocol(identity, "secret")
-        transport = HTTPTransport(protocol)
-        
-        agent_info = await transport.discover_agent(endpoint)
+        async with HTTPTransport(protocol) as transport:
+            agent_info = await transport.discover_agent(endpoint)
         return agent_info
     
     info = asyncio.run(_discover())
@@ -167,7 +166,8 @@ def send_message(
             payload={"content": message},
         )
         
-        response = await transport.send_message(endpoint, msg)
+        async with transport:
+            response = await transport.send_message(endpoint, msg)
         return response
     
     response = asyncio.run(_send())
@@ -9,7 +9,7 @@ from rich.live import Live
 from rich.panel import Panel
 
 from ..storage.task_store import TaskStore
-from ..core.task_runner import TaskRunner
+from ..core.task_runner import TaskRunner, cancel_pooled_task
 from ..core.llm_provider import get_available_provider
 from .utils import init_environment
 
@@ -250,7 +250,8 @@ def tasks_cancel(
 ):
     """実行中のタスクをキャンセル"""
     store = TaskStore()
-    success = store.cancel_task(task_id)
+    # ワーカープールのタスクはプール経由で止める（待機中のタスクも取り消せる）
+    success = cancel_pooled_task(task_id) or store.cancel_task(task_id)
     if success:
         typer.echo(f"Task {task_id} cancelled.")
     else:
@@ -258,6 +259,48 @@ def tasks_cancel(
         raise typer.Exit(code=1)
 
 
+@tasks_app.command("pool")
+def tasks_pool(
+    action: str = typer.Argument("status", help="start / stop / status"),
+):
+    """ウォームワーカープール（常駐デーモン）の操作"""
+    from ..core import task_pool
+
+    init_environment()
+    client = task_pool.TaskPoolClient()
+    if action == "start":
+        if not task_pool.POOL_AVAILABLE:
+            typer.echo("Task pool is not supported on this platform.", err=True)
+            raise typer.Exit(code=1)
+        if not task_pool.start_daemon(env=TaskRunner()._build_env()):
+            typer.echo("Failed to start task pool. See ~/.moco/logs/task-pool.log", err=True)
+            raise typer.Exit(code=1)
+        typer.echo(f"Task pool running at {client.socket_path}")
+    elif action == "stop":
+        if not client.is_running():
+            typer.echo("Task pool is not running.")
+            return
+        client.shutdown()
+        typer.echo("Task pool stopped.")
+    elif action == "status":
+        if not client.is_running():
+            typer.echo("Task pool is not running.")
+            return
+        status = client.status()
+        console = Console()
+        console.print(
+            f"[bold]Task pool[/] pid={status['pid']} workers={status['size']} "
+            f"queued={len(status['queued'])} completed={status['completed']} "
+            f"cancelled={status['cancelled']} recycled={status['recycled']} crashed={status['crashed']}"
+        )
+        for worker in status["workers"]:
+            task = worker["task_id"][:8] if worker["task_id"] else "-"
+            console.print(f"  pid={worker['pid']} task={task} handled={worker['handled']}")
+    else:
+        typer.echo(f"Unknown action: {action} (start / stop / status)", err=True)
+        raise typer.Exit(code=1)
+
+
 @tasks_app.command("_exec", hidden=True)
 def tasks_exec(
     task_id: str = typer.Argument(..., help="タスクID"),
@@ -7,25 +7,30 @@
 - システムメッセージは常に保持
 - 現在の run 内のメッセージ（最後の user メッセージ以降）は全件保持
 - run 前の古い履歴のみを要約で圧縮
+- しきい値の prefetch_ratio 倍を超えた時点（maybe_prefetch）で run 前履歴の要約を
+  バックグラウンドで作り始め、圧縮時はそれを使う。要約がまだ無ければ待たずに
+  このターンの圧縮を見送る（MOCO_BACKGROUND_SUMMARY=off の場合のみ同期的に要約）
+- ただしトークン数がしきい値の hard_limit_ratio 倍を超えたら、見送らずに
+  事前要約の完了を待つか同期的に要約して圧縮する
 """
 
+import hashlib
 import logging
 import os
 from typing import List, Dict, Any, Tuple, Optional
 
-logger = logging.getLogger(__name__)
+from .token_counter import TokenLedger, count_tokens
 
-# トークン推定の統一係数（プロジェクト全体で使用）
-TOKEN_ESTIMATE_RATIO = 1.5
+logger = logging.getLogger(__name__)
 
 
-def estimate_tokens(text: str) -> int:
-    """文字数ベースのトークン推定（統一関数）。
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """テキストのトークン数（統一関数）。
 
-    日本語は1文字≒1.5トークン、英語は1単語≒1.3トークン。
-    安全マージンを含めて文字数の1.5倍で推定。
+    tiktoken が使える場合は実トークナイザで数え（コンテンツハッシュでキャッシュ）、
+    使えない場合は文字数の 1.5 倍で推定する。
     """
-    return int(len(text) * TOKEN_ESTIMATE_RATIO)
+    return count_tokens(text, model)
 
 
 class ContextCompressor:
@@ -40,46 +45,31 @@ class ContextCompressor:
         self,
         max_tokens: int = 200000,
         summary_model: Optional[str] = None,
+        model: Optional[str] = None,
+        prefetch_ratio: Optional[float] = 0.8,
+        hard_limit_ratio: float = 1.25,
     ):
         """
         Args:
             max_tokens: 圧縮を開始するトークン数のしきい値
             summary_model: 要約に使用するモデル名（省略時は自動選択）
+            model: トークン計数に使うモデル名（トークナイザの選択用）
+            prefetch_ratio: 事前要約を始める割合（None で無効）
+            hard_limit_ratio: 圧縮を見送らずに同期的に行う割合（max_tokens に対する倍率）
         """
         from .llm_provider import get_analyzer_model
+        from .summary_worker import background_summary_enabled
         self.max_tokens = max_tokens
         self.summary_model = summary_model or get_analyzer_model()
+        self.prefetch_ratio = prefetch_ratio if background_summary_enabled() else None
+        self.hard_max_tokens = int(max_tokens * max(1.0, hard_limit_ratio))
+        # 同じリストへの追加分だけを数える
+        self._ledger = TokenLedger(model)
+        self._prefetched_key: Optional[Tuple[str, int, str]] = None
 
     def estimate_tokens(self, messages: List[Dict[str, Any]]) -> int:
-        """メッセージリストのトークン数を推定する。"""
-        total_chars = 0
-
-        for msg in messages:
-            # OpenAI形式: {"role": "...", "content": "..."}
-            if "content" in msg:
-                content = msg.get("content", "")
-                if content:
-                    total_chars += len(str(content))
-
-            # Gemini形式: {"role": "...", "parts": [...]}
-            if "parts" in msg:
-                parts = msg.get("parts", [])
-                for part in parts:
-                    if isinstance(part, str):
-                        total_chars += len(part)
-                    elif isinstance(part, dict) and "text" in part:
-                        total_chars += len(part["text"])
-                    elif hasattr(part, "text") and part.text:
-                        total_chars += len(part.text)
-
-            # ツール呼び出し結果なども考慮
-            if "tool_calls" in msg:
-                for tc in msg.get("tool_calls", []):
-                    if isinstance(tc, dict) and "function" in tc:
-                        args = tc["function"].get("arguments", "")
-                        total_chars += len(str(args))
-
-        return int(total_chars * TOKEN_ESTIMATE_RATIO)
+        """メッセージリストのトークン数を数える（前回と同じリストなら追加分のみ計数）。"""
+        return self._ledger.sync(messages)
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -181,10 +171,77 @@ class ContextCompressor:
             logger.warning(f"Failed to summarize with provider={provider_name}: {e}")
             return ""
 
+    def _split(
+        self, messages: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(システムメッセージ, run 前メッセージ, run 内メッセージ) に分ける"""
+        system_messages = []
+        non_system_messages = []
+        for msg in messages:
+            if self._is_system_message(msg):
+                system_messages.append(msg)
+            else:
+                non_system_messages.append(msg)
+        run_boundary = self._find_run_boundary(non_system_messages)
+        return system_messages, non_system_messages[:run_boundary], non_system_messages[run_boundary:]
+
+    def _prefetch_key(self, pre_run_messages: List[Dict[str, Any]]) -> Tuple[str, int, str]:
+        # 要約の入力そのもののハッシュ（run 前履歴が変わらなければ同じキー）
+        text = self._format_messages_for_summary(pre_run_messages)
+        digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+        # run ごとに作り直されるインスタンスをまたいで同じ要約を使えるよう id(self) は含めない
+        return ("context_summary", self.summary_model, digest)
+
+    def _prefetch_summary(self, messages: List[Dict[str, Any]], provider: Optional[str]) -> None:
+        """run 前履歴の要約をバックグラウンドで作り始める（同じ履歴なら一度だけ）"""
+        from .summary_worker import get_summary_worker
+        _, pre_run_messages, _ = self._split(messages)
+        if len(pre_run_messages) < 3:
+            return
+        key = self._prefetch_key(pre_run_messages)
+        if key == self._prefetched_key:
+            return
+        self._prefetched_key = key
+        worker = get_summary_worker()
+        if worker.is_pending(key) or worker.has_result(key):
+            # 前の run のインスタンスが同じ履歴で投入済み
+            return
+        worker.submit(key, self._generate_summary, list(pre_run_messages), provider)
+
+    def _take_prefetched_summary(
+        self, pre_run_messages: List[Dict[str, Any]], wait: bool = False
+    ) -> Optional[str]:
+        """完了済みの事前要約を取り出す（実行中なら wait=True の場合だけ完了を待つ）"""
+        from .summary_worker import get_summary_worker
+        key = self._prefetch_key(pre_run_messages)
+        worker = get_summary_worker()
+        if worker.is_pending(key):
+            if not wait:
+                return None
+            worker.wait(key)
+        if key == self._prefetched_key:
+            self._prefetched_key = None
+        return worker.take_result(key) or None
+
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
 
+    def maybe_prefetch(self, messages: List[Dict[str, Any]], provider: Optional[str] = None) -> bool:
+        """
+        トークン数がしきい値の prefetch_ratio 倍を超えていれば run 前履歴の要約を
+        バックグラウンドで作り始める（圧縮しきい値より手前で毎ターン呼ぶ）。
+
+        Returns:
+            事前要約の対象になった場合 True
+        """
+        if self.prefetch_ratio is None or not messages:
+            return False
+        if self.estimate_tokens(messages) <= self.max_tokens * self.prefetch_ratio:
+            return False
+        self._prefetch_summary(messages, provider)
+        return True
+
     def compress_if_needed(
         self,
         messages: List[Dict[str, Any]],
@@ -212,35 +269,33 @@ class ContextCompressor:
 
         if estimated_tokens <= self.max_tokens:
             logger.debug(f"No compression needed: {estimated_tokens} tokens <= {self.max_tokens}")
+            self.maybe_prefetch(messages, provider)
             return messages, False
 
         logger.info(f"Compressing context: {estimated_tokens} tokens > {self.max_tokens}")
 
-        # システムメッセージを分離
-        system_messages = []
-        non_system_messages = []
-        for msg in messages:
-            if self._is_system_message(msg):
-                system_messages.append(msg)
-            else:
-                non_system_messages.append(msg)
-
-        # 現在の run の境界を検出
-        run_boundary = self._find_run_boundary(non_system_messages)
-
-        # run 内メッセージ（保護対象）
-        run_messages = non_system_messages[run_boundary:]
-
-        # run 前メッセージ（圧縮対象）
-        pre_run_messages = non_system_messages[:run_boundary]
+        # システムメッセージ / run 前メッセージ（圧縮対象） / run 内メッセージ（保護対象）に分離
+        system_messages, pre_run_messages, run_messages = self._split(messages)
 
         # 圧縮対象が少なすぎる場合はスキップ
         if len(pre_run_messages) < 3:
             logger.debug("Too few pre-run messages to compress")
             return messages, False
 
-        # run 前メッセージを要約
-        summary = self._generate_summary(pre_run_messages, provider)
+        # run 前メッセージを要約（事前要約があればそれを使う）
+        over_hard_limit = estimated_tokens > self.hard_max_tokens
+        summary = self._take_prefetched_summary(pre_run_messages, wait=over_hard_limit)
+        if summary:
+            logger.info("Using prefetched context summary")
+        elif self.prefetch_ratio is not None and not over_hard_limit:
+            # ターン内で要約の LLM 呼び出しを待たない: 要約を投入（実行中ならそのまま）して次回に回す
+            self._prefetch_summary(messages, provider)
+            logger.info("Context summary is being prepared in background; compression deferred")
+            return messages, False
+        else:
+            if over_hard_limit:
+                logger.info(f"Context exceeds hard limit ({self.hard_max_tokens} tokens); summarizing synchronously")
+            summary = self._generate_summary(pre_run_messages, provider)
 
         if not summary:
             logger.warning("Failed to generate summary, returning original messages")
@@ -7,10 +7,11 @@ LLM API コスト追跡モジュール。
 import json
 import logging
 import threading
+from collections import deque
 from dataclasses import dataclass, field
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Optional, Callable, Any, Dict, List, Generator
+from typing import Optional, Callable, Any, Deque, Dict, Iterable, List, Generator
 from contextlib import contextmanager
 from functools import wraps
 
@@ -109,6 +110,13 @@ PROVIDER_DEFAULT_MODELS: Dict[str, str] = {
 }
 
 
+# 明細として保持するレコード数の上限（超えた分は集計値だけ残して破棄）
+DEFAULT_MAX_RECORDS = 100_000
+
+# 期間集計の単位
+TIME_BUCKET = timedelta(hours=1)
+
+
 class BudgetStatus(Enum):
     """予算ステータス"""
     OK = "ok"
@@ -199,6 +207,26 @@ class BudgetCheckResult:
     message: str
 
 
+@dataclass
+class _Aggregate:
+    """集計値（キーごとの累計）"""
+    cost_usd: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    count: int = 0
+
+    def add(self, record: CostRecord) -> None:
+        self.cost_usd += record.cost_usd
+        self.input_tokens += record.usage.input_tokens
+        self.output_tokens += record.usage.output_tokens
+        self.count += 1
+
+
+def _time_bucket(timestamp: datetime) -> datetime:
+    """タイムスタンプを集計単位（1時間）に切り捨てる"""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
 @dataclass
 class CostSummary:
     """コストサマリー"""
@@ -220,6 +248,10 @@ class CostTracker:
     
     トークン使用量の記録、料金計算、予算管理、レポート生成を行う。
     スレッドセーフな実装。
+
+    セッション・エージェント・モデル・プロバイダ・時間（1時間単位）ごとの累計を
+    記録時に更新するため、集計や予算チェックはレコード数に依存しない。
+    明細は max_records 件まで保持し、古いものは集計値だけ残して破棄する。
     
     Example:
         tracker = CostTracker(budget_limit=10.0)
@@ -246,6 +278,7 @@ class CostTracker:
         custom_pricing: Optional[Dict[str, Dict[str, float]]] = None,
         on_budget_warning: Optional[Callable[[BudgetCheckResult], None]] = None,
         on_budget_exceeded: Optional[Callable[[BudgetCheckResult], None]] = None,
+        max_records: Optional[int] = DEFAULT_MAX_RECORDS,
     ):
         """
         Args:
@@ -255,9 +288,34 @@ class CostTracker:
             custom_pricing: カスタム料金表。PRICING を上書きする。
             on_budget_warning: 予算警告時のコールバック。
             on_budget_exceeded: 予算超過時のコールバック。
+            max_records: 明細として保持する最大件数。None の場合は無制限。
+                超過分は古い順に破棄されるが、累計・内訳には残る。
         """
-        self._records: List[CostRecord] = []
+        self._records: Deque[CostRecord] = deque()
+        # _records と同じ順序で、記録時の正規化モデル名を保持
+        self._record_model_keys: Deque[str] = deque()
         self._lock = threading.RLock()
+        self.max_records = max_records
+
+        # 累計と内訳（記録時に更新）
+        self._total = _Aggregate()
+        self._by_session: Dict[str, _Aggregate] = {}
+        self._by_agent: Dict[str, _Aggregate] = {}
+        self._by_model: Dict[str, _Aggregate] = {}  # 正規化済みモデル名
+        self._by_raw_model: Dict[str, _Aggregate] = {}  # レポート用（記録時のモデル名）
+        self._by_provider: Dict[str, _Aggregate] = {}  # 小文字
+        self._by_bucket: Dict[datetime, _Aggregate] = {}
+        self._first_timestamp: Optional[datetime] = None
+        self._last_timestamp: Optional[datetime] = None
+
+        # 明細の二次インデックス（挿入順）
+        self._records_by_session: Dict[str, Deque[CostRecord]] = {}
+        self._records_by_agent: Dict[str, Deque[CostRecord]] = {}
+        self._records_by_model: Dict[str, Deque[CostRecord]] = {}
+        self._records_by_bucket: Dict[datetime, Deque[CostRecord]] = {}
+
+        # モデル名正規化のキャッシュ（料金表の更新でクリア）
+        self._normalized_names: Dict[str, str] = {}
         
         self.budget_limit = budget_limit
         self.warning_threshold = warning_threshold
@@ -315,7 +373,7 @@ class CostTracker:
         )
         
         with self._lock:
-            self._records.append(record)
+            self._add_record(record)
         
         logger.debug(
             f"Cost recorded: model={model}, tokens={usage.total_tokens}, "
@@ -327,6 +385,63 @@ class CostTracker:
         
         return record
     
+    def _add_record(self, record: CostRecord) -> None:
+        """明細・インデックス・累計に追加する（ロック取得済みで呼ぶ）"""
+        model_key = self._normalize_model_name(record.model)
+        bucket = _time_bucket(record.timestamp)
+
+        self._records.append(record)
+        self._record_model_keys.append(model_key)
+        self._total.add(record)
+        self._by_model.setdefault(model_key, _Aggregate()).add(record)
+        self._by_raw_model.setdefault(record.model, _Aggregate()).add(record)
+        self._by_provider.setdefault(record.provider.lower(), _Aggregate()).add(record)
+        self._by_bucket.setdefault(bucket, _Aggregate()).add(record)
+        self._records_by_model.setdefault(model_key, deque()).append(record)
+        self._records_by_bucket.setdefault(bucket, deque()).append(record)
+        if record.session_id:
+            self._by_session.setdefault(record.session_id, _Aggregate()).add(record)
+            self._records_by_session.setdefault(record.session_id, deque()).append(record)
+        if record.agent_name:
+            self._by_agent.setdefault(record.agent_name, _Aggregate()).add(record)
+            self._records_by_agent.setdefault(record.agent_name, deque()).append(record)
+
+        if self._first_timestamp is None or record.timestamp < self._first_timestamp:
+            self._first_timestamp = record.timestamp
+        if self._last_timestamp is None or record.timestamp > self._last_timestamp:
+            self._last_timestamp = record.timestamp
+
+        if self.max_records is not None:
+            while len(self._records) > self.max_records:
+                self._roll_up_oldest()
+
+    def _roll_up_oldest(self) -> None:
+        """最も古い明細を破棄する（累計・内訳には残る）"""
+        record = self._records.popleft()
+        model_key = self._record_model_keys.popleft()
+        # 各インデックスも挿入順なので、破棄対象は常に先頭にある
+        self._pop_index(self._records_by_model, model_key, record)
+        self._pop_index(self._records_by_bucket, _time_bucket(record.timestamp), record)
+        if record.session_id:
+            self._pop_index(self._records_by_session, record.session_id, record)
+        if record.agent_name:
+            self._pop_index(self._records_by_agent, record.agent_name, record)
+
+    @staticmethod
+    def _pop_index(index: Dict[Any, Deque[CostRecord]], key: Any, record: CostRecord) -> None:
+        records = index.get(key)
+        if not records:
+            return
+        if records[0] is record:
+            records.popleft()
+        else:
+            try:
+                records.remove(record)
+            except ValueError:
+                pass
+        if not records:
+            del index[key]
+
     def _calculate_cost(self, model: str, usage: TokenUsage) -> float:
         """料金を計算する"""
         # モデル名を正規化（小文字化、バージョン除去）
@@ -341,7 +456,14 @@ class CostTracker:
         return input_cost + output_cost
     
     def _normalize_model_name(self, model: str) -> str:
-        """モデル名を正規化する"""
+        """モデル名を正規化する（結果はキャッシュ）"""
+        normalized = self._normalized_names.get(model)
+        if normalized is None:
+            normalized = self._normalize_model_name_uncached(model)
+            self._normalized_names[model] = normalized
+        return normalized
+
+    def _normalize_model_name_uncached(self, model: str) -> str:
         model_lower = model.lower()
         
         # 完全一致
@@ -412,61 +534,65 @@ class CostTracker:
     def get_total_cost(self) -> float:
         """総コストを取得する"""
         with self._lock:
-            return sum(r.cost_usd for r in self._records)
+            return self._total.cost_usd
     
     def get_total_tokens(self) -> TokenUsage:
         """総トークン使用量を取得する"""
         with self._lock:
-            result = TokenUsage.zero()
-            for r in self._records:
-                result = result + r.usage
-            return result
+            return TokenUsage(
+                input_tokens=self._total.input_tokens,
+                output_tokens=self._total.output_tokens,
+            )
     
     def get_cost_by_session(self, session_id: str) -> float:
         """セッション別コストを取得する"""
         with self._lock:
-            return sum(
-                r.cost_usd for r in self._records
-                if r.session_id == session_id
-            )
+            agg = self._by_session.get(session_id)
+            return agg.cost_usd if agg else 0
     
     def get_cost_by_agent(self, agent_name: str) -> float:
         """エージェント別コストを取得する"""
         with self._lock:
-            return sum(
-                r.cost_usd for r in self._records
-                if r.agent_name == agent_name
-            )
+            agg = self._by_agent.get(agent_name)
+            return agg.cost_usd if agg else 0
     
     def get_cost_by_model(self, model: str) -> float:
         """モデル別コストを取得する"""
         model_normalized = self._normalize_model_name(model)
         with self._lock:
-            return sum(
-                r.cost_usd for r in self._records
-                if self._normalize_model_name(r.model) == model_normalized
-            )
+            agg = self._by_model.get(model_normalized)
+            return agg.cost_usd if agg else 0
     
     def get_cost_by_provider(self, provider: str) -> float:
         """プロバイダ別コストを取得する"""
         with self._lock:
-            return sum(
-                r.cost_usd for r in self._records
-                if r.provider.lower() == provider.lower()
-            )
+            agg = self._by_provider.get(provider.lower())
+            return agg.cost_usd if agg else 0
     
     def get_cost_by_period(
         self,
         start: datetime,
         end: Optional[datetime] = None,
     ) -> float:
-        """期間別コストを取得する"""
+        """
+        期間別コストを取得する。
+
+        期間に完全に含まれる時間帯は累計を使い、境界の時間帯だけ明細を集計する。
+        破棄済みの明細は時間帯単位でのみ反映される。
+        """
         end = end or datetime.now(timezone.utc)
         with self._lock:
-            return sum(
-                r.cost_usd for r in self._records
-                if start <= r.timestamp <= end
-            )
+            total = 0.0
+            for bucket, agg in self._by_bucket.items():
+                bucket_end = bucket + TIME_BUCKET
+                if bucket >= start and bucket_end <= end:
+                    total += agg.cost_usd
+                elif bucket_end > start and bucket <= end:
+                    total += sum(
+                        r.cost_usd for r in self._records_by_bucket.get(bucket, ())
+                        if start <= r.timestamp <= end
+                    )
+            return total
     
     def get_records(
         self,
@@ -491,16 +617,26 @@ class CostTracker:
         Returns:
             条件に一致する CostRecord のリスト
         """
+        model_normalized = self._normalize_model_name(model) if model is not None else None
         with self._lock:
-            records = self._records.copy()
+            # インデックスから候補を絞り込む
+            candidates: Iterable[CostRecord]
+            if session_id is not None:
+                candidates = self._records_by_session.get(session_id, ())
+            elif agent_name is not None:
+                candidates = self._records_by_agent.get(agent_name, ())
+            elif model_normalized is not None:
+                candidates = self._records_by_model.get(model_normalized, ())
+            else:
+                candidates = self._records
+            records = list(candidates)
         
         # フィルタリング
         if session_id is not None:
             records = [r for r in records if r.session_id == session_id]
         if agent_name is not None:
             records = [r for r in records if r.agent_name == agent_name]
-        if model is not None:
-            model_normalized = self._normalize_model_name(model)
+        if model_normalized is not None:
             records = [r for r in records if self._normalize_model_name(r.model) == model_normalized]
         if start is not None:
             records = [r for r in records if r.timestamp >= start]
@@ -575,6 +711,9 @@ class CostTracker:
         Returns:
             CostSummary
         """
+        if start is None and end is None:
+            return self._summary_from_totals()
+
         records = self.get_records(start=start, end=end)
         
         if not records:
@@ -623,6 +762,22 @@ class CostTracker:
             breakdown_by_session=by_session,
         )
     
+    def _summary_from_totals(self) -> CostSummary:
+        """全期間のサマリーを累計から作る（破棄済みの明細も含む）"""
+        with self._lock:
+            return CostSummary(
+                total_cost=self._total.cost_usd,
+                total_input_tokens=self._total.input_tokens,
+                total_output_tokens=self._total.output_tokens,
+                total_tokens=self._total.input_tokens + self._total.output_tokens,
+                record_count=self._total.count,
+                period_start=self._first_timestamp,
+                period_end=self._last_timestamp,
+                breakdown_by_model={k: v.cost_usd for k, v in self._by_raw_model.items()},
+                breakdown_by_agent={k: v.cost_usd for k, v in self._by_agent.items()},
+                breakdown_by_session={k: v.cost_usd for k, v in self._by_session.items()},
+            )
+    
     def generate_report(
         self,
         format: str = "text",
@@ -836,8 +991,18 @@ class CostTracker:
             削除されたレコード数
         """
         with self._lock:
-            count = len(self._records)
+            count = self._total.count
             self._records.clear()
+            self._record_model_keys.clear()
+            self._total = _Aggregate()
+            for index in (
+                self._by_session, self._by_agent, self._by_model, self._by_raw_model,
+                self._by_provider, self._by_bucket, self._records_by_session,
+                self._records_by_agent, self._records_by_model, self._records_by_bucket,
+            ):
+                index.clear()
+            self._first_timestamp = None
+            self._last_timestamp = None
             self._last_budget_status = None
         
         logger.info(f"Cost tracker cleared: {count} records removed")
@@ -845,7 +1010,7 @@ class CostTracker:
     
     def export_records(self, filepath: str) -> int:
         """
-        レコードをJSONファイルにエクスポートする。
+        レコードをJSONファイルにエクスポートする（保持している明細のみ）。
         
         Args:
             filepath: 出力ファイルパス
@@ -878,7 +1043,8 @@ class CostTracker:
         records = [CostRecord.from_dict(d) for d in data]
         
         with self._lock:
-            self._records.extend(records)
+            for record in records:
+                self._add_record(record)
         
         logger.info(f"Imported {len(records)} records from {filepath}")
         return len(records)
@@ -896,6 +1062,9 @@ class CostTracker:
             "input": input_price,
             "output": output_price,
         }
+        # 新しいキーで正規化結果が変わりうるのでキャッシュを破棄
+        # （既存の内訳は記録時の正規化名のまま）
+        self._normalized_names.clear()
         logger.debug(f"Pricing updated: {model} = input=${input_price}, output=${output_price}")
     
     def get_pricing(self, model: str) -> Dict[str, float]:
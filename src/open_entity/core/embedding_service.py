@@ -0,0 +1,458 @@
+"""
+Embedding サービス（共有・バッチ・キャッシュ）
+
+MemoryService / SemanticMemory / CodebaseSearcher / SemanticSearcher から共通で使う。
+
+- クライアントはプロバイダー・APIキーごとにプロセス内で1つだけ生成して再利用
+- 同時に届いた単発リクエストを1回のAPI呼び出しにまとめる（API呼び出し中に届いたものは
+  次の呼び出しにまとめ、他に処理中の呼び出しがあるときだけ短いウィンドウを待つ。
+  単独の呼び出しは待たずに送信する）
+- 内容ハッシュをキーにしたメモリ内LRU + SQLite のディスクキャッシュ
+
+使い方:
+    service = get_embedding_service()
+    vec = service.embed("text")
+    vecs = service.embed_many(["a", "b"])
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    np = None
+    NUMPY_AVAILABLE = False
+
+from .llm_provider import (
+    GENAI_AVAILABLE,
+    OPENAI_AVAILABLE,
+    PROVIDER_GEMINI,
+    PROVIDER_OPENAI,
+    _ensure_dotenv_loaded,
+    get_embedding_model,
+    get_embedding_provider,
+)
+
+logger = logging.getLogger(__name__)
+
+# 1回のAPI呼び出しでまとめるテキスト数の上限（Gemini の batch 上限に合わせる）
+DEFAULT_MAX_BATCH_SIZE = 100
+# 単発リクエストをまとめる待ち時間
+DEFAULT_BATCH_WINDOW_MS = 10
+DEFAULT_MEMORY_CACHE_SIZE = 4096
+DEFAULT_DISK_CACHE_MAX_ENTRIES = 200_000
+
+
+def _default_disk_cache_path() -> Optional[Path]:
+    """ディスクキャッシュの保存先（MOCO_EMBEDDING_CACHE=off で無効化）"""
+    override = os.environ.get("MOCO_EMBEDDING_CACHE")
+    if override:
+        if override.lower() in ("0", "off", "false", "none"):
+            return None
+        return Path(override)
+    storage_dir = os.environ.get("MOCO_STORAGE_DIR")
+    base = Path(storage_dir) if storage_dir else Path.home() / ".moco" / "storage"
+    return base / "embeddings.db"
+
+
+# ---------------------------------------------------------------------------
+# Client pool
+# ---------------------------------------------------------------------------
+_clients: Dict[Tuple[str, str], Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _api_key_for(provider: str) -> Optional[str]:
+    _ensure_dotenv_loaded()
+    if provider == PROVIDER_OPENAI:
+        return os.environ.get("OPENAI_API_KEY")
+    return (
+        os.environ.get("GENAI_API_KEY") or
+        os.environ.get("GEMINI_API_KEY") or
+        os.environ.get("GOOGLE_API_KEY")
+    )
+
+
+def get_embedding_client(provider: str) -> Optional[Any]:
+    """
+    Embedding 用クライアントを返す（プロバイダー・APIキーごとにキャッシュ）。
+    ライブラリ未インストールまたはAPIキー未設定の場合は None。
+    """
+    api_key = _api_key_for(provider)
+    if not api_key:
+        return None
+    cache_key = (provider, api_key)
+    with _clients_lock:
+        client = _clients.get(cache_key)
+        if client is not None:
+            return client
+        try:
+            if provider == PROVIDER_OPENAI:
+                if not OPENAI_AVAILABLE:
+                    return None
+                from openai import OpenAI
+                client = OpenAI(api_key=api_key)
+            else:
+                if not GENAI_AVAILABLE:
+                    return None
+                from google import genai
+                client = genai.Client(api_key=api_key)
+        except Exception as e:
+            logger.warning(f"Failed to create embedding client for {provider}: {e}")
+            return None
+        _clients[cache_key] = client
+        return client
+
+
+def _provider_of(client: Any) -> str:
+    """クライアントの種類からプロバイダー名を推定"""
+    # OpenAI クライアントも .models を持つため .embeddings の有無で判定する
+    return PROVIDER_OPENAI if hasattr(client, "embeddings") else PROVIDER_GEMINI
+
+
+# ---------------------------------------------------------------------------
+# Disk cache
+# ---------------------------------------------------------------------------
+class _DiskCache:
+    """SQLite に embedding (float32) を保存するキャッシュ"""
+
+    def __init__(self, path: Path, max_entries: int = DEFAULT_DISK_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_created_at ON embeddings(created_at)")
+        self._conn.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Tuple[float, ...]]:
+        out: Dict[str, Tuple[float, ...]] = {}
+        if not keys:
+            return out
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = list(keys[start:start + 500])
+                placeholders = ",".join(["?"] * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    out[key] = _decode_vector(blob)
+        return out
+
+    def put_many(self, items: Dict[str, Tuple[float, ...]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                [(key, _encode_vector(vec), now) for key, vec in items.items()],
+            )
+            self._conn.commit()
+            self._writes += len(items)
+            if self._writes >= 1000:
+                self._writes = 0
+                self._prune()
+
+    def _prune(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY created_at LIMIT ?)",
+                (excess,),
+            )
+            self._conn.commit()
+
+
+def _encode_vector(vec: Sequence[float]) -> bytes:
+    if NUMPY_AVAILABLE:
+        return np.asarray(vec, dtype="<f4").tobytes()
+    import struct
+    return struct.pack(f"<{len(vec)}f", *vec)
+
+
+def _decode_vector(blob: bytes) -> Tuple[float, ...]:
+    if NUMPY_AVAILABLE:
+        return tuple(np.frombuffer(blob, dtype="<f4").tolist())
+    import struct
+    return struct.unpack(f"<{len(blob) // 4}f", blob)
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+class EmbeddingService:
+    """
+    バッチ・キャッシュ付き Embedding クライアント
+
+    Args:
+        provider: "gemini" or "openai"
+        model: embedding モデル名
+        client: 既存クライアント（省略時は get_embedding_client で共有インスタンスを取得）
+        batch_window_ms: 他の embed() が処理中のときに単発リクエストをまとめる待ち時間（0でまとめない）
+        max_batch_size: 1回のAPI呼び出しでまとめる最大件数
+        memory_cache_size: メモリ内LRUの最大件数
+        disk_cache_path: ディスクキャッシュのパス（None で無効）
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        client: Optional[Any] = None,
+        batch_window_ms: int = DEFAULT_BATCH_WINDOW_MS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        memory_cache_size: int = DEFAULT_MEMORY_CACHE_SIZE,
+        disk_cache_path: Optional[Path] = None,
+    ):
+        self.provider = provider
+        self.model = model
+        self.client = client if client is not None else get_embedding_client(provider)
+        self.batch_window = max(0, batch_window_ms) / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.memory_cache_size = memory_cache_size
+
+        self._lru: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self._disk: Optional[_DiskCache] = None
+        if disk_cache_path is not None:
+            try:
+                self._disk = _DiskCache(Path(disk_cache_path))
+            except Exception as e:
+                logger.warning(f"Embedding disk cache disabled: {e}")
+
+        # 単発リクエストの集約用
+        self._pending: "OrderedDict[str, Tuple[str, Future]]" = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._leader_active = False
+        # embed() を処理中の呼び出し数（単独なら集約を待たない）
+        self._active_calls = 0
+
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "api_calls": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.provider}\0{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    # -- public API ---------------------------------------------------------
+    def embed(self, text: str) -> List[float]:
+        """テキスト1件を embedding に変換（同時呼び出しはまとめて送信）"""
+        key = self._key(text)
+        with self._pending_lock:
+            self._active_calls += 1
+        try:
+            cached = self._cache_get([key])
+            if key in cached:
+                return list(cached[key])
+            if not self.available:
+                raise RuntimeError(f"Embedding client for {self.provider} is not available")
+            if self.batch_window <= 0:
+                return list(self._fetch({key: text})[key])
+            return list(self._submit(key, text).result())
+        finally:
+            with self._pending_lock:
+                self._active_calls -= 1
+
+    def embed_many(self, texts: Sequence[str]) -> List[List[float]]:
+        """複数テキストを embedding に変換（キャッシュ済みはAPIを呼ばない）"""
+        keys = [self._key(t) for t in texts]
+        found = self._cache_get(keys)
+        missing: "OrderedDict[str, str]" = OrderedDict()
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            if not self.available:
+                raise RuntimeError(f"Embedding client for {self.provider} is not available")
+            items = list(missing.items())
+            for start in range(0, len(items), self.max_batch_size):
+                found.update(self._fetch(OrderedDict(items[start:start + self.max_batch_size])))
+        return [list(found[key]) for key in keys]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def clear_memory_cache(self) -> None:
+        with self._lru_lock:
+            self._lru.clear()
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += n
+
+    # -- caching ------------------------------------------------------------
+    def _cache_get(self, keys: Sequence[str]) -> Dict[str, Tuple[float, ...]]:
+        found: Dict[str, Tuple[float, ...]] = {}
+        with self._lru_lock:
+            for key in keys:
+                vec = self._lru.get(key)
+                if vec is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vec
+        self._count("memory_hits", len(found))
+        if self._disk is not None and len(found) < len(set(keys)):
+            try:
+                from_disk = self._disk.get_many([k for k in keys if k not in found])
+            except Exception as e:
+                logger.debug(f"Embedding disk cache read failed: {e}")
+                from_disk = {}
+            if from_disk:
+                self._count("disk_hits", len(from_disk))
+                self._lru_put(from_disk)
+                found.update(from_disk)
+        return found
+
+    def _lru_put(self, items: Dict[str, Tuple[float, ...]]) -> None:
+        with self._lru_lock:
+            for key, vec in items.items():
+                self._lru[key] = vec
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.memory_cache_size:
+                self._lru.popitem(last=False)
+
+    # -- provider calls -----------------------------------------------------
+    def _fetch(self, items: "OrderedDict[str, str]") -> Dict[str, Tuple[float, ...]]:
+        """キャッシュに無いテキストをAPIで取得してキャッシュに保存"""
+        vectors = self._call_provider(list(items.values()))
+        result = {key: tuple(vec) for key, vec in zip(items.keys(), vectors)}
+        self._count("misses", len(result))
+        self._lru_put(result)
+        if self._disk is not None:
+            try:
+                self._disk.put_many(result)
+            except Exception as e:
+                logger.debug(f"Embedding disk cache write failed: {e}")
+        return result
+
+    def _call_provider(self, texts: List[str]) -> List[List[float]]:
+        self._count("api_calls")
+        if self.provider == PROVIDER_GEMINI:
+            result = self.client.models.embed_content(model=self.model, contents=texts)
+            vectors = [list(e.values) for e in result.embeddings]
+        else:
+            result = self.client.embeddings.create(model=self.model, input=texts)
+            data = sorted(result.data, key=lambda d: getattr(d, "index", 0))
+            vectors = [list(d.embedding) for d in data]
+        if len(vectors) != len(texts):
+            raise RuntimeError(f"Embedding count mismatch: expected {len(texts)}, got {len(vectors)}")
+        return vectors
+
+    # -- request coalescing -------------------------------------------------
+    def _submit(self, key: str, text: str) -> Future:
+        """
+        単発リクエストを集約キューに積む。
+        最初に積んだスレッドがリーダーとなりまとめて送信する。他に embed() を処理中の
+        呼び出しがあればウィンドウだけ待って集め、単独ならすぐに送信する。
+        リーダーの送信中に積まれたものは次の送信にまとめられる。
+        同じテキストの同時リクエストは同じ Future を共有する。
+        """
+        with self._pending_lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                return entry[1]
+            future: Future = Future()
+            self._pending[key] = (text, future)
+            is_leader = not self._leader_active
+            if is_leader:
+                self._leader_active = True
+            concurrent = self._active_calls > 1
+        if is_leader:
+            if concurrent:
+                time.sleep(self.batch_window)
+            self._drain()
+        return future
+
+    def _drain(self) -> None:
+        while True:
+            with self._pending_lock:
+                if not self._pending:
+                    self._leader_active = False
+                    return
+                batch = OrderedDict()
+                while self._pending and len(batch) < self.max_batch_size:
+                    k, entry = self._pending.popitem(last=False)
+                    batch[k] = entry
+            try:
+                vectors = self._fetch(OrderedDict((k, t) for k, (t, _) in batch.items()))
+                for k, (_, future) in batch.items():
+                    future.set_result(vectors[k])
+            except Exception as e:
+                for _, future in batch.values():
+                    future.set_exception(e)
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+_services: Dict[Tuple[str, str, int], EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    client: Optional[Any] = None,
+) -> EmbeddingService:
+    """
+    プロセス共有の EmbeddingService を返す。
+
+    Args:
+        provider: プロバイダー（省略時は get_embedding_provider / client から推定）
+        model: モデル名（省略時は get_embedding_model）
+        client: 明示的に使うクライアント（テストや独自設定用）
+    """
+    if provider is None:
+        provider = _provider_of(client) if client is not None else get_embedding_provider()
+    model = model or get_embedding_model(provider)
+    key = (provider, model, id(client) if client is not None else 0)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = EmbeddingService(
+                provider=provider,
+                model=model,
+                client=client,
+                disk_cache_path=_default_disk_cache_path(),
+            )
+            _services[key] = service
+        elif service.client is None and client is None:
+            # APIキーが後から設定された場合に備えて再取得
+            service.client = get_embedding_client(provider)
+        return service
+
+
+def reset_embedding_services() -> None:
+    """共有インスタンスを破棄（テスト用）"""
+    with _services_lock:
+        _services.clear()
+    with _clients_lock:
+        _clients.clear()
@@ -0,0 +1,431 @@
+"""
+分析系 LLM 呼び出しの応答キャッシュ（オプトイン）
+
+TaskAnalyzer / QualityEvaluator / MemoryService.analyze のような
+低温度・決定的な分類プロンプトの応答を再利用する。
+
+- 完全一致層: (provider, model, temperature, max_tokens, response_format, prompt) のハッシュ
+- 類似層（任意）: 同じ条件の既存プロンプトと embedding のコサイン類似度がしきい値以上なら再利用
+- メモリ内 LRU + SQLite の永続ストア、TTL と件数上限で追い出し
+- ヒット・ミスの統計
+
+呼び出し側が generate_text(..., cache="exact" / "semantic") で明示した場合のみ使う。
+入力内容をそのまま返す必要がある呼び出し（要約・抽出等）に "semantic" を使わないこと。
+類似層で比較するのは semantic_text（プロンプトの可変部分。省略時はプロンプト全体）。
+固定のテンプレートが大半を占めるプロンプトでは必ず可変部分だけを渡すこと。
+
+環境変数:
+  - MOCO_LLM_CACHE: on で有効化（パスを指定するとその SQLite ファイルを使用）
+  - MOCO_LLM_CACHE_TTL: 有効期限（秒、既定 86400）
+  - MOCO_LLM_CACHE_SEMANTIC: 類似層のしきい値（例: 0.97、off で無効）
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("exact", "semantic")
+DEFAULT_TTL = 86400
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MEMORY_SIZE = 1024
+DEFAULT_SEMANTIC_THRESHOLD = 0.97
+
+# (provider, model, temperature, max_tokens, response_format)
+Namespace = Tuple[str, str, float, Optional[int], Optional[str]]
+
+
+def _default_cache_path() -> Path:
+    storage_dir = os.environ.get("MOCO_STORAGE_DIR")
+    base = Path(storage_dir) if storage_dir else Path.home() / ".moco" / "storage"
+    return base / "llm_cache.db"
+
+
+def _normalize(vec: List[float]) -> Optional[Tuple[float, ...]]:
+    if not vec:
+        return None
+    if NUMPY_AVAILABLE:
+        arr = np.asarray(vec, dtype="float32")
+        norm = float(np.linalg.norm(arr))
+        return tuple((arr / norm).tolist()) if norm else None
+    norm = sum(x * x for x in vec) ** 0.5
+    return tuple(x / norm for x in vec) if norm else None
+
+
+class LLMResponseCache:
+    """
+    LLM 応答キャッシュ
+
+    Args:
+        path: SQLite ファイル（None ならメモリのみ）
+        ttl: 有効期限（秒）
+        max_entries: 永続ストアの件数上限（古い順に削除）
+        memory_size: メモリ内 LRU の件数
+        semantic_threshold: 類似層のしきい値（None で無効）
+        embed_fn: テキスト -> embedding（省略時は共有 EmbeddingService）
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl: int = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        memory_size: int = DEFAULT_MEMORY_SIZE,
+        semantic_threshold: Optional[float] = None,
+        embed_fn: Optional[Any] = None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_size = memory_size
+        self.semantic_threshold = semantic_threshold
+        self._embed_fn = embed_fn
+        self._lock = threading.Lock()
+        # key -> (response, expires_at)
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # namespace -> {key: 正規化済み embedding}（類似層の探索対象）
+        self._vectors: Dict[Namespace, "OrderedDict[str, Tuple[float, ...]]"] = {}
+        self._vectors_loaded = False
+        self._writes = 0
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._conn = self._open(path)
+
+    # -- storage ------------------------------------------------------------
+    @staticmethod
+    def _open(path: Path) -> sqlite3.Connection:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses(expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_namespace ON responses(namespace)")
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def namespace(
+        provider: str,
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        response_format: Optional[str],
+    ) -> Namespace:
+        return (provider, model, round(float(temperature), 3), max_tokens, response_format)
+
+    @staticmethod
+    def _ns_id(ns: Namespace) -> str:
+        return "|".join("" if v is None else str(v) for v in ns)
+
+    def key(self, ns: Namespace, prompt: str) -> str:
+        h = hashlib.sha256(self._ns_id(ns).encode("utf-8"))
+        h.update(b"\0")
+        h.update(prompt.encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
+    # -- lookup -------------------------------------------------------------
+    def get(
+        self, ns: Namespace, prompt: str, semantic: bool = False, semantic_text: Optional[str] = None
+    ) -> Optional[str]:
+        """キャッシュ済みの応答（なければ None）。類似層は semantic_text（省略時 prompt）で比較"""
+        key = self.key(ns, prompt)
+        now = time.time()
+        response = self._get_exact(key, now)
+        if response is not None:
+            self._count("exact_hits")
+            return response
+        if semantic and self.semantic_threshold is not None:
+            response = self._get_similar(ns, prompt if semantic_text is None else semantic_text, now)
+            if response is not None:
+                self._count("semantic_hits")
+                return response
+        self._count("misses")
+        return None
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _get_exact(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                return None
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def _get_similar(self, ns: Namespace, text: str, now: float) -> Optional[str]:
+        query = self._embed(text)
+        if query is None:
+            return None
+        with self._lock:
+            self._load_vectors()
+            candidates = self._vectors.get(ns)
+            if not candidates:
+                return None
+            keys = list(candidates.keys())
+            # 正規化済みなので内積 = コサイン類似度
+            if NUMPY_AVAILABLE:
+                try:
+                    scores = np.asarray(list(candidates.values()), dtype="float32") @ np.asarray(query, dtype="float32")
+                except ValueError:
+                    # embedding モデルが変わり次元が合わない
+                    return None
+                best = int(np.argmax(scores))
+                best_score = float(scores[best])
+            else:
+                scored = [
+                    sum(a * b for a, b in zip(vec, query)) if len(vec) == len(query) else 0.0
+                    for vec in candidates.values()
+                ]
+                best = max(range(len(scored)), key=scored.__getitem__)
+                best_score = scored[best]
+        if best_score < self.semantic_threshold:
+            return None
+        return self._get_exact(keys[best], now)
+
+    def _embed(self, text: str) -> Optional[Tuple[float, ...]]:
+        try:
+            if self._embed_fn is not None:
+                vec = self._embed_fn(text)
+            else:
+                from .embedding_service import get_embedding_service
+                service = get_embedding_service()
+                if not service.available:
+                    return None
+                vec = service.embed(text)
+        except Exception as e:
+            logger.debug(f"LLM cache embedding failed: {e}")
+            return None
+        return _normalize(list(vec))
+
+    def _load_vectors(self) -> None:
+        """永続ストアの embedding を類似層に読み込む（初回のみ、ロック内で呼ぶ）"""
+        if self._vectors_loaded:
+            return
+        self._vectors_loaded = True
+        if self._conn is None:
+            return
+        rows = self._conn.execute(
+            "SELECT key, namespace, embedding FROM responses "
+            "WHERE embedding IS NOT NULL AND expires_at > ? ORDER BY created_at",
+            (time.time(),),
+        ).fetchall()
+        ns_by_id: Dict[str, Namespace] = {}
+        for key, ns_id, blob in rows:
+            ns = ns_by_id.get(ns_id)
+            if ns is None:
+                ns = ns_by_id[ns_id] = self._parse_ns(ns_id)
+            self._vectors.setdefault(ns, OrderedDict())[key] = _decode(blob)
+
+    @staticmethod
+    def _parse_ns(ns_id: str) -> Namespace:
+        provider, model, temperature, max_tokens, response_format = ns_id.split("|")
+        return (
+            provider,
+            model,
+            float(temperature),
+            int(max_tokens) if max_tokens else None,
+            response_format or None,
+        )
+
+    # -- store --------------------------------------------------------------
+    def put(
+        self,
+        ns: Namespace,
+        prompt: str,
+        response: str,
+        semantic: bool = False,
+        semantic_text: Optional[str] = None,
+    ) -> None:
+        if not response:
+            return
+        key = self.key(ns, prompt)
+        now = time.time()
+        expires_at = now + self.ttl
+        vec = None
+        if semantic and self.semantic_threshold is not None:
+            vec = self._embed(prompt if semantic_text is None else semantic_text)
+        with self._lock:
+            self._remember(key, response, expires_at)
+            if vec is not None:
+                self._load_vectors()
+                vectors = self._vectors.setdefault(ns, OrderedDict())
+                vectors[key] = vec
+                vectors.move_to_end(key)
+                while len(vectors) > self.max_entries:
+                    vectors.popitem(last=False)
+            self.stats["stores"] += 1
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, namespace, response, embedding, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self._ns_id(ns), response, _encode(vec) if vec is not None else None, now, expires_at),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes >= 100:
+                self._writes = 0
+                self._prune(now)
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _prune(self, now: float) -> None:
+        """期限切れと件数超過分を削除（ロック内で呼ぶ）"""
+        removed = self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,)).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            removed += self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY created_at LIMIT ?)",
+                (excess,),
+            ).rowcount
+        self._conn.commit()
+        if removed:
+            self.stats["evictions"] += removed
+            # 類似層は次回アクセス時に読み直す
+            self._vectors.clear()
+            self._vectors_loaded = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._vectors.clear()
+            self._vectors_loaded = False
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            memory_entries = len(self._memory)
+            semantic_entries = sum(len(v) for v in self._vectors.values())
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        hits = lookups - stats["misses"]
+        return {
+            "enabled": True,
+            **stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "semantic_entries": semantic_entries,
+        }
+
+
+def _encode(vec: Tuple[float, ...]) -> bytes:
+    if NUMPY_AVAILABLE:
+        return np.asarray(vec, dtype="<f4").tobytes()
+    import struct
+    return struct.pack(f"<{len(vec)}f", *vec)
+
+
+def _decode(blob: bytes) -> Tuple[float, ...]:
+    if NUMPY_AVAILABLE:
+        return tuple(np.frombuffer(blob, dtype="<f4").tolist())
+    import struct
+    return struct.unpack(f"<{len(blob) // 4}f", blob)
+
+
+# ---------------------------------------------------------------------------
+# Shared instance
+# ---------------------------------------------------------------------------
+_cache: Optional[LLMResponseCache] = None
+_cache_config: Optional[Tuple[Any, ...]] = None
+_cache_lock = threading.Lock()
+
+
+def _env_config() -> Optional[Tuple[Any, ...]]:
+    setting = os.environ.get("MOCO_LLM_CACHE", "off")
+    if setting.lower() in ("", "0", "off", "false", "none"):
+        return None
+    path = _default_cache_path() if setting.lower() in ("1", "on", "true") else Path(setting)
+    try:
+        ttl = int(os.environ.get("MOCO_LLM_CACHE_TTL", DEFAULT_TTL))
+    except ValueError:
+        ttl = DEFAULT_TTL
+    semantic = os.environ.get("MOCO_LLM_CACHE_SEMANTIC", "off").lower()
+    if semantic in ("", "0", "off", "false", "none"):
+        threshold = None
+    elif semantic in ("1", "on", "true"):
+        threshold = DEFAULT_SEMANTIC_THRESHOLD
+    else:
+        try:
+            threshold = float(semantic)
+        except ValueError:
+            threshold = DEFAULT_SEMANTIC_THRESHOLD
+    return (path, ttl, threshold)
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """環境変数で有効化されていれば共有キャッシュを返す（無効なら None）"""
+    global _cache, _cache_config
+    config = _env_config()
+    if config is None:
+        return None
+    if _cache is not None and _cache_config == config:
+        return _cache
+    with _cache_lock:
+        if _cache is None or _cache_config != config:
+            path, ttl, threshold = config
+            try:
+                _cache = LLMResponseCache(path=path, ttl=ttl, semantic_threshold=threshold)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache store unavailable ({path}), using memory only: {e}")
+                _cache = LLMResponseCache(path=None, ttl=ttl, semantic_threshold=threshold)
+            _cache_config = config
+        return _cache
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    cache = _cache
+    return cache.get_stats() if cache is not None else {"enabled": False}
+
+
+def reset_llm_cache() -> None:
+    """共有インスタンスを破棄（テスト用）"""
+    global _cache, _cache_config
+    with _cache_lock:
+        _cache = None
+        _cache_config = None
@@ -2,22 +2,49 @@
 LLM プロバイダー統一管理
 
 プロバイダー優先順位: 1. zai, 2. openrouter, 3. gemini
+
+クライアントはプロバイダー・API キーごとにキャッシュし、keep-alive の
+HTTP コネクションプールを共有する。非同期クライアントは専用のバックグラウンド
+イベントループ1つで動かし、agenerate_text は呼び出し元のループからそこへ橋渡しする
+（run_sync や asyncio.run のように呼び出しごとに別ループで動く場合も、同じプールと
+同時実行枠を使う）。
+generate_text / agenerate_text は同時実行数の制限と 429/5xx の再試行（ジッター付き
+指数バックオフ、Retry-After は上限まで従う）を共通で行う。
+
+環境変数:
+  - MOCO_LLM_MAX_CONCURRENCY: プロバイダーごとの同時リクエスト数（既定 8）
+  - MOCO_LLM_MAX_RETRIES: 再試行回数（既定 3）
+  - MOCO_LLM_MAX_CONNECTIONS: コネクションプールの上限（既定 20）
 """
 
+import asyncio
 import base64
 import os
 import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
-from typing import Optional, Tuple
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Optional, Tuple, TypeVar
 
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI, APIConnectionError
     OPENAI_AVAILABLE = True
 except Exception:
     OpenAI = None
+    AsyncOpenAI = None
+    APIConnectionError = None
     OPENAI_AVAILABLE = False
 
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except Exception:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
 try:
     from google import genai
     from google.genai import types
@@ -200,21 +227,19 @@ def get_vision_model(provider: Optional[str] = None) -> str:
     return VISION_MODELS[PROVIDER_OPENROUTER]
 
 
-def _get_openai_like_client(provider: str) -> "OpenAI":
-    if not OPENAI_AVAILABLE:
-        raise ImportError("OpenAI package not installed. Run: pip install openai")
-
+def _openai_client_kwargs(provider: str) -> Dict[str, Any]:
+    """OpenAI 互換クライアントの接続設定（API キー・base_url・ヘッダ）"""
     if provider == PROVIDER_OPENROUTER:
         api_key = os.environ.get("OPENROUTER_API_KEY")
         if not api_key:
             raise ValueError("OPENROUTER_API_KEY environment variable not set")
-        return OpenAI(api_key=api_key, base_url="https://openrouter.ai/api/v1")
+        return {"api_key": api_key, "base_url": "https://openrouter.ai/api/v1"}
 
     if provider == PROVIDER_ZAI:
         api_key = os.environ.get("ZAI_API_KEY")
         if not api_key:
             raise ValueError("ZAI_API_KEY environment variable not set")
-        return OpenAI(api_key=api_key, base_url="https://api.z.ai/api/coding/paas/v4")
+        return {"api_key": api_key, "base_url": "https://api.z.ai/api/coding/paas/v4"}
 
     if provider == PROVIDER_MOONSHOT:
         api_key = os.environ.get("MOONSHOT_API_KEY")
@@ -230,13 +255,13 @@ def _get_openai_like_client(provider: str) -> "OpenAI":
         kwargs = {"api_key": api_key, "base_url": base_url}
         if "kimi.com/coding" in base_url:
             kwargs["default_headers"] = {"User-Agent": "Kilo-Code/1.0.0"}
-        return OpenAI(**kwargs)
+        return kwargs
 
     if provider == PROVIDER_OLLAMA:
         # Ollama uses OpenAI-compatible API without auth
         base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434/v1")
         api_key = os.environ.get("OLLAMA_API_KEY", "ollama")
-        return OpenAI(api_key=api_key, base_url=base_url)
+        return {"api_key": api_key, "base_url": base_url}
 
     # PROVIDER_OPENAI (including OpenAI-compatible via OPENAI_BASE_URL)
     api_key = os.environ.get("OPENAI_API_KEY")
@@ -244,13 +269,11 @@ def _get_openai_like_client(provider: str) -> "OpenAI":
         raise ValueError("OPENAI_API_KEY environment variable not set")
     base_url = os.environ.get("OPENAI_BASE_URL")
     if base_url:
-        return OpenAI(api_key=api_key, base_url=base_url)
-    return OpenAI(api_key=api_key)
+        return {"api_key": api_key, "base_url": base_url}
+    return {"api_key": api_key}
 
 
-def _get_gemini_client() -> "genai.Client":
-    if not GENAI_AVAILABLE:
-        raise ImportError("google-genai is not installed. Run: pip install google-genai")
+def _gemini_api_key() -> str:
     api_key = (
         os.environ.get("GENAI_API_KEY") or
         os.environ.get("GEMINI_API_KEY") or
@@ -258,7 +281,325 @@ def _get_gemini_client() -> "genai.Client":
     )
     if not api_key:
         raise ValueError("Gemini API key not set (GENAI_API_KEY / GEMINI_API_KEY / GOOGLE_API_KEY)")
-    return genai.Client(api_key=api_key)
+    return api_key
+
+
+# ---------------------------------------------------------------------------
+# Client pool
+# ---------------------------------------------------------------------------
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_MAX_CONNECTIONS = 20
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 20.0
+
+_client_lock = threading.Lock()
+# (provider, api_key, base_url, headers) -> OpenAI / api_key -> genai.Client
+_sync_clients: Dict[Tuple[Any, ...], Any] = {}
+# キー -> AsyncOpenAI / genai.Client（_llm_loop 上でだけ使う）
+_async_clients: Dict[Tuple[Any, ...], Any] = {}
+_sync_slots: Dict[str, threading.BoundedSemaphore] = {}
+# プロバイダー -> asyncio.Semaphore（_llm_loop 上でだけ使う）
+_async_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+class _LLMEventLoop:
+    """
+    非同期 LLM クライアント専用のバックグラウンドイベントループ
+
+    最初の submit でデーモンスレッドを起動し、以降は同じループを使い続ける。
+    非同期クライアントの keep-alive 接続はこのループに束縛されるため、
+    呼び出し元のループが短命でも接続と同時実行枠をプロセス全体で共有できる。
+    """
+
+    def __init__(self, name: str = "moco-llm-loop"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self.loop is None or self.loop.is_closed() or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(started.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                started.wait()
+                self.loop = loop
+            return self.loop
+
+    def in_loop(self) -> bool:
+        """現在のスレッドがこのループのスレッドかどうか"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+
+
+_llm_loop = _LLMEventLoop()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _pool_limits() -> Optional["httpx.Limits"]:
+    if not HTTPX_AVAILABLE:
+        return None
+    max_connections = _env_int("MOCO_LLM_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=60.0,
+    )
+
+
+def _openai_client_key(provider: str, kwargs: Dict[str, Any]) -> Tuple[Any, ...]:
+    headers = tuple(sorted((kwargs.get("default_headers") or {}).items()))
+    return (provider, kwargs["api_key"], kwargs.get("base_url"), headers)
+
+
+def _get_openai_like_client(provider: str) -> "OpenAI":
+    """OpenAI 互換クライアント（設定ごとにキャッシュしてコネクションを再利用）"""
+    if not OPENAI_AVAILABLE:
+        raise ImportError("OpenAI package not installed. Run: pip install openai")
+    kwargs = _openai_client_kwargs(provider)
+    key = _openai_client_key(provider, kwargs)
+    client = _sync_clients.get(key)
+    if client is None:
+        with _client_lock:
+            client = _sync_clients.get(key)
+            if client is None:
+                limits = _pool_limits()
+                if limits is not None:
+                    kwargs["http_client"] = httpx.Client(limits=limits, timeout=httpx.Timeout(600.0, connect=5.0))
+                # 再試行はこのモジュールで行う
+                client = OpenAI(max_retries=0, **kwargs)
+                _sync_clients[key] = client
+    return client
+
+
+def _get_async_openai_like_client(provider: str) -> "AsyncOpenAI":
+    """非同期 OpenAI 互換クライアント（設定ごとにキャッシュ。_llm_loop 上で呼ぶ）"""
+    if not OPENAI_AVAILABLE:
+        raise ImportError("OpenAI package not installed. Run: pip install openai")
+    kwargs = _openai_client_kwargs(provider)
+    key = _openai_client_key(provider, kwargs)
+    with _client_lock:
+        client = _async_clients.get(key)
+        if client is None:
+            limits = _pool_limits()
+            if limits is not None:
+                kwargs["http_client"] = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(600.0, connect=5.0))
+            client = _async_clients[key] = AsyncOpenAI(max_retries=0, **kwargs)
+    return client
+
+
+def _get_gemini_client() -> "genai.Client":
+    """Gemini クライアント（API キーごとにキャッシュ）"""
+    if not GENAI_AVAILABLE:
+        raise ImportError("google-genai is not installed. Run: pip install google-genai")
+    api_key = _gemini_api_key()
+    key = (PROVIDER_GEMINI, api_key)
+    client = _sync_clients.get(key)
+    if client is None:
+        with _client_lock:
+            client = _sync_clients.get(key)
+            if client is None:
+                client = _sync_clients[key] = genai.Client(api_key=api_key)
+    return client
+
+
+def _get_async_gemini_client() -> "genai.Client":
+    """非同期呼び出し（client.aio）用の Gemini クライアント（API キーごとにキャッシュ。_llm_loop 上で呼ぶ）"""
+    if not GENAI_AVAILABLE:
+        raise ImportError("google-genai is not installed. Run: pip install google-genai")
+    api_key = _gemini_api_key()
+    key = (PROVIDER_GEMINI, api_key)
+    with _client_lock:
+        client = _async_clients.get(key)
+        if client is None:
+            client = _async_clients[key] = genai.Client(api_key=api_key)
+    return client
+
+
+def _sync_slot(provider: str) -> threading.BoundedSemaphore:
+    slot = _sync_slots.get(provider)
+    if slot is None:
+        with _client_lock:
+            slot = _sync_slots.get(provider)
+            if slot is None:
+                limit = max(1, _env_int("MOCO_LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+                slot = _sync_slots[provider] = threading.BoundedSemaphore(limit)
+    return slot
+
+
+def _async_slot(provider: str) -> asyncio.Semaphore:
+    """プロバイダーごとの同時実行枠（_llm_loop 上で呼ぶのでプロセス全体で1つ）"""
+    with _client_lock:
+        slot = _async_slots.get(provider)
+        if slot is None:
+            limit = max(1, _env_int("MOCO_LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+            slot = _async_slots[provider] = asyncio.Semaphore(limit)
+    return slot
+
+
+def reset_llm_clients() -> None:
+    """キャッシュ済みクライアントと同時実行枠を破棄（API キー変更時・テスト用）"""
+    with _client_lock:
+        for client in _sync_clients.values():
+            close = getattr(client, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+        _sync_clients.clear()
+        for client in _async_clients.values():
+            aclose = getattr(client, "close", None)
+            if asyncio.iscoroutinefunction(aclose) and _llm_loop.loop is not None and not _llm_loop.loop.is_closed():
+                _llm_loop.submit(aclose())
+        _async_clients.clear()
+        _sync_slots.clear()
+        _async_slots.clear()
+
+
+# ---------------------------------------------------------------------------
+# Retry
+# ---------------------------------------------------------------------------
+_T = TypeVar("_T")
+
+
+def _error_status(error: Exception) -> Optional[int]:
+    # openai: status_code / google-genai: code
+    for attr in ("status_code", "code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = _error_status(error)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    if OPENAI_AVAILABLE and isinstance(error, APIConnectionError):
+        return True
+    if HTTPX_AVAILABLE and isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Retry-After があれば従い（RETRY_MAX_DELAY で頭打ち）、なければ full jitter の指数バックオフ"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            retry_after = float(headers.get("retry-after"))
+            if retry_after >= 0:
+                return min(retry_after, RETRY_MAX_DELAY)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def _call_with_retry(provider: str, call: Callable[[], _T]) -> _T:
+    max_retries = _env_int("MOCO_LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+    attempt = 0
+    while True:
+        try:
+            with _sync_slot(provider):
+                return call()
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning(f"LLM request to {provider} failed ({e}); retrying in {delay:.1f}s")
+            attempt += 1
+            time.sleep(delay)
+
+
+async def _acall_with_retry(provider: str, call: Callable[[], Awaitable[_T]]) -> _T:
+    max_retries = _env_int("MOCO_LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+    attempt = 0
+    while True:
+        try:
+            async with _async_slot(provider):
+                return await call()
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning(f"LLM request to {provider} failed ({e}); retrying in {delay:.1f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+# ---------------------------------------------------------------------------
+# Text generation
+# ---------------------------------------------------------------------------
+def _gemini_text_config(
+    temperature: float,
+    max_tokens: Optional[int],
+    response_format: Optional[str],
+) -> "types.GenerateContentConfig":
+    config_kwargs = {"temperature": temperature}
+    if max_tokens is not None:
+        config_kwargs["max_output_tokens"] = max_tokens
+    if response_format == "json":
+        config_kwargs["response_mime_type"] = "application/json"
+    return types.GenerateContentConfig(**config_kwargs)
+
+
+def _openai_text_kwargs(
+    prompt: str,
+    model_name: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    response_format: Optional[str],
+) -> Dict[str, Any]:
+    create_kwargs = {
+        "model": model_name,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature,
+    }
+    if max_tokens is not None:
+        create_kwargs["max_tokens"] = max_tokens
+    if response_format == "json":
+        create_kwargs["response_format"] = {"type": "json_object"}
+    return create_kwargs
+
+
+def _response_cache(
+    cache: Optional[str],
+    provider_name: str,
+    model_name: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    response_format: Optional[str],
+) -> Tuple[Optional[Any], Optional[Tuple[Any, ...]]]:
+    """応答キャッシュと名前空間（cache 未指定・無効時は (None, None)）"""
+    if not cache:
+        return None, None
+    from .llm_cache import CACHE_MODES, LLMResponseCache, get_llm_cache
+    if cache not in CACHE_MODES:
+        raise ValueError(f"cache must be one of {CACHE_MODES}: {cache!r}")
+    llm_cache = get_llm_cache()
+    if llm_cache is None:
+        return None, None
+    ns = LLMResponseCache.namespace(provider_name, model_name, temperature, max_tokens, response_format)
+    return llm_cache, ns
 
 
 def generate_text(
@@ -268,45 +609,117 @@ def generate_text(
     max_tokens: Optional[int] = None,
     temperature: float = 0.3,
     response_format: Optional[str] = None,
+    cache: Optional[str] = None,
+    semantic_text: Optional[str] = None,
 ) -> str:
     """
     Generate text with a unified provider interface.
 
+    Synchronous counterpart of agenerate_text (same pooled clients, limits and retries).
+
     response_format:
       - None: normal text
       - "json": request JSON output (best-effort)
+    cache:
+      - None: no response cache
+      - "exact" / "semantic": reuse cached responses when MOCO_LLM_CACHE is enabled
+        (see core/llm_cache.py; only for deterministic classification prompts)
+    semantic_text:
+      - variable part of the prompt compared by the "semantic" tier (defaults to the whole prompt)
     """
     _ensure_dotenv_loaded()
     provider_name = provider or get_preferred_provider()
     model_name = model or get_analyzer_model(provider_name)
 
+    llm_cache, ns = _response_cache(cache, provider_name, model_name, temperature, max_tokens, response_format)
+    if llm_cache is not None:
+        cached = llm_cache.get(ns, prompt, semantic=cache == "semantic", semantic_text=semantic_text)
+        if cached is not None:
+            return cached
+
     if provider_name == PROVIDER_GEMINI:
         client = _get_gemini_client()
-        config_kwargs = {"temperature": temperature}
-        if max_tokens is not None:
-            config_kwargs["max_output_tokens"] = max_tokens
-        if response_format == "json":
-            config_kwargs["response_mime_type"] = "application/json"
-        config = types.GenerateContentConfig(**config_kwargs)
-        response = client.models.generate_content(
+        config = _gemini_text_config(temperature, max_tokens, response_format)
+        response = _call_with_retry(provider_name, lambda: client.models.generate_content(
             model=model_name,
             contents=prompt,
             config=config
-        )
-        return response.text or ""
+        ))
+        text = response.text or ""
+    else:
+        # OpenAI-compatible providers
+        client = _get_openai_like_client(provider_name)
+        create_kwargs = _openai_text_kwargs(prompt, model_name, temperature, max_tokens, response_format)
+        response = _call_with_retry(provider_name, lambda: client.chat.completions.create(**create_kwargs))
+        text = response.choices[0].message.content or ""
 
-    # OpenAI-compatible providers
-    client = _get_openai_like_client(provider_name)
-    create_kwargs = {
-        "model": model_name,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": temperature,
-    }
-    if max_tokens is not None:
-        create_kwargs["max_tokens"] = max_tokens
-    if response_format == "json":
-        create_kwargs["response_format"] = {"type": "json_object"}
-    response = client.chat.completions.create(**create_kwargs)
+    if llm_cache is not None:
+        llm_cache.put(ns, prompt, text, semantic=cache == "semantic", semantic_text=semantic_text)
+    return text
+
+
+async def agenerate_text(
+    prompt: str,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    temperature: float = 0.3,
+    response_format: Optional[str] = None,
+    cache: Optional[str] = None,
+    semantic_text: Optional[str] = None,
+) -> str:
+    """
+    Async version of generate_text.
+
+    Uses AsyncOpenAI / genai.Client.aio so the event loop is not blocked
+    and no worker thread is held while waiting for the provider. The request
+    itself runs on the shared background LLM loop, so every caller loop
+    reuses the same connection pool and concurrency limit.
+    """
+    _ensure_dotenv_loaded()
+    provider_name = provider or get_preferred_provider()
+    model_name = model or get_analyzer_model(provider_name)
+
+    llm_cache, ns = _response_cache(cache, provider_name, model_name, temperature, max_tokens, response_format)
+    semantic = cache == "semantic"
+    if llm_cache is not None:
+        # SQLite / embedding の参照はイベントループの外で行う
+        cached = await asyncio.to_thread(llm_cache.get, ns, prompt, semantic, semantic_text)
+        if cached is not None:
+            return cached
+
+    request = _agenerate_on_llm_loop(prompt, provider_name, model_name, max_tokens, temperature, response_format)
+    if _llm_loop.in_loop():
+        text = await request
+    else:
+        text = await asyncio.wrap_future(_llm_loop.submit(request))
+
+    if llm_cache is not None:
+        await asyncio.to_thread(llm_cache.put, ns, prompt, text, semantic, semantic_text)
+    return text
+
+
+async def _agenerate_on_llm_loop(
+    prompt: str,
+    provider_name: str,
+    model_name: str,
+    max_tokens: Optional[int],
+    temperature: float,
+    response_format: Optional[str],
+) -> str:
+    """agenerate_text の API 呼び出し部分（_llm_loop 上で実行）"""
+    if provider_name == PROVIDER_GEMINI:
+        client = _get_async_gemini_client()
+        config = _gemini_text_config(temperature, max_tokens, response_format)
+        response = await _acall_with_retry(provider_name, lambda: client.aio.models.generate_content(
+            model=model_name,
+            contents=prompt,
+            config=config
+        ))
+        return response.text or ""
+    client = _get_async_openai_like_client(provider_name)
+    create_kwargs = _openai_text_kwargs(prompt, model_name, temperature, max_tokens, response_format)
+    response = await _acall_with_retry(provider_name, lambda: client.chat.completions.create(**create_kwargs))
     return response.choices[0].message.content or ""
 
 
@@ -353,11 +766,11 @@ def generate_vision(
             ),
             types.Part(text=prompt),
         ]
-        response = client.models.generate_content(
+        response = _call_with_retry(provider_name, lambda: client.models.generate_content(
             model=model_name,
             contents=[types.Content(role="user", parts=parts)],
             config=config,
-        )
+        ))
         return response.text or ""
 
     if image_url is None and image_base64 is None:
@@ -389,7 +802,7 @@ def generate_vision(
     }
     if max_tokens is not None:
         create_kwargs["max_tokens"] = max_tokens
-    response = client.chat.completions.create(**create_kwargs)
+    response = _call_with_retry(provider_name, lambda: client.chat.completions.create(**create_kwargs))
     return response.choices[0].message.content or ""
 
 
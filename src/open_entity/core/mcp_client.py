@@ -3,20 +3,37 @@ MCP (Model Context Protocol) クライアント
 
 外部 MCP サーバーと通信し、ツールを利用可能にする。
 MCP SDK がインストールされていない場合は NoOp として動作する。
+
+MCP セッションはクライアントごとに1つのバックグラウンドイベントループ（専用スレッド）上で
+保持し、どのスレッド・ループからの呼び出しも run_coroutine_threadsafe でそのループへ渡す。
+
+- 生成するツール関数は async 関数（ランタイムがそのまま await できる）
+- 同じサーバーへの呼び出しは1セッション上で並行に送る（応答はリクエスト ID で対応付け）。
+  同時実行数はサーバーごとのセマフォで制限する
+- 通信路が切れていたら1回だけ再接続して呼び出し直す
+
+環境変数:
+  - MOCO_MCP_MAX_CONCURRENCY: サーバーごとの同時呼び出し数（既定 8）
+  - MOCO_MCP_CALL_TIMEOUT: ツール呼び出しのタイムアウト（秒、既定 60）
 """
 
 import os
 import asyncio
+import inspect
 import logging
+import threading
 import concurrent.futures
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any, Callable
+from typing import Optional, List, Dict, Any, Callable, Coroutine
 
 logger = logging.getLogger(__name__)
 
 # 許可されたコマンドのホワイトリスト
 ALLOWED_COMMANDS = frozenset({"npx", "node", "python", "python3", "uvx", "deno"})
 
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_CALL_TIMEOUT = 60.0
+
 # MCP SDK のインポート（オプション依存）
 try:
     from mcp import ClientSession, StdioServerParameters
@@ -28,6 +45,96 @@ except ImportError:
     StdioServerParameters = None
     stdio_client = None
 
+# 再接続の対象とする通信路のエラー（ツール自体のエラーは対象外）
+try:
+    import anyio
+    _TRANSPORT_ERRORS = (
+        ConnectionError, EOFError, anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream
+    )
+except ImportError:
+    _TRANSPORT_ERRORS = (ConnectionError, EOFError)
+
+
+def _env_number(name: str, default, cast=int):
+    try:
+        return cast(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# inputSchema の型 → ツール関数のアノテーション
+_JSON_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool, "array": list, "object": dict}
+
+
+def _tool_signature(input_schema: Dict[str, Any]) -> Optional[inspect.Signature]:
+    """
+    inputSchema からツール関数のシグネチャを作る
+
+    ランタイムはシグネチャから引数の検証とスキーマ生成を行うため、**kwargs だけでは
+    引数が渡らない。プロパティ名が識別子でない場合は None。
+    """
+    properties = (input_schema or {}).get("properties") or {}
+    required = set((input_schema or {}).get("required") or [])
+    params = []
+    for name, prop in properties.items():
+        if not name.isidentifier():
+            return None
+        annotation = _JSON_TYPES.get((prop or {}).get("type"), str)
+        default = inspect.Parameter.empty if name in required else None
+        params.append(inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=default, annotation=annotation))
+    # 必須の引数を先に並べる
+    params.sort(key=lambda p: p.default is not inspect.Parameter.empty)
+    return inspect.Signature(params, return_annotation=str)
+
+
+class _MCPEventLoop:
+    """
+    MCP セッション専用のバックグラウンドイベントループ
+
+    最初の submit でデーモンスレッドを起動し、以降は同じループを使い続ける。
+    """
+
+    def __init__(self, name: str = "moco-mcp-loop"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self.loop is None or self.loop.is_closed() or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(started.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                started.wait()
+                self.loop = loop
+            return self.loop
+
+    def in_loop(self) -> bool:
+        """現在のスレッドがこのループのスレッドかどうか"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> "concurrent.futures.Future":
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+
+    def stop(self) -> None:
+        with self._lock:
+            loop, thread = self.loop, self._thread
+            self.loop = self._thread = None
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(5)
+                if not thread.is_alive():
+                    loop.close()
+
 
 @dataclass
 class MCPServerConfig:
@@ -83,7 +190,48 @@ class MCPServerConnection:
         self.tools: List[Dict[str, Any]] = []
         self._context_manager = None
         self._connected = False
-    
+        self._owner: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        """
+        専用タスクで接続を開き、stop() まで保持する
+
+        stdio_client / ClientSession は anyio のタスクグループを使うため、
+        開いたタスクと同じタスクで閉じる必要がある。呼び出し側のタスクが
+        終わっても接続が残るよう、所有タスクに接続と切断を任せる。
+
+        Raises:
+            connect() と同じ
+        """
+        if self._owner is not None and not self._owner.done():
+            return
+        ready = asyncio.get_running_loop().create_future()
+        self._stop_event = asyncio.Event()
+        self._owner = asyncio.create_task(self._hold(ready))
+        await ready
+
+    async def _hold(self, ready: "asyncio.Future") -> None:
+        try:
+            await self.connect()
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+        try:
+            await self._stop_event.wait()
+        finally:
+            await self.disconnect()
+
+    async def stop(self) -> None:
+        """start() で開いた接続を閉じる"""
+        if self._owner is None:
+            await self.disconnect()
+            return
+        self._stop_event.set()
+        await asyncio.gather(self._owner, return_exceptions=True)
+        self._owner = None
+
     async def connect(self) -> None:
         """
         MCP サーバーに接続
@@ -244,16 +392,33 @@ class MCPClient:
     MCP クライアント
     
     複数の MCP サーバーを管理し、ツールを統合的に利用可能にする。
+    セッションはバックグラウンドイベントループ上に置き、呼び出し元のループには依存しない。
     """
     
-    def __init__(self, config: Optional[MCPConfig] = None):
+    def __init__(
+        self,
+        config: Optional[MCPConfig] = None,
+        max_concurrency: Optional[int] = None,
+        call_timeout: Optional[float] = None,
+    ):
         """
         Args:
             config: MCP 設定（省略時はデフォルト設定）
+            max_concurrency: サーバーごとの同時呼び出し数（省略時は MOCO_MCP_MAX_CONCURRENCY）
+            call_timeout: ツール呼び出しのタイムアウト秒（省略時は MOCO_MCP_CALL_TIMEOUT）
         """
         self.config = config or MCPConfig()
         self._connections: Dict[str, MCPServerConnection] = {}
         self._tool_map: Dict[str, str] = {}  # prefixed_name -> server_name
+        self.max_concurrency = max(
+            1, max_concurrency or _env_number("MOCO_MCP_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)
+        )
+        self.call_timeout = call_timeout or _env_number("MOCO_MCP_CALL_TIMEOUT", DEFAULT_CALL_TIMEOUT, float)
+        self._bridge = _MCPEventLoop()
+        # 以下はバックグラウンドループ上でのみ触る
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._reconnect_locks: Dict[str, asyncio.Lock] = {}
+        self.stats = {"calls": 0, "reconnects": 0}
     
     @property
     def is_available(self) -> bool:
@@ -264,53 +429,125 @@ class MCPClient:
     def is_enabled(self) -> bool:
         """MCP 機能が有効かどうか"""
         return self.config.enabled and MCP_AVAILABLE
-    
+
+    # ----------------------------------------
+    # バックグラウンドループへの受け渡し
+    # ----------------------------------------
+
+    async def _on_bridge(self, coro: Coroutine) -> Any:
+        """コルーチンをバックグラウンドループで実行して結果を待つ"""
+        if self._bridge.in_loop():
+            return await coro
+        return await asyncio.wrap_future(self._bridge.submit(coro))
+
+    def run_sync(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        コルーチンをバックグラウンドループで実行し、同期的に結果を返す
+
+        Raises:
+            RuntimeError: バックグラウンドループのスレッドから呼ばれた場合（デッドロック防止）
+        """
+        if self._bridge.in_loop():
+            coro.close()
+            raise RuntimeError("run_sync() cannot be called from the MCP event loop thread")
+        return self._bridge.submit(coro).result(timeout)
+
+    def connect_sync(self, timeout: Optional[float] = 120) -> None:
+        """connect() の同期版（ツール探索など同期コードから使う）"""
+        self.run_sync(self._connect(), timeout)
+
+    def close(self, timeout: Optional[float] = 30) -> None:
+        """すべてのサーバーから切断し、バックグラウンドループを止める"""
+        if self._bridge.loop is not None:
+            try:
+                self.run_sync(self._disconnect(), timeout)
+            except Exception as e:
+                logger.warning(f"Error closing MCP client: {e}")
+        self._bridge.stop()
+        self._semaphores.clear()
+        self._reconnect_locks.clear()
+
+    # ----------------------------------------
+    # 接続管理
+    # ----------------------------------------
+
     async def connect(self) -> None:
         """
         すべての MCP サーバーに接続
         
-        設定された各サーバーに順次接続を試みる。
+        設定された各サーバーに並行して接続を試みる（接続済みのサーバーはそのまま）。
         一部のサーバーへの接続が失敗しても、他のサーバーへの接続は継続する。
         """
+        await self._on_bridge(self._connect())
+
+    async def _connect(self) -> None:
         if not self.is_enabled:
             logger.debug("MCP is disabled or not available")
             return
-        
-        for server_config in self.config.servers:
+
+        async def connect_one(server_config: MCPServerConfig) -> None:
+            existing = self._connections.get(server_config.name)
+            if existing is not None and existing.is_connected:
+                return
             try:
                 connection = MCPServerConnection(server_config)
-                await connection.connect()
+                await connection.start()
                 self._connections[server_config.name] = connection
-                
-                # ツールマッピングを更新
-                for tool in connection.tools:
-                    prefixed_name = f"{server_config.name}_{tool['name']}"
-                    self._tool_map[prefixed_name] = server_config.name
-                    
+                self._register_tools(server_config.name, connection)
             except Exception as e:
                 logger.error(
                     f"Failed to connect to MCP server '{server_config.name}': {e}"
                 )
                 # 接続失敗しても他のサーバーは継続
-                continue
+
+        await asyncio.gather(*(connect_one(s) for s in self.config.servers))
         
         connected_count = len(self._connections)
         total_count = len(self.config.servers)
         logger.info(f"Connected to {connected_count}/{total_count} MCP servers")
+
+    def _register_tools(self, server_name: str, connection: MCPServerConnection) -> None:
+        """ツールマッピングを更新"""
+        for tool in connection.tools:
+            prefixed_name = f"{server_name}_{tool['name']}"
+            self._tool_map[prefixed_name] = server_name
     
     async def disconnect(self) -> None:
         """
         すべての MCP サーバーから切断
         """
+        await self._on_bridge(self._disconnect())
+
+    async def _disconnect(self) -> None:
         for name, connection in list(self._connections.items()):
             try:
-                await connection.disconnect()
+                await connection.stop()
             except Exception as e:
                 logger.warning(f"Error disconnecting from '{name}': {e}")
         
         self._connections.clear()
         self._tool_map.clear()
         logger.debug("Disconnected from all MCP servers")
+
+    async def _reconnect(self, server_name: str, failed: MCPServerConnection) -> MCPServerConnection:
+        """切れた接続を作り直す（同じサーバーの再接続は1回にまとめる）"""
+        lock = self._reconnect_locks.setdefault(server_name, asyncio.Lock())
+        async with lock:
+            current = self._connections.get(server_name)
+            if current is not None and current is not failed and current.is_connected:
+                # 待っている間に他の呼び出しが再接続済み
+                return current
+            try:
+                await failed.stop()
+            except Exception as e:
+                logger.debug(f"Error closing broken connection to '{server_name}': {e}")
+            connection = MCPServerConnection(failed.config)
+            await connection.start()
+            self._connections[server_name] = connection
+            self._register_tools(server_name, connection)
+            self.stats["reconnects"] += 1
+            logger.info(f"Reconnected to MCP server '{server_name}'")
+            return connection
     
     async def list_tools(self) -> List[Dict[str, Any]]:
         """
@@ -339,6 +576,9 @@ class MCPClient:
     ) -> Any:
         """
         MCP サーバーのツールを呼び出す
+
+        どのイベントループ・スレッドから呼んでもよい。実際の呼び出しは
+        バックグラウンドループ上のセッションで行う。
         
         Args:
             server_name: サーバー識別名
@@ -354,9 +594,23 @@ class MCPClient:
         """
         if server_name not in self._connections:
             raise ValueError(f"MCP server not found: {server_name}")
-        
-        connection = self._connections[server_name]
-        return await connection.call_tool(tool_name, arguments)
+        return await self._on_bridge(self._call_tool(server_name, tool_name, arguments))
+
+    async def _call_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        semaphore = self._semaphores.get(server_name)
+        if semaphore is None:
+            semaphore = self._semaphores[server_name] = asyncio.Semaphore(self.max_concurrency)
+        async with semaphore:
+            self.stats["calls"] += 1
+            connection = self._connections[server_name]
+            try:
+                if not connection.is_connected:
+                    raise ConnectionError(f"MCP server '{server_name}' is disconnected")
+                return await asyncio.wait_for(connection.call_tool(tool_name, arguments), self.call_timeout)
+            except _TRANSPORT_ERRORS as e:
+                logger.warning(f"MCP server '{server_name}' connection lost ({e!r}); reconnecting")
+            connection = await self._reconnect(server_name, connection)
+            return await asyncio.wait_for(connection.call_tool(tool_name, arguments), self.call_timeout)
     
     async def call_tool_by_prefixed_name(
         self,
@@ -419,6 +673,9 @@ class MCPClient:
         """
         moco のツールマップに追加可能な関数を生成
 
+        生成される関数は async 関数で、ランタイムは直接 await できる。
+        同期コードから呼ぶ場合も、返るコルーチンをどのループで実行してもよい。
+
         Returns:
             ツール名をキー、呼び出し関数を値とする辞書
         """
@@ -427,38 +684,43 @@ class MCPClient:
         for prefixed_name in self._tool_map:
             # クロージャで変数をキャプチャ
             def make_tool_func(name: str):
-                def tool_func(**kwargs) -> str:
-                    """MCP ツールを同期的に呼び出す"""
+                async def tool_func(**kwargs) -> str:
+                    """MCP ツールを呼び出す"""
                     try:
-                        # Python 3.10+ 対応: get_running_loop で実行中のループを検出
-                        try:
-                            loop = asyncio.get_running_loop()
-                        except RuntimeError:
-                            loop = None
-
-                        if loop is not None:
-                            # 既にイベントループが動いている場合は ThreadPoolExecutor を使用
-                            with concurrent.futures.ThreadPoolExecutor() as executor:
-                                future = executor.submit(
-                                    lambda: asyncio.run(
-                                        self.call_tool_by_prefixed_name(name, kwargs)
-                                    )
-                                )
-                                return future.result(timeout=60)
-                        else:
-                            # イベントループが動いていない場合は asyncio.run を使用
-                            return asyncio.run(
-                                self.call_tool_by_prefixed_name(name, kwargs)
-                            )
+                        return await self.call_tool_by_prefixed_name(name, kwargs)
                     except Exception as e:
                         return f"Error calling MCP tool '{name}': {e}"
 
                 return tool_func
 
-            tool_functions[prefixed_name] = make_tool_func(prefixed_name)
+            tool_func = make_tool_func(prefixed_name)
+            tool = self._find_tool(prefixed_name)
+            signature = _tool_signature(tool.get("inputSchema", {})) if tool else None
+            if signature is not None:
+                properties = tool["inputSchema"].get("properties") or {}
+                lines = [tool.get("description") or f"MCP tool: {prefixed_name}"]
+                if properties:
+                    lines.append("")
+                    lines.append("Args:")
+                    for param in signature.parameters.values():
+                        description = (properties[param.name] or {}).get("description", "")
+                        lines.append(f"    {param.name}: {description}")
+                tool_func.__name__ = prefixed_name
+                tool_func.__doc__ = "\n".join(lines)
+                tool_func.__signature__ = signature
+                tool_func.__annotations__ = {p.name: p.annotation for p in signature.parameters.values()}
+            tool_functions[prefixed_name] = tool_func
 
         return tool_functions
     
+    def _find_tool(self, prefixed_name: str) -> Optional[Dict[str, Any]]:
+        server_name = self._tool_map.get(prefixed_name)
+        connection = self._connections.get(server_name) if server_name else None
+        if connection is None:
+            return None
+        tool_name = prefixed_name[len(server_name) + 1:]
+        return next((t for t in connection.tools if t["name"] == tool_name), None)
+
     def get_connected_servers(self) -> List[str]:
         """
         接続中のサーバー名一覧を取得
@@ -515,4 +777,6 @@ def reset_mcp_client() -> None:
     テスト用途やクライアント再初期化時に使用。
     """
     global _global_mcp_client
+    if _global_mcp_client is not None:
+        _global_mcp_client.close()
     _global_mcp_client = None
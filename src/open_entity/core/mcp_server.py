@@ -6,7 +6,6 @@ stdio モードと HTTP モードの両方をサポート。
 """
 
 import asyncio
-import inspect
 import json
 import logging
 import hashlib
@@ -14,7 +13,9 @@ import hmac
 import time
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Union, get_type_hints, TYPE_CHECKING
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+from .tool_registry import get_compiled_tool, python_type_to_json_type
 
 logger = logging.getLogger(__name__)
 
@@ -79,77 +80,21 @@ class ToolDefinition:
             self.input_schema = self._generate_schema_from_handler()
 
     def _generate_schema_from_handler(self) -> Dict[str, Any]:
-        """ハンドラの型ヒントからJSONスキーマを生成"""
-        schema = {
-            "type": "object",
-            "properties": {},
-            "required": []
-        }
-        
+        """ハンドラの型ヒントからJSONスキーマを生成（ツールレジストリで関数ごとにキャッシュ）"""
         try:
-            sig = inspect.signature(self.handler)
-            hints = get_type_hints(self.handler) if hasattr(self.handler, '__annotations__') else {}
-            
-            for param_name, param in sig.parameters.items():
-                if param_name in ('self', 'cls'):
-                    continue
-                
-                # 型からJSONスキーマ型を推定
-                param_type = hints.get(param_name, Any)
-                json_type = self._python_type_to_json_type(param_type)
-                
-                prop_def = {"type": json_type}
-                
-                # docstring からパラメータ説明を抽出（簡易版）
-                if self.handler.__doc__:
-                    doc_lines = self.handler.__doc__.split('\n')
-                    for line in doc_lines:
-                        line = line.strip()
-                        if line.startswith(f'{param_name}') or line.startswith(f'{param_name} '):
-                            # "param_name: description" or "param_name (type): description"
-                            if ':' in line:
-                                desc = line.split(':', 1)[1].strip()
-                                prop_def["description"] = desc
-                            break
-                
-                schema["properties"][param_name] = prop_def
-                
-                # デフォルト値がない場合は必須
-                if param.default is inspect.Parameter.empty:
-                    schema["required"].append(param_name)
-                    
+            return get_compiled_tool(self.handler).mcp_input_schema()
         except Exception as e:
             logger.debug(f"Failed to generate schema for {self.name}: {e}")
-        
-        return schema
+            return {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
 
     @staticmethod
     def _python_type_to_json_type(python_type: type) -> str:
         """Python型をJSONスキーマ型に変換"""
-        type_map = {
-            str: "string",
-            int: "integer",
-            float: "number",
-            bool: "boolean",
-            list: "array",
-            dict: "object",
-        }
-        
-        # typing モジュールの型を処理
-        origin = getattr(python_type, '__origin__', None)
-        if origin is not None:
-            if origin in (list, List):
-                return "array"
-            if origin in (dict, Dict):
-                return "object"
-            if origin is Union:
-                # Optional は Union[X, None] なので最初の型を使用
-                args = getattr(python_type, '__args__', ())
-                for arg in args:
-                    if arg is not type(None):
-                        return ToolDefinition._python_type_to_json_type(arg)
-        
-        return type_map.get(python_type, "string")
+        return python_type_to_json_type(python_type)
 
 
 @dataclass
@@ -7,6 +7,8 @@ TaskAnalyzer - LLMベースのタスク分析
 
 import re
 import asyncio
+import functools
+import inspect
 from typing import TypedDict, Optional, Any, Callable
 from ...utils.json_parser import SmartJSONParser
 
@@ -21,6 +23,17 @@ class TaskScores(TypedDict):
     task_type: str       # "bugfix" | "feature" | "refactor" | "docs" | "security" | "other"
 
 
+def _accepts_semantic_text(fn: Optional[Callable]) -> bool:
+    """llm_generate_fn が semantic_text キーワード引数を受け取れるか"""
+    if fn is None:
+        return False
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == "semantic_text" or p.kind is inspect.Parameter.VAR_KEYWORD for p in params)
+
+
 class TaskAnalyzer:
     """LLMベースのタスク分析器"""
     
@@ -87,12 +100,14 @@ JSON形式で回答（説明不要）:
         """
         Args:
             llm_generate_fn: LLM呼び出し関数 (prompt, model, max_tokens, temperature) -> str
+                semantic_text キーワード引数を受け取る場合はタスク本文を渡す（類似キャッシュの比較用）
             model: 使用するモデル（省略時は自動選択）
             max_tokens: 最大トークン数
             temperature: 温度（0=決定論的）
         """
         from ..llm_provider import get_analyzer_model
         self.llm_generate = llm_generate_fn
+        self._pass_semantic_text = _accepts_semantic_text(llm_generate_fn)
         self.model = model or get_analyzer_model()
         self.max_tokens = max_tokens
         self.temperature = temperature
@@ -107,6 +122,9 @@ JSON形式で回答（説明不要）:
         sanitized_task = self._sanitize_input(task)
         prompt = self.ANALYSIS_PROMPT.format(task=sanitized_task)
         
+        # 類似キャッシュはテンプレートを除いたタスク本文だけで比較する
+        kwargs = {"semantic_text": sanitized_task} if self._pass_semantic_text else {}
+
         try:
             # llm_generate_fn がコルーチンか通常の関数かチェックして呼び出し
             if asyncio.iscoroutinefunction(self.llm_generate):
@@ -114,13 +132,16 @@ JSON形式で回答（説明不要）:
                     prompt,
                     self.model,
                     self.max_tokens,
-                    self.temperature
+                    self.temperature,
+                    **kwargs
                 )
             else:
                 # 同期関数の場合はスレッドで実行
                 loop = asyncio.get_running_loop()
                 response = await loop.run_in_executor(
-                    None, self.llm_generate, prompt, self.model, self.max_tokens, self.temperature
+                    None,
+                    functools.partial(self.llm_generate, **kwargs),
+                    prompt, self.model, self.max_tokens, self.temperature
                 )
             return self._parse_response(response)
         except Exception as e:
@@ -1,8 +1,12 @@
 import os
 import re
 import asyncio
+import contextvars
+import functools
 import time
+import threading
 import logging
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, Optional, List, Any
 from ..tools.discovery import AgentLoader, AgentConfig, discover_tools, load_profile_config, _flag_is_disabled
@@ -10,6 +14,7 @@ from ..tools.skill_loader import SkillLoader, SkillConfig
 from ..tools.skill_tools import get_loaded_skills, clear_session_skills
 from ..cancellation import check_cancelled, clear_cancel_event, OperationCancelled
 from .runtime import AgentRuntime, LLMProvider
+from .run_context import RunScoped, ConcurrencyLimiter, ensure_scope, request_scope, publish_to_instance
 from ..storage.session_logger import SessionLogger
 from ..memory import MemoryService
 from ..utils.json_parser import SmartJSONParser
@@ -28,6 +33,9 @@ from .optimizer import (
 # Module-level logger (shared across this module)
 logger = logging.getLogger(__name__)
 
+# サブセッションIDをキャッシュする親セッション数の上限（プールされたインスタンスで増え続けないように）
+MAX_CACHED_SUB_SESSION_PARENTS = 256
+
 def _strip_orchestrator_prefixes(text: str) -> str:
     """Remove repeated '@orchestrator:' prefixes from output lines."""
     if not text:
@@ -101,8 +109,21 @@ class Orchestrator:
     会話履歴を管理する。
 
     各サブエージェントは独立したセッション履歴を持つ。
+
+    1回の実行に閉じた状態（RunScoped 属性）はリクエストスコープに置くため、
+    1つのインスタンスで複数セッションを並行して処理できる。
     """
 
+    # リクエストスコープの実行状態
+    progress_callback = RunScoped()
+    _current_session_id = RunScoped()
+    _session_skills = RunScoped(factory=lambda self: [])  # セッション中にロードしたスキル（プール）
+    _current_execution_start = RunScoped()
+    _current_scores = RunScoped()
+    _current_selection = RunScoped()
+    _inline_evaluations = RunScoped(factory=lambda self: {})  # エージェント名 -> 評価結果
+    _agent_execution_metrics = RunScoped(factory=lambda self: [])  # エージェント別実行メトリクス
+
     def __init__(
         self,
         profile: str = 'default',
@@ -114,7 +135,9 @@ class Orchestrator:
         progress_callback: Optional[callable] = None,
         use_optimizer: bool = False,
         working_directory: Optional[str] = None,
-        mcp_servers: Optional[List[Dict[str, Any]]] = None
+        mcp_servers: Optional[List[Dict[str, Any]]] = None,
+        max_concurrent_sessions: Optional[int] = None,
+        max_concurrent_per_session: Optional[int] = None
     ):
         # Ensure global skill tools use the active profile.
         # skill_tools._get_loader() relies on MOCO_PROFILE and keeps a global loader cache,
@@ -131,6 +154,16 @@ class Orchestrator:
         self.working_directory = working_directory or os.getcwd()  # 作業ディレクトリ
         self.name = "orchestrator"
 
+        # 同時実行数の制限（None/0 = 無制限）。同じセッションは既定で直列に処理する
+        if max_concurrent_sessions is None:
+            max_concurrent_sessions = int(os.getenv("MOCO_MAX_CONCURRENT_SESSIONS", "0") or 0)
+        if max_concurrent_per_session is None:
+            max_concurrent_per_session = int(os.getenv("MOCO_MAX_CONCURRENT_PER_SESSION", "1") or 0)
+        self._limiter = ConcurrencyLimiter(
+            max_total=max_concurrent_sessions,
+            max_per_key=max_concurrent_per_session,
+        )
+
         # If provider is explicitly specified (e.g., -P), propagate it globally
         provider_name = getattr(self.provider, "value", self.provider)
         if provider_name:
@@ -158,13 +191,14 @@ class Orchestrator:
         
         # Optimizer コンポーネント
         self.optimizer_config = OptimizerConfig(profile=profile)
+        # タスク分析は類似タスクの結果も再利用できる（MOCO_LLM_CACHE 有効時）
         self.task_analyzer = TaskAnalyzer(
-            llm_generate_fn=self._llm_generate_for_optimizer
+            llm_generate_fn=functools.partial(self._allm_generate_for_optimizer, cache="semantic")
         )
         self.agent_selector = AgentSelector(self.optimizer_config)
         self.quality_tracker = QualityTracker()
         self.quality_evaluator = QualityEvaluator(
-            llm_generate_fn=self._llm_generate_for_optimizer
+            llm_generate_fn=functools.partial(self._allm_generate_for_optimizer, cache="exact")
         )
         
         # 実行メトリクス用
@@ -233,8 +267,9 @@ class Orchestrator:
                 pass
         self._current_session_id: Optional[str] = None
 
-        # サブエージェントのセッションIDをキャッシュ
-        self._sub_sessions: Dict[str, Dict[str, str]] = {}
+        # サブエージェントのセッションIDをキャッシュ（親セッション単位の LRU）
+        self._sub_sessions: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self._sub_sessions_lock = threading.Lock()
 
         # エージェント定義をロード
         self.reload_agents()
@@ -393,7 +428,7 @@ class Orchestrator:
         self.tool_map = discover_tools(profile=self.profile)
 
         # Clear sub-session cache since available agents may differ by profile
-        self._sub_sessions = {}
+        self._sub_sessions = OrderedDict()
 
         # Reload agents/runtimes/skills
         self.reload_agents()
@@ -440,19 +475,25 @@ class Orchestrator:
         サブエージェント用のセッションを取得または作成する。
         同じ親セッション内では同じサブセッションを再利用する。
         """
-        if parent_session_id not in self._sub_sessions:
-            self._sub_sessions[parent_session_id] = {}
+        with self._sub_sessions_lock:
+            sub_sessions = self._sub_sessions.get(parent_session_id)
+            if sub_sessions is None:
+                sub_sessions = self._sub_sessions[parent_session_id] = {}
+                while len(self._sub_sessions) > MAX_CACHED_SUB_SESSION_PARENTS:
+                    self._sub_sessions.popitem(last=False)
+            else:
+                self._sub_sessions.move_to_end(parent_session_id)
 
-        if agent_name not in self._sub_sessions[parent_session_id]:
+        if agent_name not in sub_sessions:
             # 新しいサブセッションを作成
             sub_session_id = self.session_logger.create_session(
                 title=f"Sub: @{agent_name}",
                 parent_session_id=parent_session_id,
                 agent_name=agent_name
             )
-            self._sub_sessions[parent_session_id][agent_name] = sub_session_id
+            sub_sessions[agent_name] = sub_session_id
 
-        return self._sub_sessions[parent_session_id][agent_name]
+        return sub_sessions[agent_name]
 
     def _prepare_session(self, user_input: str, session_id: Optional[str] = None) -> tuple[str, List[Any]]:
         """セッションの準備と履歴の取得を行う"""
@@ -474,11 +515,27 @@ class Orchestrator:
         """
         ユーザー入力を処理し、適切なエージェントにルーティングする
 
+        同時実行数の制限内で、リクエストスコープを開始して実行する。
+
         Args:
             user_input: ユーザーからの入力
             session_id: セッションID（履歴管理用）
             history: 事前に取得した履歴（省略時は自動取得）
         """
+        async with self._limiter.acquire(session_id):
+            with ensure_scope():
+                try:
+                    return await self._process_message(user_input, session_id, history)
+                finally:
+                    # get_optimizer_info() 等が直近の実行結果を参照できるようにする
+                    publish_to_instance(self, "_current_session_id", "_current_selection", "_current_scores")
+
+    async def _process_message(
+        self,
+        user_input: str,
+        session_id: Optional[str] = None,
+        history: Optional[List[Any]] = None
+    ) -> str:
         # 実行開始時刻を記録
         self._current_execution_start = time.time()
         
@@ -616,10 +673,10 @@ class Orchestrator:
         #   can be closed immediately after the user exits (e.g., Ctrl+C), which can lead to:
         #   "RuntimeError: Event loop is closed".
         # - Instead, run the whole learning flow in a daemon thread synchronously.
-        import threading
+        # channel_id などリクエストスコープの値をスレッドに引き継ぐ
         threading.Thread(
-            target=self._learn_from_conversation_sync,
-            args=(user_input, response),
+            target=contextvars.copy_context().run,
+            args=(self._learn_from_conversation_sync, user_input, response),
             daemon=True,
         ).start()
 
@@ -1141,11 +1198,10 @@ class Orchestrator:
             if is_local_model and self._all_skills:
                 # Ollama: matches_input() で自動検出・自動注入
                 auto_matched = []
-                for name, skill in self._all_skills.items():
-                    if skill.matches_input(query):
-                        auto_matched.append(skill)
-                        if name not in loaded_skills:
-                            loaded_skills[name] = skill
+                for skill in self.skill_loader.keyword_matches(query, self._all_skills):
+                    auto_matched.append(skill)
+                    if skill.name not in loaded_skills:
+                        loaded_skills[skill.name] = skill
                 # 既にロード済みのスキルも含める
                 matched_names = {s.name for s in auto_matched}
                 for name, skill in loaded_skills.items():
@@ -1495,6 +1551,32 @@ class Orchestrator:
             )
         except Exception as e:
             raise RuntimeError(f"Optimizer LLM generation failed: {e}")
+
+    async def _allm_generate_for_optimizer(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        cache: Optional[str] = None,
+        semantic_text: Optional[str] = None
+    ) -> str:
+        """Optimizer用のLLM生成関数（統一プロバイダー・非同期版）"""
+        from .llm_provider import agenerate_text, get_preferred_provider, get_analyzer_model
+        provider_name = getattr(self.provider, "value", self.provider) or get_preferred_provider()
+        model_name = model or get_analyzer_model(provider_name)
+        try:
+            return await agenerate_text(
+                prompt=prompt,
+                provider=provider_name,
+                model=model_name,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                cache=cache,
+                semantic_text=semantic_text,
+            )
+        except Exception as e:
+            raise RuntimeError(f"Optimizer LLM generation failed: {e}")
     
     def get_optimizer_stats(self, days: int = 30) -> Dict[str, Any]:
         """Optimizer の統計情報を取得"""
@@ -1575,34 +1657,34 @@ class Orchestrator:
             data.update(kwargs)
             loop.call_soon_threadsafe(queue.put_nowait, data)
 
-        # 既存のコールバックを保存し、ストリーム用コールバックを設定
-        original_callback = self.progress_callback
-        self.progress_callback = stream_callback
-        
-        # 全てのランタイムのコールバックを更新
-        for runtime in self.runtimes.values():
-            runtime.progress_callback = stream_callback
+        async def run_with_stream_callback():
+            # コールバックはこのリクエストのスコープにだけ設定する（並行実行中の他セッションに影響しない）
+            with request_scope():
+                self.attach_progress_callback(stream_callback)
+                return await self.run(user_input, session_id)
 
         # 実行タスクを作成
-        task = asyncio.create_task(self.run(user_input, session_id))
+        task = asyncio.create_task(run_with_stream_callback())
 
-        try:
-            while not task.done() or not queue.empty():
-                try:
-                    # タイムアウト付きでキューから取得して yield
-                    item = await asyncio.wait_for(queue.get(), timeout=0.1)
-                    yield item
-                except (asyncio.TimeoutError, asyncio.QueueEmpty):
-                    continue
-            
-            # 最終結果を確認（例外があればここで発生する）
-            await task
-            
-        finally:
-            # コールバックを元に戻す
-            self.progress_callback = original_callback
-            for runtime in self.runtimes.values():
-                runtime.progress_callback = original_callback
+        while not task.done() or not queue.empty():
+            try:
+                # タイムアウト付きでキューから取得して yield
+                item = await asyncio.wait_for(queue.get(), timeout=0.1)
+                yield item
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                continue
+        
+        # 最終結果を確認（例外があればここで発生する）
+        await task
+
+    def attach_progress_callback(self, callback: Optional[callable]) -> None:
+        """
+        進捗コールバックを現在のリクエストスコープに設定する（各エージェントにも反映）。
+        request_scope() 内で呼ぶと、同じインスタンスで並行実行中の他リクエストには影響しない。
+        """
+        self.progress_callback = callback
+        for runtime in self.runtimes.values():
+            runtime.progress_callback = callback
 
     def run_sync(self, user_input: str, session_id: Optional[str] = None) -> str:
         """
@@ -1637,7 +1719,6 @@ class Orchestrator:
                     pass
                 
                 # フォールバック: 新しいスレッドで実行
-                import threading
                 result = [None, None]
                 
                 def run_in_thread():
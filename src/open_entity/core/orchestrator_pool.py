@@ -0,0 +1,204 @@
+"""
+構築済み Orchestrator のプール（Web API 用）
+
+Orchestrator の構築はエージェント・スキルの読み込み、MemoryService（GraphStore）や
+QualityTracker の初期化、全エージェントの reload_agents を伴い重い。
+実行状態はリクエストスコープ（core/run_context.py）にあるため、1つのインスタンスを
+複数リクエストで使い回せる。ここでは (profile, provider, model, working_directory, verbose)
+ごとにインスタンスを保持する。
+
+- 件数上限を超えたら最も長く使われていないものから破棄する
+- 一定時間使われなかったものは破棄する
+- プロファイルのファイル（profile.yaml / agents / skills / tools）が変わったら作り直す
+- 進捗コールバックはリクエストごとに Orchestrator.attach_progress_callback で設定する
+- 実行中に注入したスキルのツールはリクエストスコープに置かれ、他のリクエストには見えない
+- AgentRuntime の AsyncOpenAI クライアントはイベントループごとに作られるため、
+  run_sync（呼び出しごとに新しいループ）から使い回しても閉じたループに縛られない
+
+環境変数:
+  - MOCO_ORCHESTRATOR_POOL: off で毎回新規に構築する
+  - MOCO_ORCHESTRATOR_POOL_SIZE: 保持する件数（既定 8）
+  - MOCO_ORCHESTRATOR_POOL_IDLE: 破棄までのアイドル時間（秒、既定 1800）
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_IDLE_TIMEOUT = 1800.0
+# プロファイルの変更確認を行う最短間隔（秒）
+FINGERPRINT_INTERVAL = 2.0
+
+
+def orchestrator_pool_enabled() -> bool:
+    return os.environ.get("MOCO_ORCHESTRATOR_POOL", "on").lower() not in ("0", "off", "false", "no")
+
+
+def profile_fingerprint(profile: str) -> Tuple[int, int]:
+    """プロファイル配下のファイル数と最終更新時刻（ns）"""
+    from ..tools.discovery import _find_all_profiles_dirs
+
+    count = 0
+    latest = 0
+    for base in _find_all_profiles_dirs():
+        stack = [os.path.join(base, profile)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.startswith(".") or entry.name == "__pycache__":
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            continue
+                        mtime = entry.stat().st_mtime_ns
+                    except OSError:
+                        continue
+                    count += 1
+                    latest = max(latest, mtime)
+    return count, latest
+
+
+class _Entry:
+    __slots__ = ("orchestrator", "fingerprint", "checked_at", "last_used")
+
+    def __init__(self, orchestrator: Any, fingerprint: Tuple[int, int]):
+        self.orchestrator = orchestrator
+        self.fingerprint = fingerprint
+        self.checked_at = self.last_used = time.monotonic()
+
+
+class OrchestratorPool:
+    """
+    キーごとに Orchestrator を保持するプール
+
+    Args:
+        factory: (profile, provider, model, working_directory, verbose) -> Orchestrator
+        max_size: 保持する件数
+        idle_timeout: この秒数使われなかったものは破棄
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., Any],
+        max_size: int = DEFAULT_POOL_SIZE,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    ):
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 同じキーの同時構築を1回にまとめる
+        self._build_locks: Dict[Hashable, threading.Lock] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls, factory: Callable[..., Any]) -> "OrchestratorPool":
+        try:
+            max_size = int(os.environ.get("MOCO_ORCHESTRATOR_POOL_SIZE", DEFAULT_POOL_SIZE))
+        except ValueError:
+            max_size = DEFAULT_POOL_SIZE
+        try:
+            idle_timeout = float(os.environ.get("MOCO_ORCHESTRATOR_POOL_IDLE", DEFAULT_IDLE_TIMEOUT))
+        except ValueError:
+            idle_timeout = DEFAULT_IDLE_TIMEOUT
+        return cls(factory, max_size=max_size, idle_timeout=idle_timeout)
+
+    def get(
+        self,
+        profile: str,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        working_directory: Optional[str] = None,
+        verbose: bool = False,
+    ) -> Any:
+        """プールの Orchestrator を返す（なければ構築して登録）"""
+        provider_name = getattr(provider, "value", provider)
+        key = (profile, provider_name, model, working_directory, bool(verbose))
+        orchestrator = self._lookup(key, profile)
+        if orchestrator is not None:
+            return orchestrator
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            # 待っている間に他のリクエストが構築していれば使う
+            orchestrator = self._lookup(key, profile, count=False)
+            if orchestrator is not None:
+                return orchestrator
+            try:
+                fingerprint = profile_fingerprint(profile)
+                orchestrator = self.factory(profile, provider, model, working_directory, verbose)
+                with self._lock:
+                    self.stats["misses"] += 1
+                    self._entries[key] = _Entry(orchestrator, fingerprint)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                        self.stats["evictions"] += 1
+            finally:
+                with self._lock:
+                    self._build_locks.pop(key, None)
+            return orchestrator
+
+    def _lookup(self, key: Hashable, profile: str, count: bool = True) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            check = now - entry.checked_at >= FINGERPRINT_INTERVAL
+        if check:
+            fingerprint = profile_fingerprint(profile)
+            with self._lock:
+                if self._entries.get(key) is not entry:
+                    return None
+                entry.checked_at = now
+                if fingerprint != entry.fingerprint:
+                    logger.info(f"Profile '{profile}' changed; rebuilding orchestrator")
+                    del self._entries[key]
+                    self.stats["invalidations"] += 1
+                    return None
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return None
+            entry.last_used = now
+            self._entries.move_to_end(key)
+            if count:
+                self.stats["hits"] += 1
+        # Orchestrator は構築時にプロファイルを環境変数へ反映するため、使い回す場合も合わせる
+        os.environ["MOCO_PROFILE"] = profile
+        return entry.orchestrator
+
+    def _evict_idle(self, now: float) -> None:
+        """アイドル時間を超えたものを破棄（ロック内で呼ぶ）"""
+        if self.idle_timeout <= 0:
+            return
+        for key in [k for k, e in self._entries.items() if now - e.last_used > self.idle_timeout]:
+            del self._entries[key]
+            self.stats["evictions"] += 1
+
+    def invalidate(self, profile: Optional[str] = None) -> int:
+        """指定プロファイル（None なら全件）を破棄"""
+        with self._lock:
+            keys = [k for k in self._entries if profile is None or k[0] == profile]
+            for key in keys:
+                del self._entries[key]
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "size": len(self._entries), "max_size": self.max_size}
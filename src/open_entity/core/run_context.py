@@ -0,0 +1,257 @@
+"""
+リクエスト単位の実行状態（contextvars ベース）。
+
+Orchestrator / AgentRuntime / MemoryService の「1回の実行に閉じた状態」
+（現在のセッションID・ツール履歴・ループ検出など）をインスタンスではなく
+リクエストスコープに置き、1つのインスタンスで複数セッションを並行処理できるようにする。
+
+- ``request_scope()`` で新しいスコープを開始する（Orchestrator.process_message）
+- ``ensure_scope()`` はスコープがなければ開始する（AgentRuntime.run の単独利用など）
+- ``RunScoped`` 属性はスコープ内ではスコープに、スコープ外ではインスタンスに読み書きする
+- asyncio のタスクと asyncio.to_thread はコンテキストを引き継ぐ。
+  threading.Thread で実行する場合は ``contextvars.copy_context().run`` を使うこと
+
+使い方:
+    class Runtime:
+        _tool_history = RunScoped(factory=lambda self: [])
+
+    with request_scope():
+        runtime._tool_history.append(...)  # このリクエストだけの値
+"""
+
+import asyncio
+import contextvars
+import copy
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+class RunState:
+    """1リクエスト分の状態（オブジェクトごとの属性値）"""
+
+    __slots__ = ("values", "_owners")
+
+    def __init__(self):
+        # id(obj) -> {属性名: 値}
+        self.values: Dict[int, Dict[str, Any]] = {}
+        # スコープ中に id が再利用されないよう参照を保持
+        self._owners: Dict[int, Any] = {}
+
+    def values_for(self, obj: Any) -> Dict[str, Any]:
+        key = id(obj)
+        values = self.values.get(key)
+        if values is None:
+            values = self.values[key] = {}
+            self._owners[key] = obj
+        return values
+
+
+_current_state: contextvars.ContextVar[Optional[RunState]] = contextvars.ContextVar(
+    "moco_run_state", default=None
+)
+
+
+def current_run_state() -> Optional[RunState]:
+    return _current_state.get()
+
+
+@contextmanager
+def request_scope() -> Iterator[RunState]:
+    """新しいリクエストスコープを開始（外側のスコープの値は引き継がない）"""
+    state = RunState()
+    token = _current_state.set(state)
+    try:
+        yield state
+    finally:
+        _current_state.reset(token)
+
+
+@contextmanager
+def ensure_scope() -> Iterator[RunState]:
+    """スコープがなければ開始し、あれば現在のスコープをそのまま使う"""
+    state = _current_state.get()
+    if state is not None:
+        yield state
+        return
+    with request_scope() as state:
+        yield state
+
+
+_MISSING = object()
+
+
+class RunScoped:
+    """
+    リクエストスコープに値を置く属性（データディスクリプタ）。
+
+    スコープ内で未設定のまま読むと factory(obj) の結果を返す。factory がなければ
+    インスタンスの値（copy_instance=True ならその浅いコピー）を返す。
+    可変な値（list / dict 等）はリクエスト間で共有されないよう factory か copy_instance を指定すること。
+    """
+
+    def __init__(
+        self,
+        default: Any = None,
+        factory: Optional[Callable[[Any], Any]] = None,
+        copy_instance: bool = False,
+    ):
+        self.default = default
+        self.factory = factory
+        self.copy_instance = copy_instance
+        self.name = ""
+        self.attr = ""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.attr = f"_instance{name}" if name.startswith("_") else f"_instance_{name}"
+
+    def _instance_value(self, obj):
+        value = obj.__dict__.get(self.attr, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.factory is not None:
+            value = obj.__dict__[self.attr] = self.factory(obj)
+            return value
+        return self.default
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        state = _current_state.get()
+        if state is None:
+            return self._instance_value(obj)
+        values = state.values_for(obj)
+        value = values.get(self.name, _MISSING)
+        if value is _MISSING:
+            if self.factory is not None:
+                value = self.factory(obj)
+            elif self.copy_instance:
+                value = copy.copy(self._instance_value(obj))
+            else:
+                value = self._instance_value(obj)
+            values[self.name] = value
+        return value
+
+    def __set__(self, obj, value):
+        state = _current_state.get()
+        if state is None:
+            obj.__dict__[self.attr] = value
+        else:
+            state.values_for(obj)[self.name] = value
+
+
+def publish_to_instance(obj: Any, *names: str) -> None:
+    """スコープ内の値をインスタンスにも書き込む（「最後の実行結果」を参照する API 用）"""
+    state = _current_state.get()
+    if state is None:
+        return
+    values = state.values.get(id(obj), {})
+    for name in names:
+        if name in values:
+            descriptor = getattr(type(obj), name)
+            obj.__dict__[descriptor.attr] = values[name]
+
+
+class ThreadSafeSemaphore:
+    """
+    スレッド・イベントループをまたいで共有できる非同期セマフォ。
+
+    待機者は自分のループの Future で待ち、解放側は call_soon_threadsafe で起こす。
+    待機中にキャンセルされた場合も枠は次の待機者に引き継がれる。
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._lock = threading.Lock()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = deque()
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        future = waiter[1]
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            # 枠を受け取った後にキャンセルされた場合は返す
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    # 待機者のループが閉じている
+                    continue
+            self._value += 1
+
+    def _grant(self, future: "asyncio.Future[None]") -> None:
+        if future.done():
+            # 起こす前にキャンセルされた: 次の待機者へ
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class ConcurrencyLimiter:
+    """
+    全体とキー（セッションID等）ごとの同時実行数を制限する。
+
+    スレッド・イベントループをまたいで共有する（run_sync のように呼び出しごとに
+    別ループで動く実行とメインループ上の実行にも同じ上限がかかる）。None は無制限。
+    """
+
+    def __init__(self, max_total: Optional[int] = None, max_per_key: Optional[int] = None):
+        self.max_total = max_total if max_total and max_total > 0 else None
+        self.max_per_key = max_per_key if max_per_key and max_per_key > 0 else None
+        self._total = ThreadSafeSemaphore(self.max_total) if self.max_total else None
+        # key -> [semaphore, 利用中 + 待機中の数]
+        self._keys: Dict[Hashable, List[Any]] = {}
+        self._keys_lock = threading.Lock()
+
+    @asynccontextmanager
+    async def acquire(self, key: Optional[Hashable] = None) -> AsyncIterator[None]:
+        entry = None
+        if key is not None and self.max_per_key:
+            with self._keys_lock:
+                entry = self._keys.get(key)
+                if entry is None:
+                    entry = self._keys[key] = [ThreadSafeSemaphore(self.max_per_key), 0]
+                entry[1] += 1
+        try:
+            # キーごとの枠を先に取り、同じセッションの待ちが全体の枠を塞がないようにする
+            if entry is not None:
+                await entry[0].acquire()
+            try:
+                if self._total is not None:
+                    await self._total.acquire()
+                try:
+                    yield
+                finally:
+                    if self._total is not None:
+                        self._total.release()
+            finally:
+                if entry is not None:
+                    entry[0].release()
+        finally:
+            if entry is not None:
+                with self._keys_lock:
+                    entry[1] -= 1
+                    if entry[1] == 0:
+                        self._keys.pop(key, None)
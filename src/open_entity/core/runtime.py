@@ -6,12 +6,14 @@ import json
 import inspect
 import hashlib
 import re
+import threading
 from ..cancellation import check_cancelled, OperationCancelled
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, List, Optional, Callable, get_type_hints
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from collections import defaultdict
 
 from ..tools.skill_loader import SkillConfig
+from ..tools.line_index import prime_line_index
 from ..utils.json_parser import SmartJSONParser
 
 
@@ -87,6 +89,9 @@ except ImportError:
 
 from ..tools.discovery import AgentConfig
 from .context_compressor import ContextCompressor, estimate_tokens as _estimate_tokens
+from .run_context import RunScoped, ensure_scope
+from .system_prompt import PromptSegment, SystemPromptBuilder, extract_placeholders
+from .tool_registry import get_compiled_tool, get_compiled_skill_tool, python_type_to_schema
 
 # For tool usage logs
 MAX_ARG_LEN = 40  # Maximum number of characters for arguments
@@ -261,55 +266,10 @@ except ImportError:
 def _validate_arguments(func: Callable, args: Dict[str, Any]) -> Dict[str, Any]:
     """
     Validate the types of function arguments and convert them if possible.
-    """
-    sig = inspect.signature(func)
-    try:
-        hints = get_type_hints(func)
-    except (TypeError, NameError, ValueError):
-        hints = {}
-
-    validated_args = {}
-    missing_required: List[str] = []
-    for param_name, param in sig.parameters.items():
-        if param_name in ("self", "cls"):
-            continue
-        if param.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD):
-            continue
-        
-        if param_name in args:
-            val = args[param_name]
-            expected_type = hints.get(param_name)
-            
-            if expected_type:
-                # Simple type conversion/check
-                if expected_type is int and not isinstance(val, int):
-                    try:
-                        val = int(val)
-                    except (ValueError, TypeError):
-                        pass
-                elif expected_type is float and not isinstance(val, (int, float)):
-                    try:
-                        val = float(val)
-                    except (ValueError, TypeError):
-                        pass
-                elif expected_type is bool and not isinstance(val, bool):
-                    if str(val).lower() in ("true", "1", "yes"):
-                        val = True
-                    elif str(val).lower() in ("false", "0", "no"):
-                        val = False
-            
-            validated_args[param_name] = val
-        elif param.default != inspect.Parameter.empty:
-            # If there's a default value, do nothing (the default will be used in func(**validated_args))
-            pass
-        else:
-            # Required parameter is missing
-            missing_required.append(param_name)
-            
-    if missing_required:
-        raise ValueError(f"missing required arguments: {', '.join(missing_required)}")
 
-    return validated_args
+    シグネチャ・型ヒントの解析結果はツールレジストリで関数ごとにキャッシュされる。
+    """
+    return get_compiled_tool(func).validate(args)
 
 
 def _execute_tool_safely(func: Callable, args: Dict[str, Any]) -> Any:
@@ -992,6 +952,8 @@ def _truncate_tool_output(result: Any, tool_name: str) -> str:
 
     with open(filepath, 'w', encoding='utf-8') as f:
         f.write(result_str)
+    # The LLM pages through this file with read_file/grep; index it up front
+    prime_line_index(filepath, result_str)
 
     # Extract important information (paths, functions, errors, etc.)
     key_info = _extract_important_info(result_str)
@@ -1051,122 +1013,43 @@ def _is_reasoning_model(model_name: str) -> bool:
 
 def _python_type_to_schema(py_type) -> Dict[str, Any]:
     """Convert Python type to JSON schema"""
-    type_map = {
-        str: {"type": "string"},
-        int: {"type": "integer"},
-        float: {"type": "number"},
-        bool: {"type": "boolean"},
-        list: {"type": "array"},
-        dict: {"type": "object"},
-    }
-    return type_map.get(py_type, {"type": "string"})
+    return python_type_to_schema(py_type)
 
 
 def _func_to_openai_tool(func: Callable, tool_name: str) -> Dict[str, Any]:
-    """Convert Python function to OpenAI tool format"""
-    sig = inspect.signature(func)
-    docstring = func.__doc__ or ""
-    # Use entire docstring as description (to convey format examples to LLM)
-    description = docstring.strip() if docstring else f"{tool_name} function"
-
-    properties = {}
-    required = []
-
-    try:
-        hints = get_type_hints(func)
-    except (TypeError, NameError, ValueError):
-        hints = {}
-
-    for param_name, param in sig.parameters.items():
-        if param_name in ("self", "cls"):
-            continue
-
-        param_type = hints.get(param_name, str)
-        schema = _python_type_to_schema(param_type)
-
-        param_desc = f"Parameter: {param_name}"
-        if param_name in docstring:
-            lines = docstring.split("\n")
-            for line in lines:
-                if param_name in line and ":" in line:
-                    param_desc = line.split(":", 1)[-1].strip()
-                    break
-
-        properties[param_name] = {**schema, "description": param_desc}
-
-        if param.default == inspect.Parameter.empty:
-            required.append(param_name)
-
-    return {
-        "type": "function",
-        "function": {
-            "name": tool_name,
-            "description": description,
-            "parameters": {
-                "type": "object",
-                "properties": properties,
-                "required": required,
-            }
-        }
-    }
+    """Convert Python function to OpenAI tool format (cached per function and tool name)"""
+    return get_compiled_tool(func).openai_tool(tool_name)
 
 
 def _func_to_declaration(func: Callable, tool_name: str) -> types.FunctionDeclaration:
-    """Convert Python function to FunctionDeclaration"""
-    sig = inspect.signature(func)
-    docstring = func.__doc__ or ""
-
-    # Use the entire docstring as the description (to convey formatting examples, etc., to the LLM)
-    description = docstring.strip() if docstring else f"{tool_name} function"
-
-    # Build parameter schema
-    properties = {}
-    required = []
-
-    try:
-        hints = get_type_hints(func)
-    except (TypeError, NameError, ValueError):
-        hints = {}
-
-    for param_name, param in sig.parameters.items():
-        if param_name in ("self", "cls"):
-            continue
-
-        # Use type annotation if available
-        param_type = hints.get(param_name, str)
-        schema = _python_type_to_schema(param_type)
-
-        # Extract parameter descriptions from docstring (Args: section)
-        param_desc = f"Parameter: {param_name}"
-        if f"{param_name}" in docstring:
-            # Simple extraction
-            lines = docstring.split("\n")
-            for line in lines:
-                if param_name in line and ":" in line:
-                    param_desc = line.split(":", 1)[-1].strip()
-                    break
-
-        properties[param_name] = {**schema, "description": param_desc}
-
-        # Required if there's no default value
-        if param.default == inspect.Parameter.empty:
-            required.append(param_name)
-
-    # The parameters argument requires a Schema type, but passing a dict structure is often converted internally
-    # If an error occurs, it might be necessary to wrap it with types.Schema(**...)
-    # For now, pass it as a dictionary for compatibility
-    return types.FunctionDeclaration(
-        name=tool_name,
-        description=description,
-        parameters={
-            "type": "object",
-            "properties": properties,
-            "required": required,
-        }
-    )
+    """Convert Python function to FunctionDeclaration (cached per function and tool name)"""
+    return get_compiled_tool(func).gemini_declaration(tool_name)
 
 
 class AgentRuntime:
+    # Per-run state: stored in the current request scope when one is active
+    progress_callback = RunScoped()
+    _current_session_id = RunScoped()
+    _memory_context = RunScoped(default="")
+    _partial_response = RunScoped(default="")
+    _tool_history = RunScoped(factory=lambda self: [])
+    tool_tracker = RunScoped(factory=lambda self: ToolCallTracker(max_repeats=3, window_size=10))
+    _invalid_tool_call_counts = RunScoped(factory=lambda self: defaultdict(int))
+    _accumulated_tokens = RunScoped(default=0)
+    _tool_call_count = RunScoped(default=0)
+    _context_limit_reached = RunScoped(default=False)
+    _context_compressor = RunScoped()
+    last_usage = RunScoped(factory=lambda self: {})
+    # Set per delegation by the Orchestrator (skills loaded in one session stay in that session)
+    skills = RunScoped(copy_instance=True)
+    parent_session_id = RunScoped()
+    # Hash of the static prompt prefix this run's prompt was built from (prompt cache key)
+    _prompt_prefix_hash = RunScoped(default="")
+    # Base tools are prepared once; skill tools injected during a run stay in that run
+    available_tools = RunScoped(factory=lambda self: dict(self._base_available_tools))
+    tool_declarations = RunScoped(factory=lambda self: list(self._base_tool_declarations))
+    openai_tools = RunScoped(factory=lambda self: list(self._base_openai_tools))
+
     def __init__(
         self,
         config: AgentConfig,
@@ -1198,6 +1081,8 @@ class AgentRuntime:
         
         # Memory context (dynamically updated in run())
         self._memory_context = ""
+        # System prompt (static prefix cached, volatile context appended)
+        self._prompt_builder = SystemPromptBuilder()
 
         # Tool call loop detection
         self.tool_tracker = ToolCallTracker(max_repeats=3, window_size=10)
@@ -1237,7 +1122,7 @@ class AgentRuntime:
             openrouter_key = os.environ.get("OPENROUTER_API_KEY")
             if not openrouter_key:
                 raise ValueError("OPENROUTER_API_KEY environment variable not set")
-            self.openai_client = AsyncOpenAI(
+            self._openai_client_kwargs = dict(
                 api_key=openrouter_key,
                 base_url="https://openrouter.ai/api/v1"
             )
@@ -1250,9 +1135,9 @@ class AgentRuntime:
                 raise ValueError("OPENAI_API_KEY environment variable not set")
             openai_base_url = os.environ.get("OPENAI_BASE_URL")
             if openai_base_url:
-                self.openai_client = AsyncOpenAI(api_key=openai_key, base_url=openai_base_url)
+                self._openai_client_kwargs = dict(api_key=openai_key, base_url=openai_base_url)
             else:
-                self.openai_client = AsyncOpenAI(api_key=openai_key)
+                self._openai_client_kwargs = dict(api_key=openai_key)
             self.client = None
         elif self.provider == LLMProvider.ZAI:
             # Z.ai GLM-4.7 (OpenAI-compatible API)
@@ -1261,7 +1146,7 @@ class AgentRuntime:
             zai_key = os.environ.get("ZAI_API_KEY")
             if not zai_key:
                 raise ValueError("ZAI_API_KEY environment variable not set")
-            self.openai_client = AsyncOpenAI(
+            self._openai_client_kwargs = dict(
                 api_key=zai_key,
                 base_url="https://api.z.ai/api/coding/paas/v4"
             )
@@ -1286,14 +1171,14 @@ class AgentRuntime:
             # Use Kimi Code User-Agent only for coding endpoint
             if "kimi.com/coding" in base_url:
                 kwargs["default_headers"] = {"User-Agent": "Kilo-Code/1.0.0"}
-            self.openai_client = AsyncOpenAI(**kwargs)
+            self._openai_client_kwargs = kwargs
             self.client = None
         elif self.provider == LLMProvider.OLLAMA:
             if not OPENAI_AVAILABLE:
                 raise ImportError("OpenAI package not installed. Run: pip install openai")
             base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434/v1")
             api_key = os.environ.get("OLLAMA_API_KEY", "ollama")
-            self.openai_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+            self._openai_client_kwargs = dict(api_key=api_key, base_url=base_url)
             self.client = None
         else:
             # Gemini
@@ -1305,7 +1190,13 @@ class AgentRuntime:
             if not api_key:
                 raise ValueError("GENAI_API_KEY, GEMINI_API_KEY, or GOOGLE_API_KEY not set")
             self.client = genai.Client(api_key=api_key)
-            self.openai_client = None
+            self._openai_client_kwargs = None
+        # AsyncOpenAI's httpx pool is bound to the loop it first ran on, and a
+        # pooled runtime is driven from a new loop per run_sync()/asyncio.run().
+        # A weak-keyed map never expires here (the pooled sockets reference the
+        # loop), so clients of closed loops are dropped explicitly instead.
+        self._openai_clients: Dict[asyncio.AbstractEventLoop, "AsyncOpenAI"] = {}
+        self._openai_clients_lock = threading.Lock()
 
         # Streaming configuration
         self.stream = stream
@@ -1320,17 +1211,33 @@ class AgentRuntime:
         self._accumulated_tokens = 0
         self._tool_call_count = 0
         self._context_limit_reached = False
+        # Reused within a run so that per-message token counts accumulate incrementally
+        self._context_compressor: Optional[ContextCompressor] = None
 
         # For metrics recording
         self.last_usage: Dict[str, Any] = {}
 
         # Preparation of tools
-        self.available_tools = {}
-        self.tool_declarations = []  # For Gemini
-        self.openai_tools = []       # For OpenAI
+        self._base_available_tools: Dict[str, Callable] = {}
+        self._base_tool_declarations = []  # For Gemini
+        self._base_openai_tools = []       # For OpenAI
 
         self._prepare_tools()
 
+    @property
+    def openai_client(self) -> Optional["AsyncOpenAI"]:
+        """AsyncOpenAI client for the running event loop (one per loop, reused within it)"""
+        if self._openai_client_kwargs is None:
+            return None
+        loop = asyncio.get_running_loop()
+        with self._openai_clients_lock:
+            client = self._openai_clients.get(loop)
+            if client is None:
+                for stale in [l for l in self._openai_clients if l.is_closed()]:
+                    del self._openai_clients[stale]
+                client = self._openai_clients[loop] = AsyncOpenAI(**self._openai_client_kwargs)
+        return client
+
     # Ollama/ローカルモデル向け: LLMに公開すべきでないツール
     # ローカルモデルはコンテキストウィンドウが限られているため、
     # 不要なツールを除外してツール選択の精度を向上させる。
@@ -1409,15 +1316,15 @@ class AgentRuntime:
         for tool_name in tools_to_enable:
             if tool_name in self.tool_map:
                 func = self.tool_map[tool_name]
-                self.available_tools[tool_name] = func
+                self._base_available_tools[tool_name] = func
 
                 # Gemini FunctionDeclaration
                 declaration = _func_to_declaration(func, tool_name)
-                self.tool_declarations.append(declaration)
+                self._base_tool_declarations.append(declaration)
 
                 # OpenAI tool definition
                 openai_tool = _func_to_openai_tool(func, tool_name)
-                self.openai_tools.append(openai_tool)
+                self._base_openai_tools.append(openai_tool)
             else:
                 if self.verbose:
                     print(f"Warning: Tool '{tool_name}' not found in provided tool_map")
@@ -1450,28 +1357,47 @@ class AgentRuntime:
         スキルの index.py から元の関数を取得し、execute_skill 経由のラッパーを作成して
         available_tools / openai_tools / tool_declarations に追加する。
         tool_map には入れず、必要な時だけオンデマンドで追加する。
+        追加先はリクエストスコープの値なので、他のリクエスト・セッションには見えない。
         """
         from ..tools.skill_tools import execute_skill
         for skill in skills:
             for tool_name in (skill.allowed_tools or []):
                 if tool_name in self.available_tools:
                     continue  # 既に追加済み
-                # 元の関数を取得（シグネチャ用）
-                original_func = self._load_skill_function(skill.path, tool_name)
-                if not original_func:
+                # ラッパーとスキーマはスキルのバージョン単位でプロセス内共有
+                compiled = get_compiled_skill_tool(
+                    skill.name, tool_name, self._skill_version(skill),
+                    lambda s=skill, t=tool_name: self._build_skill_wrapper(s, t, execute_skill),
+                )
+                if compiled is None:
                     continue
-                # execute_skill 経由のラッパーを作成
-                _sn, _tn = skill.name, tool_name
-                def _wrapper(_skill_name=_sn, _tool_name=_tn, **kwargs):
-                    return execute_skill(skill_name=_skill_name, tool_name=_tool_name, arguments=kwargs)
-                _wrapper.__name__ = tool_name
-                _wrapper.__doc__ = original_func.__doc__ or f"Skill tool: {skill.name}.{tool_name}"
-                _wrapper.__signature__ = inspect.signature(original_func)
-                _wrapper.__annotations__ = getattr(original_func, '__annotations__', {})
                 # 登録
-                self.available_tools[tool_name] = _wrapper
-                self.tool_declarations.append(_func_to_declaration(_wrapper, tool_name))
-                self.openai_tools.append(_func_to_openai_tool(_wrapper, tool_name))
+                self.available_tools[tool_name] = compiled.func
+                self.tool_declarations.append(compiled.gemini_declaration(tool_name))
+                self.openai_tools.append(compiled.openai_tool(tool_name))
+
+    @staticmethod
+    def _skill_version(skill: SkillConfig):
+        """スキルツールのキャッシュキー用バージョン（version と index.py の mtime）"""
+        try:
+            mtime = os.path.getmtime(os.path.join(skill.path, "index.py"))
+        except OSError:
+            mtime = None
+        return (skill.version, skill.path, mtime)
+
+    def _build_skill_wrapper(self, skill: SkillConfig, tool_name: str, execute_skill: Callable):
+        """execute_skill 経由のラッパーを作成（シグネチャは元の関数から取得）"""
+        original_func = self._load_skill_function(skill.path, tool_name)
+        if not original_func:
+            return None
+        _sn, _tn = skill.name, tool_name
+        def _wrapper(_skill_name=_sn, _tool_name=_tn, **kwargs):
+            return execute_skill(skill_name=_skill_name, tool_name=_tool_name, arguments=kwargs)
+        _wrapper.__name__ = tool_name
+        _wrapper.__doc__ = original_func.__doc__ or f"Skill tool: {skill.name}.{tool_name}"
+        _wrapper.__signature__ = inspect.signature(original_func)
+        _wrapper.__annotations__ = getattr(original_func, '__annotations__', {})
+        return _wrapper
 
     def _on_skill_loaded(self):
         """load_skill 実行後のフック: ロードされたスキルのツール定義を動的に追加する。
@@ -1487,12 +1413,38 @@ class AgentRuntime:
                 self.skills.extend(new_skills)
                 self._inject_skill_tools(new_skills)
 
+    def _get_context_compressor(self) -> ContextCompressor:
+        """Context compressor for the current run (run-scoped; keeps a running token ledger across its LLM calls)"""
+        if self._context_compressor is None:
+            self._context_compressor = ContextCompressor(
+                max_tokens=int(MAX_CONTEXT_TOKENS * CONTEXT_WARNING_THRESHOLD),
+                model=self.model_name,
+            )
+        return self._context_compressor
+
+    def _compress_context_if_needed(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Start the background pre-run summary early, and compress once usage exceeds 80%.
+        Compression is deferred until the summary is ready, unless usage passes the compressor's
+        hard ceiling, in which case it waits for (or generates) the summary synchronously.
+        """
+        compressor = self._get_context_compressor()
+        compressor.maybe_prefetch(messages, self.provider)
+        if self._accumulated_tokens / MAX_CONTEXT_TOKENS < CONTEXT_WARNING_THRESHOLD:
+            return messages
+        messages, was_compressed = compressor.compress_if_needed(messages, self.provider)
+        if was_compressed:
+            self._accumulated_tokens = compressor.estimate_tokens(messages)
+            if self.verbose:
+                print(f"\n🗜️ [Context compressed: {self._accumulated_tokens:,} tokens]")
+        return messages
+
     def _update_context_usage(self, result: str) -> str:
         """
         Accumulate tokens from tool results and perform limit checks.
         Return result with warning or limit message appended.
         """
-        result_tokens = _estimate_tokens(result)
+        result_tokens = _estimate_tokens(result, self.model_name)
         self._accumulated_tokens += result_tokens
         self._tool_call_count += 1
         
@@ -1533,25 +1485,67 @@ class AgentRuntime:
         return result
 
     def _get_system_prompt(self) -> str:
-        """Retrieve system prompt and insert context information"""
+        """Retrieve system prompt and insert context information
+
+        静的セグメント（エージェント定義・委譲ルール・スキル・共通ルール）はキャッシュし、
+        揮発セグメント（タイムスタンプ・記憶コンテキスト・統計）は末尾に付与する。
+        プレフィックスがターン間で一致するため、プロバイダのプロンプトキャッシュが効く。
+        """
         # JST (UTC+9)
         jst = timezone(timedelta(hours=9))
         now_dt = datetime.now(jst)
         now_str = now_dt.strftime("%Y-%m-%d %H:%M:%S (JST)")
 
-        # Construction of context information
-        context_header = f"---\n[Current Context]\nTimestamp: {now_str}\n"
-        
+        base_prompt = self.system_prompt_override or self.config.system_prompt or ""
+        key = (
+            base_prompt,
+            self.agent_name,
+            self.provider,
+            "delegate_to_agent" in self.tool_map,
+            tuple((id(s), s.name, s.version) for s in self.skills),
+        )
+        static = self._prompt_builder.static_prefix(key, lambda: self._static_prompt_segments(base_prompt))
+        self._prompt_prefix_hash = static.prefix_hash
+
+        # Construction of context information (volatile, placed last)
+        context = f"---\n[Current Context]\nTimestamp: {now_str}\n"
+
         # MemoryService からの記憶コンテキスト追加
         if hasattr(self, "_memory_context") and self._memory_context:
-            context_header += f"\n{self._memory_context}\n"
-        
-        context_header += "---\n\n"
+            context += f"\n{self._memory_context}\n"
+
+        # Session context (injected only if {{SESSION_CONTEXT}} is used in md)
+        if "{{SESSION_CONTEXT}}" in static.placeholders:
+            context += f"\n## Session Context\n{self._build_session_context()}\n"
+
+        # Agent stats (injected only if {{AGENT_STATS}} is used in md)
+        if "{{AGENT_STATS}}" in static.placeholders:
+            context += f"\n## Agent Stats\n{self._build_agent_stats()}\n"
+
+        context += "---"
+
+        return self._prompt_builder.build(static.prefix, [PromptSegment("context", context)])
+
+    @property
+    def prompt_prefix_hash(self) -> str:
+        """システムプロンプトの静的プレフィックスのハッシュ（プロンプトキャッシュキー）"""
+        return self._prompt_prefix_hash
+
+    def _apply_prompt_cache_key(self, create_kwargs: Dict[str, Any]) -> None:
+        """OpenAI: 静的プレフィックスのハッシュをキャッシュキーとして渡し、同じプレフィックスを同じキャッシュに寄せる"""
+        if self.provider != LLMProvider.OPENAI or not self.prompt_prefix_hash:
+            return
+        extra_body = dict(create_kwargs.get("extra_body") or {})
+        extra_body.setdefault("prompt_cache_key", f"moco-{self.prompt_prefix_hash}")
+        create_kwargs["extra_body"] = extra_body
+
+    def _static_prompt_segments(self, base_prompt: str) -> Tuple[List[PromptSegment], Tuple[str, ...]]:
+        """システムプロンプトの静的セグメントと使われている揮発プレースホルダ（キャッシュにないキーの時のみ呼ばれる）"""
+        # 揮発値のプレースホルダは参照テキストに置き換え、値は末尾の Current Context に出す
+        prompt = base_prompt
 
-        prompt = self.system_prompt_override or self.config.system_prompt
-        
         # 委譲に関する基本ルールを追加（orchestrator エージェントの場合）
-        if self.agent_name == "orchestrator" and "delegate_to_agent" in str(self.tool_map.keys()):
+        if self.agent_name == "orchestrator" and "delegate_to_agent" in self.tool_map:
             delegation_rules = """
 
 ## サブエージェント委譲ルール（重要）
@@ -1615,35 +1609,27 @@ You have full internet access. Choose the right tool for the task:
 """
             prompt += ollama_tool_rules
 
+        prompt, placeholders = extract_placeholders(prompt)
+        segments = [PromptSegment("agent", prompt)]
+
         # Injection of Skills
         if self.skills:
-            skills_section = "\n\n## Skills\n\n"
-            for i, skill in enumerate(self.skills, 1):
-                skills_section += f"### Skill: {skill.name} (v{skill.version})\n"
-                skills_section += f"{skill.description}\n"
-                if skill.allowed_tools:
-                    skills_section += f"\n**Allowed Tools**: {', '.join(skill.allowed_tools)}\n"
-                skills_section += f"\n{skill.content}\n\n"
-            prompt += skills_section
-
-        # Placeholder replacement
-        # May overlap with header, but addresses requests to embed date/time at specific locations in the prompt
-        if "{{CURRENT_DATETIME}}" in prompt:
-            prompt = prompt.replace("{{CURRENT_DATETIME}}", now_str)
-        
-        # Session context (injected only if {{SESSION_CONTEXT}} is used in md)
-        if "{{SESSION_CONTEXT}}" in prompt:
-            session_context = self._build_session_context()
-            prompt = prompt.replace("{{SESSION_CONTEXT}}", session_context)
-        
-        # Agent stats (injected only if {{AGENT_STATS}} is used in md)
-        if "{{AGENT_STATS}}" in prompt:
-            agent_stats = self._build_agent_stats()
-            prompt = prompt.replace("{{AGENT_STATS}}", agent_stats)
+            skills_section = "## Skills\n\n"
+            for skill in self.skills:
+                skill_text, skill_placeholders = extract_placeholders(
+                    f"### Skill: {skill.name} (v{skill.version})\n"
+                    f"{skill.description}\n"
+                    + (f"\n**Allowed Tools**: {', '.join(skill.allowed_tools)}\n" if skill.allowed_tools else "")
+                    + f"\n{skill.content}\n\n"
+                )
+                placeholders += skill_placeholders
+                skills_section += skill_text
+            segments.append(PromptSegment("skills", skills_section))
+
+        # Add common rules at the end of the static part
+        segments.append(PromptSegment("common_rules", COMMON_AGENT_RULES))
+        return segments, placeholders
 
-        # Add common rules at the end
-        return context_header + prompt + "\n\n" + COMMON_AGENT_RULES
-    
     def _build_session_context(self) -> str:
         """Construct current session context"""
         try:
@@ -1851,7 +1837,14 @@ You have full internet access. Choose the right tool for the task:
     async def run(self, user_input: str, history: Optional[List[Any]] = None, session_id: Optional[str] = None) -> str:
         """
         Execute the agent
+
+        Per-run state lives in the request scope (see run_context), so one runtime
+        can serve several sessions concurrently.
         """
+        with ensure_scope():
+            return await self._run(user_input, history, session_id)
+
+    async def _run(self, user_input: str, history: Optional[List[Any]] = None, session_id: Optional[str] = None) -> str:
         if self.progress_callback:
             self.progress_callback(event_type="start", agent_name=self.name)
 
@@ -2083,6 +2076,7 @@ You have full internet access. Choose the right tool for the task:
                         if extra_body:
                             create_kwargs["extra_body"] = extra_body
                         
+                        self._apply_prompt_cache_key(create_kwargs)
                         response = await self.openai_client.chat.completions.create(**create_kwargs)
                     else:
                         # Ollama はローカルモデル用に低 temperature
@@ -2106,6 +2100,7 @@ You have full internet access. Choose the right tool for the task:
                         # Moonshot Kimi requires higher max_tokens for thinking
                         if self.provider == LLMProvider.MOONSHOT:
                             create_kwargs["max_tokens"] = 16384
+                        self._apply_prompt_cache_key(create_kwargs)
                         response = await self.openai_client.chat.completions.create(**create_kwargs)
 
                     # Process streaming response
@@ -2297,17 +2292,8 @@ You have full internet access. Choose the right tool for the task:
                             })
                         had_tool_results = True
                         
-                        # Compress context when exceeding 80%
-                        usage_ratio = self._accumulated_tokens / MAX_CONTEXT_TOKENS
-                        if usage_ratio >= CONTEXT_WARNING_THRESHOLD:
-                            compressor = ContextCompressor(
-                                max_tokens=int(MAX_CONTEXT_TOKENS * CONTEXT_WARNING_THRESHOLD),
-                            )
-                            messages, was_compressed = compressor.compress_if_needed(messages, self.provider)
-                            if was_compressed:
-                                self._accumulated_tokens = compressor.estimate_tokens(messages)
-                                if self.verbose:
-                                    print(f"\n🗜️ [Context compressed: {self._accumulated_tokens:,} tokens]")
+                        # Prefetch the summary early; compress context when exceeding 80%
+                        messages = self._compress_context_if_needed(messages)
                         
                         continue  # Next iteration
                     else:
@@ -2359,16 +2345,7 @@ You have full internet access. Choose the right tool for the task:
                                 })
 
                             had_tool_results = True
-                            usage_ratio = self._accumulated_tokens / MAX_CONTEXT_TOKENS
-                            if usage_ratio >= CONTEXT_WARNING_THRESHOLD:
-                                compressor = ContextCompressor(
-                                    max_tokens=int(MAX_CONTEXT_TOKENS * CONTEXT_WARNING_THRESHOLD),
-                                )
-                                messages, was_compressed = compressor.compress_if_needed(messages, self.provider)
-                                if was_compressed:
-                                    self._accumulated_tokens = compressor.estimate_tokens(messages)
-                                    if self.verbose:
-                                        print(f"\n🗜️ [Context compressed: {self._accumulated_tokens:,} tokens]")
+                            messages = self._compress_context_if_needed(messages)
                             continue
 
                         # If empty, return partial response
@@ -2423,6 +2400,7 @@ You have full internet access. Choose the right tool for the task:
                         # ZAI: force tool calling when tools are available
                         if self.provider == LLMProvider.ZAI and tools:
                             create_kwargs["tool_choice"] = "required"
+                        self._apply_prompt_cache_key(create_kwargs)
                         try:
                             response = await self.openai_client.chat.completions.create(**create_kwargs)
                         except Exception:
@@ -2457,6 +2435,7 @@ You have full internet access. Choose the right tool for the task:
                         # ZAI: force tool calling when tools are available
                         if self.provider == LLMProvider.ZAI and tools:
                             create_kwargs["tool_choice"] = "required"
+                        self._apply_prompt_cache_key(create_kwargs)
                         try:
                             response = await self.openai_client.chat.completions.create(**create_kwargs)
                         except Exception:
@@ -2533,17 +2512,8 @@ You have full internet access. Choose the right tool for the task:
                 messages.extend(tool_results)
                 had_tool_results = True
                 
-                # Compress context when exceeding 80%
-                usage_ratio = self._accumulated_tokens / MAX_CONTEXT_TOKENS
-                if usage_ratio >= CONTEXT_WARNING_THRESHOLD:
-                    compressor = ContextCompressor(
-                        max_tokens=int(MAX_CONTEXT_TOKENS * CONTEXT_WARNING_THRESHOLD),
-                    )
-                    messages, was_compressed = compressor.compress_if_needed(messages, self.provider)
-                    if was_compressed:
-                        self._accumulated_tokens = compressor.estimate_tokens(messages)
-                        if self.verbose:
-                            print(f"[Context compressed: {self._accumulated_tokens:,} tokens]")
+                # Prefetch the summary early; compress context when exceeding 80%
+                messages = self._compress_context_if_needed(messages)
             else:
                 # Return text response
                 content = message.content or ""
@@ -2603,16 +2573,7 @@ You have full internet access. Choose the right tool for the task:
                     messages.extend(tool_results)
                     had_tool_results = True
 
-                    usage_ratio = self._accumulated_tokens / MAX_CONTEXT_TOKENS
-                    if usage_ratio >= CONTEXT_WARNING_THRESHOLD:
-                        compressor = ContextCompressor(
-                            max_tokens=int(MAX_CONTEXT_TOKENS * CONTEXT_WARNING_THRESHOLD),
-                        )
-                        messages, was_compressed = compressor.compress_if_needed(messages, self.provider)
-                        if was_compressed:
-                            self._accumulated_tokens = compressor.estimate_tokens(messages)
-                            if self.verbose:
-                                print(f"[Context compressed: {self._accumulated_tokens:,} tokens]")
+                    messages = self._compress_context_if_needed(messages)
                     continue
                 if tools and content:
                     pseudo = _detect_pseudo_tool_calls(content, list(self.available_tools.keys()))
@@ -2713,13 +2674,13 @@ You have full internet access. Choose the right tool for the task:
             use_stream = False
 
         def _compress_gemini_messages_if_needed(message_list: List[Any]) -> List[Any]:
+            compressor = self._get_context_compressor()
+            dict_messages = _gemini_messages_to_dict(message_list)
+            # Start the background summary before the 80% threshold (does not block)
+            compressor.maybe_prefetch(dict_messages, self.provider)
             usage_ratio = self._accumulated_tokens / MAX_CONTEXT_TOKENS
             if usage_ratio < CONTEXT_WARNING_THRESHOLD:
                 return message_list
-            compressor = ContextCompressor(
-                max_tokens=int(MAX_CONTEXT_TOKENS * CONTEXT_WARNING_THRESHOLD),
-            )
-            dict_messages = _gemini_messages_to_dict(message_list)
             compressed_dicts, was_compressed = compressor.compress_if_needed(dict_messages, self.provider)
             if not was_compressed:
                 return message_list
@@ -1,22 +1,47 @@
 import asyncio
+import heapq
 import logging
 import os
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import httpx
+from croniter import croniter
 
 from ..storage.scheduled_task_store import ScheduledTaskStore
+from .run_context import ConcurrencyLimiter
 
 logger = logging.getLogger(__name__)
 
 # moco ui のAPI URL
 MOCO_API_URL = os.environ.get("MOCO_API_URL", "http://localhost:8000/api/chat")
 
+# タスクごとのタイムアウト: 5分（複雑なタスクでも5分以内に完了すべき）
+TASK_TIMEOUT_SECONDS = 300.0
+DEFAULT_MAX_CONCURRENT_TASKS = 4
+DEFAULT_MAX_TASKS_PER_PROFILE = 2
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class MocoScheduler:
     """
     Moco スケジュール実行エンジン。
-    定期的にデータベースをチェックし、実行時刻が到来したタスクを Orchestrator に渡す。
+    実行時刻が到来したタスクを moco ui の API に渡す。
+
+    - 次回実行時刻の min-heap を持ち、次のタスクの時刻まで眠る
+      （interval_seconds は他プロセスからの追加・変更を拾うための最大待ち時間）
+    - 期限が来たタスクは並行に実行する（全体・プロファイルごとの同時実行数を制限）
+    - HTTP クライアントは1つを使い回す
+    - タスクごとの遅延（予定時刻からの開始遅れ）・実行時間・超過を記録する
     """
 
     def __init__(
@@ -24,23 +49,44 @@ class MocoScheduler:
         orchestrator_factory,
         interval_seconds: int = 60,
         db_path: Optional[str] = None,
-        after_execute_callback = None
+        after_execute_callback = None,
+        max_concurrent_tasks: Optional[int] = None,
+        max_tasks_per_profile: Optional[int] = None
     ):
         """
         Args:
             orchestrator_factory: Orchestratorのインスタンスを生成する呼び出し可能オブジェクト、
                                  または既存のOrchestrator。
                                  タスクごとに異なるprofileを適用するため、factoryが望ましい。
-            interval_seconds: チェック間隔（秒）
+            interval_seconds: DB の変更を確認する最大間隔（秒）
             db_path: タスクDBのパス
             after_execute_callback: タスク完了時に呼ばれるコールバック (task_dict, result_text)
+            max_concurrent_tasks: 同時に実行するタスク数（既定: MOCO_SCHEDULER_MAX_CONCURRENCY or 4）
+            max_tasks_per_profile: プロファイルごとの同時実行数（既定: MOCO_SCHEDULER_MAX_PER_PROFILE or 2）
         """
         self.orchestrator_factory = orchestrator_factory
         self.interval_seconds = interval_seconds
         self.store = ScheduledTaskStore(db_path=db_path)
         self.after_execute_callback = after_execute_callback
+        if max_concurrent_tasks is None:
+            max_concurrent_tasks = int(os.environ.get("MOCO_SCHEDULER_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENT_TASKS))
+        if max_tasks_per_profile is None:
+            max_tasks_per_profile = int(os.environ.get("MOCO_SCHEDULER_MAX_PER_PROFILE", DEFAULT_MAX_TASKS_PER_PROFILE))
+        self._limiter = ConcurrencyLimiter(max_total=max_concurrent_tasks, max_per_key=max_tasks_per_profile)
         self._running = False
         self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._wake: Optional[asyncio.Event] = None
+
+        # (次回実行時刻, task_id) の min-heap
+        self._heap: List[Tuple[datetime, str]] = []
+        self._heap_dirty = True
+        self._data_version: Optional[int] = None
+        # 実行中のタスク: task_id -> asyncio.Task
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.metrics: Dict[str, int] = {"dispatched": 0, "completed": 0, "failed": 0, "overruns": 0}
+        self.task_metrics: Dict[str, Dict[str, Any]] = {}
 
     async def start(self):
         """スケジューラーをバックグラウンドで開始する"""
@@ -49,11 +95,14 @@ class MocoScheduler:
             return
 
         self._running = True
+        self._wake = asyncio.Event()
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(TASK_TIMEOUT_SECONDS))
+        self._heap_dirty = True
         self._task = asyncio.create_task(self._loop())
         logger.info("Moco Scheduler started.")
 
     async def stop(self):
-        """スケジューラーを停止する"""
+        """スケジューラーを停止する（実行中のタスクもキャンセル）"""
         self._running = False
         if self._task:
             self._task.cancel()
@@ -61,8 +110,22 @@ class MocoScheduler:
                 await self._task
             except asyncio.CancelledError:
                 pass
+        running = list(self._inflight.values())
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
         logger.info("Moco Scheduler stopped.")
 
+    def wake(self):
+        """タスクの追加・変更をすぐに反映する（同じイベントループから呼ぶ）"""
+        self._heap_dirty = True
+        if self._wake is not None:
+            self._wake.set()
+
     async def _loop(self):
         """メイン実行ループ"""
         while self._running:
@@ -70,12 +133,57 @@ class MocoScheduler:
                 await self._check_and_execute_tasks()
             except Exception as e:
                 logger.error(f"Error in scheduler loop: {e}", exc_info=True)
-            
-            await asyncio.sleep(self.interval_seconds)
+
+            await self._sleep_until_next()
+
+    async def _sleep_until_next(self):
+        """次のタスクの実行時刻まで（最大 interval_seconds）待つ。wake() で中断される"""
+        delay = float(self.interval_seconds)
+        if self._heap:
+            delay = max(0.0, min(delay, (self._heap[0][0] - datetime.now()).total_seconds()))
+        if self._wake is None:
+            await asyncio.sleep(delay)
+            return
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def _refresh_heap(self):
+        """
+        DB が変わっていればヒープを作り直す（実行中のタスクは除く）
+
+        実行中のタスクは完了時（complete_task で next_run が進んだ後）に再び入る。
+        前回の実行が次の実行時刻をまたいだ場合は _run_task で overrun として数える。
+        """
+        version = self.store.data_version()
+        if not self._heap_dirty and version == self._data_version:
+            return
+        heap = []
+        for next_run, task_id in self.store.get_schedule():
+            when = _parse_time(next_run)
+            if when is not None and task_id not in self._inflight:
+                heap.append((when, task_id))
+        heapq.heapify(heap)
+        self._heap = heap
+        self._heap_dirty = False
+        self._data_version = version
 
     async def _check_and_execute_tasks(self):
-        """期限が来たタスクをチェックして実行する"""
-        due_tasks = self.store.get_due_tasks()
+        """期限が来たタスクを取り出して並行に実行する"""
+        self._refresh_heap()
+        now = datetime.now()
+        due_ids: Set[str] = set()
+        while self._heap and self._heap[0][0] <= now:
+            due_ids.add(heapq.heappop(self._heap)[1])
+        if not due_ids:
+            return
+
+        due_tasks = [task for task in self.store.get_due_tasks() if task['id'] in due_ids]
+        if len(due_tasks) < len(due_ids):
+            # ヒープ構築後に DB 側で次回時刻が変わっていた
+            self._heap_dirty = True
         if not due_tasks:
             return
 
@@ -83,57 +191,127 @@ class MocoScheduler:
 
         for task in due_tasks:
             task_id = task['id']
-            description = task['description']
-            profile = task.get('profile', 'default')
-            
-            logger.info(f"Executing task {task_id}: {description} (profile: {profile})")
-            
-            try:
-                # moco ui の /api/chat にリクエストを投げる（WhatsAppと同じフロー）
-                # セッションIDはタスクごとに固定（履歴を引き継ぐ）
-                # None を渡すと api.py が新しいセッションを作成する
-                session_id = None
-                working_dir = task.get('working_dir') or os.getcwd()
-                
-                payload = {
-                    "message": description,
-                    "session_id": session_id,
-                    "profile": profile,
-                    "working_directory": working_dir
-                }
-                
-                # タイムアウト: 5分（複雑なタスクでも5分以内に完了すべき）
-                async with httpx.AsyncClient(timeout=httpx.Timeout(300.0)) as client:
+            self.metrics["dispatched"] += 1
+            runner = asyncio.create_task(self._run_task(task, now))
+            self._inflight[task_id] = runner
+
+    def _task_metric(self, task_id: str) -> Dict[str, Any]:
+        metric = self.task_metrics.get(task_id)
+        if metric is None:
+            metric = self.task_metrics[task_id] = {
+                "runs": 0,
+                "failures": 0,
+                "overruns": 0,
+                "last_latency_s": None,
+                "last_duration_s": None,
+                "max_duration_s": 0.0,
+            }
+        return metric
+
+    async def _run_task(self, task: Dict[str, Any], dispatched_at: datetime):
+        """同時実行数の枠を取ってタスクを実行し、メトリクスを記録する"""
+        task_id = task['id']
+        profile = task.get('profile') or 'default'
+        metric = self._task_metric(task_id)
+        try:
+            async with self._limiter.acquire(profile):
+                started = time.monotonic()
+                scheduled = _parse_time(task.get('next_run')) or dispatched_at
+                metric["last_latency_s"] = round((datetime.now() - scheduled).total_seconds(), 3)
+                ok = await self._execute_task(task)
+                duration = time.monotonic() - started
+            metric["runs"] += 1
+            metric["last_duration_s"] = round(duration, 3)
+            metric["max_duration_s"] = max(metric["max_duration_s"], round(duration, 3))
+            self.metrics["completed" if ok else "failed"] += 1
+            if not ok:
+                metric["failures"] += 1
+            # 実行時間が cron の間隔を超えた（その間の実行は見送られている）
+            cron = task.get('cron')
+            if cron:
+                try:
+                    next_slot = croniter(cron, scheduled).get_next(datetime)
+                    if datetime.now() > next_slot:
+                        metric["overruns"] += 1
+                        self.metrics["overruns"] += 1
+                except Exception:
+                    pass
+        finally:
+            self._inflight.pop(task_id, None)
+            # complete_task で next_run が変わったのでヒープを作り直す
+            self.wake()
+
+    async def _execute_task(self, task: Dict[str, Any]) -> bool:
+        """タスクを1件実行する（成功時 True）"""
+        task_id = task['id']
+        description = task['description']
+        profile = task.get('profile', 'default')
+
+        logger.info(f"Executing task {task_id}: {description} (profile: {profile})")
+
+        try:
+            # moco ui の /api/chat にリクエストを投げる（WhatsAppと同じフロー）
+            # セッションIDはタスクごとに固定（履歴を引き継ぐ）
+            # None を渡すと api.py が新しいセッションを作成する
+            session_id = None
+            working_dir = task.get('working_dir') or os.getcwd()
+
+            payload = {
+                "message": description,
+                "session_id": session_id,
+                "profile": profile,
+                "working_directory": working_dir
+            }
+
+            client = self._client
+            if client is None:
+                async with httpx.AsyncClient(timeout=httpx.Timeout(TASK_TIMEOUT_SECONDS)) as client:
                     response = await client.post(MOCO_API_URL, json=payload)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    result = data.get("response", "")
-                    artifacts = data.get("artifacts", [])
-                    logger.debug(f"Task {task_id} result: {result[:100] if result else '(empty)'}...")
-                    if artifacts:
-                        logger.info(f"Task {task_id} generated {len(artifacts)} artifacts")
-                else:
-                    result = f"Error: {response.status_code}"
-                    logger.error(f"Task {task_id} failed: {response.text[:200]}")
-                
-                # 完了通知と次回予定の更新
-                self.store.complete_task(task_id)
-                logger.info(f"Task {task_id} completed successfully.")
-
-                # コールバックの実行（モバイル等への通知）
-                if self.after_execute_callback:
-                    try:
-                        if asyncio.iscoroutinefunction(self.after_execute_callback):
-                            await self.after_execute_callback(task, result)
-                        else:
-                            self.after_execute_callback(task, result)
-                    except Exception as callback_err:
-                        logger.error(f"Error in scheduler callback: {callback_err}")
-                
-            except Exception as e:
-                logger.error(f"Failed to execute task {task_id}: {e}", exc_info=True)
-                self.store.complete_task(task_id)
+            else:
+                response = await client.post(MOCO_API_URL, json=payload)
+
+            ok = response.status_code == 200
+            if ok:
+                data = response.json()
+                result = data.get("response", "")
+                artifacts = data.get("artifacts", [])
+                logger.debug(f"Task {task_id} result: {result[:100] if result else '(empty)'}...")
+                if artifacts:
+                    logger.info(f"Task {task_id} generated {len(artifacts)} artifacts")
+            else:
+                result = f"Error: {response.status_code}"
+                logger.error(f"Task {task_id} failed: {response.text[:200]}")
+
+            # 完了通知と次回予定の更新
+            await asyncio.to_thread(self.store.complete_task, task_id)
+            logger.info(f"Task {task_id} completed successfully.")
+
+            # コールバックの実行（モバイル等への通知）
+            if self.after_execute_callback:
+                try:
+                    if asyncio.iscoroutinefunction(self.after_execute_callback):
+                        await self.after_execute_callback(task, result)
+                    else:
+                        self.after_execute_callback(task, result)
+                except Exception as callback_err:
+                    logger.error(f"Error in scheduler callback: {callback_err}")
+            return ok
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to execute task {task_id}: {e}", exc_info=True)
+            await asyncio.to_thread(self.store.complete_task, task_id)
+            return False
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """スケジューラー全体とタスクごとのメトリクス"""
+        return {
+            **self.metrics,
+            "running": sorted(self._inflight),
+            "next_run": self._heap[0][0].isoformat() if self._heap else None,
+            "tasks": {task_id: dict(m) for task_id, m in self.task_metrics.items()},
+        }
 
 if __name__ == "__main__":
     # スケジューラを永続的に実行（moco ui の API 経由）
@@ -0,0 +1,164 @@
+"""
+要約の非同期生成ワーカー（プロセス共有）
+
+SessionLogger のローリング要約と ContextCompressor の事前要約で共通利用する。
+
+- 要約の LLM 呼び出しを上限付きのスレッドプールで実行し、ユーザーのターンを待たせない
+- 同じキー（セッション等）の要約が待機中なら引数を最新のものに差し替え（1件にまとめ）、
+  実行中なら投入しない
+- 待機・実行中のキー数が上限を超えた分は投入しない
+- 完了した結果はキーごとに保持し、次のターンで取り出す
+
+使い方:
+    worker = get_summary_worker()
+    worker.submit(("session", session_id), build_summary, messages)
+    ...
+    summary = worker.take_result(("session", session_id))
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 2
+# 待機中 + 実行中のキー数の上限
+DEFAULT_MAX_PENDING = 32
+# 取り出されなかった結果を保持する上限
+DEFAULT_MAX_RESULTS = 64
+
+_MISSING = object()
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "started", "done")
+
+    def __init__(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.started = False
+        self.done = threading.Event()
+
+
+class SummaryWorker:
+    """キーごとに重複排除するバックグラウンド実行器"""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_results: int = DEFAULT_MAX_RESULTS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        self.max_results = max_results
+        self.max_pending = max(1, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="moco-summary")
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Job] = {}
+        self._results: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.stats = {
+            "submitted": 0, "coalesced": 0, "deduplicated": 0, "dropped": 0,
+            "completed": 0, "failed": 0,
+        }
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> bool:
+        """
+        fn をバックグラウンドで実行する。
+
+        同じキーがまだ開始前なら、その投入を今回の fn / 引数に差し替える。
+
+        Returns:
+            投入（または差し替え）した場合 True、同じキーが実行中か待ちが上限で投入しなかった場合 False
+        """
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                if not job.started:
+                    job.fn, job.args, job.kwargs = fn, args, kwargs
+                    self.stats["coalesced"] += 1
+                    return True
+                self.stats["deduplicated"] += 1
+                return False
+            if len(self._inflight) >= self.max_pending:
+                self.stats["dropped"] += 1
+                return False
+            job = self._inflight[key] = _Job(fn, args, kwargs)
+            self._results.pop(key, None)
+            self.stats["submitted"] += 1
+        self._executor.submit(self._run, key, job)
+        return True
+
+    def _run(self, key: Hashable, job: _Job) -> None:
+        with self._lock:
+            job.started = True
+            fn, args, kwargs = job.fn, job.args, job.kwargs
+        result = None
+        outcome = "failed"
+        try:
+            result = fn(*args, **kwargs)
+            outcome = "completed"
+        except Exception as e:
+            logger.error(f"Background summary failed ({key!r}): {e}")
+        finally:
+            with self._lock:
+                self.stats[outcome] += 1
+                if result is not None:
+                    self._results[key] = result
+                    self._results.move_to_end(key)
+                    while len(self._results) > self.max_results:
+                        self._results.popitem(last=False)
+                self._inflight.pop(key, None)
+            job.done.set()
+
+    def is_pending(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._inflight
+
+    def wait(self, key: Hashable, timeout: Optional[float] = None) -> bool:
+        """実行中の要約の完了を待つ（実行中でなければすぐ True）"""
+        with self._lock:
+            job = self._inflight.get(key)
+        if job is None:
+            return True
+        return job.done.wait(timeout)
+
+    def has_result(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._results
+
+    def take_result(self, key: Hashable, default: Any = None) -> Any:
+        """完了した結果を取り出す（取り出した結果は破棄）"""
+        with self._lock:
+            result = self._results.pop(key, _MISSING)
+        return default if result is _MISSING else result
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "pending": len(self._inflight), "ready": len(self._results)}
+
+
+_worker: Optional[SummaryWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_summary_worker() -> SummaryWorker:
+    """共有ワーカー（同時実行数は MOCO_SUMMARY_WORKERS、既定 2）"""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                try:
+                    max_workers = int(os.environ.get("MOCO_SUMMARY_WORKERS", DEFAULT_MAX_WORKERS))
+                except ValueError:
+                    max_workers = DEFAULT_MAX_WORKERS
+                _worker = SummaryWorker(max_workers=max_workers)
+    return _worker
+
+
+def background_summary_enabled() -> bool:
+    """MOCO_BACKGROUND_SUMMARY=off で従来どおり同期的に要約する"""
+    return os.environ.get("MOCO_BACKGROUND_SUMMARY", "on").lower() not in ("0", "off", "false", "no")
@@ -0,0 +1,129 @@
+"""
+システムプロンプトのセグメント化ビルダー。
+
+プロンプトを「静的セグメント」と「揮発セグメント」に分けて組み立てる。
+
+- 静的セグメント（エージェント定義・委譲ルール・スキル・共通ルール）は
+  キーごとに結合済みの文字列・ハッシュ・使われているプレースホルダを LRU にキャッシュ
+- 揮発セグメント（タイムスタンプ・記憶コンテキスト・統計）は毎ターン末尾に付与
+- 静的プレフィックスがターン間で完全一致するため、プロバイダ側の
+  プレフィックスキャッシュ（OpenAI の自動キャッシュ / Gemini の implicit caching）が効く
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, NamedTuple, Tuple
+
+# 揮発値を埋め込むプレースホルダと、静的部分に残す参照テキスト
+VOLATILE_PLACEHOLDERS: Dict[str, str] = {
+    "{{CURRENT_DATETIME}}": "(末尾の [Current Context] の Timestamp を参照)",
+    "{{SESSION_CONTEXT}}": "(末尾の [Current Context] の Session Context を参照)",
+    "{{AGENT_STATS}}": "(末尾の [Current Context] の Agent Stats を参照)",
+}
+
+
+@dataclass(frozen=True)
+class PromptSegment:
+    """プロンプトの1区画"""
+    name: str
+    text: str
+
+
+def extract_placeholders(text: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    揮発プレースホルダを参照テキストに置き換える。
+
+    Returns:
+        (置換後のテキスト, 使われていたプレースホルダ)
+    """
+    used = []
+    for placeholder, reference in VOLATILE_PLACEHOLDERS.items():
+        if placeholder in text:
+            text = text.replace(placeholder, reference)
+            used.append(placeholder)
+    return text, tuple(used)
+
+
+def prefix_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class StaticPrefix(NamedTuple):
+    """構築済みの静的プレフィックス"""
+    prefix: str
+    prefix_hash: str
+    placeholders: FrozenSet[str]
+    segments: Tuple[PromptSegment, ...] = ()
+
+
+# キャッシュする静的プレフィックスの数（同じランタイムを並行セッションで使う場合のスキル構成の違い）
+DEFAULT_MAX_PREFIXES = 32
+
+
+class SystemPromptBuilder:
+    """
+    静的プレフィックスをキーごとにキャッシュし、揮発セグメントを末尾に連結する。
+
+    1つのランタイムを複数のリクエストが並行して使うため、結果はインスタンスに
+    「現在の値」として持たず、呼び出し側が static_prefix の戻り値を build に渡す。
+
+    使い方:
+        static = builder.static_prefix(key, lambda: (static_segments, placeholders))
+        prompt = builder.build(static.prefix, volatile_segments)
+        static.prefix_hash  # プロバイダのプロンプトキャッシュキーに使用
+    """
+
+    def __init__(self, separator: str = "\n\n", max_prefixes: int = DEFAULT_MAX_PREFIXES):
+        self.separator = separator
+        self.max_prefixes = max(1, max_prefixes)
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Hashable, StaticPrefix]" = OrderedDict()
+        self.rebuilds = 0
+
+    def static_prefix(
+        self,
+        key: Hashable,
+        factory: Callable[[], Tuple[List[PromptSegment], Iterable[str]]],
+    ) -> StaticPrefix:
+        """key の静的プレフィックスを返す（なければ factory の (セグメント, プレースホルダ) から構築）"""
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        segments, placeholders = factory()
+        segments = tuple(s for s in segments if s.text)
+        prefix = self.separator.join(s.text for s in segments)
+        built = StaticPrefix(prefix, prefix_hash(prefix), frozenset(placeholders), segments)
+        with self._lock:
+            self._cache[key] = built
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_prefixes:
+                self._cache.popitem(last=False)
+            self.rebuilds += 1
+        return built
+
+    def build(self, prefix: str, volatile: List[PromptSegment]) -> str:
+        """静的プレフィックス（static_prefix の戻り値）+ 揮発セグメント"""
+        tail = self.separator.join(s.text for s in volatile if s.text)
+        if not tail:
+            return prefix
+        if not prefix:
+            return tail
+        return prefix + self.separator + tail
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "prefixes": [
+                    {"prefix_hash": p.prefix_hash, "prefix_chars": len(p.prefix), "segments": [s.name for s in p.segments]}
+                    for p in self._cache.values()
+                ],
+                "rebuilds": self.rebuilds,
+            }
@@ -0,0 +1,665 @@
+"""
+バックグラウンドタスク用のウォームワーカープール
+
+``oe tasks run`` は従来タスクごとに ``oe tasks _exec`` を新規プロセスで起動しており、
+毎回 import・ツールレジストリ構築・LLM クライアント生成のコールドスタートを払っていた。
+このモジュールは常駐デーモンが事前に起動したワーカープロセスを保持し、
+ローカルの Unix ソケット経由でジョブを受け付けて使い回す。
+
+- ワーカーは起動時に Orchestrator 周りを import して温めておき、
+  (profile, provider, working_dir) ごとの Orchestrator を使い回す
+- ジョブはワーカーごとに1つの常駐イベントループで実行する（ループに紐づく
+  LLM クライアントの接続をジョブ間で使い回し、閉じたループを参照しないように）
+- ジョブ中の stdout/stderr は従来どおり ~/.moco/logs/{task_id}.log に書く（tasks logs -f で追える）
+- タスク ID でキャンセルでき、実行中ならワーカーごと終了して補充する
+- N 件処理後または RSS が上限を超えたらワーカーを入れ替える
+- ステータスは従来どおり TaskStore に記録する（実行開始時の pid はワーカーの pid）
+
+環境変数:
+  - MOCO_TASK_POOL: off / auto（既定: デーモンが起動していれば使う）/ on（必要なら自動起動）
+  - MOCO_TASK_POOL_SIZE: ワーカー数（既定 2）
+  - MOCO_TASK_WORKER_MAX_TASKS: ワーカーを入れ替えるまでの処理件数（既定 20）
+  - MOCO_TASK_WORKER_MAX_RSS_MB: ワーカーを入れ替える RSS（MB、既定 1024、0 で無効）
+  - MOCO_TASK_POOL_PROFILE: 起動時にツールを読み込んでおくプロファイル
+  - MOCO_TASK_POOL_SOCKET: ソケットのパス（既定 ~/.moco/run/task-pool.sock）
+
+起動:
+    oe tasks pool start          # または python -m open_entity.core.task_pool
+"""
+
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..storage.task_store import TaskStatus, TaskStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_TASKS_PER_WORKER = 20
+DEFAULT_MAX_RSS_MB = 1024
+# ワーカー内で保持する Orchestrator の数
+MAX_WARM_ORCHESTRATORS = 4
+# ワーカーの起動（import による事前ウォーム）を待つ時間
+WORKER_READY_TIMEOUT = 120.0
+
+POOL_AVAILABLE = hasattr(socket, "AF_UNIX")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def default_socket_path() -> Path:
+    path = os.environ.get("MOCO_TASK_POOL_SOCKET")
+    return Path(path) if path else Path.home() / ".moco" / "run" / "task-pool.sock"
+
+
+def pool_mode() -> str:
+    """off / auto / on"""
+    if not POOL_AVAILABLE:
+        return "off"
+    mode = os.environ.get("MOCO_TASK_POOL", "auto").lower()
+    if mode in ("0", "off", "false", "no"):
+        return "off"
+    if mode in ("1", "on", "true", "yes"):
+        return "on"
+    return "auto"
+
+
+def _rss_mb() -> float:
+    """現在の RSS（MB）。/proc がなければピーク値で代用"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux は KB、macOS は bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return 0.0
+
+
+# ---------------------------------------------------------------------------
+# Worker process
+# ---------------------------------------------------------------------------
+def _warm_up(profile: Optional[str]) -> None:
+    """重い import を済ませ、指定があればプロファイルのツールを読み込んでおく"""
+    try:
+        from ..utils.env_loader import init_environment
+        init_environment()
+        importlib.import_module(".orchestrator", __package__)
+        if profile:
+            from ..tools.discovery import discover_tools
+            discover_tools(profile)
+    except Exception as e:
+        print(f"[TaskPool] warm-up failed: {e}", file=sys.stderr, flush=True)
+
+
+@contextmanager
+def _redirect_output(log_file: Path) -> Iterator[None]:
+    """fd レベルで stdout/stderr をログファイルに向ける（子プロセスの出力も含む）"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = (os.dup(1), os.dup(2))
+    log_f = open(log_file, "w", buffering=1)
+    try:
+        os.dup2(log_f.fileno(), 1)
+        os.dup2(log_f.fileno(), 2)
+        yield
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+            log_f.close()
+
+
+@contextmanager
+def _job_environment(env: Optional[Dict[str, str]], cwd: Optional[str]) -> Iterator[None]:
+    """ジョブの間だけ呼び出し元の環境変数とカレントディレクトリを適用する"""
+    saved_env = dict(os.environ)
+    saved_cwd = os.getcwd()
+    try:
+        if env:
+            os.environ.clear()
+            os.environ.update(env)
+        if cwd:
+            try:
+                os.chdir(cwd)
+            except OSError:
+                pass
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved_env)
+        try:
+            os.chdir(saved_cwd)
+        except OSError:
+            pass
+
+
+def _run_job(
+    job: Dict[str, Any],
+    runner: Any,
+    orchestrators: "OrderedDict[Any, Any]",
+    loop: asyncio.AbstractEventLoop,
+) -> None:
+    from ..utils.env_loader import init_environment
+
+    task_id = job["task_id"]
+    profile = job["profile"]
+    log_file = runner.log_dir / f"{task_id}.log"
+    with _job_environment(job.get("env"), job.get("cwd")), _redirect_output(log_file):
+        # oe tasks _exec と同じく .env を上書きで読み込む
+        init_environment(override=True)
+        task_info = runner.store.get_task(task_id)
+        if not task_info:
+            print(f"Task {task_id} not found.")
+            return
+        if job.get("provider"):
+            task_info["provider"] = job["provider"]
+        if job.get("model"):
+            task_info["model"] = job["model"]
+
+        working_dir = job.get("working_dir")
+        key = (profile, task_info.get("provider"), working_dir or os.getcwd())
+
+        def get_orchestrator():
+            from .orchestrator import Orchestrator
+            # Orchestrator はプロファイルを環境変数で参照するため使い回す場合も設定し直す
+            os.environ["MOCO_PROFILE"] = profile
+            orchestrator = orchestrators.get(key)
+            if orchestrator is None:
+                orchestrator = Orchestrator(
+                    profile=profile,
+                    provider=task_info.get("provider"),
+                    working_directory=working_dir,
+                )
+                orchestrators[key] = orchestrator
+                while len(orchestrators) > MAX_WARM_ORCHESTRATORS:
+                    orchestrators.popitem(last=False)
+            orchestrators.move_to_end(key)
+            return orchestrator
+
+        runner.execute_task(
+            task_id, task_info, profile, working_dir,
+            orchestrator_factory=get_orchestrator, event_loop=loop,
+        )
+
+
+def _worker_main(conn, max_tasks: int, max_rss_mb: int, warm_profile: Optional[str]) -> None:
+    """ワーカープロセス本体（spawn で起動）"""
+    # 自分専用のプロセスグループにし、キャンセル時の killpg がデーモンに波及しないようにする
+    try:
+        os.setsid()
+    except OSError:
+        pass
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    _warm_up(warm_profile)
+    from .task_runner import TaskRunner
+    runner = TaskRunner()
+    orchestrators: "OrderedDict[Any, Any]" = OrderedDict()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    conn.send({"ready": True, "pid": os.getpid()})
+
+    handled = 0
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        try:
+            _run_job(job, runner, orchestrators, loop)
+        except Exception as e:
+            # execute_task 外の失敗（ログファイルを開けない等）
+            runner.store.update_task(
+                job["task_id"],
+                status=TaskStatus.FAILED,
+                error=f"{type(e).__name__}: {e}",
+                completed_at=datetime.now().isoformat(),
+            )
+        handled += 1
+        rss = _rss_mb()
+        recycle = handled >= max_tasks > 0 or (max_rss_mb > 0 and rss > max_rss_mb)
+        try:
+            conn.send({"task_id": job["task_id"], "rss_mb": round(rss, 1), "recycle": recycle})
+        except (BrokenPipeError, OSError):
+            break
+        if recycle:
+            break
+
+    try:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        loop.close()
+
+
+# ---------------------------------------------------------------------------
+# Pool (daemon side)
+# ---------------------------------------------------------------------------
+class _Slot:
+    __slots__ = ("index", "process", "task_id", "handled", "started_at")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.task_id: Optional[str] = None
+        self.handled = 0
+        self.started_at: Optional[float] = None
+
+
+class TaskWorkerPool:
+    """
+    事前起動したワーカープロセスにタスクを割り当てるプール
+
+    Args:
+        size: ワーカー数
+        max_tasks_per_worker: この件数を処理したワーカーは入れ替える（0 で無制限）
+        max_rss_mb: RSS がこれを超えたワーカーは入れ替える（0 で無効）
+        warm_profile: 起動時にツールを読み込んでおくプロファイル
+        task_store: TaskStore（省略時は既定の DB）
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        max_tasks_per_worker: int = DEFAULT_MAX_TASKS_PER_WORKER,
+        max_rss_mb: int = DEFAULT_MAX_RSS_MB,
+        warm_profile: Optional[str] = None,
+        task_store: Optional[Any] = None,
+    ):
+        self.size = max(1, size)
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.warm_profile = warm_profile
+        self.store = task_store or TaskStore()
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._queued: Dict[str, Dict[str, Any]] = {}
+        self._slots = [_Slot(i) for i in range(self.size)]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.stats = {"submitted": 0, "completed": 0, "cancelled": 0, "crashed": 0, "recycled": 0, "spawned": 0}
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "TaskWorkerPool":
+        return cls(
+            size=_env_int("MOCO_TASK_POOL_SIZE", DEFAULT_POOL_SIZE),
+            max_tasks_per_worker=_env_int("MOCO_TASK_WORKER_MAX_TASKS", DEFAULT_MAX_TASKS_PER_WORKER),
+            max_rss_mb=_env_int("MOCO_TASK_WORKER_MAX_RSS_MB", DEFAULT_MAX_RSS_MB),
+            warm_profile=os.environ.get("MOCO_TASK_POOL_PROFILE") or None,
+            **kwargs,
+        )
+
+    def start(self) -> None:
+        for slot in self._slots:
+            thread = threading.Thread(
+                target=self._slot_loop, args=(slot,), name=f"moco-task-slot-{slot.index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    # -- worker lifecycle ---------------------------------------------------
+    def _spawn(self, slot: _Slot):
+        parent_conn, child_conn = self._ctx.Pipe()
+        # daemon=False: タスク内で ProcessPoolExecutor 等を使えるようにする
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.max_tasks_per_worker, self.max_rss_mb, self.warm_profile),
+            name=f"moco-task-worker-{slot.index}",
+        )
+        process.start()
+        child_conn.close()
+        with self._lock:
+            slot.process = process
+            slot.handled = 0
+            self.stats["spawned"] += 1
+        if not parent_conn.poll(WORKER_READY_TIMEOUT):
+            logger.warning(f"Task worker {process.pid} did not become ready")
+        else:
+            try:
+                parent_conn.recv()
+            except (EOFError, OSError):
+                pass
+        return process, parent_conn
+
+    def _stop_process(self, process) -> None:
+        if process is None or not process.is_alive():
+            return
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError, OSError):
+            process.terminate()
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join(1)
+
+    def _slot_loop(self, slot: _Slot) -> None:
+        while not self._stopping.is_set():
+            process, conn = self._spawn(slot)
+            try:
+                self._serve_worker(slot, process, conn)
+            finally:
+                conn.close()
+                self._stop_process(process)
+                with self._lock:
+                    slot.process = None
+
+    def _serve_worker(self, slot: _Slot, process, conn) -> None:
+        while not self._stopping.is_set():
+            if not process.is_alive():
+                return
+            try:
+                job = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if job is None:
+                return
+            task_id = job["task_id"]
+            with self._lock:
+                if self._queued.pop(task_id, None) is None:
+                    # 待機中にキャンセルされた
+                    continue
+                slot.task_id = task_id
+                slot.started_at = time.time()
+            self.store.update_task(
+                task_id,
+                pid=process.pid,
+                status=TaskStatus.RUNNING,
+                started_at=datetime.now().isoformat(),
+            )
+            try:
+                conn.send(job)
+                reply = conn.recv()
+            except (EOFError, OSError):
+                reply = None
+            with self._lock:
+                slot.task_id = None
+                slot.started_at = None
+                slot.handled += 1
+            if reply is None:
+                # キャンセル（killpg）またはクラッシュ
+                self._mark_interrupted(task_id)
+                return
+            with self._lock:
+                self.stats["completed"] += 1
+            if reply.get("recycle"):
+                with self._lock:
+                    self.stats["recycled"] += 1
+                process.join(5)
+                return
+
+    def _mark_interrupted(self, task_id: str) -> None:
+        task = self.store.get_task(task_id)
+        if task and task.get("status") == TaskStatus.RUNNING.value:
+            with self._lock:
+                self.stats["crashed"] += 1
+            self.store.update_task(
+                task_id,
+                status=TaskStatus.FAILED,
+                error="Task worker exited unexpectedly",
+                completed_at=datetime.now().isoformat(),
+            )
+
+    # -- API ----------------------------------------------------------------
+    def submit(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        task_id = job["task_id"]
+        with self._lock:
+            self._queued[task_id] = job
+            self.stats["submitted"] += 1
+            position = len(self._queued)
+            idle = sum(1 for s in self._slots if s.process is not None and s.task_id is None)
+        self._queue.put(job)
+        return {"queued": True, "position": position, "idle_workers": idle}
+
+    def cancel(self, task_id: str) -> bool:
+        """タスク ID（短縮 ID 可）でキャンセル"""
+        task = self.store.get_task(task_id)
+        full_id = task["task_id"] if task else task_id
+        process = None
+        with self._lock:
+            if self._queued.pop(full_id, None) is not None:
+                self.stats["cancelled"] += 1
+                queued = True
+            else:
+                queued = False
+                for slot in self._slots:
+                    if slot.task_id == full_id:
+                        process = slot.process
+                        break
+                if process is None:
+                    return False
+                self.stats["cancelled"] += 1
+        self.store.update_task(full_id, status=TaskStatus.CANCELLED, completed_at=datetime.now().isoformat())
+        if not queued:
+            # ワーカーごと終了し、スロットのスレッドが補充する
+            self._stop_process(process)
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            workers = [
+                {
+                    "pid": s.process.pid if s.process is not None else None,
+                    "task_id": s.task_id,
+                    "handled": s.handled,
+                    "running_for": round(now - s.started_at, 1) if s.started_at else None,
+                }
+                for s in self._slots
+            ]
+            return {
+                "size": self.size,
+                "queued": list(self._queued.keys()),
+                "workers": workers,
+                **self.stats,
+            }
+
+    def shutdown(self) -> None:
+        self._stopping.set()
+        for _ in self._slots:
+            self._queue.put(None)
+        with self._lock:
+            processes = [s.process for s in self._slots]
+        for process in processes:
+            self._stop_process(process)
+        for thread in self._threads:
+            thread.join(5)
+
+
+# ---------------------------------------------------------------------------
+# Local socket server / client
+# ---------------------------------------------------------------------------
+if POOL_AVAILABLE:
+
+    class _RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            try:
+                request = json.loads(self.rfile.readline().decode("utf-8") or "{}")
+                response = self.server.dispatch(request)
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+    class _PoolServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, path: str, pool: TaskWorkerPool):
+            super().__init__(path, _RequestHandler)
+            self.pool = pool
+
+        def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+            op = request.get("op")
+            if op == "ping":
+                return {"ok": True, "pid": os.getpid()}
+            if op == "submit":
+                return {"ok": True, **self.pool.submit(request["job"])}
+            if op == "cancel":
+                return {"ok": self.pool.cancel(request["task_id"])}
+            if op == "status":
+                return {"ok": True, "pid": os.getpid(), **self.pool.get_status()}
+            if op == "shutdown":
+                threading.Thread(target=self.shutdown, daemon=True).start()
+                return {"ok": True}
+            return {"ok": False, "error": f"unknown op: {op}"}
+
+
+class TaskPoolClient:
+    """プールデーモンへのクライアント（1リクエスト1接続）"""
+
+    def __init__(self, socket_path: Optional[Path] = None, timeout: float = 5.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+
+    def request(self, op: str, **payload: Any) -> Dict[str, Any]:
+        """デーモンが起動していなければ OSError"""
+        if not POOL_AVAILABLE:
+            raise OSError("Unix domain sockets are not available")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(str(self.socket_path))
+            sock.sendall((json.dumps({"op": op, **payload}) + "\n").encode("utf-8"))
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        if not line:
+            raise OSError("Task pool closed the connection")
+        return json.loads(line.decode("utf-8"))
+
+    def is_running(self) -> bool:
+        if not self.socket_path.exists():
+            return False
+        try:
+            return bool(self.request("ping").get("ok"))
+        except (OSError, ValueError):
+            return False
+
+    def submit(
+        self,
+        task_id: str,
+        profile: str,
+        working_dir: Optional[str] = None,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        job = {
+            "task_id": task_id,
+            "profile": profile,
+            "working_dir": working_dir,
+            "provider": provider,
+            "model": model,
+            "cwd": os.getcwd(),
+            "env": env if env is not None else dict(os.environ),
+        }
+        return self.request("submit", job=job)
+
+    def cancel(self, task_id: str) -> bool:
+        return bool(self.request("cancel", task_id=task_id).get("ok"))
+
+    def status(self) -> Dict[str, Any]:
+        return self.request("status")
+
+    def shutdown(self) -> bool:
+        return bool(self.request("shutdown").get("ok"))
+
+
+def start_daemon(env: Optional[Dict[str, str]] = None, timeout: float = 15.0) -> bool:
+    """デーモンを起動し、ソケットが応答するまで待つ（起動済みなら何もしない）"""
+    client = TaskPoolClient()
+    if client.is_running():
+        return True
+    if not POOL_AVAILABLE:
+        return False
+    log_dir = Path.home() / ".moco" / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    with open(log_dir / "task-pool.log", "a", buffering=1) as log_f:
+        subprocess.Popen(
+            [sys.executable, "-m", "open_entity.core.task_pool"],
+            stdout=log_f,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            start_new_session=True,
+            env=env,
+        )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.is_running():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def serve(socket_path: Optional[Path] = None, pool: Optional[TaskWorkerPool] = None) -> None:
+    """デーモン本体（フォアグラウンドで動作し、SIGTERM で終了）"""
+    if not POOL_AVAILABLE:
+        raise RuntimeError("Task pool requires Unix domain sockets")
+    path = socket_path or default_socket_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        if TaskPoolClient(path).is_running():
+            print(f"[TaskPool] already running at {path}", flush=True)
+            return
+        path.unlink()
+
+    pool = pool or TaskWorkerPool.from_env()
+    old_umask = os.umask(0o077)
+    try:
+        server = _PoolServer(str(path), pool)
+    finally:
+        os.umask(old_umask)
+
+    def _terminate(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _terminate)
+    signal.signal(signal.SIGINT, _terminate)
+    pool.start()
+    print(f"[TaskPool] serving {pool.size} workers at {path} (pid {os.getpid()})", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        pool.shutdown()
+        print("[TaskPool] stopped", flush=True)
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,3 +1,4 @@
+import asyncio
 import subprocess
 import os
 import sys
@@ -5,7 +6,7 @@ import signal
 import re
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Any, Callable, Optional
 from dotenv import load_dotenv, find_dotenv
 from ..storage.task_store import TaskStore, TaskStatus
 
@@ -18,11 +19,75 @@ class TaskRunner:
         self.log_dir = Path.home() / ".moco" / "logs"
         self.log_dir.mkdir(parents=True, exist_ok=True)
 
+    def _build_env(self, working_dir: Optional[str] = None) -> dict:
+        """タスク実行用の環境変数（.env と PYTHONPATH を反映）"""
+        # PYTHONPATH を確実に引き継ぐ (開発環境用)
+        env = os.environ.copy()
+        env["PYTHONUNBUFFERED"] = "1"
+        
+        # .env ファイルを読み込んで環境変数に追加
+        def load_env_file(env_path: Path):
+            if not env_path.exists():
+                return
+            with open(env_path) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#') and '=' in line:
+                        key, _, value = line.partition('=')
+                        key = key.strip()
+                        value = value.strip().strip('"').strip("'")
+                        if key and key not in env:  # 既存の環境変数を上書きしない
+                            env[key] = value
+
+        # 優先順で .env を読み込む
+        # 1. 作業ディレクトリの .env
+        load_env_file(Path(working_dir or os.getcwd()) / ".env")
+        # 2. open-entity の .env
+        open_entity_root = Path(__file__).parent.parent.parent.parent
+        load_env_file(open_entity_root / ".env")
+        # 3. moco-workspace の .env (open-entity の親ディレクトリ)
+        load_env_file(open_entity_root.parent / ".env")
+        current_pythonpath = env.get("PYTHONPATH", "")
+        # src ディレクトリがあれば開発中とみなして追加
+        src_path = Path(__file__).parent.parent.parent
+        if (src_path / "moco").exists():
+            src_path_str = str(src_path)
+            if current_pythonpath:
+                env["PYTHONPATH"] = os.pathsep.join([src_path_str, current_pythonpath])
+            else:
+                env["PYTHONPATH"] = src_path_str
+        return env
+
+    def _submit_to_pool(self, task_id: str, profile: str, working_dir: Optional[str], provider: Optional[str], model: Optional[str], env: dict) -> bool:
+        """ワーカープールに投入できれば True"""
+        from . import task_pool
+
+        mode = task_pool.pool_mode()
+        if mode == "off":
+            return False
+        client = task_pool.TaskPoolClient()
+        if not client.is_running():
+            if mode != "on" or not task_pool.start_daemon(env=env):
+                return False
+        try:
+            response = client.submit(task_id, profile, working_dir, provider, model, env=env)
+        except (OSError, ValueError) as e:
+            print(f"[TaskRunner] Task pool unavailable, falling back to subprocess: {e}", file=sys.stderr)
+            return False
+        return bool(response.get("ok"))
+
     def run_task(self, task_id: str, profile: str, description: str, working_dir: Optional[str] = None, provider: Optional[str] = None, model: Optional[str] = None):
         """
         タスクをバックグラウンドで実行する。
-        実際には、自分自身を別のプロセスとして起動し、そこでタスクを実行させる。
+        ワーカープール（core/task_pool.py）が使えればそこに投入し、
+        なければ自分自身を別のプロセスとして起動し、そこでタスクを実行させる。
         """
+        env = self._build_env(working_dir)
+
+        # ウォームワーカープールがあればそちらに投入する（なければ従来どおり別プロセスで実行）
+        if self._submit_to_pool(task_id, profile, working_dir, provider, model, env):
+            return
+
         log_file = self.log_dir / f"{task_id}.log"
         
         # 内部的に実行するためのコマンド
@@ -57,42 +122,6 @@ class TaskRunner:
         if model:
             cmd.extend(["--model", model])
         
-        # PYTHONPATH を確実に引き継ぐ (開発環境用)
-        env = os.environ.copy()
-        env["PYTHONUNBUFFERED"] = "1"
-        
-        # .env ファイルを読み込んで環境変数に追加
-        def load_env_file(env_path: Path):
-            if not env_path.exists():
-                return
-            with open(env_path) as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, _, value = line.partition('=')
-                        key = key.strip()
-                        value = value.strip().strip('"').strip("'")
-                        if key and key not in env:  # 既存の環境変数を上書きしない
-                            env[key] = value
-
-        # 優先順で .env を読み込む
-        # 1. 作業ディレクトリの .env
-        load_env_file(Path(working_dir or os.getcwd()) / ".env")
-        # 2. open-entity の .env
-        open_entity_root = Path(__file__).parent.parent.parent.parent
-        load_env_file(open_entity_root / ".env")
-        # 3. moco-workspace の .env (open-entity の親ディレクトリ)
-        load_env_file(open_entity_root.parent / ".env")
-        current_pythonpath = env.get("PYTHONPATH", "")
-        # src ディレクトリがあれば開発中とみなして追加
-        src_path = Path(__file__).parent.parent.parent
-        if (src_path / "moco").exists():
-            src_path_str = str(src_path)
-            if current_pythonpath:
-                env["PYTHONPATH"] = os.pathsep.join([src_path_str, current_pythonpath])
-            else:
-                env["PYTHONPATH"] = src_path_str
-
         # stdout/stderr をログファイルにリダイレクト
         # buffering=1 (行バッファリング) を指定
         log_f = open(log_file, "w", buffering=1)
@@ -115,12 +144,13 @@ class TaskRunner:
             # 親プロセス側では log_f を閉じて良い（子プロセスが引き継ぐ）
             log_f.close()
 
-    def execute_task(self, task_id: str, task_info: dict, profile: str, working_dir: Optional[str] = None):
+    def execute_task(self, task_id: str, task_info: dict, profile: str, working_dir: Optional[str] = None, orchestrator_factory: Optional[Callable[[], Any]] = None, event_loop: Optional[asyncio.AbstractEventLoop] = None):
         """
-        タスクを実際に実行する（サブプロセス内で呼ばれる）。
+        タスクを実際に実行する（サブプロセスまたはプールのワーカー内で呼ばれる）。
         Orchestratorを使ってタスクを処理し、結果をDBに保存する。
+        orchestrator_factory を渡すとワーカーが保持している Orchestrator を使い回す。
+        event_loop を渡すとそのループで実行する（ワーカーの常駐ループ。省略時は asyncio.run）。
         """
-        import asyncio
         from ..core.orchestrator import Orchestrator
 
         description = task_info.get("task_description", "")
@@ -132,18 +162,24 @@ class TaskRunner:
             print(f"[Task] Profile: {profile}, Provider: {provider}")
 
             # Orchestratorを初期化
-            orchestrator = Orchestrator(
-                profile=profile,
-                provider=provider,
-                working_directory=working_dir,
-            )
+            if orchestrator_factory is not None:
+                orchestrator = orchestrator_factory()
+            else:
+                orchestrator = Orchestrator(
+                    profile=profile,
+                    provider=provider,
+                    working_directory=working_dir,
+                )
 
             # タスクを実行
             async def run():
                 response = await orchestrator.run(description, session_id=session_id)
                 return response
 
-            result = asyncio.run(run())
+            if event_loop is not None:
+                result = event_loop.run_until_complete(run())
+            else:
+                result = asyncio.run(run())
 
             # 成功
             print(f"\n[Task] Completed successfully")
@@ -166,6 +202,10 @@ class TaskRunner:
             )
 
     def cancel_task(self, task_id: str) -> bool:
+        # プールで待機中・実行中のタスクはプールに任せる（ワーカーの補充も行われる）
+        if cancel_pooled_task(task_id):
+            return True
+
         task = self.store.get_task(task_id)
         if not task or not task.get("pid"):
             # タスクは存在するがpidがない場合もCANCELLEDにする
@@ -312,3 +352,18 @@ class TaskRunner:
         if len(text) > max_len:
             return text[:max_len - 3] + "..."
         return text
+
+
+def cancel_pooled_task(task_id: str) -> bool:
+    """ワーカープールのタスクをキャンセル（プールにないタスクなら False）"""
+    from . import task_pool
+
+    if task_pool.pool_mode() == "off":
+        return False
+    client = task_pool.TaskPoolClient()
+    if not client.is_running():
+        return False
+    try:
+        return client.cancel(task_id)
+    except (OSError, ValueError):
+        return False
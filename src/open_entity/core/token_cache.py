@@ -3,8 +3,16 @@ import hashlib
 import time
 import json
 import shutil
+import stat
+import sqlite3
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+
+# メタデータインデックスのファイル名（キャッシュディレクトリ内）
+INDEX_DB_NAME = "index.db"
+
 
 class TokenCache:
     """
@@ -12,182 +20,334 @@ class TokenCache:
     長いコンテキスト（ファイル内容等）をローカルにキャッシュし、
     ファイルが変更（mtime）されていない場合はキャッシュを利用することで
     読み取り速度の向上やトークン節約に寄与する。
-    
+
+    - メモリ内LRU（memory_max_mb まで）→ ディスク（.cache ファイル）の2段構成
+    - メタデータは SQLite のインデックス（path / mtime / サイズ / 有効期限 / 最終アクセス）で管理し、
+      合計サイズは実行中に保持するため、書き込みのたびにディレクトリを走査しない
+
     保存先: ~/.moco/cache/
     """
-    
+
     def __init__(
-        self, 
-        cache_dir: Optional[str] = None, 
+        self,
+        cache_dir: Optional[str] = None,
         max_size_mb: int = 100,
-        default_ttl: int = 3600
+        default_ttl: int = 3600,
+        memory_max_mb: int = 16
     ):
         if cache_dir is None:
             self.cache_dir = Path.home() / ".moco" / "cache"
         else:
             self.cache_dir = Path(cache_dir)
-            
+
         self.max_size_bytes = max_size_mb * 1024 * 1024
         self.default_ttl = default_ttl
-        
+        self.memory_max_bytes = memory_max_mb * 1024 * 1024
+
         # ディレクトリ作成
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        
+
+        self._lock = threading.RLock()
+        # key -> (content, expires_at, size_bytes)
+        self._memory: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._memory_size = 0
+        # 最終アクセス時刻の更新は次の書き込み時にまとめて反映する
+        self._pending_touches: Dict[str, float] = {}
+        self._conn = self._open_index()
+        self._total_size = self._conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM entries"
+        ).fetchone()[0]
+
+    def _open_index(self) -> sqlite3.Connection:
+        """メタデータインデックスを開く（初回は旧形式の .meta ファイルを取り込む）"""
+        conn = sqlite3.connect(str(self.cache_dir / INDEX_DB_NAME), timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_path ON entries(path)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+        conn.commit()
+        self._import_legacy_meta(conn)
+        return conn
+
+    def _import_legacy_meta(self, conn: sqlite3.Connection):
+        """旧形式（key.meta JSON）のエントリをインデックスへ移行"""
+        rows = []
+        for meta_file in self.cache_dir.glob("*.meta"):
+            key = meta_file.stem
+            cache_file = self.cache_dir / f"{key}.cache"
+            try:
+                with open(meta_file, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                if cache_file.exists():
+                    rows.append((
+                        key,
+                        meta.get("path", ""),
+                        meta.get("mtime", 0),
+                        meta.get("size_bytes", cache_file.stat().st_size),
+                        meta.get("created_at", 0),
+                        meta.get("expires_at", 0),
+                        cache_file.stat().st_atime,
+                    ))
+                meta_file.unlink()
+            except Exception:
+                continue
+        if rows:
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries (key, path, mtime, size_bytes, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+
     def _compute_key(self, path: str, mtime: float) -> str:
         """キャッシュキーを生成（パス + mtime のハッシュ）"""
         key_str = f"{os.path.abspath(path)}:{mtime}"
         return hashlib.sha256(key_str.encode()).hexdigest()
-        
+
     def get(self, path: str) -> Optional[str]:
         """
         ファイル内容をキャッシュから取得する（生データ）。
         """
-        if not os.path.isfile(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
             return None
-            
+        mtime = st.st_mtime
+
         try:
-            mtime = os.path.getmtime(path)
             key = self._compute_key(path, mtime)
-            cache_file = self.cache_dir / f"{key}.cache"
-            meta_file = self.cache_dir / f"{key}.meta"
-            
-            if not cache_file.exists() or not meta_file.exists():
-                return None
-                
-            # メタデータ確認（TTL）
-            with open(meta_file, "r", encoding="utf-8") as f:
-                meta = json.load(f)
-                
-            expires_at = meta.get("expires_at", 0)
-            if time.time() > expires_at:
-                self.delete_entry(key)
-                return None
-                
+            now = time.time()
+            with self._lock:
+                # メモリ内LRU
+                entry = self._memory.get(key)
+                if entry is not None:
+                    if now > entry[1]:
+                        self._delete_key(key)
+                        self._conn.commit()
+                        return None
+                    self._memory.move_to_end(key)
+                    self._pending_touches[key] = now
+                    return entry[0]
+
+                # メタデータ確認（TTL）
+                row = self._conn.execute(
+                    "SELECT expires_at, size_bytes FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                expires_at, size_bytes = row
+                if now > expires_at:
+                    self._delete_key(key)
+                    self._conn.commit()
+                    return None
+
             # キャッシュヒット
-            with open(cache_file, "r", encoding="utf-8") as f:
-                content = f.read()
-                
-            # アクセス時刻を更新（LRU用）
             try:
-                cache_file.touch()
-            except Exception:
-                pass
+                with open(self.cache_dir / f"{key}.cache", "r", encoding="utf-8", newline="") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                # 外部から削除された場合はインデックスからも消す
+                with self._lock:
+                    self._delete_key(key)
+                    self._conn.commit()
+                return None
+
+            with self._lock:
+                self._remember(key, content, expires_at, size_bytes)
+                # アクセス時刻を更新（LRU用）
+                self._pending_touches[key] = now
             return content
-            
+
         except Exception:
             return None
-            
+
     def set(self, path: str, content: str, ttl: Optional[int] = None):
         """ファイル内容（生データ）をキャッシュに保存する"""
         if not os.path.isfile(path):
             return
-            
+
         try:
             abs_path = os.path.abspath(path)
             mtime = os.path.getmtime(abs_path)
             key = self._compute_key(abs_path, mtime)
             cache_file = self.cache_dir / f"{key}.cache"
-            meta_file = self.cache_dir / f"{key}.meta"
-            
+
             ttl = ttl if ttl is not None else self.default_ttl
-            
+            now = time.time()
+            data = content.encode("utf-8")
+            size_bytes = len(data)
+
             # キャッシュファイル書き込み
-            with open(cache_file, "w", encoding="utf-8") as f:
-                f.write(content)
-                
-            # メタデータ書き込み
-            meta = {
-                "path": abs_path,
-                "mtime": mtime,
-                "created_at": time.time(),
-                "expires_at": time.time() + ttl,
-                "size_bytes": len(content.encode("utf-8"))
-            }
-            with open(meta_file, "w", encoding="utf-8") as f:
-                json.dump(meta, f)
-                
-            # サイズ制限のチェック（書き込みごとに全スキャンしないよう配慮）
-            # ここではシンプルに呼び出し、内部でサイズチェック
-            self._cleanup_if_needed()
-            
+            with open(cache_file, "wb") as f:
+                f.write(data)
+
+            with self._lock:
+                # 同じパスの古い版（mtime違い）はもう参照されないので削除
+                for (old_key,) in self._conn.execute(
+                    "SELECT key FROM entries WHERE path = ? AND key != ?", (abs_path, key)
+                ).fetchall():
+                    self._delete_key(old_key)
+                self._forget_size(key)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, path, mtime, size_bytes, created_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, abs_path, mtime, size_bytes, now, now + ttl, now)
+                )
+                self._total_size += size_bytes
+                self._pending_touches.pop(key, None)
+                self._remember(key, content, now + ttl, size_bytes)
+
+                # サイズ制限のチェック（合計サイズは保持しているので超過時のみ削除処理）
+                self._cleanup_if_needed()
+                self._flush_touches()
+                self._conn.commit()
+
         except Exception:
             pass
-            
+
     def delete_by_path(self, path: str):
         """パスに基づいてキャッシュを無効化（ファイル変更時用）"""
         try:
             abs_path = os.path.abspath(path)
-            # 全てのメタデータをチェックして該当するパスのキーを削除
-            # パフォーマンスのため、一致する可能性のあるファイルを走査
-            for meta_file in self.cache_dir.glob("*.meta"):
-                try:
-                    with open(meta_file, "r", encoding="utf-8") as f:
-                        meta = json.load(f)
-                        if meta.get("path") == abs_path:
-                            self.delete_entry(meta_file.stem)
-                except Exception:
-                    continue
+            with self._lock:
+                keys = self._conn.execute(
+                    "SELECT key FROM entries WHERE path = ?", (abs_path,)
+                ).fetchall()
+                for (key,) in keys:
+                    self._delete_key(key)
+                if keys:
+                    self._conn.commit()
         except Exception:
             pass
 
     def delete_entry(self, key: str):
         """特定のエントリを削除"""
         try:
-            (self.cache_dir / f"{key}.cache").unlink(missing_ok=True)
-            (self.cache_dir / f"{key}.meta").unlink(missing_ok=True)
+            with self._lock:
+                self._delete_key(key)
+                self._conn.commit()
         except Exception:
             pass
-            
+
+    def _delete_key(self, key: str):
+        """エントリを削除（コミットは呼び出し側で行う）"""
+        self._forget_size(key)
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._pending_touches.pop(key, None)
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_size -= entry[2]
+        (self.cache_dir / f"{key}.cache").unlink(missing_ok=True)
+        (self.cache_dir / f"{key}.meta").unlink(missing_ok=True)
+
+    def _forget_size(self, key: str):
+        """既存エントリのサイズを合計から差し引く"""
+        row = self._conn.execute("SELECT size_bytes FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._total_size -= row[0]
+
+    def _remember(self, key: str, content: str, expires_at: float, size_bytes: int):
+        """メモリ内LRUに追加（上限を超えたら古い順に追い出す）"""
+        if size_bytes > self.memory_max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= old[2]
+        self._memory[key] = (content, expires_at, size_bytes)
+        self._memory_size += size_bytes
+        while self._memory_size > self.memory_max_bytes and self._memory:
+            _, (_, _, evicted_size) = self._memory.popitem(last=False)
+            self._memory_size -= evicted_size
+
+    def _flush_touches(self):
+        """保留中の最終アクセス時刻をインデックスへ反映"""
+        if not self._pending_touches:
+            return
+        self._conn.executemany(
+            "UPDATE entries SET last_access = ? WHERE key = ?",
+            [(ts, key) for key, ts in self._pending_touches.items()]
+        )
+        self._pending_touches.clear()
+
     def clear(self):
         """全てのキャッシュを安全にクリア"""
         if not self.cache_dir.exists():
             return
-        for item in self.cache_dir.iterdir():
+        with self._lock:
             try:
-                if item.is_file():
-                    item.unlink()
-                elif item.is_dir():
-                    shutil.rmtree(item)
+                self._conn.execute("DELETE FROM entries")
+                self._conn.commit()
             except Exception:
                 pass
-            
+            self._memory.clear()
+            self._memory_size = 0
+            self._pending_touches.clear()
+            self._total_size = 0
+            for item in self.cache_dir.iterdir():
+                # インデックス自体（WAL等を含む）は残す
+                if item.name.startswith(INDEX_DB_NAME):
+                    continue
+                try:
+                    if item.is_file():
+                        item.unlink()
+                    elif item.is_dir():
+                        shutil.rmtree(item)
+                except Exception:
+                    pass
+
     def get_stats(self) -> Dict[str, Any]:
         """キャッシュ統計を取得"""
-        total_size = 0
-        count = 0
-        files = list(self.cache_dir.glob("*.cache"))
-        for f in files:
-            total_size += f.stat().st_size
-            count += 1
-            
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total_size = self._total_size
+            memory_count = len(self._memory)
+            memory_size = self._memory_size
+
         return {
             "count": count,
             "total_size_bytes": total_size,
             "total_size_mb": round(total_size / (1024 * 1024), 2),
             "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2),
+            "memory_count": memory_count,
+            "memory_size_bytes": memory_size,
             "cache_dir": str(self.cache_dir)
         }
-        
+
     def _cleanup_if_needed(self):
         """LRU方式で古いキャッシュを削除して、サイズ制限内に収める"""
-        files = []
-        current_size = 0
-        for f in self.cache_dir.glob("*.cache"):
-            stat = f.stat()
-            current_size += stat.st_size
-            files.append((f, stat.st_atime))
-            
-        if current_size <= self.max_size_bytes:
+        if self._total_size <= self.max_size_bytes:
             return
-            
-        # アクセス時刻（st_atime）の昇順（古い順）にソート
-        files.sort(key=lambda x: x[1])
-        
-        for f, _ in files:
-            if current_size <= self.max_size_bytes:
+
+        # 他プロセスの書き込み分を含めて合計を取り直す（超過時のみ）
+        self._flush_touches()
+        self._total_size = self._conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM entries"
+        ).fetchone()[0]
+        if self._total_size <= self.max_size_bytes:
+            return
+
+        # 最終アクセス時刻の昇順（古い順）に必要な分だけ取り出して削除
+        victims: List[str] = []
+        excess = self._total_size - self.max_size_bytes
+        for key, size in self._conn.execute(
+            "SELECT key, size_bytes FROM entries ORDER BY last_access"
+        ):
+            if excess <= 0:
                 break
-            
-            size = f.stat().st_size
-            key = f.stem
-            self.delete_entry(key)
-            current_size -= size
+            victims.append(key)
+            excess -= size
+        for key in victims:
+            self._delete_key(key)
@@ -0,0 +1,208 @@
+"""
+トークン計数モジュール。
+
+tiktoken が使える場合は実際のトークナイザで数え、使えない場合
+（未インストール・エンコーディングをダウンロードできない環境）は
+文字数ベースの推定にフォールバックする。
+
+- テキストごとの計数結果はコンテンツハッシュをキーに LRU でキャッシュ
+- TokenLedger はメッセージリストの合計を保持し、追加分だけを数える
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+# トークン推定の統一係数（トークナイザが使えない場合のフォールバック）
+TOKEN_ESTIMATE_RATIO = 1.5
+
+# OpenAI 以外のモデル（Gemini / Claude / GLM 等）の近似に使うエンコーディング
+DEFAULT_ENCODING = "o200k_base"
+FALLBACK_ENCODINGS = ("o200k_base", "cl100k_base")
+
+# これより短いテキストはハッシュせずそのままキーにする
+_INLINE_KEY_MAX = 64
+DEFAULT_CACHE_SIZE = 8192
+
+_encodings: Dict[str, Any] = {}
+_model_encodings: Dict[str, Optional[str]] = {}
+_encoding_lock = threading.Lock()
+_tokenizer_failed = False
+
+_count_cache: "OrderedDict[Any, int]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def estimate_tokens_heuristic(text: str) -> int:
+    """文字数ベースのトークン推定。
+
+    日本語は1文字≒1.5トークン、英語は1単語≒1.3トークン。
+    安全マージンを含めて文字数の1.5倍で推定。
+    """
+    return int(len(text) * TOKEN_ESTIMATE_RATIO)
+
+
+def _load_encoding(name: str):
+    global _tokenizer_failed
+    enc = _encodings.get(name)
+    if enc is not None or _tokenizer_failed:
+        return enc
+    with _encoding_lock:
+        enc = _encodings.get(name)
+        if enc is not None or _tokenizer_failed:
+            return enc
+        try:
+            enc = tiktoken.get_encoding(name)
+        except Exception as e:
+            # オフライン等でエンコーディングを取得できない場合は以後推定のみ
+            logger.warning(f"tiktoken encoding '{name}' unavailable, using character estimate: {e}")
+            _tokenizer_failed = True
+            return None
+        _encodings[name] = enc
+        return enc
+
+
+def _encoding_name_for_model(model: Optional[str]) -> str:
+    if not model:
+        return DEFAULT_ENCODING
+    name = _model_encodings.get(model)
+    if name is None:
+        try:
+            # "openai/gpt-4o" のようなプレフィックス付きも解決する
+            name = tiktoken.encoding_name_for_model(model.rsplit("/", 1)[-1])
+        except Exception:
+            name = DEFAULT_ENCODING
+        if name not in FALLBACK_ENCODINGS:
+            # p50k 等の旧エンコーディングは近似としても精度が低いので既定を使う
+            name = DEFAULT_ENCODING
+        _model_encodings[model] = name
+    return name
+
+
+def get_tokenizer(model: Optional[str] = None):
+    """モデルに対応する tiktoken エンコーディング（使えない場合は None）"""
+    if not TIKTOKEN_AVAILABLE or _tokenizer_failed:
+        return None
+    return _load_encoding(_encoding_name_for_model(model))
+
+
+def tokenizer_available() -> bool:
+    return get_tokenizer() is not None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """テキストのトークン数（コンテンツハッシュでキャッシュ）"""
+    if not text:
+        return 0
+    if not TIKTOKEN_AVAILABLE or _tokenizer_failed:
+        return estimate_tokens_heuristic(text)
+    enc_name = _encoding_name_for_model(model)
+    enc = _load_encoding(enc_name)
+    if enc is None:
+        return estimate_tokens_heuristic(text)
+
+    if len(text) <= _INLINE_KEY_MAX:
+        key = (enc_name, text)
+    else:
+        key = (enc_name, hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest())
+    with _cache_lock:
+        cached = _count_cache.get(key)
+        if cached is not None:
+            _count_cache.move_to_end(key)
+            return cached
+
+    count = len(enc.encode(text, disallowed_special=()))
+    with _cache_lock:
+        _count_cache[key] = count
+        while len(_count_cache) > DEFAULT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
+    return count
+
+
+def iter_message_texts(msg: Dict[str, Any]) -> Iterator[str]:
+    """メッセージ内のトークンを消費するテキストを列挙する"""
+    # OpenAI形式: {"role": "...", "content": "..."}
+    if "content" in msg:
+        content = msg.get("content", "")
+        if content:
+            yield content if isinstance(content, str) else str(content)
+
+    # Gemini形式: {"role": "...", "parts": [...]}
+    if "parts" in msg:
+        for part in msg.get("parts", []) or []:
+            if isinstance(part, str):
+                yield part
+            elif isinstance(part, dict) and "text" in part:
+                yield part["text"]
+            elif hasattr(part, "text") and part.text:
+                yield part.text
+
+    # ツール呼び出し結果なども考慮
+    if "tool_calls" in msg:
+        for tc in msg.get("tool_calls", []) or []:
+            if isinstance(tc, dict) and "function" in tc:
+                yield str(tc["function"].get("arguments", ""))
+
+
+def count_message_tokens(msg: Dict[str, Any], model: Optional[str] = None) -> int:
+    return sum(count_tokens(text, model) for text in iter_message_texts(msg))
+
+
+def count_messages_tokens(messages: List[Dict[str, Any]], model: Optional[str] = None) -> int:
+    return sum(count_message_tokens(msg, model) for msg in messages)
+
+
+class TokenLedger:
+    """
+    メッセージリストのトークン合計を保持する。
+
+    同じリストに末尾追加された場合は追加分だけを数える。別のリストや
+    先頭側が入れ替わった場合は数え直す（各メッセージはキャッシュから引ける）。
+    既存メッセージの内容をその場で書き換えた場合は reset() を呼ぶこと。
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+        self._list_id: Optional[int] = None
+        self._counts: List[int] = []
+        self._last: Optional[Dict[str, Any]] = None
+        self.total = 0
+
+    def reset(self, messages: Optional[List[Dict[str, Any]]] = None) -> int:
+        self._list_id = None
+        self._counts = []
+        self._last = None
+        self.total = 0
+        if messages is not None:
+            return self.sync(messages)
+        return 0
+
+    def sync(self, messages: List[Dict[str, Any]]) -> int:
+        """リストの現在の合計を返す（追加分のみ計数）"""
+        seen = len(self._counts)
+        if (
+            self._list_id != id(messages)
+            or len(messages) < seen
+            or (seen and messages[seen - 1] is not self._last)
+        ):
+            self._list_id = id(messages)
+            self._counts = []
+            self.total = 0
+            seen = 0
+        for msg in messages[seen:]:
+            count = count_message_tokens(msg, self.model)
+            self._counts.append(count)
+            self.total += count
+        self._last = messages[-1] if messages else None
+        return self.total
@@ -0,0 +1,315 @@
+"""
+ツール定義のコンパイル済みレジストリ（プロセス共有）
+
+AgentRuntime / MCP サーバーで共通利用する。
+
+- 関数ごとに inspect.signature / get_type_hints / docstring 解析を1回だけ行う
+- OpenAI tool 定義・Gemini FunctionDeclaration・MCP inputSchema をツール名ごとにキャッシュ
+- 引数の検証・型変換は事前に組み立てたパラメータ表で行う（呼び出しごとの内省なし）
+
+キーは関数オブジェクト（弱参照）とバージョン。スキルツールは
+(スキル名, ツール名, スキルのバージョン) で共有する。
+
+CompiledTool は通常の関数自体を保持しない（弱参照キーを生かし続けないため）。
+
+使い方:
+    compiled = get_compiled_tool(func)
+    compiled.openai_tool("read_file")
+    valid_args = compiled.validate({"path": "a.txt"})
+"""
+
+import inspect
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, get_type_hints
+
+logger = logging.getLogger(__name__)
+
+try:
+    from google.genai import types as genai_types
+    GENAI_TYPES_AVAILABLE = True
+except ImportError:
+    genai_types = None
+    GENAI_TYPES_AVAILABLE = False
+
+_TYPE_SCHEMAS: Dict[Any, Dict[str, str]] = {
+    str: {"type": "string"},
+    int: {"type": "integer"},
+    float: {"type": "number"},
+    bool: {"type": "boolean"},
+    list: {"type": "array"},
+    dict: {"type": "object"},
+}
+
+
+def python_type_to_schema(py_type: Any) -> Dict[str, Any]:
+    """Convert Python type to JSON schema"""
+    return dict(_TYPE_SCHEMAS.get(py_type, {"type": "string"}))
+
+
+def python_type_to_json_type(python_type: Any) -> str:
+    """Python型をJSONスキーマ型に変換（typing のジェネリクス・Optional も解釈）"""
+    origin = getattr(python_type, "__origin__", None)
+    if origin is not None:
+        if origin in (list, List):
+            return "array"
+        if origin in (dict, Dict):
+            return "object"
+        if origin is Union:
+            # Optional は Union[X, None] なので最初の型を使用
+            for arg in getattr(python_type, "__args__", ()):
+                if arg is not type(None):
+                    return python_type_to_json_type(arg)
+    return _TYPE_SCHEMAS.get(python_type, {"type": "string"})["type"]
+
+
+@dataclass(frozen=True)
+class CompiledParam:
+    name: str
+    annotation: Any  # get_type_hints の結果（なければ None）
+    required: bool
+    variadic: bool  # *args / **kwargs（スキーマには含めるが検証では無視）
+    description: str  # runtime 形式（docstring 中の "name ...: desc" 行）
+    mcp_description: Optional[str]  # MCP 形式（行頭が name の行）
+
+
+class CompiledTool:
+    """1つの関数について事前計算したスキーマと引数検証器"""
+
+    def __init__(self, params: Tuple[CompiledParam, ...], doc: str, func: Optional[Callable] = None):
+        # func はスキルツールのラッパーのみ保持（通常の関数は弱参照キー側にある）
+        self.func = func
+        self.params = params
+        self.doc = doc
+        self._openai: Dict[str, Dict[str, Any]] = {}
+        self._gemini: Dict[str, Any] = {}
+        self._mcp_schema: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    # -- schemas ------------------------------------------------------------
+    def _description(self, tool_name: str) -> str:
+        # Use entire docstring as description (to convey format examples to LLM)
+        return self.doc.strip() if self.doc else f"{tool_name} function"
+
+    def _parameters(self) -> Dict[str, Any]:
+        properties = {}
+        required = []
+        for p in self.params:
+            properties[p.name] = {**python_type_to_schema(p.annotation or str), "description": p.description}
+            if p.required:
+                required.append(p.name)
+        return {"type": "object", "properties": properties, "required": required}
+
+    def openai_tool(self, tool_name: str) -> Dict[str, Any]:
+        """OpenAI tool 定義（ツール名ごとにキャッシュ、呼び出し側で変更しないこと）"""
+        tool = self._openai.get(tool_name)
+        if tool is None:
+            tool = {
+                "type": "function",
+                "function": {
+                    "name": tool_name,
+                    "description": self._description(tool_name),
+                    "parameters": self._parameters(),
+                },
+            }
+            with self._lock:
+                tool = self._openai.setdefault(tool_name, tool)
+        return tool
+
+    def gemini_declaration(self, tool_name: str) -> Any:
+        """Gemini FunctionDeclaration（ツール名ごとにキャッシュ）"""
+        decl = self._gemini.get(tool_name)
+        if decl is None:
+            if not GENAI_TYPES_AVAILABLE:
+                raise ImportError("google-genai is required for Gemini function declarations")
+            decl = genai_types.FunctionDeclaration(
+                name=tool_name,
+                description=self._description(tool_name),
+                parameters=self._parameters(),
+            )
+            with self._lock:
+                decl = self._gemini.setdefault(tool_name, decl)
+        return decl
+
+    def mcp_input_schema(self) -> Dict[str, Any]:
+        """MCP の inputSchema（呼び出しごとに新しい dict を返す）"""
+        if self._mcp_schema is None:
+            properties = {}
+            required = []
+            for p in self.params:
+                prop_def: Dict[str, Any] = {
+                    "type": python_type_to_json_type(p.annotation if p.annotation is not None else Any)
+                }
+                if p.mcp_description is not None:
+                    prop_def["description"] = p.mcp_description
+                properties[p.name] = prop_def
+                if p.required:
+                    required.append(p.name)
+            self._mcp_schema = {"type": "object", "properties": properties, "required": required}
+        schema = self._mcp_schema
+        return {
+            "type": schema["type"],
+            "properties": {k: dict(v) for k, v in schema["properties"].items()},
+            "required": list(schema["required"]),
+        }
+
+    # -- validation ---------------------------------------------------------
+    def validate(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate the types of function arguments and convert them if possible.
+        """
+        validated_args = {}
+        missing_required: List[str] = []
+        for p in self.params:
+            if p.variadic:
+                continue
+            if p.name in args:
+                val = args[p.name]
+                expected_type = p.annotation
+                if expected_type is int and not isinstance(val, int):
+                    try:
+                        val = int(val)
+                    except (ValueError, TypeError):
+                        pass
+                elif expected_type is float and not isinstance(val, (int, float)):
+                    try:
+                        val = float(val)
+                    except (ValueError, TypeError):
+                        pass
+                elif expected_type is bool and not isinstance(val, bool):
+                    if str(val).lower() in ("true", "1", "yes"):
+                        val = True
+                    elif str(val).lower() in ("false", "0", "no"):
+                        val = False
+                validated_args[p.name] = val
+            elif p.required:
+                missing_required.append(p.name)
+
+        if missing_required:
+            raise ValueError(f"missing required arguments: {', '.join(missing_required)}")
+        return validated_args
+
+
+def _param_description(doc: str, param_name: str) -> str:
+    """Extract parameter descriptions from docstring (Args: section)"""
+    if param_name in doc:
+        for line in doc.split("\n"):
+            if param_name in line and ":" in line:
+                return line.split(":", 1)[-1].strip()
+    return f"Parameter: {param_name}"
+
+
+def _mcp_param_description(doc: str, param_name: str) -> Optional[str]:
+    for line in doc.split("\n"):
+        line = line.strip()
+        if line.startswith(param_name):
+            # "param_name: description" or "param_name (type): description"
+            if ":" in line:
+                return line.split(":", 1)[1].strip()
+            return None
+    return None
+
+
+def compile_tool(func: Callable) -> CompiledTool:
+    """関数を内省して CompiledTool を作る（キャッシュしない）"""
+    sig = inspect.signature(func)
+    try:
+        hints = get_type_hints(func)
+    except (TypeError, NameError, ValueError):
+        hints = {}
+    doc = func.__doc__ or ""
+
+    params = []
+    for name, param in sig.parameters.items():
+        if name in ("self", "cls"):
+            continue
+        params.append(CompiledParam(
+            name=name,
+            annotation=hints.get(name),
+            required=param.default is inspect.Parameter.empty,
+            variadic=param.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD),
+            description=_param_description(doc, name),
+            mcp_description=_mcp_param_description(doc, name) if doc else None,
+        ))
+    return CompiledTool(tuple(params), doc)
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+_by_func: "weakref.WeakKeyDictionary[Callable, Tuple[Any, CompiledTool]]" = weakref.WeakKeyDictionary()
+_by_key: Dict[Tuple[Any, ...], CompiledTool] = {}
+_registry_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def get_compiled_tool(func: Callable, version: Any = None) -> CompiledTool:
+    """
+    関数の CompiledTool を返す（関数オブジェクトとバージョンごとにキャッシュ）。
+
+    バウンドメソッドは元の関数で共有する（アクセスごとに別オブジェクトになるため）。
+    弱参照できない呼び出し可能オブジェクトは毎回コンパイルする。
+    """
+    key = getattr(func, "__func__", func) if inspect.ismethod(func) else func
+    try:
+        entry = _by_func.get(key)
+    except TypeError:
+        return compile_tool(func)
+    if entry is not None and entry[0] == version:
+        _stats["hits"] += 1
+        return entry[1]
+    compiled = compile_tool(func)
+    _stats["misses"] += 1
+    with _registry_lock:
+        try:
+            _by_func[key] = (version, compiled)
+        except TypeError:
+            pass
+    return compiled
+
+
+def get_compiled_skill_tool(
+    skill_name: str,
+    tool_name: str,
+    version: Any,
+    build: Callable[[], Optional[Callable]],
+) -> Optional[CompiledTool]:
+    """
+    スキルツールの CompiledTool を返す（ランタイム間で共有）。
+
+    Args:
+        skill_name: スキル名
+        tool_name: ツール名
+        version: スキルのバージョン（SKILL.md の version と index.py の mtime など）
+        build: キャッシュにない場合に呼び出し用の関数を作る関数（None なら登録しない）
+    """
+    key = (skill_name, tool_name, version)
+    compiled = _by_key.get(key)
+    if compiled is not None:
+        _stats["hits"] += 1
+        return compiled
+    func = build()
+    if func is None:
+        return None
+    compiled = compile_tool(func)
+    compiled.func = func
+    _stats["misses"] += 1
+    with _registry_lock:
+        # 同じツールの古いバージョンは破棄
+        for old in [k for k in _by_key if k[0] == skill_name and k[1] == tool_name and k != key]:
+            del _by_key[old]
+        compiled = _by_key.setdefault(key, compiled)
+    return compiled
+
+
+def get_registry_stats() -> Dict[str, int]:
+    return {**_stats, "functions": len(_by_func), "skill_tools": len(_by_key)}
+
+
+def clear_tool_registry() -> None:
+    """キャッシュを破棄（テスト用）"""
+    with _registry_lock:
+        _by_func.clear()
+        _by_key.clear()
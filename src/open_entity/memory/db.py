@@ -2,9 +2,15 @@ from __future__ import annotations
 
 import sqlite3
 
+from .serialization import deserialize_embedding, serialize_embedding_blob
+
 # SQLite tuning for concurrent writers
 _BUSY_TIMEOUT_MS = 5000
 
+# PRAGMA user_version: 1 = embedding を BLOB 列へ移行済み
+_SCHEMA_VERSION_EMBEDDING_BLOB = 1
+_MIGRATION_BATCH_SIZE = 500
+
 
 def _configure_conn(conn: sqlite3.Connection) -> sqlite3.Connection:
     """Apply SQLite PRAGMAs to reduce 'database is locked' errors."""
@@ -35,6 +41,7 @@ def init_db(db_path: str) -> None:
                 questions TEXT,
                 source TEXT,
                 embedding TEXT,
+                embedding_blob BLOB,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """
@@ -51,6 +58,8 @@ def init_db(db_path: str) -> None:
             cursor.execute("ALTER TABLE memories ADD COLUMN router_id TEXT DEFAULT ''")
         if "worker_id" not in cols:
             cursor.execute("ALTER TABLE memories ADD COLUMN worker_id TEXT DEFAULT ''")
+        if "embedding_blob" not in cols:
+            cursor.execute("ALTER TABLE memories ADD COLUMN embedding_blob BLOB")
     except Exception:
         # If migration fails, keep running; run_id is optional.
         pass
@@ -104,9 +113,121 @@ def init_db(db_path: str) -> None:
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_relations_memory_id ON relations(memory_id)")
 
     conn.commit()
+
+    init_fts(conn)
+
+    try:
+        migrate_embeddings_to_blob(conn)
+    except Exception as e:
+        # 移行に失敗してもJSON列からの読み取りで動作は継続できる
+        print(f"[MemoryService] Embedding BLOB migration failed: {e}")
     conn.close()
 
 
+def init_fts(conn: sqlite3.Connection) -> bool:
+    """
+    キーワード検索用の FTS5 (trigram) インデックスを作成
+
+    memories を外部コンテンツとする仮想テーブルで、トリガーにより常に同期される。
+    trigram トークナイザは分かち書き不要のため日本語/CJKでも部分一致検索できる。
+    SQLite が FTS5/trigram に未対応の場合は False を返す (LIKE 検索にフォールバック)。
+    """
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories_fts'"
+        ).fetchone()
+        if not exists:
+            conn.execute(
+                """
+                CREATE VIRTUAL TABLE memories_fts USING fts5(
+                    content, keywords, questions,
+                    content='memories', content_rowid='id', tokenize='trigram'
+                )
+                """
+            )
+            # 既存の記憶をインデックスに取り込む
+            conn.execute("INSERT INTO memories_fts(memories_fts) VALUES ('rebuild')")
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS memories_fts_ai AFTER INSERT ON memories BEGIN
+                INSERT INTO memories_fts(rowid, content, keywords, questions)
+                VALUES (new.id, new.content, new.keywords, new.questions);
+            END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS memories_fts_ad AFTER DELETE ON memories BEGIN
+                INSERT INTO memories_fts(memories_fts, rowid, content, keywords, questions)
+                VALUES ('delete', old.id, old.content, old.keywords, old.questions);
+            END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS memories_fts_au AFTER UPDATE OF content, keywords, questions ON memories BEGIN
+                INSERT INTO memories_fts(memories_fts, rowid, content, keywords, questions)
+                VALUES ('delete', old.id, old.content, old.keywords, old.questions);
+                INSERT INTO memories_fts(rowid, content, keywords, questions)
+                VALUES (new.id, new.content, new.keywords, new.questions);
+            END
+            """
+        )
+        conn.commit()
+        return True
+    except sqlite3.OperationalError:
+        conn.rollback()
+        return False
+
+
+def has_fts(conn: sqlite3.Connection) -> bool:
+    """FTS5 インデックスが利用可能か"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def migrate_embeddings_to_blob(conn: sqlite3.Connection, batch_size: int = _MIGRATION_BATCH_SIZE) -> int:
+    """
+    JSON形式の embedding を float32 BLOB 列へ移行する (DBごとに一度だけ)
+
+    バッチ単位でコミットするため、移行中も他の接続からの読み書きをブロックし続けない。
+    移行済みの行は JSON 列を NULL にしてDBサイズを削減する。
+
+    Returns:
+        移行した行数
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= _SCHEMA_VERSION_EMBEDDING_BLOB:
+        return 0
+
+    migrated = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            """
+            SELECT id, embedding FROM memories
+            WHERE id > ? AND embedding_blob IS NULL AND embedding IS NOT NULL AND embedding != ''
+            ORDER BY id LIMIT ?
+            """,
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for memory_id, emb_str in rows:
+            last_id = memory_id
+            updates.append((serialize_embedding_blob(deserialize_embedding(emb_str)), memory_id))
+        conn.executemany("UPDATE memories SET embedding_blob = ?, embedding = NULL WHERE id = ?", updates)
+        conn.commit()
+        migrated += len(updates)
+
+    conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION_EMBEDDING_BLOB}")
+    conn.commit()
+    return migrated
+
+
 def get_conn(db_path: str) -> sqlite3.Connection:
     """DB接続を取得"""
     return _configure_conn(sqlite3.connect(db_path, timeout=10))
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import os
 from typing import Any, List, Optional
 
 
@@ -21,54 +20,28 @@ except ImportError:  # pragma: no cover
 
 
 def build_genai_client() -> Optional[Any]:
-    """Create a google-genai client if available and API key is set."""
+    """Return the shared google-genai client if available and API key is set."""
     if not GENAI_AVAILABLE:
         return None
-    api_key = os.getenv("GENAI_API_KEY") or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        return None
-    try:
-        return genai.Client(api_key=api_key)
-    except Exception:
-        return None
+    from ..core.embedding_service import get_embedding_client
+    return get_embedding_client("gemini")
 
 
 def build_openai_client() -> Optional[Any]:
-    """Create an OpenAI client if available and API key is set."""
+    """Return the shared OpenAI client if available and API key is set."""
     if not OPENAI_AVAILABLE:
         return None
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return None
-    try:
-        return OpenAI(api_key=api_key)
-    except Exception:
-        return None
+    from ..core.embedding_service import get_embedding_client
+    return get_embedding_client("openai")
 
 
 def embed_text(client: Any, model: str, text: str) -> List[float]:
-    """テキストをembeddingに変換"""
+    """テキストをembeddingに変換（共有EmbeddingService経由でバッチ・キャッシュ）"""
     if not client:
         return []
     try:
-        if hasattr(client, "models"):
-            result = client.models.embed_content(model=model, contents=text)
-            return list(result.embeddings[0].values)
-        if hasattr(client, "embeddings"):
-            result = client.embeddings.create(model=model, input=text)
-            return list(result.data[0].embedding)
+        from ..core.embedding_service import get_embedding_service
+        return get_embedding_service(model=model, client=client).embed(text)
     except Exception as e:
         print(f"[MemoryService] Embedding error: {e}")
         return []
-    return []
-
-
-
-
-
-
-
-
-
-
-
@@ -1,5 +1,8 @@
-from typing import List, Dict
+from typing import Dict, Iterable, List, Set, Tuple
 import sqlite3
+import threading
+
+from .db import get_conn
 
 try:
     import networkx as nx
@@ -11,35 +14,66 @@ except ImportError:
 class GraphStore:
     """
     NetworkXベースのグラフストア (SQLite永続化)
+
+    - 起動時に全関係性をロードせず、クエリが触れたノードの近傍だけを
+      relations の subject/object インデックス経由で遅延ロードする
+    - memory_id -> エッジ の索引を持ち、delete_relations は O(次数)
     """
     def __init__(self, db_path: str):
         if not NX_AVAILABLE:
             raise ImportError("networkx is required for GraphStore. Install with: pip install networkx")
         self.db_path = db_path
         self.graph = nx.MultiDiGraph()
-        self._load_from_db()
+        # 近傍をDBからロード済みのノード
+        self._loaded_nodes: Set[str] = set()
+        # memory_id -> [(subject, object, relation_id)]
+        self._edges_by_memory: Dict[int, List[Tuple[str, str, int]]] = {}
+        self._lock = threading.RLock()
 
-    def _load_from_db(self):
-        """SQLiteから関係性をロードしてNetworkXに反映"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT subject, predicate, object, memory_id FROM relations")
-            for sub, pred, obj, mem_id in cursor.fetchall():
-                self.graph.add_edge(sub, obj, predicate=pred, memory_id=mem_id)
-        except sqlite3.OperationalError:
-            # テーブルが存在しない場合はスキップ
-            pass
-        finally:
-            conn.close()
+    def _add_edge(self, rel_id: int, sub: str, pred: str, obj: str, mem_id) -> None:
+        """エッジを追加 (relations.id をエッジキーにして重複ロードを防ぐ)"""
+        if self.graph.has_edge(sub, obj, key=rel_id):
+            return
+        self.graph.add_edge(sub, obj, key=rel_id, predicate=pred, memory_id=mem_id)
+        if mem_id is not None:
+            self._edges_by_memory.setdefault(mem_id, []).append((sub, obj, rel_id))
+
+    def _ensure_loaded(self, nodes: Iterable[str]) -> None:
+        """指定ノードに接続する関係性を SQLite から読み込む (未ロード分のみ)"""
+        with self._lock:
+            pending = [n for n in nodes if n not in self._loaded_nodes]
+            if not pending:
+                return
+            conn = get_conn(self.db_path)
+            try:
+                cursor = conn.cursor()
+                for start in range(0, len(pending), 400):
+                    chunk = pending[start:start + 400]
+                    placeholders = ",".join(["?"] * len(chunk))
+                    cursor.execute(
+                        f"""
+                        SELECT id, subject, predicate, object, memory_id FROM relations WHERE subject IN ({placeholders})
+                        UNION
+                        SELECT id, subject, predicate, object, memory_id FROM relations WHERE object IN ({placeholders})
+                        """,
+                        tuple(chunk) * 2,
+                    )
+                    for rel_id, sub, pred, obj, mem_id in cursor.fetchall():
+                        self._add_edge(rel_id, sub, pred, obj, mem_id)
+            except sqlite3.OperationalError:
+                # テーブルが存在しない場合はスキップ
+                pass
+            finally:
+                conn.close()
+            self._loaded_nodes.update(pending)
 
     def add_relation(self, subject: str, predicate: str, object: str, memory_id: int):
         """関係性を追加（メモリと同期）"""
         # MemoryStore側のDBへの書き込みはMemoryService側で行われる想定だが、
         # ここではグラフへの反映と、一応DBへの反映も担当する設計にするか？
         # 実装方針に従い、ここはNetworkXへの反映とDB保存をセットで行う
-        
-        conn = sqlite3.connect(self.db_path)
+
+        conn = get_conn(self.db_path)
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -47,28 +81,34 @@ class GraphStore:
                 (memory_id, subject, predicate, object)
             )
             conn.commit()
-            self.graph.add_edge(subject, object, predicate=predicate, memory_id=memory_id)
+            with self._lock:
+                self._add_edge(cursor.lastrowid, subject, predicate, object, memory_id)
         finally:
             conn.close()
 
     def get_related(self, entity: str, max_hops: int = 2) -> List[Dict]:
         """指定したエンティティに関連する情報を取得"""
+        self._ensure_loaded([entity])
         if not self.graph.has_node(entity):
             return []
 
         results = []
-        # 指定したノードからmax_hops以内のノードを探索
+        # 指定したノードからmax_hops以内のノードを探索（階層ごとの幅優先）
         visited = {entity}
-        queue = [(entity, 0)]
+        frontier = [entity]
         seen_edges = set()
-        
-        while queue:
-            curr_node, dist = queue.pop(0)
-            if dist >= max_hops:
-                continue
-            
-            # 出るエッジ
-            if self.graph.has_node(curr_node):
+
+        for _ in range(max_hops):
+            if not frontier:
+                break
+            # この階層で展開するノードの近傍をまとめて1回でロード
+            self._ensure_loaded(frontier)
+            next_frontier = []
+
+            for curr_node in frontier:
+                if not self.graph.has_node(curr_node):
+                    continue
+                # 出るエッジ
                 # out_edgesを使用して明示的に
                 for _, neighbor, data in self.graph.out_edges(curr_node, data=True):
                     edge_id = data.get("memory_id")
@@ -81,11 +121,11 @@ class GraphStore:
                         })
                         if edge_id:
                             seen_edges.add(edge_id)
-                    
+
                     if neighbor not in visited:
                         visited.add(neighbor)
-                        queue.append((neighbor, dist + 1))
-                
+                        next_frontier.append(neighbor)
+
                 # 入るエッジ (無向グラフ的に扱いたい場合)
                 for neighbor, _, data in self.graph.in_edges(curr_node, data=True): # type: ignore
                     edge_id = data.get("memory_id")
@@ -98,17 +138,19 @@ class GraphStore:
                         })
                         if edge_id:
                             seen_edges.add(edge_id)
-                    
+
                     if neighbor not in visited:
                         visited.add(neighbor)
-                        queue.append((neighbor, dist + 1))
-                    
+                        next_frontier.append(neighbor)
+
+            frontier = next_frontier
+
         return results
 
     def delete_relations(self, memory_id: int):
         """特定のmemory_idに紐づく関係性を削除"""
         # 1. DBから削除
-        conn = sqlite3.connect(self.db_path)
+        conn = get_conn(self.db_path)
         cursor = conn.cursor()
         try:
             cursor.execute("DELETE FROM relations WHERE memory_id = ?", (memory_id,))
@@ -116,17 +158,13 @@ class GraphStore:
         finally:
             conn.close()
 
-        # 2. NetworkXから削除 (メモリ上のエッジを全走査して削除)
-        edges_to_remove = []
-        for u, v, k, data in self.graph.edges(keys=True, data=True): # type: ignore
-            if data.get("memory_id") == memory_id:
-                edges_to_remove.append((u, v, k))
-        
-        for u, v, k in edges_to_remove:
-            self.graph.remove_edge(u, v, key=k)
-            
-        # 孤立したノードの削除 (オプション)
-        nodes_to_remove = [n for n, d in self.graph.degree if d == 0] # type: ignore
-        for n in nodes_to_remove:
-            self.graph.remove_node(n)
+        # 2. NetworkXから削除 (memory_id索引からO(次数)で削除)
+        with self._lock:
+            for u, v, k in self._edges_by_memory.pop(memory_id, []):
+                if self.graph.has_edge(u, v, key=k):
+                    self.graph.remove_edge(u, v, key=k)
 
+                # 孤立したノードの削除 (オプション)
+                for n in (u, v):
+                    if self.graph.has_node(n) and self.graph.degree(n) == 0:
+                        self.graph.remove_node(n)
@@ -1,7 +1,24 @@
 from __future__ import annotations
 
 import json
-from typing import List
+import struct
+import sys
+from array import array
+from typing import Any, List, Optional, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+# BLOB形式: [magic 2B][dtype 2B][dim uint32 LE] + little-endian float32 x dim
+EMBEDDING_BLOB_MAGIC = b"OE"
+EMBEDDING_BLOB_DTYPE = b"f4"
+_BLOB_HEADER = struct.Struct("<2s2sI")
+EMBEDDING_BLOB_HEADER_SIZE = _BLOB_HEADER.size
 
 
 def serialize_embedding(emb: List[float]) -> str:
@@ -19,6 +36,43 @@ def deserialize_embedding(emb_str: str) -> List[float]:
         return []
 
 
+def serialize_embedding_blob(emb: Sequence[float]) -> Optional[bytes]:
+    """embeddingをヘッダ付きfloat32 BLOBに変換 (空ならNone)"""
+    if emb is None or len(emb) == 0:
+        return None
+    if NUMPY_AVAILABLE:
+        body = np.asarray(emb, dtype="<f4").tobytes()
+    else:
+        arr = array("f", emb)
+        if sys.byteorder == "big":
+            arr.byteswap()
+        body = arr.tobytes()
+    return _BLOB_HEADER.pack(EMBEDDING_BLOB_MAGIC, EMBEDDING_BLOB_DTYPE, len(emb)) + body
+
+
+def deserialize_embedding_blob(blob: Optional[bytes]) -> Any:
+    """
+    ヘッダ付きfloat32 BLOBからembeddingを復元
+
+    numpy があれば np.frombuffer によるコピーなしの読み取り専用配列を返す。
+    不正なBLOBの場合は空リストを返す。
+    """
+    if not blob or len(blob) < EMBEDDING_BLOB_HEADER_SIZE:
+        return []
+    magic, dtype, dim = _BLOB_HEADER.unpack_from(blob)
+    if magic != EMBEDDING_BLOB_MAGIC or dtype != EMBEDDING_BLOB_DTYPE:
+        return []
+    if len(blob) != EMBEDDING_BLOB_HEADER_SIZE + dim * 4:
+        return []
+    if NUMPY_AVAILABLE:
+        return np.frombuffer(blob, dtype="<f4", count=dim, offset=EMBEDDING_BLOB_HEADER_SIZE)
+    arr = array("f")
+    arr.frombytes(bytes(blob[EMBEDDING_BLOB_HEADER_SIZE:]))
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tolist()
+
+
 def deserialize_keywords(kw_str: str) -> List[str]:
     """JSON文字列からキーワードリストを復元"""
     if not kw_str:
@@ -27,15 +81,3 @@ def deserialize_keywords(kw_str: str) -> List[str]:
         return json.loads(kw_str)
     except Exception:
         return []
-
-
-
-
-
-
-
-
-
-
-
-
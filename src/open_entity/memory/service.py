@@ -31,18 +31,32 @@ from typing import List, Dict, Optional, Tuple, Any, Iterator
 from datetime import datetime
 from dotenv import load_dotenv
 
-from .db import init_db, get_conn
+from .db import init_db, get_conn, has_fts
 from .embeddings import build_genai_client, build_openai_client, embed_text
-from .serialization import serialize_embedding, deserialize_embedding, deserialize_keywords
+from .serialization import (
+    serialize_embedding,
+    deserialize_embedding,
+    serialize_embedding_blob,
+    deserialize_embedding_blob,
+    deserialize_keywords,
+)
 from .similarity import cos_sim
+from .vector_index import EmbeddingMatrix, NUMPY_AVAILABLE
 from ..utils.json_parser import SmartJSONParser
 from ..core.llm_provider import generate_text, get_preferred_provider, get_analyzer_model
+from ..core.run_context import RunScoped
 
 # Lazy import for GraphStore (requires networkx)
 GraphStore = None
 
 load_dotenv()
 
+
+def _as_list(emb: Any) -> List[float]:
+    """np配列のembeddingをPythonのfloatリストに変換"""
+    return emb.tolist() if hasattr(emb, "tolist") else list(emb)
+
+
 class MemoryService:
     """
     記憶・学習サービス (SQLite版)
@@ -55,7 +69,10 @@ class MemoryService:
     チャンネル分離:
     - channel_id でフィルタリング
     - 全チャンネルのデータは1つのDBに保存
+    - channel_id はリクエストスコープ（並行セッションごとに別の値を持つ）
     """
+
+    channel_id = RunScoped()
     
     def __init__(
         self,
@@ -78,12 +95,19 @@ class MemoryService:
         self.duplicate_threshold = duplicate_threshold
         self.graph_enabled = graph_enabled
         self.provider = provider
+        # memory_id -> 正規化済み embedding 行列 (recall の一括スコアリング用)
+        self._emb_index = EmbeddingMatrix() if NUMPY_AVAILABLE else None
         
         # DBディレクトリを作成
         os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
         
         # DB初期化
         self._init_db()
+        conn = self._get_conn()
+        try:
+            self._fts_enabled = has_fts(conn)
+        finally:
+            conn.close()
         
         # Embedding client (optional)
         from ..core.llm_provider import get_embedding_provider, get_embedding_model
@@ -125,6 +149,12 @@ class MemoryService:
         """JSON文字列からembeddingを復元"""
         return deserialize_embedding(emb_str)
     
+    def _decode_embedding(self, emb_blob: Optional[bytes], emb_str: Optional[str]) -> Any:
+        """BLOB列を優先してembeddingを復元 (未移行の行はJSON列から)"""
+        if emb_blob:
+            return deserialize_embedding_blob(emb_blob)
+        return self._deserialize_embedding(emb_str)
+
     def _deserialize_keywords(self, kw_str: str) -> List[str]:
         """JSON文字列からキーワードリストを復元"""
         return deserialize_keywords(kw_str)
@@ -134,17 +164,55 @@ class MemoryService:
         exclude_types: Optional[List[str]] = None,
         limit: Optional[int] = None,
         since_days: Optional[int] = None,
-        keyword_search: Optional[str] = None
+        keyword_search: Optional[str] = None,
+        include_embeddings: bool = True
     ) -> Iterator[Dict]:
         """
         記憶を条件付きで取得（Generator）
+
+        include_embeddings=False の場合は embedding 列を読まず、"emb" は空リストになる
+        (スコアリング側で _embedding_scores を使う場合)
         """
         conn = self._get_conn()
         try:
             cursor = conn.cursor()
             
-            query = "SELECT id, content, type, keywords, source, embedding, created_at, channel_id, questions FROM memories WHERE 1=1"
+            emb_cols = "embedding_blob, embedding" if include_embeddings else "NULL, NULL"
+            query = f"SELECT id, content, type, keywords, source, {emb_cols}, created_at, channel_id, questions FROM memories WHERE 1=1"
             params = []
+            order_by = " ORDER BY created_at DESC"
+
+            # Keyword search
+            if keyword_search:
+                # クエリをトークンに分割して検索
+                tokens = re.findall(r'[a-zA-Z0-9]{2,}|[\u4e00-\u9fff]+|[\u3040-\u309f]{2,}|[\u30a0-\u30ff]{2,}', keyword_search)[:5] # 最大5トークンまで
+                # trigram インデックスは3文字以上のトークンのみ検索可能
+                fts_tokens = [t for t in tokens if len(t) >= 3] if self._fts_enabled else []
+                # FTS で引けない短いトークン（"AI"、2文字の漢字・かな等）は LIKE で拾う
+                like_tokens = [t for t in tokens if t not in fts_tokens]
+                token_queries = []
+                for t in like_tokens:
+                    token_queries.append("(content LIKE ? OR keywords LIKE ? OR questions LIKE ?)")
+                if fts_tokens:
+                    # FTS5 (BM25順) のヒット、または短いトークンの LIKE に一致するもの
+                    match_expr = " OR ".join('"' + t.replace('"', '""') + '"' for t in fts_tokens)
+                    join = "JOIN" if not like_tokens else "LEFT JOIN"
+                    query = query.replace(
+                        "FROM memories WHERE 1=1",
+                        f"FROM memories {join} (SELECT rowid AS fts_id, rank AS fts_rank FROM memories_fts"
+                        " WHERE memories_fts MATCH ?) ON fts_id = id WHERE 1=1",
+                    )
+                    params.append(match_expr)
+                    if like_tokens:
+                        query += " AND (fts_id IS NOT NULL OR " + " OR ".join(token_queries) + ")"
+                    order_by = " ORDER BY fts_rank IS NULL, fts_rank, created_at DESC"
+                elif tokens:
+                    # Rough filter via LIKE
+                    query += " AND (" + " OR ".join(token_queries) + ")"
+                for t in like_tokens:
+                    params.append(f"%{t}%")
+                    params.append(f"%{t}%")
+                    params.append(f"%{t}%")
             
             # Channel filter
             if self.channel_id:
@@ -168,23 +236,10 @@ class MemoryService:
             if since_days:
                 query += " AND created_at > datetime('now', ?)"
                 params.append(f"-{since_days} days")
-                
-            # Keyword search (Rough filter via LIKE)
-            if keyword_search:
-                # クエリをトークンに分割して検索
-                tokens = re.findall(r'[a-zA-Z0-9]{2,}|[\u4e00-\u9fff]+|[\u3040-\u309f]{2,}|[\u30a0-\u30ff]{2,}', keyword_search)
-                if tokens:
-                    token_queries = []
-                    for t in tokens[:5]: # 最大5トークンまで
-                        token_queries.append("(content LIKE ? OR keywords LIKE ? OR questions LIKE ?)")
-                        params.append(f"%{t}%")
-                        params.append(f"%{t}%")
-                        params.append(f"%{t}%")
-                    query += " AND (" + " OR ".join(token_queries) + ")"
 
 
-            # Order by created_at DESC
-            query += " ORDER BY created_at DESC"
+            # Order by BM25 rank (FTS) or created_at DESC
+            query += order_by
             
             if limit:
                 query += " LIMIT ?"
@@ -202,10 +257,10 @@ class MemoryService:
                     "type": row[2],
                     "keywords": self._deserialize_keywords(row[3]),
                     "source": row[4],
-                    "emb": self._deserialize_embedding(row[5]),
-                    "created_at": row[6],
-                    "channel_id": row[7],
-                    "questions": json.loads(row[8] or "[]") if isinstance(row[8], str) else (row[8] or [])
+                    "emb": _as_list(self._decode_embedding(row[5], row[6])),
+                    "created_at": row[7],
+                    "channel_id": row[8],
+                    "questions": json.loads(row[9] or "[]") if isinstance(row[9], str) else (row[9] or [])
                 }
         finally:
             conn.close()
@@ -217,20 +272,64 @@ class MemoryService:
         """
         return list(self._fetch_memories())
     
+    def _load_embeddings(self, ids: List[int]) -> Dict[int, Any]:
+        """指定IDのembeddingをまとめて取得 (BLOBはコピーなしのnp配列)"""
+        out: Dict[int, Any] = {}
+        if not ids:
+            return out
+        conn = self._get_conn()
+        try:
+            cursor = conn.cursor()
+            # SQLiteの変数上限を考慮して分割
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join(["?"] * len(chunk))
+                cursor.execute(
+                    f"SELECT id, embedding_blob, embedding FROM memories WHERE id IN ({placeholders})",
+                    tuple(chunk),
+                )
+                for mid, emb_blob, emb_str in cursor.fetchall():
+                    out[mid] = self._decode_embedding(emb_blob, emb_str)
+        finally:
+            conn.close()
+        return out
+
+    def _embedding_scores(self, query_emb: List[float], ids: List[int]) -> Dict[int, float]:
+        """
+        候補IDのembedding類似度を一括計算
+
+        Returns:
+            memory_id -> コサイン類似度 (embeddingを持たないIDは含まない)
+        """
+        if not query_emb or not ids:
+            return {}
+        if self._emb_index is None:
+            # numpy が無い環境では従来通り1件ずつ計算
+            return {
+                mid: cos_sim(query_emb, _as_list(emb))
+                for mid, emb in self._load_embeddings(ids).items()
+                if len(emb)
+            }
+        missing = self._emb_index.missing(ids)
+        if missing:
+            loaded = self._load_embeddings(missing)
+            for mid in missing:
+                self._emb_index.add(mid, loaded.get(mid))
+        return self._emb_index.cosine(query_emb, ids)
+
     def _is_duplicate(self, text: str) -> Tuple[bool, Optional[str]]:
         """重複チェック"""
         # 直近100件程度で重複チェックすれば十分 (パフォーマンスのため)
-        memory_gen = self._fetch_memories(limit=100)
-        
+        candidates = list(self._fetch_memories(limit=100, include_embeddings=False))
+
         new_emb = self._embed(text)
         if not new_emb:
             return False, None
-        
-        for m in memory_gen:
-            if m['emb']:
-                sim = cos_sim(new_emb, m['emb'])
-                if sim >= self.duplicate_threshold:
-                    return True, m['content']
+
+        sims = self._embedding_scores(new_emb, [m['id'] for m in candidates])
+        for m in candidates:
+            if sims.get(m['id'], 0.0) >= self.duplicate_threshold:
+                return True, m['content']
         return False, None
     
     def recall(
@@ -260,15 +359,17 @@ class MemoryService:
         memory_gen_recent = self._fetch_memories(
             exclude_types=exclude_types,
             limit=500,
-            since_days=since_days
+            since_days=since_days,
+            include_embeddings=False
         )
-        
+
         # 2. キーワードにマッチする記憶を広めに取得 (キーワードマッチ用)
         memory_gen_kw = self._fetch_memories(
             exclude_types=exclude_types,
             limit=500,
             keyword_search=query,
-            since_days=since_days
+            since_days=since_days,
+            include_embeddings=False
         )
         
         # Generatorを統合して重複排除
@@ -303,17 +404,17 @@ class MemoryService:
 
         results = []
         now = datetime.now()
-        
-        for m in combined_gen():
-            # 除外タイプはスキップ (念のため再度チェック)
-            mem_type = m.get('type', 'unknown')
-            if mem_type in exclude_types:
-                continue
-            
+
+        # 除外タイプはスキップ (念のため再度チェック)
+        candidates = [m for m in combined_gen() if m.get('type', 'unknown') not in exclude_types]
+        # Embeddingスコアは候補集合全体を1回の行列演算で計算
+        emb_scores = self._embedding_scores(query_emb, [m['id'] for m in candidates])
+
+        for m in candidates:
             # Embeddingスコア
             emb_score = 0
-            if query_emb and m['emb']:
-                emb_score = max(0, cos_sim(query_emb, m['emb']))
+            if m['id'] in emb_scores:
+                emb_score = max(0, emb_scores[m['id']])
             
             # キーワードマッチスコア（高速化版）
             kw_list = m.get('keywords', [])
@@ -492,6 +593,7 @@ scoreが{self.feedback_threshold}以上の時のみruleを作成。それ以外
                 max_tokens=800,
                 temperature=0.2,
                 response_format="json",
+                cache="exact",
             )
             result = SmartJSONParser.parse(response_text, default={})
 
@@ -669,7 +771,7 @@ scoreが{self.feedback_threshold}以上の時のみruleを作成。それ以外
         conn = self._get_conn()
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO memories (channel_id, router_id, worker_id, run_id, content, type, keywords, questions, source, embedding)
+            INSERT INTO memories (channel_id, router_id, worker_id, run_id, content, type, keywords, questions, source, embedding_blob)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             target_channel_id,
@@ -681,11 +783,13 @@ scoreが{self.feedback_threshold}以上の時のみruleを作成。それ以外
             json.dumps(keywords or [], ensure_ascii=False),
             json.dumps(questions or [], ensure_ascii=False),
             source,
-            self._serialize_embedding(emb)
+            serialize_embedding_blob(emb)
         ))
         memory_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        if self._emb_index is not None and memory_id is not None:
+            self._emb_index.add(memory_id, emb)
         
         # グラフに関係性を保存
         if self.graph and relations and memory_id is not None:
@@ -722,6 +826,8 @@ scoreが{self.feedback_threshold}以上の時のみruleを作成。それ以外
         deleted = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        if self._emb_index is not None:
+            self._emb_index.remove(memory_id)
         return deleted
     
     def list_all(self) -> List[Dict]:
@@ -832,6 +938,9 @@ scoreが{self.feedback_threshold}以上の時のみruleを作成。それ以外
             cursor.executemany("DELETE FROM memories WHERE id = ?", [(i,) for i in ids])
             deleted = cursor.rowcount if cursor.rowcount is not None else len(ids)
             conn.commit()
+            if self._emb_index is not None:
+                for i in ids:
+                    self._emb_index.remove(i)
             return int(deleted)
         finally:
             conn.close()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from .similarity import cos_sim
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+class EmbeddingMatrix:
+    """
+    memory_id をキーにした embedding の連続 float32 行列。
+
+    - 行は事前に L2 正規化して保持し、候補集合のコサイン類似度を 1 回の行列積で計算する
+    - 次元の異なる embedding (モデル変更前の古い行など) は cos_sim にフォールバックして
+      従来と同じスコアを返す
+    - max_items を超えたら古い行から追い出す (再度必要になれば DB から読み直される)
+    """
+
+    def __init__(self, max_items: int = 20000):
+        if not NUMPY_AVAILABLE:
+            raise ImportError("numpy is required for EmbeddingMatrix")
+        self.max_items = max_items
+        self.dim: Optional[int] = None
+        self._matrix = None  # (capacity, dim) float32
+        self._size = 0
+        self._rows: Dict[int, int] = {}
+        self._row_ids: List[Optional[int]] = []
+        self._odd: Dict[int, List[float]] = {}
+        self._empty: set = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows) + len(self._odd)
+
+    def __contains__(self, memory_id: int) -> bool:
+        return memory_id in self._rows or memory_id in self._odd or memory_id in self._empty
+
+    def missing(self, ids: Iterable[int]) -> List[int]:
+        """未ロードの memory_id を返す"""
+        return [i for i in ids if i not in self]
+
+    def add(self, memory_id: int, emb) -> None:
+        """embedding を登録 (空の場合も「embeddingなし」として記録)"""
+        with self._lock:
+            self._discard(memory_id)
+            if emb is None or len(emb) == 0:
+                self._empty.add(memory_id)
+                return
+            if self.dim is None:
+                self.dim = len(emb)
+            if len(emb) != self.dim:
+                self._odd[memory_id] = list(emb)
+                return
+
+            vec = np.asarray(emb, dtype=np.float32)
+            norm = float(np.linalg.norm(vec))
+            if self._size >= self.max_items:
+                self._evict()
+            self._reserve(self._size + 1)
+            self._matrix[self._size] = vec / norm if norm else 0.0
+            self._rows[memory_id] = self._size
+            self._row_ids.append(memory_id)
+            self._size += 1
+
+    def remove(self, memory_id: int) -> None:
+        """embedding を削除"""
+        with self._lock:
+            self._discard(memory_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.dim = None
+            self._matrix = None
+            self._size = 0
+            self._rows.clear()
+            self._row_ids = []
+            self._odd.clear()
+            self._empty.clear()
+
+    def cosine(self, query: List[float], ids: Iterable[int]) -> Dict[int, float]:
+        """
+        query と ids の各 embedding のコサイン類似度をまとめて計算
+
+        Returns:
+            memory_id -> 類似度 (embedding を持たない id は含まない)
+        """
+        if query is None or len(query) == 0:
+            return {}
+        ids = list(ids)
+        scores: Dict[int, float] = {}
+        with self._lock:
+            row_ids = [i for i in ids if i in self._rows]
+            odd_ids = [i for i in ids if i in self._odd]
+            if row_ids:
+                if len(query) == self.dim:
+                    q = np.asarray(query, dtype=np.float32)
+                    q_norm = float(np.linalg.norm(q))
+                    if q_norm:
+                        rows = np.fromiter((self._rows[i] for i in row_ids), dtype=np.int64, count=len(row_ids))
+                        sims = self._matrix[rows] @ (q / q_norm)
+                        scores.update(zip(row_ids, sims.tolist()))
+                    else:
+                        scores.update((i, 0.0) for i in row_ids)
+                else:
+                    for i in row_ids:
+                        scores[i] = cos_sim(query, self._matrix[self._rows[i]].tolist())
+            for i in odd_ids:
+                scores[i] = cos_sim(query, self._odd[i])
+        return scores
+
+    # ------------------------------------------------------------------
+    def _discard(self, memory_id: int) -> None:
+        self._empty.discard(memory_id)
+        self._odd.pop(memory_id, None)
+        row = self._rows.pop(memory_id, None)
+        if row is not None:
+            self._row_ids[row] = None
+
+    def _reserve(self, n: int) -> None:
+        if self._matrix is not None and n <= self._matrix.shape[0]:
+            return
+        capacity = max(64, n, 0 if self._matrix is None else self._matrix.shape[0] * 2)
+        capacity = min(capacity, max(self.max_items, n))
+        grown = np.empty((capacity, self.dim), dtype=np.float32)
+        if self._matrix is not None and self._size:
+            grown[: self._size] = self._matrix[: self._size]
+        self._matrix = grown
+
+    def _evict(self) -> None:
+        """削除済み行を詰め、それでも満杯なら古い半分を追い出す"""
+        live = [(row, mid) for row, mid in enumerate(self._row_ids[: self._size]) if mid is not None]
+        if len(live) >= self.max_items:
+            live = live[len(live) // 2:]
+        rows = np.fromiter((row for row, _ in live), dtype=np.int64, count=len(live))
+        self._matrix[: len(live)] = self._matrix[rows]
+        self._row_ids = [mid for _, mid in live]
+        self._rows = {mid: row for row, mid in enumerate(self._row_ids)}
+        self._size = len(live)
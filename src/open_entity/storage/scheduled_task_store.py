@@ -1,10 +1,18 @@
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import Iterator, List, Optional, Dict, Tuple
 from croniter import croniter
 
 class ScheduledTaskStore:
+    """
+    予約タスクの SQLite ストア。
+
+    接続はインスタンスごとに1本を使い回す（WAL、スレッド間はロックで直列化）。
+    """
+
     def __init__(self, db_path: Optional[str] = None):
         if db_path is None:
             # 作業ディレクトリ基準でDBパスを決定
@@ -12,11 +20,43 @@ class ScheduledTaskStore:
             db_path = os.path.join(base_dir, "tasks.db")
         
         self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
         self._init_db()
 
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """共有接続を返す（ブロックを抜けるとコミット、例外時はロールバック）"""
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+                self._conn = conn
+            try:
+                with self._conn:
+                    yield self._conn
+            except sqlite3.Error:
+                # 壊れた接続を使い続けないよう次回開き直す
+                self._close()
+                raise
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
     def _init_db(self):
         """テーブルの初期化（存在しない場合のみ）"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS scheduled_tasks (
                     id TEXT PRIMARY KEY,
@@ -29,7 +69,7 @@ class ScheduledTaskStore:
                     working_dir TEXT
                 )
             """)
-            conn.commit()
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_scheduled_tasks_next_run ON scheduled_tasks(enabled, next_run)")
 
     def add_task(self, task_id: str, description: str, cron: str, profile: str = "default") -> bool:
         """新規予約タスクの追加"""
@@ -40,36 +80,46 @@ class ScheduledTaskStore:
         iter = croniter(cron, now)
         next_run = iter.get_next(datetime).isoformat()
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("""
                 INSERT OR REPLACE INTO scheduled_tasks (id, description, cron, profile, working_dir, enabled, next_run)
                 VALUES (?, ?, ?, ?, ?, 1, ?)
             """, (task_id, description, cron, profile, working_dir, next_run))
-            conn.commit()
         return True
 
     def get_enabled_tasks(self) -> List[Dict]:
         """有効なタスク一覧を取得"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             cursor = conn.execute("SELECT * FROM scheduled_tasks WHERE enabled = 1")
             return [dict(row) for row in cursor.fetchall()]
 
     def get_due_tasks(self) -> List[Dict]:
         """実行時刻が到来している、有効なタスクを取得"""
         now = datetime.now().isoformat()
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             cursor = conn.execute("""
                 SELECT * FROM scheduled_tasks 
                 WHERE enabled = 1 AND next_run <= ?
             """, (now,))
             return [dict(row) for row in cursor.fetchall()]
 
+    def get_schedule(self) -> List[Tuple[str, str]]:
+        """有効なタスクの (next_run, id) 一覧（スケジューラーのヒープ構築用）"""
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                SELECT next_run, id FROM scheduled_tasks
+                WHERE enabled = 1 AND next_run IS NOT NULL
+            """)
+            return [(row["next_run"], row["id"]) for row in cursor.fetchall()]
+
+    def data_version(self) -> int:
+        """他の接続（別インスタンス・別プロセス）がコミットするたびに変わる値"""
+        with self._connect() as conn:
+            return conn.execute("PRAGMA data_version").fetchone()[0]
+
     def complete_task(self, task_id: str):
         """タスク完了時の処理。last_runを更新し、次回実行時刻を再計算する"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             cursor = conn.execute("SELECT cron FROM scheduled_tasks WHERE id = ?", (task_id,))
             row = cursor.fetchone()
             if not row:
@@ -86,26 +136,22 @@ class ScheduledTaskStore:
                 SET last_run = ?, next_run = ? 
                 WHERE id = ?
             """, (last_run, next_run, task_id))
-            conn.commit()
 
     def update_next_run(self, task_id: str, next_run: datetime):
         """次回実行予定時刻の更新"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("UPDATE scheduled_tasks SET next_run = ? WHERE id = ?", 
                         (next_run.isoformat(), task_id))
-            conn.commit()
 
     def delete_task(self, task_id: str) -> bool:
         """タスクを削除する"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.execute("DELETE FROM scheduled_tasks WHERE id = ?", (task_id,))
-            conn.commit()
             return cursor.rowcount > 0
 
     def set_task_enabled(self, task_id: str, enabled: bool) -> bool:
         """タスクの有効/無効を切り替える"""
         val = 1 if enabled else 0
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.execute("UPDATE scheduled_tasks SET enabled = ? WHERE id = ?", (val, task_id))
-            conn.commit()
             return cursor.rowcount > 0
@@ -2,11 +2,14 @@ import os
 import sqlite3
 import json
 import logging
+import threading
 import numpy as np
 import faiss
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from ..core.embedding_service import get_embedding_client, get_embedding_service
+
 logger = logging.getLogger(__name__)
 
 # Gemini client for embeddings
@@ -18,33 +21,70 @@ except ImportError:
     GENAI_AVAILABLE = False
 
 DEFAULT_EMBEDDING_MODEL = "gemini-embedding-001"
+# Switch from exact (flat) search to IVF once the index holds this many vectors
+DEFAULT_ANN_THRESHOLD = 50_000
+DEFAULT_NPROBE = 16
+# Persist the index after this many unsaved changes (startup reconciles the rest)
+DEFAULT_PERSIST_EVERY = 32
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        doc_id TEXT NOT NULL UNIQUE,
+        content TEXT NOT NULL,
+        metadata TEXT,
+        embedding BLOB,
+        created_at TIMESTAMP NOT NULL
+    )
+"""
+
+# Memory-map flat index codes on load; mutations re-read the index into RAM first
+_MMAP_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
 
 class SemanticMemory:
     """
     Semantic Memory using FAISS and Gemini Embeddings.
     Stores documents and their embeddings for similarity search.
+
+    Vectors are keyed by the ``id`` column of their document (AUTOINCREMENT, so an
+    id is never reused after a delete), so deletes and replacements remove the
+    exact vector from the index and a stale persisted vector can never be
+    mistaken for a newer document. The index is persisted
+    next to the database, opened with mmap on startup, and reconciled with the
+    ``semantic_documents`` table so it never drifts from the stored documents.
     """
 
-    def __init__(self, db_path: str, embedding_model: str = DEFAULT_EMBEDDING_MODEL):
+    def __init__(
+        self,
+        db_path: str,
+        embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+        index_path: Optional[str] = None,
+        ann_threshold: Optional[int] = DEFAULT_ANN_THRESHOLD,
+        nprobe: int = DEFAULT_NPROBE,
+        persist_every: int = DEFAULT_PERSIST_EVERY,
+    ):
         self.db_path = db_path
         self.embedding_model = embedding_model
-        self.dimension = 768  # text-embedding-004 dimension
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.doc_ids = []  # List to map index position to doc_id
-        
+        self.index_path = index_path or f"{db_path}.faiss"
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.persist_every = max(1, persist_every)
+        self.dimension = 768  # default until the first embedding is stored
+        self.index = self._new_flat_index(self.dimension)
+        self._mmapped = False
+        self._dirty = 0
+        self._lock = threading.RLock()
+
         # Initialize DB and load existing data
         self._init_db()
-        self._load_all_documents()
+        self._load_index()
 
     def _get_client(self):
-        api_key = (
-            os.environ.get("GENAI_API_KEY") or
-            os.environ.get("GEMINI_API_KEY") or
-            os.environ.get("GOOGLE_API_KEY")
-        )
-        if not api_key:
+        client = get_embedding_client("gemini")
+        if client is None:
             raise ValueError("Gemini API key not found in environment variables.")
-        return genai.Client(api_key=api_key)
+        return client
 
     def _init_db(self):
         """Initialize SQLite table for documents."""
@@ -53,83 +93,222 @@ class SemanticMemory:
             os.makedirs(db_dir, exist_ok=True)
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS semantic_documents (
-                doc_id TEXT PRIMARY KEY,
-                content TEXT NOT NULL,
-                metadata TEXT,
-                embedding BLOB,
-                created_at TIMESTAMP NOT NULL
+        cursor.execute(_CREATE_TABLE_SQL.format(table="semantic_documents"))
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(semantic_documents)")]
+        if "id" not in columns:
+            # Older tables were keyed by doc_id only, and SQLite reuses the implicit
+            # rowid of a deleted maximum row. Copy rows into a table with an
+            # AUTOINCREMENT id, keeping rowid as id so a persisted index stays valid.
+            cursor.execute(_CREATE_TABLE_SQL.format(table="semantic_documents_new"))
+            cursor.execute(
+                "INSERT INTO semantic_documents_new (id, doc_id, content, metadata, embedding, created_at) "
+                "SELECT rowid, doc_id, content, metadata, embedding, created_at FROM semantic_documents"
             )
-        """)
+            cursor.execute("DROP TABLE semantic_documents")
+            cursor.execute("ALTER TABLE semantic_documents_new RENAME TO semantic_documents")
+            logger.info("Migrated semantic_documents to an AUTOINCREMENT id column.")
         conn.commit()
         conn.close()
 
-    def _load_all_documents(self):
-        """Load all documents from DB into FAISS index."""
+    # ------------------------------------------------------------------
+    # Index management
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _new_flat_index(dimension: int) -> faiss.Index:
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+
+    def _read_index(self, mmap: bool) -> faiss.Index:
+        index = None
+        if mmap:
+            try:
+                index = faiss.read_index(self.index_path, _MMAP_FLAGS)
+            except RuntimeError:
+                # Not every index type supports mmap (e.g. IVF); read it normally
+                index = None
+        if index is None:
+            index = faiss.read_index(self.index_path)
+            mmap = False
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = self.nprobe
+        self._mmapped = mmap
+        return index
+
+    def _materialize(self):
+        """Load an mmapped index into memory before it is modified."""
+        if self._mmapped:
+            self.index = self._read_index(mmap=False)
+
+    def _index_ids(self) -> np.ndarray:
+        """Return the document ids currently stored in the index."""
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return faiss.vector_to_array(self.index.id_map)
+        ivf = faiss.extract_index_ivf(self.index)
+        invlists = ivf.invlists
+        parts = [
+            faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+            for i in range(ivf.nlist)
+            if invlists.list_size(i)
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _load_index(self):
+        """Open the persisted index and reconcile it with the documents table."""
         try:
             conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT doc_id, embedding FROM semantic_documents WHERE embedding IS NOT NULL")
-            rows = cursor.fetchall()
+            rows = conn.execute(
+                "SELECT id, length(embedding) FROM semantic_documents WHERE embedding IS NOT NULL"
+            ).fetchall()
             conn.close()
 
-            if not rows:
-                return
+            if os.path.exists(self.index_path):
+                try:
+                    self.index = self._read_index(mmap=True)
+                    self.dimension = self.index.d
+                except Exception as e:
+                    logger.warning(f"Failed to read semantic index {self.index_path}, rebuilding: {e}")
+                    self.index = self._new_flat_index(self.dimension)
+                    self._mmapped = False
+            elif rows:
+                # No persisted index yet: take the dimension of the stored vectors
+                sizes = [size for _, size in rows]
+                self.dimension = max(set(sizes), key=sizes.count) // 4
+                self.index = self._new_flat_index(self.dimension)
 
-            embeddings = []
-            for doc_id, emb_blob in rows:
-                emb = np.frombuffer(emb_blob, dtype=np.float32)
-                if emb.shape[0] == self.dimension:
-                    embeddings.append(emb)
-                    self.doc_ids.append(doc_id)
+            wanted = set()
+            for doc_key, size in rows:
+                if size == self.dimension * 4:
+                    wanted.add(doc_key)
                 else:
-                    logger.warning(f"Embedding dimension mismatch for {doc_id}: {emb.shape[0]}")
+                    logger.warning(f"Embedding dimension mismatch for id {doc_key}: {size // 4}")
+            indexed = set(self._index_ids().tolist())
+
+            to_remove = indexed - wanted
+            to_add = wanted - indexed
+            if to_remove or to_add:
+                self._materialize()
+                if to_remove:
+                    self.index.remove_ids(np.array(sorted(to_remove), dtype=np.int64))
+                if to_add:
+                    self._add_from_db(sorted(to_add))
+                self._maybe_switch_to_ivf()
+                self._save_index()
 
-            if embeddings:
-                self.index.add(np.array(embeddings).astype('float32'))
-                logger.info(f"Loaded {len(embeddings)} documents into semantic memory.")
+            if self.index.ntotal:
+                logger.info(f"Loaded {self.index.ntotal} documents into semantic memory.")
         except Exception as e:
             logger.error(f"Failed to load documents into semantic memory: {e}")
 
+    def _add_from_db(self, ids: List[int]):
+        """Add stored embeddings for the given document ids to the index."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join(["?"] * len(chunk))
+                rows = conn.execute(
+                    f"SELECT id, embedding FROM semantic_documents WHERE id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                if not rows:
+                    continue
+                vectors = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                self.index.add_with_ids(vectors, np.array([doc_key for doc_key, _ in rows], dtype=np.int64))
+        finally:
+            conn.close()
+
+    def _maybe_switch_to_ivf(self):
+        """Rebuild a large flat index as IVF (which still supports remove_ids)."""
+        if not self.ann_threshold or not isinstance(self.index, faiss.IndexIDMap2):
+            return
+        n = self.index.ntotal
+        if n < self.ann_threshold:
+            return
+        flat = faiss.downcast_index(self.index.index)
+        vectors = flat.reconstruct_n(0, n)
+        ids = faiss.vector_to_array(self.index.id_map)
+        nlist = max(1, int(4 * np.sqrt(n)))
+        quantizer = faiss.IndexFlatL2(self.dimension)
+        ivf = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_L2)
+        ivf.train(vectors)
+        ivf.add_with_ids(vectors, ids)
+        ivf.nprobe = self.nprobe
+        self.index = ivf
+        logger.info(f"Semantic index switched to IVF ({nlist} lists, {n} vectors).")
+
+    def _save_index(self):
+        """Atomically write the index next to the database."""
+        tmp_path = f"{self.index_path}.tmp"
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = 0
+
+    def _mark_dirty(self):
+        self._dirty += 1
+        if self._dirty >= self.persist_every:
+            self._save_index()
+
+    def flush(self):
+        """Persist pending index changes to disk."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def _ensure_dimension(self, dimension: int):
+        if dimension == self.index.d:
+            return
+        if self.index.ntotal == 0:
+            self.dimension = dimension
+            self.index = self._new_flat_index(dimension)
+            self._mmapped = False
+            return
+        raise ValueError(f"Embedding dimension {dimension} does not match index dimension {self.index.d}")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
     def _get_embedding(self, text: str) -> np.ndarray:
-        """Get embedding for text using Gemini API."""
+        """Get embedding for text using the shared (batched, cached) embedding service."""
         if not GENAI_AVAILABLE:
             raise RuntimeError("google-genai library is not installed.")
-        
-        client = self._get_client()
-        response = client.models.embed_content(
-            model=self.embedding_model,
-            contents=text
-        )
-        # Handle both single and batch responses
-        embedding = response.embeddings[0].values
-        return np.array(embedding).astype('float32')
+
+        service = get_embedding_service(provider="gemini", model=self.embedding_model, client=self._get_client())
+        return np.array(service.embed(text)).astype('float32')
 
     def add_document(self, doc_id: str, content: str, metadata: Optional[Dict[str, Any]] = None):
         """Add a document to semantic memory."""
         try:
             embedding = self._get_embedding(content)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            now = datetime.now().isoformat()
-            metadata_json = json.dumps(metadata or {}, ensure_ascii=False)
-            emb_blob = embedding.tobytes()
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO semantic_documents (doc_id, content, metadata, embedding, created_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (doc_id, content, metadata_json, emb_blob, now))
-            
-            conn.commit()
-            conn.close()
-            
-            # Update in-memory index
-            self.index.add(np.array([embedding]))
-            self.doc_ids.append(doc_id)
-            
+
+            with self._lock:
+                self._ensure_dimension(embedding.shape[0])
+
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+
+                cursor.execute("SELECT id FROM semantic_documents WHERE doc_id = ?", (doc_id,))
+                old = cursor.fetchone()
+
+                now = datetime.now().isoformat()
+                metadata_json = json.dumps(metadata or {}, ensure_ascii=False)
+                emb_blob = embedding.tobytes()
+
+                cursor.execute("""
+                    INSERT OR REPLACE INTO semantic_documents (doc_id, content, metadata, embedding, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (doc_id, content, metadata_json, emb_blob, now))
+                new_id = cursor.lastrowid
+
+                conn.commit()
+                conn.close()
+
+                # Update in-memory index (replace the previous vector of this doc_id)
+                self._materialize()
+                if old:
+                    self.index.remove_ids(np.array([old[0]], dtype=np.int64))
+                self.index.add_with_ids(np.array([embedding]), np.array([new_id], dtype=np.int64))
+                self._maybe_switch_to_ivf()
+                self._mark_dirty()
+
             logger.info(f"Added document {doc_id} to semantic memory.")
         except Exception as e:
             logger.error(f"Failed to add document {doc_id}: {e}")
@@ -138,22 +317,24 @@ class SemanticMemory:
     def delete_document(self, doc_id: str) -> bool:
         """Delete a document from semantic memory."""
         try:
-            # Remove from SQLite
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM semantic_documents WHERE doc_id = ?", (doc_id,))
-            deleted = cursor.rowcount > 0
-            conn.commit()
-            conn.close()
-            
-            # Remove from in-memory index (requires rebuild)
-            if doc_id in self.doc_ids:
-                idx = self.doc_ids.index(doc_id)
-                self.doc_ids.remove(doc_id)
-                # Note: FAISS doesn't support direct deletion, need to rebuild index
-                # For now, just remove from doc_ids list - index will be rebuilt on next search if needed
-                logger.debug(f"Removed document {doc_id} from semantic memory (index rebuild may be needed)")
-            
+            with self._lock:
+                # Remove from SQLite
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                cursor.execute("SELECT id FROM semantic_documents WHERE doc_id = ?", (doc_id,))
+                row = cursor.fetchone()
+                cursor.execute("DELETE FROM semantic_documents WHERE doc_id = ?", (doc_id,))
+                deleted = cursor.rowcount > 0
+                conn.commit()
+                conn.close()
+
+                # Remove from in-memory index
+                if row:
+                    self._materialize()
+                    self.index.remove_ids(np.array([row[0]], dtype=np.int64))
+                    self._mark_dirty()
+                    logger.debug(f"Removed document {doc_id} from semantic memory")
+
             return deleted
         except Exception as e:
             logger.error(f"Failed to delete document {doc_id}: {e}")
@@ -163,33 +344,45 @@ class SemanticMemory:
         """Search for similar documents."""
         if self.index.ntotal == 0:
             return []
-            
+
         try:
             query_embedding = self._get_embedding(query)
-            
-            # Search FAISS
-            distances, indices = self.index.search(np.array([query_embedding]), top_k)
-            
-            results = []
+
+            with self._lock:
+                if query_embedding.shape[0] != self.index.d:
+                    logger.warning(
+                        f"Query embedding dimension {query_embedding.shape[0]} does not match index dimension {self.index.d}"
+                    )
+                    return []
+                # Search FAISS
+                distances, indices = self.index.search(np.array([query_embedding]), top_k)
+
+            hits = [(int(idx), float(dist)) for idx, dist in zip(indices[0], distances[0]) if idx != -1]
+            if not hits:
+                return []
+
+            # Hydrate all hits with one query
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            for i, idx in enumerate(indices[0]):
-                if idx == -1:
-                    continue
-                
-                doc_id = self.doc_ids[idx]
-                cursor.execute("SELECT doc_id, content, metadata FROM semantic_documents WHERE doc_id = ?", (doc_id,))
-                row = cursor.fetchone()
-                
-                if row:
-                    res = dict(row)
-                    res['score'] = float(distances[0][i])
-                    res['metadata'] = json.loads(res['metadata'])
-                    results.append(res)
-            
+            placeholders = ",".join(["?"] * len(hits))
+            rows = conn.execute(
+                f"SELECT id, doc_id, content, metadata FROM semantic_documents WHERE id IN ({placeholders})",
+                [doc_key for doc_key, _ in hits],
+            ).fetchall()
             conn.close()
+            by_id = {row["id"]: row for row in rows}
+
+            results = []
+            for doc_key, dist in hits:
+                row = by_id.get(doc_key)
+                if row:
+                    results.append({
+                        "doc_id": row["doc_id"],
+                        "content": row["content"],
+                        "metadata": json.loads(row["metadata"]),
+                        "score": dist,
+                    })
+
             return results
         except Exception as e:
             logger.error(f"Search failed: {e}")
@@ -198,14 +391,16 @@ class SemanticMemory:
     def clear(self):
         """Clear all documents."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM semantic_documents")
-            conn.commit()
-            conn.close()
-            
-            self.index = faiss.IndexFlatL2(self.dimension)
-            self.doc_ids = []
+            with self._lock:
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM semantic_documents")
+                conn.commit()
+                conn.close()
+
+                self.index = self._new_flat_index(self.dimension)
+                self._mmapped = False
+                self._save_index()
             logger.info("Cleared semantic memory.")
         except Exception as e:
             logger.error(f"Clear failed: {e}")
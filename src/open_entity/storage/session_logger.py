@@ -8,8 +8,10 @@ import json
 import uuid
 import threading
 import os
+import time
+import atexit
 from datetime import datetime
-from typing import Any, Optional, List, Dict
+from typing import Any, Optional, List, Dict, Tuple
 from pathlib import Path
 import logging
 
@@ -17,6 +19,9 @@ logger = logging.getLogger(__name__)
 
 # Summarization settings
 DEFAULT_MAX_TOKENS = 8000
+# 要約を作り始めるメッセージ数と、要約後も原文で残す直近メッセージ数
+SUMMARY_TRIGGER_MESSAGES = 30
+SUMMARY_KEEP_RECENT = 20
 
 def _get_summarize_model() -> str:
     """要約用モデルを取得"""
@@ -136,7 +141,7 @@ ROLLING_SUMMARIZE_PROMPT = """以下は「過去の要約」と「新しい会
 class ContextHealthMonitor:
     """コンテキストの健康状態を監視"""
 
-    # 閾値はトークン数（文字数 × 1.5 で推定）
+    # 閾値はトークン数（tiktoken で計数、使えない場合は文字数 × 1.5 で推定）
     NOTICE_THRESHOLD = 15000
     WARNING_THRESHOLD = 22000
     CRITICAL_THRESHOLD = 30000
@@ -149,15 +154,15 @@ class ContextHealthMonitor:
 
     def check_health(self, history: List[Dict], system_prompt: str = "") -> Dict[str, Any]:
         """コンテキストの健康状態をチェック"""
-        total_chars = len(system_prompt)
+        from ..core.token_counter import count_tokens
+
+        # メッセージごとの計数はコンテンツハッシュでキャッシュされる
+        total_tokens = count_tokens(system_prompt)
         for msg in history:
             content = msg.get("content") or msg.get("parts", [""])[0]
             if isinstance(content, list):
                 content = str(content)
-            total_chars += len(str(content))
-
-        from ..core.context_compressor import TOKEN_ESTIMATE_RATIO
-        total_tokens = int(total_chars * TOKEN_ESTIMATE_RATIO) if total_chars else 0
+            total_tokens += count_tokens(str(content))
 
         is_healthy = total_tokens < self.WARNING_THRESHOLD
         warning = None
@@ -178,16 +183,236 @@ class ContextHealthMonitor:
         }
 
 
+# Write-behind settings
+DEFAULT_FLUSH_INTERVAL_MS = 50
+DEFAULT_MAX_BATCH = 500
+DURABILITY_BATCHED = "batched"
+DURABILITY_SYNC = "sync"
+# PRAGMA synchronous per durability mode (sync keeps SQLite's default, FULL)
+_SYNCHRONOUS_LEVEL = {DURABILITY_BATCHED: "NORMAL", DURABILITY_SYNC: "FULL"}
+
+
+def _get_default_durability() -> str:
+    """書き込みの耐久性モード（SESSION_DB_DURABILITY=sync で毎回同期コミット）"""
+    value = os.environ.get("SESSION_DB_DURABILITY", DURABILITY_BATCHED).lower()
+    return DURABILITY_SYNC if value in ("sync", "full", "synchronous") else DURABILITY_BATCHED
+
+
+class _PooledConnection(sqlite3.Connection):
+    """スレッドごとに再利用する接続。close() では閉じずに状態だけ戻す。"""
+
+    synchronous_level = "FULL"
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = None
+
+    def really_close(self):
+        super().close()
+
+
+_local = threading.local()
+
+
+def _pooled_connection(db_path: str, timeout: float = 10.0,
+                       synchronous: str = _SYNCHRONOUS_LEVEL[DURABILITY_BATCHED]) -> _PooledConnection:
+    """
+    現在のスレッド用の接続を返す（db_path ごとに1本）。
+
+    synchronous は呼び出し元の耐久性モードの PRAGMA synchronous（同じ接続を
+    モードの違う SessionLogger が使うため、違っていれば切り替える）。
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=timeout, factory=_PooledConnection)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conns[db_path] = conn
+    else:
+        conn.row_factory = None
+    if conn.synchronous_level != synchronous:
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+        conn.synchronous_level = synchronous
+    return conn
+
+
+class _WriteBehindQueue:
+    """
+    agent_messages / session_events への追記をまとめてコミットするキュー（db_path ごとに1つ）。
+
+    別セッションの書き込みも1トランザクションにまとめ、最初の書き込みから
+    flush_interval_ms 以内にコミットする。読み込み前には flush() で反映される。
+    """
+
+    def __init__(self, db_path: str, flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        self.db_path = db_path
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._messages: List[Tuple] = []
+        self._events: List[Tuple] = []
+        # session_id -> last_updated
+        self._touched: Dict[str, str] = {}
+        # 取り出し済みでコミット中のバッチがあるか（その間キューは空に見える）
+        self._writing = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _size(self) -> int:
+        return len(self._messages) + len(self._events)
+
+    def _put(self, bucket: List[Tuple], row: Tuple, session_id: str, timestamp: str):
+        with self._cond:
+            bucket.append(row)
+            self._touched[session_id] = timestamp
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="session-log-writer", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def put_message(self, row: Tuple):
+        self._put(self._messages, row, row[1], row[2])
+
+    def put_event(self, row: Tuple):
+        self._put(self._events, row, row[1], row[2])
+
+    def _has_queued(self) -> bool:
+        return bool(self._messages or self._events)
+
+    def has_pending(self) -> bool:
+        """未コミットの書き込み（キュー内・コミット中のバッチ）があるか"""
+        # キューを先に見る（取り出し時は _writing を立ててから空にするので取りこぼさない）
+        return self._has_queued() or self._writing
+
+    def flush(self, synchronous: bool = False):
+        """保留中の書き込みを1トランザクションでコミット（コミット中のバッチがあれば完了を待つ）"""
+        with self._flush_lock:
+            with self._cond:
+                if not self._has_queued():
+                    return
+                self._writing = True
+                messages, self._messages = self._messages, []
+                events, self._events = self._events, []
+                touched, self._touched = self._touched, {}
+
+            durability = DURABILITY_SYNC if synchronous else DURABILITY_BATCHED
+            conn = _pooled_connection(self.db_path, synchronous=_SYNCHRONOUS_LEVEL[durability])
+            try:
+                self._write(conn, messages, events, touched)
+            except sqlite3.IntegrityError:
+                # 外部キー違反などがあれば1件ずつ書き込み、失敗した行だけ捨てる
+                conn.rollback()
+                self._write_rows_individually(conn, messages, events, touched)
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Failed to flush session log ({len(messages)} messages, {len(events)} events): {e}")
+            finally:
+                self._writing = False
+
+    def _write(self, conn: sqlite3.Connection, messages: List[Tuple], events: List[Tuple],
+               touched: Dict[str, str]):
+        with conn:
+            if messages:
+                conn.executemany("""
+                    INSERT INTO agent_messages (message_id, session_id, timestamp, role, agent_id, content)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, messages)
+            if events:
+                conn.executemany("""
+                    INSERT INTO session_events (event_id, session_id, timestamp, event_type, source, content)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, events)
+            conn.executemany("""
+                UPDATE sessions SET last_updated = ? WHERE session_id = ?
+            """, [(ts, sid) for sid, ts in touched.items()])
+
+    def _write_rows_individually(self, conn: sqlite3.Connection, messages: List[Tuple],
+                                 events: List[Tuple], touched: Dict[str, str]):
+        for row in messages:
+            try:
+                self._write(conn, [row], [], {})
+            except Exception as e:
+                logger.error(f"Failed to log agent message: {e}")
+        for row in events:
+            try:
+                self._write(conn, [], [row], {})
+            except Exception as e:
+                logger.error(f"Failed to add event: {e}")
+        try:
+            self._write(conn, [], [], touched)
+        except Exception as e:
+            logger.error(f"Failed to update session timestamps: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._has_queued():
+                    self._cond.wait()
+                # 最初の書き込みから flush_interval 以内、またはバッチが満杯になったらコミット
+                deadline = time.monotonic() + self.flush_interval
+                while self._size() < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self.flush()
+
+
+_writers: Dict[str, _WriteBehindQueue] = {}
+_writers_lock = threading.Lock()
+_initialized_dbs = set()
+
+
+def _get_writer(db_path: str) -> _WriteBehindQueue:
+    with _writers_lock:
+        writer = _writers.get(db_path)
+        if writer is None:
+            writer = _writers[db_path] = _WriteBehindQueue(db_path)
+        return writer
+
+
+@atexit.register
+def _flush_all_writers():
+    for writer in list(_writers.values()):
+        try:
+            writer.flush()
+        except Exception:
+            pass
+
+
 class SessionLogger:
     """
     Logger for persisting session history to SQLite.
     Supports rolling summarization for long sessions.
+
+    Connections are reused per thread. Agent messages and events are written
+    behind a shared per-database queue and committed in batches; any read
+    through this logger flushes pending writes first. Pass durability="sync"
+    (or set SESSION_DB_DURABILITY=sync) to commit each write synchronously.
+
+    Rolling summaries are generated by a background worker: a turn that
+    crosses the threshold is served with the current summary, and the new
+    summary (and the trimming of the messages it covers) applies from the
+    next turn. Pass background_summary=False to summarize inline.
     """
 
-    def __init__(self, db_path: Optional[str] = None, provider: Optional[str] = None):
+    def __init__(self, db_path: Optional[str] = None, provider: Optional[str] = None,
+                 durability: Optional[str] = None, background_summary: Optional[bool] = None):
+        from ..core.summary_worker import background_summary_enabled
         self.db_path = db_path or _get_default_db_path()
         self.provider = provider
+        self.durability = durability or _get_default_durability()
+        # ローリング要約をバックグラウンドで生成する（MOCO_BACKGROUND_SUMMARY=off で同期）
+        self.background_summary = background_summary_enabled() if background_summary is None else background_summary
         self._lock = threading.RLock()
+        self._writer = _get_writer(self.db_path)
         self.context_monitor = ContextHealthMonitor()
         # Transcript directory (same parent as db)
         self.transcript_dir = Path(self.db_path).parent / "transcripts"
@@ -233,14 +458,23 @@ class SessionLogger:
             logger.debug(f"Failed to append to transcript: {e}")
 
     def _get_connection(self, timeout: float = 10.0) -> sqlite3.Connection:
-        """データベース接続を取得し、PRAGMAを設定する。"""
-        conn = sqlite3.connect(self.db_path, timeout=timeout)
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.execute("PRAGMA journal_mode = WAL")
-        return conn
+        """
+        現在のスレッド用のデータベース接続を取得する（close() しても接続は再利用される）。
+        保留中の書き込みは先にコミットする。
+        """
+        if self._writer.has_pending():
+            self.flush()
+        return _pooled_connection(self.db_path, timeout=timeout,
+                                  synchronous=_SYNCHRONOUS_LEVEL.get(self.durability, "NORMAL"))
+
+    def flush(self):
+        """保留中のメッセージ・イベントをコミットする。"""
+        self._writer.flush(synchronous=self.durability == DURABILITY_SYNC)
 
     def _init_db(self):
         """Initialize database tables."""
+        if self.db_path in _initialized_dbs:
+            return
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
@@ -304,14 +538,16 @@ class SessionLogger:
                 )
             """)
 
-            # Backward compatible migration: add summary_count if missing
-            try:
-                cursor.execute("ALTER TABLE session_summaries ADD COLUMN summary_count INTEGER DEFAULT 0")
-                conn.commit()
-            except sqlite3.OperationalError as e:
-                # duplicate column name -> already migrated
-                if "duplicate column name" not in str(e):
-                    raise
+            # Backward compatible migration: add summary_count / covered_until if missing
+            # covered_until: 要約に含めた最後のメッセージの timestamp（以前の行は NULL）
+            for column_def in ("summary_count INTEGER DEFAULT 0", "covered_until TEXT"):
+                try:
+                    cursor.execute(f"ALTER TABLE session_summaries ADD COLUMN {column_def}")
+                    conn.commit()
+                except sqlite3.OperationalError as e:
+                    # duplicate column name -> already migrated
+                    if "duplicate column name" not in str(e):
+                        raise
 
             # Todo list items
             cursor.execute("""
@@ -335,6 +571,7 @@ class SessionLogger:
 
             conn.commit()
             conn.close()
+            _initialized_dbs.add(self.db_path)
         except Exception as e:
             logger.error(f"DB init failed: {e}")
 
@@ -366,40 +603,39 @@ class SessionLogger:
     def list_sessions(self, limit: int = 10, profile: str = None) -> List[Dict[str, Any]]:
         """List recent sessions, optionally filtered by profile."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
+            conn = self._get_connection()
+            cursor = conn.cursor()
 
-                if profile:
-                    cursor.execute("""
-                        SELECT session_id, title, profile, status, created_at, last_updated
-                        FROM sessions
-                        WHERE profile = ?
-                        ORDER BY last_updated DESC
-                        LIMIT ?
-                    """, (profile, limit))
-                else:
-                    cursor.execute("""
-                        SELECT session_id, title, profile, status, created_at, last_updated
-                        FROM sessions
-                        ORDER BY last_updated DESC
-                        LIMIT ?
-                    """, (limit,))
+            if profile:
+                cursor.execute("""
+                    SELECT session_id, title, profile, status, created_at, last_updated
+                    FROM sessions
+                    WHERE profile = ?
+                    ORDER BY last_updated DESC
+                    LIMIT ?
+                """, (profile, limit))
+            else:
+                cursor.execute("""
+                    SELECT session_id, title, profile, status, created_at, last_updated
+                    FROM sessions
+                    ORDER BY last_updated DESC
+                    LIMIT ?
+                """, (limit,))
 
-                rows = cursor.fetchall()
-                conn.close()
+            rows = cursor.fetchall()
+            conn.close()
 
-                return [
-                    {
-                        "session_id": row[0],
-                        "title": row[1],
-                        "profile": row[2],
-                        "status": row[3],
-                        "created_at": row[4],
-                        "last_updated": row[5],
-                    }
-                    for row in rows
-                ]
+            return [
+                {
+                    "session_id": row[0],
+                    "title": row[1],
+                    "profile": row[2],
+                    "status": row[3],
+                    "created_at": row[4],
+                    "last_updated": row[5],
+                }
+                for row in rows
+            ]
         except Exception as e:
             logger.error(f"Failed to list sessions: {e}")
             return []
@@ -413,25 +649,11 @@ class SessionLogger:
     ):
         """Log an agent conversation message."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
-
-                message_id = str(uuid.uuid4())
-                now = datetime.now().isoformat()
-
-                cursor.execute("""
-                    INSERT INTO agent_messages (message_id, session_id, timestamp, role, agent_id, content)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (message_id, session_id, now, role, agent_id, content))
-
-                # Update session last_updated
-                cursor.execute("""
-                    UPDATE sessions SET last_updated = ? WHERE session_id = ?
-                """, (now, session_id))
-
-                conn.commit()
-                conn.close()
+            message_id = str(uuid.uuid4())
+            now = datetime.now().isoformat()
+            self._writer.put_message((message_id, session_id, now, role, agent_id, content))
+            if self.durability == DURABILITY_SYNC:
+                self.flush()
         except Exception as e:
             logger.error(f"Failed to log agent message: {e}")
 
@@ -452,8 +674,8 @@ class SessionLogger:
             max_tokens: Max tokens for context
         """
         try:
-            # Get existing summary
-            summary = self._get_rolling_summary(session_id)
+            # Get existing summary (バックグラウンドで更新済みならそれを使う)
+            summary, covered_until = self._get_rolling_summary_state(session_id)
 
             # Get recent messages
             messages = self._get_recent_messages(session_id, limit)
@@ -461,15 +683,28 @@ class SessionLogger:
             if not messages:
                 return []
 
+            # 要約済みのメッセージは除く（直近 SUMMARY_KEEP_RECENT 件は常に残す）
+            if summary and covered_until:
+                uncovered = sum(1 for m in messages if (m.get("timestamp") or "") > covered_until)
+                keep = max(uncovered, SUMMARY_KEEP_RECENT)
+                messages = messages[-keep:]
+
             # Check context health
             health = self.context_monitor.check_health(messages)
 
             # 構造化サマリー自動生成（メッセージが30以上で、コンテキストが大きくなったら）
-            if health["recommend_summarize"] and len(messages) > 30:
-                older_messages = messages[:-20]
-                self._update_rolling_summary(session_id, summary, older_messages)
-                messages = messages[-20:]
-                summary = self._get_rolling_summary(session_id)
+            if health["recommend_summarize"] and len(messages) > SUMMARY_TRIGGER_MESSAGES:
+                older_messages = [
+                    m for m in messages[:-SUMMARY_KEEP_RECENT]
+                    if not covered_until or (m.get("timestamp") or "") > covered_until
+                ]
+                if older_messages and self.background_summary:
+                    # このターンは現在の要約で返し、新しい要約は次のターンから使う
+                    self.schedule_rolling_summary(session_id, summary, older_messages)
+                elif older_messages:
+                    self._update_rolling_summary(session_id, summary, older_messages)
+                    messages = messages[-SUMMARY_KEEP_RECENT:]
+                    summary = self._get_rolling_summary(session_id)
 
             result = []
 
@@ -539,21 +774,20 @@ class SessionLogger:
     def _get_recent_messages(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
         """Get recent messages from DB."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-
-                cursor.execute("""
-                    SELECT role, content, agent_id, timestamp
-                    FROM agent_messages
-                    WHERE session_id = ?
-                    ORDER BY timestamp DESC
-                    LIMIT ?
-                """, (session_id, limit))
+            conn = self._get_connection()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
 
-                rows = cursor.fetchall()
-                conn.close()
+            cursor.execute("""
+                SELECT role, content, agent_id, timestamp
+                FROM agent_messages
+                WHERE session_id = ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            """, (session_id, limit))
+
+            rows = cursor.fetchall()
+            conn.close()
 
             # Reverse to get oldest first
             return [dict(row) for row in reversed(rows)]
@@ -578,36 +812,35 @@ class SessionLogger:
         Otherwise fall back to the most recent 5 memos for backwards compat.
         """
         try:
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
+            conn = self._get_connection()
+            cursor = conn.cursor()
 
-                if since_timestamp:
-                    cursor.execute(
-                        """
-                        SELECT content
-                        FROM session_events
-                        WHERE session_id = ?
-                          AND event_type = 'tool_memo'
-                          AND timestamp >= ?
-                        ORDER BY timestamp ASC
-                        """,
-                        (session_id, since_timestamp)
-                    )
-                else:
-                    cursor.execute(
-                        """
-                        SELECT content
-                        FROM session_events
-                        WHERE session_id = ?
-                          AND event_type = 'tool_memo'
-                        ORDER BY timestamp DESC
-                        LIMIT 5
-                        """,
-                        (session_id,)
-                    )
-                rows = cursor.fetchall()
-                conn.close()
+            if since_timestamp:
+                cursor.execute(
+                    """
+                    SELECT content
+                    FROM session_events
+                    WHERE session_id = ?
+                      AND event_type = 'tool_memo'
+                      AND timestamp >= ?
+                    ORDER BY timestamp ASC
+                    """,
+                    (session_id, since_timestamp)
+                )
+            else:
+                cursor.execute(
+                    """
+                    SELECT content
+                    FROM session_events
+                    WHERE session_id = ?
+                      AND event_type = 'tool_memo'
+                    ORDER BY timestamp DESC
+                    LIMIT 5
+                    """,
+                    (session_id,)
+                )
+            rows = cursor.fetchall()
+            conn.close()
 
             memos = []
             for row in rows:
@@ -631,42 +864,58 @@ class SessionLogger:
     def _get_rolling_summary(self, session_id: str) -> Optional[str]:
         """Get existing rolling summary."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
+            conn = self._get_connection()
+            cursor = conn.cursor()
 
-                cursor.execute("""
-                    SELECT summary FROM session_summaries WHERE session_id = ?
-                """, (session_id,))
+            cursor.execute("""
+                SELECT summary FROM session_summaries WHERE session_id = ?
+            """, (session_id,))
 
-                row = cursor.fetchone()
-                conn.close()
+            row = cursor.fetchone()
+            conn.close()
 
-                return row[0] if row else None
+            return row[0] if row else None
         except Exception as e:
             logger.error(f"Failed to get summary: {e}")
             return None
 
+    def _get_rolling_summary_state(self, session_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """Get existing rolling summary and the timestamp of the last message it covers."""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT summary, covered_until FROM session_summaries WHERE session_id = ?
+            """, (session_id,))
+
+            row = cursor.fetchone()
+            conn.close()
+
+            return (row[0], row[1]) if row else (None, None)
+        except Exception as e:
+            logger.error(f"Failed to get summary: {e}")
+            return None, None
+
     def get_summary_depth(self, session_id: str) -> int:
         """Get the number of times summary has been updated (summary depth)."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
+            conn = self._get_connection()
+            cursor = conn.cursor()
 
-                cursor.execute("""
-                    SELECT summary_count FROM session_summaries WHERE session_id = ?
-                """, (session_id,))
+            cursor.execute("""
+                SELECT summary_count FROM session_summaries WHERE session_id = ?
+            """, (session_id,))
 
-                row = cursor.fetchone()
-                conn.close()
+            row = cursor.fetchone()
+            conn.close()
 
-                return row[0] if row and row[0] else 0
+            return row[0] if row and row[0] else 0
         except Exception as e:
             logger.error(f"Failed to get summary depth: {e}")
             return 0
 
-    def _save_rolling_summary(self, session_id: str, summary: str):
+    def _save_rolling_summary(self, session_id: str, summary: str, covered_until: Optional[str] = None):
         """Save rolling summary."""
         try:
             with self._lock:
@@ -685,9 +934,9 @@ class SessionLogger:
 
                 cursor.execute("""
                     INSERT OR REPLACE INTO session_summaries
-                    (session_id, summary, summarized_until_timestamp, updated_at, summary_count)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (session_id, summary, now, now, current_count + 1))
+                    (session_id, summary, summarized_until_timestamp, updated_at, summary_count, covered_until)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (session_id, summary, now, now, current_count + 1, covered_until))
 
                 conn.commit()
                 conn.close()
@@ -740,7 +989,7 @@ class SessionLogger:
             ).strip()
 
             if new_summary:
-                self._save_rolling_summary(session_id, new_summary)
+                self._save_rolling_summary(session_id, new_summary, covered_until=messages[-1].get("timestamp"))
                 logger.info(f"Updated summary for session {session_id} using {provider_name}")
 
             return new_summary or existing_summary
@@ -749,27 +998,63 @@ class SessionLogger:
             logger.error(f"Failed to update summary: {e}")
             return existing_summary
 
+    def _summary_key(self, session_id: str) -> Tuple[str, str, str]:
+        return ("session_summary", self.db_path, session_id)
+
+    def schedule_rolling_summary(
+        self,
+        session_id: str,
+        existing_summary: Optional[str],
+        messages: List[Dict[str, Any]]
+    ) -> bool:
+        """
+        Update the rolling summary in the background.
+
+        Returns False if a summary for this session is already being generated.
+        """
+        from ..core.summary_worker import get_summary_worker
+        return get_summary_worker().submit(
+            self._summary_key(session_id),
+            self._update_rolling_summary_in_background,
+            session_id,
+            existing_summary,
+            messages,
+        )
+
+    def _update_rolling_summary_in_background(
+        self,
+        session_id: str,
+        existing_summary: Optional[str],
+        messages: List[Dict[str, Any]]
+    ) -> None:
+        """Background job: the summary is saved to the DB, so nothing is kept in the worker."""
+        self._update_rolling_summary(session_id, existing_summary, messages)
+
+    def wait_for_summary(self, session_id: str, timeout: Optional[float] = None) -> bool:
+        """Wait for a pending background summary of the session (True if none is pending)."""
+        from ..core.summary_worker import get_summary_worker
+        return get_summary_worker().wait(self._summary_key(session_id), timeout)
+
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session details."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
+            conn = self._get_connection()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
 
-                cursor.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,))
-                row = cursor.fetchone()
-                conn.close()
+            cursor.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,))
+            row = cursor.fetchone()
+            conn.close()
 
-                if row:
-                    data = dict(row)
-                    if data.get("metadata"):
-                        try:
-                            data["metadata"] = json.loads(data["metadata"])
-                        except Exception:
-                            pass
-                    return data
-                return None
+            if row:
+                data = dict(row)
+                if data.get("metadata"):
+                    try:
+                        data["metadata"] = json.loads(data["metadata"])
+                    except Exception:
+                        pass
+                return data
+            return None
         except Exception as e:
             logger.error(f"Failed to get session: {e}")
             return None
@@ -777,15 +1062,14 @@ class SessionLogger:
     def get_session_profile(self, session_id: str) -> str:
         """Get the profile of a session."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
+            conn = self._get_connection()
+            cursor = conn.cursor()
 
-                cursor.execute("SELECT profile FROM sessions WHERE session_id = ?", (session_id,))
-                row = cursor.fetchone()
-                conn.close()
+            cursor.execute("SELECT profile FROM sessions WHERE session_id = ?", (session_id,))
+            row = cursor.fetchone()
+            conn.close()
 
-                return row[0] if row else 'default'
+            return row[0] if row else 'default'
         except Exception as e:
             logger.error(f"Failed to get session profile for {session_id}: {e}")
             return 'default'
@@ -795,25 +1079,11 @@ class SessionLogger:
         """Add an event to a session."""
         event_id = str(uuid.uuid4())
         try:
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
-
-                now = datetime.now().isoformat()
-                content_json = json.dumps(content, ensure_ascii=False) if not isinstance(content, str) else content
-
-                cursor.execute("""
-                    INSERT INTO session_events (event_id, session_id, timestamp, event_type, source, content)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (event_id, session_id, now, event_type, source, content_json))
-
-                cursor.execute("""
-                    UPDATE sessions SET last_updated = ? WHERE session_id = ?
-                """, (now, session_id))
-
-                conn.commit()
-                conn.close()
-
+            now = datetime.now().isoformat()
+            content_json = json.dumps(content, ensure_ascii=False) if not isinstance(content, str) else content
+            self._writer.put_event((event_id, session_id, now, event_type, source, content_json))
+            if self.durability == DURABILITY_SYNC:
+                self.flush()
             return event_id
         except Exception as e:
             logger.error(f"Failed to add event: {e}")
@@ -822,22 +1092,21 @@ class SessionLogger:
     def get_events(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
         """Get events for a session."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-
-                cursor.execute("""
-                    SELECT event_id, timestamp, event_type, source, content
-                    FROM session_events
-                    WHERE session_id = ?
-                    ORDER BY timestamp DESC
-                    LIMIT ?
-                """, (session_id, limit))
+            conn = self._get_connection()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
 
-                rows = cursor.fetchall()
-                conn.close()
-                return [dict(row) for row in rows]
+            cursor.execute("""
+                SELECT event_id, timestamp, event_type, source, content
+                FROM session_events
+                WHERE session_id = ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            """, (session_id, limit))
+
+            rows = cursor.fetchall()
+            conn.close()
+            return [dict(row) for row in rows]
         except Exception as e:
             logger.error(f"Error getting events: {e}")
             return []
@@ -902,22 +1171,21 @@ class SessionLogger:
     def get_todos(self, session_id: str) -> List[Dict[str, Any]]:
         """Get todo list for a session."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
+            conn = self._get_connection()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
 
-                cursor.execute("""
-                    SELECT id, content, status, priority
-                    FROM todos
-                    WHERE session_id = ?
-                    ORDER BY created_at ASC
-                """, (session_id,))
+            cursor.execute("""
+                SELECT id, content, status, priority
+                FROM todos
+                WHERE session_id = ?
+                ORDER BY created_at ASC
+            """, (session_id,))
 
-                rows = cursor.fetchall()
-                conn.close()
+            rows = cursor.fetchall()
+            conn.close()
 
-                return [dict(row) for row in rows]
+            return [dict(row) for row in rows]
         except Exception as e:
             logger.error(f"Failed to get todos: {e}")
             return []
@@ -957,23 +1225,22 @@ class SessionLogger:
     def resolve_session_id(self, session_id_prefix: str) -> Optional[Dict[str, Any]]:
         """Resolve a session ID from a prefix (partial ID)."""
         try:
-            with self._lock:
-                conn = self._get_connection()
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-
-                # Try exact match first
-                cursor.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id_prefix,))
-                row = cursor.fetchone()
-                if row:
-                    conn.close()
-                    return dict(row)
+            conn = self._get_connection()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
 
-                # Try prefix match
-                cursor.execute("SELECT * FROM sessions WHERE session_id LIKE ? LIMIT 1", (f"{session_id_prefix}%",))
-                row = cursor.fetchone()
+            # Try exact match first
+            cursor.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id_prefix,))
+            row = cursor.fetchone()
+            if row:
                 conn.close()
-                return dict(row) if row else None
+                return dict(row)
+
+            # Try prefix match
+            cursor.execute("SELECT * FROM sessions WHERE session_id LIKE ? LIMIT 1", (f"{session_id_prefix}%",))
+            row = cursor.fetchone()
+            conn.close()
+            return dict(row) if row else None
         except Exception as e:
             logger.error(f"Failed to resolve session ID {session_id_prefix}: {e}")
             return None
@@ -6,10 +6,12 @@ from typing import Tuple, Final, Optional, Dict, Any
 try:
     from ..utils.path import resolve_safe_path, get_working_directory
     from ..core.token_cache import TokenCache
+    from .line_index import get_line_index, prime_line_index, LINE_INDEX_MIN_BYTES
 except ImportError:
     # サブプロセスからロードされる場合のフォールバック
     from open_entity.utils.path import resolve_safe_path, get_working_directory
     from open_entity.core.token_cache import TokenCache
+    from open_entity.tools.line_index import get_line_index, prime_line_index, LINE_INDEX_MIN_BYTES
 
 # 安全性のためのデフォルト最大行数 (read_file)
 DEFAULT_MAX_LINES = 10000
@@ -130,35 +132,48 @@ def read_file(path: str, offset: int = None, limit: int = None) -> str:
         # キャッシュのチェック (全文読み取り時のみキャッシュ機能を利用/保存する)
         # NOTE: limit が文字列で渡されることがあるため、比較は int にキャスト済みの max_lines を使う
         is_full_read = (start_line == 1 and (limit is None or max_lines >= DEFAULT_MAX_LINES))
-        
-        raw_content = None
-        if is_full_read:
-            raw_content = _TOKEN_CACHE.get(abs_path)
 
-        if raw_content is None:
-            # キャッシュにない場合はファイルから読み込み
+        # 範囲指定の読み取りと大きなファイルは行インデックスで必要な行だけ読む
+        index = None
+        if not is_full_read or os.path.getsize(abs_path) >= LINE_INDEX_MIN_BYTES:
             try:
-                with open(abs_path, 'r', encoding='utf-8', errors='replace') as f:
-                    raw_content = f.read()
-                # 全文読み取り時のみキャッシュに保存
-                if is_full_read:
-                    _TOKEN_CACHE.set(abs_path, raw_content)
-            except Exception as e:
+                index = get_line_index(abs_path)
+            except OSError as e:
                 return f"Error reading file: {e}"
 
-        # 生データから指定範囲を抽出してフォーマット
-        lines = raw_content.splitlines()
-        total_lines = len(lines)
-        
+        if index is not None:
+            total_lines = index.line_count
+            end_idx = min(start_line - 1 + max_lines, total_lines)
+            window = index.read_lines(start_line - 1, end_idx - (start_line - 1))
+        else:
+            raw_content = None
+            if is_full_read:
+                raw_content = _TOKEN_CACHE.get(abs_path)
+
+            if raw_content is None:
+                # キャッシュにない場合はファイルから読み込み
+                try:
+                    with open(abs_path, 'r', encoding='utf-8', errors='replace') as f:
+                        raw_content = f.read()
+                    # 全文読み取り時のみキャッシュに保存
+                    if is_full_read:
+                        _TOKEN_CACHE.set(abs_path, raw_content)
+                except Exception as e:
+                    return f"Error reading file: {e}"
+
+            # 生データから指定範囲を抽出
+            lines = raw_content.splitlines()
+            total_lines = len(lines)
+            end_idx = min(start_line - 1 + max_lines, total_lines)
+            window = lines[start_line - 1:end_idx]
+
+        # フォーマット
         result_lines = []
         if start_line > 1:
             result_lines.append(f"... {start_line - 1} lines not shown ...")
 
-        # 抽出範囲
-        end_idx = min(start_line - 1 + max_lines, total_lines)
-        for i in range(start_line - 1, end_idx):
-            line_num = i + 1
-            result_lines.append(f"{line_num:6}|{lines[i]}")
+        for line_num, line in enumerate(window, start_line):
+            result_lines.append(f"{line_num:6}|{line}")
 
         if end_idx < total_lines:
             result_lines.append(f"... more lines available (limit={max_lines}, total={total_lines}) ...")
@@ -257,8 +272,9 @@ def write_file(path: str, content: str, overwrite: bool = False) -> str:
         with open(abs_path, 'w', encoding='utf-8') as f:
             f.write(content)
 
-        # キャッシュを無効化
+        # キャッシュを無効化（行インデックスは書いた内容から作り直す）
         _TOKEN_CACHE.delete_by_path(abs_path)
+        prime_line_index(abs_path, content)
 
         lines = content.count('\n') + 1
         ext = os.path.splitext(path)[1].lower()
@@ -488,6 +504,7 @@ def edit_file(path: str, old_string: str, new_string: str, dry_run: bool = False
             f.write(new_content)
 
         _TOKEN_CACHE.delete_by_path(abs_path)
+        prime_line_index(abs_path, new_content)
         
         # 変更行数を計算
         old_line_count = len(old_string.splitlines())
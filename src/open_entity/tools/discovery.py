@@ -238,6 +238,8 @@ def discover_tools(profile: str, additional_mcp: Optional[List[Any]] = None) ->
             from ..core.mcp_client import get_mcp_client, MCPConfig
             mcp_config = MCPConfig(enabled=True, servers=servers)
             mcp_client = get_mcp_client(mcp_config)
+            # セッションは MCP クライアントのバックグラウンドループ上で保持される
+            mcp_client.connect_sync()
             mcp_tools = mcp_client.create_tool_functions()
             tool_map.update(mcp_tools)
             logger.info(f"Loaded {len(mcp_tools)} MCP tools from {len(servers)} servers")
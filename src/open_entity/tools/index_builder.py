@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""コード/ドキュメント検索インデックスの並列・ストリーミング構築
+
+CodebaseSearcher / SemanticSearcher で共通利用する。
+
+- ファイルの読み込み・ハッシュ計算・チャンク分割（ast / tiktoken）はプロセスプールで並列実行
+- 埋め込み API 呼び出しは上限付きのスレッドで並行実行し、結果が届いた順に FAISS へ追加
+  （全ベクトルを np.vstack で一度に保持しない）
+- 一定バッチごとにチェックポイントを保存し、中断されたビルドは再開できる
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBED_BATCH_SIZE = 100
+DEFAULT_EMBED_CONCURRENCY = 4
+# この数の埋め込みバッチごとにチェックポイントを保存
+DEFAULT_CHECKPOINT_EVERY = 20
+# これ未満のファイル数ならプロセスプールを使わない（起動コストの方が大きい）
+PARALLEL_MIN_FILES = 64
+
+SKIP_DIRS = ('node_modules', '__pycache__', 'venv', '.git')
+
+# (file_path, cached_mtime, cached_content_hash)
+FileJob = Tuple[str, Optional[float], Optional[str]]
+
+
+def default_workers() -> int:
+    """チャンク分割に使うプロセス数"""
+    return max(1, min(8, (os.cpu_count() or 2) - 1))
+
+
+def list_files(target_dir: str, extensions: Iterable[str]) -> List[str]:
+    """対象拡張子のファイル一覧（隠しディレクトリ等は除外）"""
+    extensions = tuple(extensions)
+    found = []
+    for root, dirs, files in os.walk(target_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS]
+        for file in files:
+            if file.endswith(extensions):
+                found.append(os.path.join(root, file))
+    return found
+
+
+def read_file_info(file_path: str) -> Dict[str, Any]:
+    """ファイルのmtimeとコンテンツハッシュを取得"""
+    stat = os.stat(file_path)
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    return {
+        "mtime": stat.st_mtime,
+        "content_hash": hashlib.sha256(content.encode()).hexdigest(),
+        "content": content,
+    }
+
+
+def _run_chunk_job(chunk_file: Callable[[str, str, str], List[Dict[str, Any]]], job: FileJob, model_name: str) -> Dict[str, Any]:
+    """1ファイル分の読み込み・変更判定・チャンク分割（ワーカープロセスで実行）"""
+    file_path, cached_mtime, cached_hash = job
+    try:
+        info = read_file_info(file_path)
+        result = {"file_path": file_path, "mtime": info["mtime"], "content_hash": info["content_hash"]}
+        if cached_mtime == info["mtime"] and cached_hash == info["content_hash"]:
+            result["unchanged"] = True
+            return result
+        result["chunks"] = chunk_file(info["content"], file_path, model_name)
+        return result
+    except Exception as e:
+        return {"file_path": file_path, "error": str(e)}
+
+
+def iter_chunked_files(
+    chunk_file: Callable[[str, str, str], List[Dict[str, Any]]],
+    jobs: List[FileJob],
+    model_name: str,
+    workers: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    ファイルを並列にチャンク分割し、結果を順に返す
+
+    chunk_file はプロセス間で受け渡すためモジュールトップレベルの関数であること。
+    """
+    workers = default_workers() if workers is None else workers
+    if workers <= 1 or len(jobs) < PARALLEL_MIN_FILES:
+        for job in jobs:
+            yield _run_chunk_job(chunk_file, job, model_name)
+        return
+
+    try:
+        # 呼び出し元のスレッド（埋め込みクライアント等）を fork で複製しないよう spawn を使う
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Process pool unavailable, chunking inline: {e}")
+        for job in jobs:
+            yield _run_chunk_job(chunk_file, job, model_name)
+        return
+
+    with pool:
+        yield from pool.map(_run_chunk_job, repeat(chunk_file), jobs, repeat(model_name), chunksize=8)
+
+
+class StreamingIndexer:
+    """
+    チャンクを埋め込みながら FAISS インデックスへ逐次追加する
+
+    file_cache / metadata は呼び出し元の辞書・リストをそのまま更新する。
+    ファイルは全チャンクがインデックスに入った時点で file_cache に登録されるため、
+    チェックポイントから再開すると未完了のファイルだけが再処理される。
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], np.ndarray],
+        index: Optional[faiss.Index],
+        metadata: List[Dict[str, Any]],
+        file_cache: Dict[str, Dict[str, Any]],
+        next_id: int,
+        checkpoint: Optional[Callable[["StreamingIndexer"], None]] = None,
+        embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+        embed_concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+        checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    ):
+        self.embed = embed
+        self.index = index
+        self.metadata = metadata
+        self.file_cache = file_cache
+        self.next_id = next_id
+        self.checkpoint = checkpoint
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.checkpoint_every = max(1, checkpoint_every)
+
+        self.chunks_indexed = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._inflight: Deque[Tuple[List[Dict[str, Any]], Future]] = deque()
+        # file_path -> (未追加チャンク数, file_cache エントリ)
+        self._pending_files: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._batches_since_checkpoint = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.embed_concurrency, thread_name_prefix="embed")
+
+    def add_file(self, result: Dict[str, Any]) -> List[int]:
+        """チャンク分割結果を受け取り、IDを付与して埋め込みキューに積む"""
+        chunks = result.get("chunks") or []
+        chunk_ids = []
+        for chunk in chunks:
+            chunk["id"] = self.next_id
+            chunk_ids.append(self.next_id)
+            self.next_id += 1
+        entry = {
+            "mtime": result["mtime"],
+            "content_hash": result["content_hash"],
+            "chunk_ids": chunk_ids,
+        }
+        if not chunks:
+            self.file_cache[result["file_path"]] = entry
+            return chunk_ids
+        self._pending_files[result["file_path"]] = (len(chunks), entry)
+        for chunk in chunks:
+            self._buffer.append(chunk)
+            if len(self._buffer) >= self.embed_batch_size:
+                self._submit_buffer()
+        return chunk_ids
+
+    def finish(self) -> None:
+        """残りのチャンクを埋め込み、すべての結果をインデックスに反映する"""
+        try:
+            self._submit_buffer()
+            while self._inflight:
+                self._collect_oldest()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def abort(self) -> None:
+        """未送信のバッチを破棄して終了（完了済みのバッチはインデックスに残る）"""
+        self._buffer = []
+        for _, future in self._inflight:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self._inflight.clear()
+
+    def _submit_buffer(self) -> None:
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        # 同時実行数を超える場合は一番古いバッチの完了を待つ（メモリ上限）
+        while len(self._inflight) >= self.embed_concurrency:
+            self._collect_oldest()
+        future = self._executor.submit(self.embed, [c["content"] for c in batch])
+        self._inflight.append((batch, future))
+
+    def _collect_oldest(self) -> None:
+        batch, future = self._inflight.popleft()
+        embeddings = future.result()
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(embeddings.shape[1]))
+        ids = np.array([c["id"] for c in batch], dtype=np.int64)
+        self.index.add_with_ids(embeddings, ids)
+        self.metadata.extend(batch)
+        self.chunks_indexed += len(batch)
+
+        for chunk in batch:
+            path = chunk["file_path"]
+            remaining, entry = self._pending_files[path]
+            if remaining <= 1:
+                del self._pending_files[path]
+                self.file_cache[path] = entry
+            else:
+                self._pending_files[path] = (remaining - 1, entry)
+
+        self._batches_since_checkpoint += 1
+        if self.checkpoint and self._batches_since_checkpoint >= self.checkpoint_every:
+            self._batches_since_checkpoint = 0
+            self.checkpoint(self)
+
+
+def remove_ids(index: Optional[faiss.Index], metadata: List[Dict[str, Any]], ids: Set[int]) -> None:
+    """インデックスとメタデータ（その場で更新）から指定IDのチャンクを削除"""
+    if not ids:
+        return
+    if index is not None:
+        index.remove_ids(np.array(sorted(ids), dtype=np.int64))
+    metadata[:] = [c for c in metadata if c["id"] not in ids]
+
+
+def orphan_ids(metadata: List[Dict[str, Any]], file_cache: Dict[str, Dict[str, Any]]) -> Set[int]:
+    """どのファイルにも属さないチャンクID（中断されたビルドの残り）"""
+    referenced: Set[int] = set()
+    for entry in file_cache.values():
+        referenced.update(entry.get("chunk_ids", []))
+    return {c["id"] for c in metadata if c["id"] not in referenced}
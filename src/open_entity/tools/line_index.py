@@ -0,0 +1,197 @@
+"""
+ファイルの行オフセットインデックス
+
+read_file の offset/limit 指定（大きなログや生成ファイルのページング）のたびに
+ファイル全体を読み込んで splitlines() しないよう、行の開始位置を記録しておく。
+
+- LINE_CHECKPOINT 行ごとの開始バイト位置だけを保持する（メモリはファイルサイズによらず小さい）
+- 読み取りは mmap から必要な範囲だけを切り出してデコードする（O(ウィンドウ)）
+- 総行数はインデックス作成時に求めて保持する
+- キャッシュキーは (パス, mtime, サイズ)。書き込み側は prime_line_index で内容から作り直せる
+
+改行が "\\n"（"\\r\\n" を含む）だけのファイルが対象。str.splitlines() が区切りとみなす
+他の文字（単独の "\\r"、"\\v"、"\\f"、U+2028 など）を含むファイルは None を返すので、
+呼び出し側は従来どおり全体を読む。
+"""
+
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+
+# 開始位置を記録する間隔（行）
+LINE_CHECKPOINT = 64
+# キャッシュするファイル数
+MAX_CACHED_INDEXES = 128
+# read_file の全文読み取りでもインデックスを使うファイルサイズ
+LINE_INDEX_MIN_BYTES = 1024 * 1024
+
+# "\n" 以外の行区切り（str.splitlines 基準）。UTF-8 の U+0085 / U+2028 / U+2029 を含む。
+# 選択肢をまとめた正規表現は先頭リテラルの高速検索が効かず遅いため、個別に find する
+_OTHER_BREAKS = (b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e", b"\xc2\x85", b"\xe2\x80\xa8", b"\xe2\x80\xa9")
+_LONE_CR = re.compile(rb"\r(?!\n)")
+_CHECKPOINT_RE = re.compile(rb"(?:[^\n]*\n){%d}" % LINE_CHECKPOINT)
+
+_Buffer = Union[bytes, mmap.mmap]
+
+
+class LineIndex:
+    """1ファイル分の行オフセットインデックス"""
+
+    __slots__ = ("path", "mtime_ns", "size", "line_count", "_checkpoints")
+
+    def __init__(self, path: str, mtime_ns: int, size: int, buf: _Buffer):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        # _checkpoints[j] は (j + 1) * LINE_CHECKPOINT 行目（0始まり）の開始位置
+        self._checkpoints = array("Q")
+        # LINE_CHECKPOINT 行ずつ先頭から一致させる（一致しなくなったら残りは LINE_CHECKPOINT 行未満）
+        end = 0
+        match = _CHECKPOINT_RE.match(buf, 0)
+        while match is not None and match.end() < size:
+            end = match.end()
+            self._checkpoints.append(end)
+            match = _CHECKPOINT_RE.match(buf, end)
+        if match is not None:
+            # 末尾の改行でちょうど区切りになった（その直後は行の開始ではない）
+            self.line_count = (len(self._checkpoints) + 1) * LINE_CHECKPOINT
+        else:
+            count = 0
+            pos = buf.find(b"\n", end)
+            while pos >= 0:
+                count += 1
+                pos = buf.find(b"\n", pos + 1)
+            self.line_count = len(self._checkpoints) * LINE_CHECKPOINT + count
+            if size and buf[size - 1:size] != b"\n":
+                self.line_count += 1
+
+    def _line_start(self, buf: _Buffer, line: int) -> int:
+        """line 行目（0始まり）の開始バイト位置（範囲外ならファイルサイズ）"""
+        if line >= self.line_count:
+            return self.size
+        block = line // LINE_CHECKPOINT
+        pos = self._checkpoints[block - 1] if block else 0
+        for _ in range(line - block * LINE_CHECKPOINT):
+            pos = buf.find(b"\n", pos) + 1
+        return pos
+
+    def read_lines(self, start: int, count: int, errors: str = "replace") -> List[str]:
+        """start 行目（0始まり）から最大 count 行を返す（改行は含まない）"""
+        start = max(0, start)
+        if count <= 0 or start >= self.line_count:
+            return []
+        with _open_buffer(self.path) as buf:
+            begin = self._line_start(buf, start)
+            end = self._line_start(buf, start + count)
+            data = buf[begin:end]
+        return data.decode("utf-8", errors=errors).splitlines()
+
+
+class _open_buffer:
+    """ファイルを読み取り専用で mmap する（空ファイルは b""）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._map = None
+
+    def __enter__(self) -> _Buffer:
+        self._file = open(self.path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空ファイルは mmap できない
+            return b""
+        return self._map
+
+    def __exit__(self, *exc) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+_cache: "OrderedDict[str, LineIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_put(index: LineIndex) -> None:
+    with _cache_lock:
+        _cache[index.path] = index
+        _cache.move_to_end(index.path)
+        while len(_cache) > MAX_CACHED_INDEXES:
+            _cache.popitem(last=False)
+
+
+def _has_other_breaks(buf: _Buffer) -> bool:
+    if any(buf.find(sep) >= 0 for sep in _OTHER_BREAKS):
+        return True
+    return buf.find(b"\r") >= 0 and _LONE_CR.search(buf) is not None
+
+
+def _build(path: str, buf: _Buffer, stat: os.stat_result) -> Optional[LineIndex]:
+    if _has_other_breaks(buf):
+        return None
+    return LineIndex(path, stat.st_mtime_ns, stat.st_size, buf)
+
+
+def get_line_index(path: str) -> Optional[LineIndex]:
+    """
+    path の行インデックスを返す（mtime とサイズが変わっていなければキャッシュを使う）
+
+    Returns:
+        LineIndex。"\\n" 以外の行区切りを含むファイルは None
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    with _cache_lock:
+        index = _cache.get(path)
+        if index is not None and index.mtime_ns == stat.st_mtime_ns and index.size == stat.st_size:
+            _cache.move_to_end(path)
+            return index
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size == 0:
+            index = LineIndex(path, stat.st_mtime_ns, 0, b"")
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                index = _build(path, buf, stat)
+    if index is None:
+        invalidate_line_index(path)
+        return None
+    _cache_put(index)
+    return index
+
+
+def prime_line_index(path: str, content: Union[str, bytes]) -> None:
+    """
+    書き込んだ内容からインデックスを作り直す（書き込み直後に呼ぶ）
+
+    ファイルのサイズが内容と一致しない場合（改行の変換など）は破棄のみ行う。
+    """
+    path = os.path.abspath(path)
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    try:
+        stat = os.stat(path)
+    except OSError:
+        invalidate_line_index(path)
+        return
+    index = _build(path, data, stat) if stat.st_size == len(data) else None
+    if index is None:
+        invalidate_line_index(path)
+    else:
+        _cache_put(index)
+
+
+def invalidate_line_index(path: str) -> None:
+    with _cache_lock:
+        _cache.pop(os.path.abspath(path), None)
+
+
+def get_cache_info() -> Tuple[int, int]:
+    """(キャッシュ中のファイル数, 上限)"""
+    with _cache_lock:
+        return len(_cache), MAX_CACHED_INDEXES
@@ -7,7 +7,6 @@ README, 仕様書, 設定ファイル (.md/.yaml/.json/.txt/.toml など) を
 """
 import os
 import pickle
-import hashlib
 import logging
 import numpy as np
 import faiss
@@ -16,6 +15,15 @@ from typing import List, Dict, Any, Optional, Set
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 from open_entity.core.llm_provider import get_embedding_provider, get_embedding_model
+from open_entity.core.embedding_service import get_embedding_service
+from open_entity.tools.index_builder import (
+    FileJob,
+    StreamingIndexer,
+    iter_chunked_files,
+    list_files,
+    orphan_ids,
+    remove_ids,
+)
 
 logger = logging.getLogger(__name__)
 _DOTENV_LOADED = False
@@ -178,6 +186,20 @@ class DocChunker:
         return chunks
 
 
+# ワーカープロセス内でモデルごとに使い回す chunker（tiktoken のエンコーディング読み込みは重い）
+_worker_chunkers: Dict[str, DocChunker] = {}
+
+
+def _chunk_doc_file(content: str, file_path: str, model_name: str) -> List[Dict[str, Any]]:
+    """ファイル内容をチャンクに分割する（index_builder のプロセスプールから呼ばれる）"""
+    chunker = _worker_chunkers.get(model_name)
+    if chunker is None:
+        chunker = _worker_chunkers[model_name] = DocChunker(model_name=model_name)
+    if file_path.endswith(".md"):
+        return chunker.chunk_by_sections(content, file_path)
+    return chunker.chunk_generic(content, file_path)
+
+
 class SemanticSearcher:
     """ドキュメント向け意味検索を管理するクラス"""
 
@@ -189,82 +211,52 @@ class SemanticSearcher:
                 "Set OPENAI_API_KEY or GEMINI_API_KEY environment variable."
             )
 
-        self._openai_client = None
-        self._gemini_client = None
-
         if self.provider == "openai":
-            self._openai_client = OpenAI(api_key=_get_openai_api_key())
             self.dimension = 1536
         elif self.provider == "gemini":
-            self._gemini_client = genai.Client(api_key=_get_gemini_api_key())
             self.dimension = 768
         else:
             raise ValueError(f"Unknown provider: {self.provider}")
 
         self.embedding_model = get_embedding_model(self.provider)
+        # クライアント・バッチ・キャッシュは他のサブシステムと共有
+        self._embedder = get_embedding_service(provider=self.provider, model=self.embedding_model)
         self.chunker = DocChunker(model_name=self.embedding_model)
         self.index: Optional[faiss.Index] = None
         self.metadata: List[Dict[str, Any]] = []
         self.file_cache: Dict[str, Dict[str, Any]] = {}
         self._next_id = 0
-
-    def _get_file_info(self, file_path: str) -> Dict[str, Any]:
-        stat = os.stat(file_path)
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        content_hash = hashlib.sha256(content.encode()).hexdigest()
-        return {
-            "mtime": stat.st_mtime,
-            "content_hash": content_hash,
-            "content": content
-        }
-
-    def _is_file_changed(self, file_path: str, file_info: Dict[str, Any]) -> bool:
-        if file_path not in self.file_cache:
-            return True
-        cached = self.file_cache[file_path]
-        return (cached.get("mtime") != file_info["mtime"] or 
-                cached.get("content_hash") != file_info["content_hash"])
+        self._build_in_progress = False
+        self._build_target: Optional[str] = None
 
     def get_embeddings(self, texts: List[str]) -> np.ndarray:
-        if self.provider == "openai":
-            return self._get_openai_embeddings(texts)
-        else:
-            return self._get_gemini_embeddings(texts)
-
-    def _get_openai_embeddings(self, texts: List[str]) -> np.ndarray:
-        response = self._openai_client.embeddings.create(
-            input=texts,
-            model=self.embedding_model
-        )
-        embeddings = np.array([data.embedding for data in response.data], dtype=np.float32)
+        embeddings = np.array(self._embedder.embed_many(texts), dtype=np.float32)
         faiss.normalize_L2(embeddings)
         return embeddings
 
-    def _get_gemini_embeddings(self, texts: List[str]) -> np.ndarray:
-        embeddings_list = []
-        for text in texts:
-            response = self._gemini_client.models.embed_content(
-                model=self.embedding_model,
-                contents=text
-            )
-            emb = response.embeddings[0].values
-            embeddings_list.append(emb)
-        embeddings = np.array(embeddings_list, dtype=np.float32)
-        faiss.normalize_L2(embeddings)
-        return embeddings
-
-    def _save_index(self):
+    def _save_index(self, in_progress: bool = False, target_dir: Optional[str] = None):
+        if self.index is None:
+            return
         if not os.path.exists(INDEX_DIR):
             os.makedirs(INDEX_DIR)
         
-        faiss.write_index(self.index, os.path.join(INDEX_DIR, "doc.index"))
-        with open(os.path.join(INDEX_DIR, "metadata.pkl"), "wb") as f:
+        self._build_in_progress = in_progress
+        if target_dir is not None:
+            self._build_target = target_dir
+        # 書き込み途中で中断されても既存のファイルを壊さないよう一時ファイル経由で置き換える
+        index_path = os.path.join(INDEX_DIR, "doc.index")
+        faiss.write_index(self.index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        metadata_path = os.path.join(INDEX_DIR, "metadata.pkl")
+        with open(metadata_path + ".tmp", "wb") as f:
             pickle.dump({
                 "chunks": self.metadata,
                 "file_cache": self.file_cache,
-                "next_id": self._next_id
+                "next_id": self._next_id,
+                "build_state": "in_progress" if in_progress else "complete",
+                "target_dir": self._build_target,
             }, f)
+        os.replace(metadata_path + ".tmp", metadata_path)
 
     def _load_index(self) -> bool:
         index_path = os.path.join(INDEX_DIR, "doc.index")
@@ -280,70 +272,84 @@ class SemanticSearcher:
                 self.metadata = data
                 self.file_cache = {}
                 self._next_id = len(data)
+                self._build_in_progress = False
+                self._build_target = None
             else:
                 self.metadata = data.get("chunks", [])
                 self.file_cache = data.get("file_cache", {})
                 self._next_id = data.get("next_id", len(self.metadata))
+                self._build_in_progress = data.get("build_state") == "in_progress"
+                self._build_target = data.get("target_dir")
         return True
 
-    def build_index(self, target_dir: str = ".", extensions: List[str] = None) -> str:
+    def _index_files(self, jobs: List[FileJob], target_dir: str) -> Dict[str, int]:
+        """
+        ファイルを並列にチャンク分割し、埋め込みを取得しながらインデックスへ追加する。
+        途中経過は一定間隔でチェックポイントとして保存する。
+        """
+        counts = {"added": 0, "modified": 0}
+        stale_ids: Set[int] = set()
+
+        def checkpoint(indexer: StreamingIndexer) -> None:
+            self.index = indexer.index
+            self._next_id = indexer.next_id
+            remove_ids(self.index, self.metadata, stale_ids)
+            stale_ids.clear()
+            self._save_index(in_progress=True, target_dir=target_dir)
+
+        indexer = StreamingIndexer(
+            self.get_embeddings, self.index, self.metadata, self.file_cache, self._next_id,
+            checkpoint=checkpoint,
+        )
+        try:
+            for result in iter_chunked_files(_chunk_doc_file, jobs, self.embedding_model):
+                file_path = result["file_path"]
+                if "error" in result:
+                    logger.warning(f"Error processing {file_path}: {result['error']}")
+                    continue
+                if result.get("unchanged"):
+                    continue
+                # 変更ファイルの古いチャンクは次のチェックポイント/完了時にまとめて削除
+                previous = self.file_cache.pop(file_path, None)
+                if previous is not None:
+                    stale_ids.update(previous.get("chunk_ids", []))
+                    counts["modified"] += 1
+                else:
+                    counts["added"] += 1
+                indexer.add_file(result)
+            indexer.finish()
+        except BaseException:
+            # 完了済みのバッチまでを保存し、次回のビルドで続きから再開できるようにする
+            indexer.abort()
+            checkpoint(indexer)
+            raise
+
+        self.index = indexer.index
+        self._next_id = indexer.next_id
+        remove_ids(self.index, self.metadata, stale_ids)
+        counts["chunks"] = indexer.chunks_indexed
+        return counts
+
+    def build_index(self, target_dir: str = ".", extensions: List[str] = None, resume: bool = True) -> str:
         if extensions is None:
             extensions = DEFAULT_EXTENSIONS
 
-        all_chunks = []
-        self.file_cache = {}
-        
-        for root, dirs, files in os.walk(target_dir):
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ('node_modules', '__pycache__', 'venv', '.git')]
-            for file in files:
-                if any(file.endswith(ext) for ext in extensions):
-                    file_path = os.path.join(root, file)
-                    try:
-                        file_info = self._get_file_info(file_path)
-                        content = file_info["content"]
-                        
-                        if file.endswith(".md"):
-                            chunks = self.chunker.chunk_by_sections(content, file_path)
-                        else:
-                            chunks = self.chunker.chunk_generic(content, file_path)
-                        
-                        chunk_ids = []
-                        for chunk in chunks:
-                            chunk["id"] = self._next_id
-                            chunk_ids.append(self._next_id)
-                            self._next_id += 1
-                        all_chunks.extend(chunks)
-                        
-                        self.file_cache[file_path] = {
-                            "mtime": file_info["mtime"],
-                            "content_hash": file_info["content_hash"],
-                            "chunk_ids": chunk_ids
-                        }
-                    except Exception as e:
-                        logger.warning(f"Error processing {file_path}: {e}")
-
-        if not all_chunks:
-            return "No document files found to index."
-
-        texts = [c["content"] for c in all_chunks]
-        batch_size = 100
-        embeddings_list = []
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            embeddings_list.append(self.get_embeddings(batch_texts))
+        abs_target = os.path.abspath(target_dir)
+        if resume and self._load_index() and self._build_in_progress and self._build_target == abs_target:
+            logger.info(f"Resuming interrupted index build ({len(self.file_cache)} files already indexed)")
+            return self.incremental_update(target_dir, extensions)
 
-        embeddings = np.vstack(embeddings_list)
+        self.index = None
+        self.metadata = []
+        self.file_cache = {}
+        jobs = [(file_path, None, None) for file_path in list_files(target_dir, extensions)]
+        self._index_files(jobs, abs_target)
 
-        dimension = embeddings.shape[1]
-        base_index = faiss.IndexFlatIP(dimension)
-        self.index = faiss.IndexIDMap2(base_index)
-        
-        ids = np.array([c["id"] for c in all_chunks], dtype=np.int64)
-        self.index.add_with_ids(embeddings, ids)
-        self.metadata = all_chunks
+        if not self.metadata:
+            return "No document files found to index."
 
-        self._save_index()
-        return f"Successfully indexed {len(all_chunks)} chunks from {len(self.file_cache)} files."
+        self._save_index(target_dir=abs_target)
+        return f"Successfully indexed {len(self.metadata)} chunks from {len(self.file_cache)} files."
 
     def incremental_update(self, target_dir: str = ".", extensions: List[str] = None) -> str:
         if extensions is None:
@@ -351,95 +357,39 @@ class SemanticSearcher:
         
         if self.index is None:
             if not self._load_index():
-                return self.build_index(target_dir, extensions)
+                return self.build_index(target_dir, extensions, resume=False)
         
         if not hasattr(self.index, 'remove_ids'):
             logger.info("Rebuilding index for incremental update support...")
-            return self.build_index(target_dir, extensions)
+            return self.build_index(target_dir, extensions, resume=False)
 
-        current_files: Set[str] = set()
-        for root, dirs, files in os.walk(target_dir):
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ('node_modules', '__pycache__', 'venv', '.git')]
-            for file in files:
-                if any(file.endswith(ext) for ext in extensions):
-                    current_files.add(os.path.join(root, file))
+        current_files = list_files(target_dir, extensions)
+        current_set = set(current_files)
+        deleted_files = [path for path in self.file_cache if path not in current_set]
+        for file_path in deleted_files:
+            del self.file_cache[file_path]
 
-        added_files = []
-        modified_files = []
-        deleted_files = []
+        # 削除ファイルのチャンクと、中断されたビルドで残ったどのファイルにも属さないチャンクを削除
+        ids_to_remove = orphan_ids(self.metadata, self.file_cache)
+        remove_ids(self.index, self.metadata, ids_to_remove)
 
+        # 変更判定（読み込み・ハッシュ計算）とチャンク分割はワーカーでまとめて行う
+        jobs = []
         for file_path in current_files:
-            try:
-                file_info = self._get_file_info(file_path)
-                if file_path not in self.file_cache:
-                    added_files.append((file_path, file_info))
-                elif self._is_file_changed(file_path, file_info):
-                    modified_files.append((file_path, file_info))
-            except Exception as e:
-                logger.warning(f"Error checking {file_path}: {e}")
-
-        for cached_path in list(self.file_cache.keys()):
-            if cached_path not in current_files:
-                deleted_files.append(cached_path)
-
-        if not added_files and not modified_files and not deleted_files:
+            cached = self.file_cache.get(file_path, {})
+            jobs.append((file_path, cached.get("mtime"), cached.get("content_hash")))
+        counts = self._index_files(jobs, os.path.abspath(target_dir))
+
+        if not (counts["added"] or counts["modified"] or ids_to_remove or self._build_in_progress):
             return "Index is up to date. No changes detected."
 
-        ids_to_remove = []
-        for file_path in deleted_files + [f[0] for f in modified_files]:
-            if file_path in self.file_cache:
-                ids_to_remove.extend(self.file_cache[file_path].get("chunk_ids", []))
-                del self.file_cache[file_path]
-
-        if ids_to_remove:
-            self.index.remove_ids(np.array(ids_to_remove, dtype=np.int64))
-            self.metadata = [c for c in self.metadata if c["id"] not in ids_to_remove]
-
-        new_chunks = []
-        for file_path, file_info in added_files + modified_files:
-            try:
-                content = file_info["content"]
-                
-                if file_path.endswith(".md"):
-                    chunks = self.chunker.chunk_by_sections(content, file_path)
-                else:
-                    chunks = self.chunker.chunk_generic(content, file_path)
-                
-                chunk_ids = []
-                for chunk in chunks:
-                    chunk["id"] = self._next_id
-                    chunk_ids.append(self._next_id)
-                    self._next_id += 1
-                new_chunks.extend(chunks)
-                
-                self.file_cache[file_path] = {
-                    "mtime": file_info["mtime"],
-                    "content_hash": file_info["content_hash"],
-                    "chunk_ids": chunk_ids
-                }
-            except Exception as e:
-                logger.warning(f"Error processing {file_path}: {e}")
-
-        if new_chunks:
-            texts = [c["content"] for c in new_chunks]
-            batch_size = 100
-            embeddings_list = []
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i + batch_size]
-                embeddings_list.append(self.get_embeddings(batch_texts))
-
-            embeddings = np.vstack(embeddings_list)
-            ids = np.array([c["id"] for c in new_chunks], dtype=np.int64)
-            self.index.add_with_ids(embeddings, ids)
-            self.metadata.extend(new_chunks)
-
-        self._save_index()
+        self._save_index(target_dir=os.path.abspath(target_dir))
         
         return (f"Incremental update complete: "
-                f"+{len(added_files)} added, "
-                f"~{len(modified_files)} modified, "
+                f"+{counts['added']} added, "
+                f"~{counts['modified']} modified, "
                 f"-{len(deleted_files)} deleted, "
-                f"{len(new_chunks)} new chunks indexed.")
+                f"{counts['chunks']} new chunks indexed.")
 
     def search(self, query: str, top_k: int = 5) -> str:
         if self.index is None:
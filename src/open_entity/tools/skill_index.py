@@ -0,0 +1,317 @@
+"""
+スキルのキーワードマッチ用インデックス
+
+SkillConfig.matches_input と同じ判定を、事前計算したデータで行う。
+
+- CompiledSkillMatcher: スキルごとに名前の変形・description のキーワード集合・
+  語幹（キーワードの先頭4/5文字）集合を1回だけ作る
+- SkillMatchIndex: 全スキル横断のインデックス
+  - キーワード → スキルの転置インデックス（単語の完全一致）
+  - 名前・名前のパーツ・長いキーワードのトライ（入力中の部分一致を入力長に比例する手間で検出）
+  - 語幹 → スキル（navigate↔navigation 等）
+  - description の 3-gram → スキルのビット集合（入力の単語が description に含まれるかの候補絞り込み）
+
+sync() は SkillConfig オブジェクトの差し替え（SKILL.md の更新で再パースされたもの）を
+検出し、変わったスキルだけを入れ替える。
+"""
+
+import threading
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+# 一般的すぎる単語（キーワードから除外）
+STOP_WORDS = frozenset({
+    'this', 'that', 'with', 'from', 'when', 'user', 'asks', 'create',
+    'build', 'make', 'code', 'using', 'includes', 'examples', 'skill',
+    'guide', 'helps', 'uses', 'like', 'such', 'also', 'some', 'more',
+    'than', 'into', 'your', 'they', 'will', 'have', 'been', 'about',
+    'the', 'and', 'for', 'are', 'not', 'can', 'use', 'how', 'its',
+})
+_DESC_STRIP = '.,()[]/:'
+_INPUT_STRIP = '.,()[]/:?!'
+# 部分一致に使うキーワード・単語の最短長
+MIN_SUBSTRING_LEN = 5
+
+
+def input_words(input_lower: str) -> Set[str]:
+    """入力から判定に使う単語（3文字以上）を取り出す"""
+    words = set()
+    for w in input_lower.split():
+        w_clean = w.strip(_INPUT_STRIP)
+        if len(w_clean) >= 3:
+            words.add(w_clean)
+    return words
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _stem(word: str) -> Optional[str]:
+    """語幹（5文字以上なら先頭5文字、4文字なら先頭4文字）"""
+    if len(word) < 4:
+        return None
+    return word[:5] if len(word) >= 5 else word[:4]
+
+
+class CompiledSkillMatcher:
+    """1つのスキルについて事前計算したマッチ条件"""
+
+    __slots__ = ("key", "name_variants", "name_parts", "desc_lower", "keywords", "long_keywords", "stems")
+
+    def __init__(self, name: str, description: str):
+        self.key = (name, description)
+        self.name_variants = (
+            name.lower(),
+            name.replace('-', ' ').lower(),
+            name.replace('-', '').lower(),
+        )
+        # 2パーツ以上の名前のみ、3文字以上のパーツが全て含まれればマッチ
+        parts = name.lower().split('-')
+        self.name_parts: Optional[Tuple[str, ...]] = (
+            tuple(p for p in parts if len(p) >= 3) if len(parts) >= 2 else None
+        )
+        self.desc_lower = description.lower() if description else ""
+        keywords = set()
+        for word in self.desc_lower.split():
+            word_clean = word.strip(_DESC_STRIP)
+            if len(word_clean) >= 3:
+                keywords.add(word_clean)
+        keywords -= STOP_WORDS
+        self.keywords: FrozenSet[str] = frozenset(keywords)
+        self.long_keywords = tuple(kw for kw in keywords if len(kw) >= MIN_SUBSTRING_LEN)
+        self.stems: FrozenSet[str] = frozenset(kw[:n] for kw in keywords for n in (4, 5) if len(kw) >= n)
+
+    def matches(self, input_lower: str, words: Set[str]) -> bool:
+        # 1. スキル名マッチ
+        for variant in self.name_variants:
+            if variant in input_lower:
+                return True
+        if self.name_parts is not None and all(part in input_lower for part in self.name_parts):
+            return True
+
+        # 2. description ベースのマッチング
+        if not self.desc_lower:
+            return False
+        # 完全一致（単語レベル）: 2つ以上一致
+        if len(words & self.keywords) >= 2:
+            return True
+        # description キーワードが入力テキストに含まれる
+        for kw in self.long_keywords:
+            if kw in input_lower:
+                return True
+        # 入力の単語が description テキストに含まれる
+        for w in words:
+            if len(w) >= MIN_SUBSTRING_LEN and w in self.desc_lower:
+                return True
+        # 語幹マッチ
+        for w in words:
+            stem = _stem(w)
+            if stem is not None and stem in self.stems:
+                return True
+        return False
+
+
+class _TrieNode:
+    __slots__ = ("children", "skills", "parts")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.skills: Set[str] = set()  # ここで終わる語が含まれればマッチするスキル
+        self.parts: Set[str] = set()  # ここで終わる名前のパーツ
+
+
+class SkillMatchIndex:
+    """全スキル横断のキーワードマッチインデックス（スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._skills: Dict[str, Any] = {}  # name -> インデックス済みの SkillConfig
+        self._matchers: Dict[str, CompiledSkillMatcher] = {}
+        self._root = _TrieNode()
+        self._tokens: Dict[str, Set[str]] = defaultdict(set)
+        self._stems: Dict[str, Set[str]] = defaultdict(set)
+        self._part_skills: Dict[str, Set[str]] = defaultdict(set)
+        # 名前の条件が常に成り立つスキル（空の変形・3文字以上のパーツがない複合名）
+        self._always: Set[str] = set()
+        # description の 3-gram -> スキルのビット集合（ビット番号は _slot_names の添字）
+        self._grams: Dict[str, int] = {}
+        self._slots: Dict[str, int] = {}
+        self._slot_names: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+        self.stats = {"added": 0, "removed": 0, "queries": 0}
+
+    def __len__(self) -> int:
+        return len(self._skills)
+
+    # -- maintenance -------------------------------------------------------
+    def sync(self, skills: Dict[str, Any]) -> None:
+        """skills の内容に合わせる（差し替わった SkillConfig だけ入れ替え）"""
+        with self._lock:
+            self._sync(skills)
+
+    def _sync(self, skills: Dict[str, Any]) -> None:
+        for name in [n for n, s in self._skills.items() if skills.get(n) is not s]:
+            self._remove(name)
+        for name, skill in skills.items():
+            if name not in self._skills and not skill.disable_model_invocation:
+                self._add(name, skill)
+
+    def _add(self, name: str, skill: Any) -> None:
+        matcher = skill._compiled_matcher()
+        self._skills[name] = skill
+        self._matchers[name] = matcher
+        for variant in matcher.name_variants:
+            if not variant:
+                self._always.add(name)
+            else:
+                self._trie_node(variant).skills.add(name)
+        if matcher.name_parts is not None:
+            if not matcher.name_parts:
+                self._always.add(name)
+            for part in matcher.name_parts:
+                self._part_skills[part].add(name)
+                self._trie_node(part).parts.add(part)
+        if matcher.desc_lower:
+            for kw in matcher.keywords:
+                self._tokens[kw].add(name)
+            for kw in matcher.long_keywords:
+                self._trie_node(kw).skills.add(name)
+            for stem in matcher.stems:
+                self._stems[stem].add(name)
+            slot = self._free_slots.pop() if self._free_slots else len(self._slot_names)
+            if slot == len(self._slot_names):
+                self._slot_names.append(None)
+            self._slot_names[slot] = name
+            self._slots[name] = slot
+            bit = 1 << slot
+            for gram in _grams(matcher.desc_lower):
+                self._grams[gram] = self._grams.get(gram, 0) | bit
+        self.stats["added"] += 1
+
+    def _remove(self, name: str) -> None:
+        self._skills.pop(name, None)
+        matcher = self._matchers.pop(name, None)
+        self._always.discard(name)
+        if matcher is None:
+            return
+        for word in matcher.name_variants + matcher.long_keywords:
+            node = self._find_node(word)
+            if node is not None:
+                node.skills.discard(name)
+        for part in matcher.name_parts or ():
+            owners = self._part_skills.get(part)
+            if owners is not None:
+                owners.discard(name)
+                if not owners:
+                    del self._part_skills[part]
+                    node = self._find_node(part)
+                    if node is not None:
+                        node.parts.discard(part)
+        for table, keys in ((self._tokens, matcher.keywords), (self._stems, matcher.stems)):
+            for key in keys:
+                owners = table.get(key)
+                if owners is not None:
+                    owners.discard(name)
+                    if not owners:
+                        del table[key]
+        slot = self._slots.pop(name, None)
+        if slot is not None:
+            mask = ~(1 << slot)
+            for gram in _grams(matcher.desc_lower):
+                bits = self._grams.get(gram, 0) & mask
+                if bits:
+                    self._grams[gram] = bits
+                else:
+                    self._grams.pop(gram, None)
+            self._slot_names[slot] = None
+            self._free_slots.append(slot)
+        self.stats["removed"] += 1
+
+    def _trie_node(self, word: str) -> _TrieNode:
+        node = self._root
+        for ch in word:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _TrieNode()
+            node = child
+        return node
+
+    def _find_node(self, word: str) -> Optional[_TrieNode]:
+        node = self._root
+        for ch in word:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    # -- query -------------------------------------------------------------
+    def match(self, user_input: str, skills: Dict[str, Any]) -> List[Any]:
+        """
+        user_input にマッチするスキルを skills の順で返す
+
+        結果は全スキルに SkillConfig.matches_input を適用した場合と同じ。
+        """
+        input_lower = user_input.lower()
+        words = input_words(input_lower)
+        with self._lock:
+            self._sync(skills)
+            self.stats["queries"] += 1
+            hits = self._match_names(input_lower, words)
+        return [skill for name, skill in skills.items() if name in hits]
+
+    def _match_names(self, input_lower: str, words: Set[str]) -> Set[str]:
+        hits = set(self._always)
+
+        # 名前・名前のパーツ・長いキーワードの部分一致（トライを入力の各位置から辿る）
+        found_parts: Set[str] = set()
+        root = self._root.children
+        length = len(input_lower)
+        for start in range(length):
+            node = root.get(input_lower[start])
+            pos = start + 1
+            while node is not None:
+                if node.skills:
+                    hits |= node.skills
+                if node.parts:
+                    found_parts |= node.parts
+                if pos >= length:
+                    break
+                node = node.children.get(input_lower[pos])
+                pos += 1
+        candidates: Set[str] = set()
+        for part in found_parts:
+            candidates |= self._part_skills.get(part, set())
+        for name in candidates - hits:
+            if all(part in found_parts for part in self._matchers[name].name_parts):
+                hits.add(name)
+
+        # 完全一致（単語レベル）: 2つ以上一致
+        counts: Dict[str, int] = defaultdict(int)
+        for w in words:
+            for name in self._tokens.get(w, ()):
+                counts[name] += 1
+        hits.update(name for name, count in counts.items() if count >= 2)
+
+        # 語幹マッチ
+        for w in words:
+            stem = _stem(w)
+            if stem is not None:
+                hits |= self._stems.get(stem, set())
+
+        # 入力の単語が description テキストに含まれる（3-gram で候補を絞ってから確認）
+        for w in words:
+            if len(w) < MIN_SUBSTRING_LEN:
+                continue
+            bits = self._grams.get(w[:3], 0)
+            for i in range(1, len(w) - 2):
+                if not bits:
+                    break
+                bits &= self._grams.get(w[i:i + 3], 0)
+            while bits:
+                low = bits & -bits
+                name = self._slot_names[low.bit_length() - 1]
+                if name not in hits and w in self._matchers[name].desc_lower:
+                    hits.add(name)
+                bits ^= low
+        return hits
@@ -22,6 +22,7 @@ import time
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, field
 from .security_scanner import SecurityScanner
+from .skill_index import CompiledSkillMatcher, SkillMatchIndex, input_words
 
 try:
     import yaml
@@ -43,6 +44,11 @@ _MOCO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 _PROJECT_ROOT = os.path.dirname(_MOCO_ROOT)
 
 
+# パース済み SKILL.md のキャッシュ: file_path -> ((SKILL.md の mtime, サイズ, スキルディレクトリの mtime), SkillConfig)
+# スキルディレクトリの mtime は index.js / scripts 等の追加（is_logic の判定）を拾うため
+_parsed_skills: Dict[str, Tuple[Tuple[int, int, int], Optional["SkillConfig"]]] = {}
+
+
 def _find_profiles_dir() -> str:
     """profiles ディレクトリを探索して見つける"""
     # 1. MOCO_PROFILES_DIR 環境変数（最優先）
@@ -113,86 +119,32 @@ class SkillConfig:
     context: str = ""
     agent: str = ""
 
+    # matches_input 用の事前計算（name / description が変わったら作り直す）
+    _matcher: Optional[CompiledSkillMatcher] = field(default=None, init=False, repr=False, compare=False)
+
+    def _compiled_matcher(self) -> CompiledSkillMatcher:
+        matcher = self._matcher
+        if matcher is None or matcher.key != (self.name, self.description):
+            matcher = self._matcher = CompiledSkillMatcher(self.name, self.description)
+        return matcher
+
     def matches_input(self, user_input: str) -> bool:
         """Check if this skill matches user input (description-based, Claude Code compatible).
 
         Skills with disable_model_invocation=True are never auto-matched
         (they can only be invoked explicitly by the user via /name).
+
+        Matching (see skill_index.CompiledSkillMatcher):
+        1. スキル名（またはその全パーツ）が入力に含まれる
+        2. description のキーワードと入力の単語が2つ以上一致、長い語の部分一致、
+           語幹（先頭5文字）の一致（navigate↔navigation, scrape↔scraping 等）
+
+        Many skills at once: use SkillLoader.keyword_matches (inverted index).
         """
         if self.disable_model_invocation:
             return False
-
         input_lower = user_input.lower()
-
-        # 1. スキル名マッチ（名前が入力に含まれていればマッチ）
-        name_variants = [
-            self.name.lower(),
-            self.name.replace('-', ' ').lower(),
-            self.name.replace('-', '').lower(),
-        ]
-        for variant in name_variants:
-            if variant in input_lower:
-                return True
-
-        # スキル名の各パーツが入力に含まれていればマッチ
-        name_parts = self.name.lower().split('-')
-        if len(name_parts) >= 2:
-            if all(part in input_lower for part in name_parts if len(part) >= 3):
-                return True
-
-        # 2. description ベースのマッチング（Claude Code 標準方式）
-        if self.description:
-            desc_lower = self.description.lower()
-
-            # description からキーワードを抽出
-            important_keywords = set()
-            for word in desc_lower.split():
-                word_clean = word.strip('.,()[]/:')
-                if len(word_clean) >= 3:
-                    important_keywords.add(word_clean)
-
-            # 一般的すぎる単語を除外
-            stop_words = {'this', 'that', 'with', 'from', 'when', 'user', 'asks', 'create',
-                         'build', 'make', 'code', 'using', 'includes', 'examples', 'skill',
-                         'guide', 'helps', 'uses', 'like', 'such', 'also', 'some', 'more',
-                         'than', 'into', 'your', 'they', 'will', 'have', 'been', 'about',
-                         'the', 'and', 'for', 'are', 'not', 'can', 'use', 'how', 'its'}
-            important_keywords -= stop_words
-
-            # 入力から単語を抽出
-            input_words = set()
-            for w in input_lower.split():
-                w_clean = w.strip('.,()[]/:?!')
-                if len(w_clean) >= 3:
-                    input_words.add(w_clean)
-
-            # 完全一致（単語レベル）: 2つ以上一致
-            exact_matches = input_words & important_keywords
-            if len(exact_matches) >= 2:
-                return True
-
-            # description キーワードが入力テキストに含まれる（部分一致）
-            for kw in important_keywords:
-                if len(kw) >= 5 and kw in input_lower:
-                    return True
-
-            # 入力の単語が description テキストに含まれる（逆方向部分一致）
-            # 短い単語の偽陽性を防ぐため5文字以上に制限
-            for w in input_words:
-                if len(w) >= 5 and w in desc_lower:
-                    return True
-
-            # 語幹マッチ: 共通プレフィックスが5文字以上なら同じ語幹とみなす
-            # navigate↔navigation, click↔clicking, scrape↔scraping 等
-            for w in input_words:
-                if len(w) < 4:
-                    continue
-                stem = w[:5] if len(w) >= 5 else w[:4]
-                for kw in important_keywords:
-                    if len(kw) >= len(stem) and kw[:len(stem)] == stem:
-                        return True
-
-        return False
+        return self._compiled_matcher().matches(input_lower, input_words(input_lower))
 
 
 class SkillLoader:
@@ -237,6 +189,8 @@ class SkillLoader:
         self._skills_indexed = False
         self._skill_mtimes: Dict[str, float] = {}  # スキルごとの更新日時
         self._indexed_skills: set = set()  # インデックス済みスキル名
+        # キーワードマッチ用インデックス（変更されたスキルだけ差し替える）
+        self._match_index = SkillMatchIndex()
 
     def _get_skill_mtimes(self) -> Dict[str, float]:
         """各スキルファイルの更新日時を取得"""
@@ -311,14 +265,41 @@ class SkillLoader:
 
         for file_path in files:
             try:
-                skill = self._parse_skill_file(file_path)
-                if skill:
-                    skills[skill.name] = skill
-            except Exception as e:
-                logger.warning(f"Failed to load skill from {file_path}: {e}")
+                stat = os.stat(file_path)
+                dir_mtime = os.stat(os.path.dirname(file_path)).st_mtime_ns
+            except OSError:
+                continue
+            key = (stat.st_mtime_ns, stat.st_size, dir_mtime)
+            cached = _parsed_skills.get(file_path)
+            if cached is not None and cached[0] == key:
+                skill = cached[1]
+            else:
+                # 変更されたファイルだけ再パースする
+                try:
+                    skill = self._parse_skill_file(file_path)
+                except Exception as e:
+                    logger.warning(f"Failed to load skill from {file_path}: {e}")
+                    continue
+                _parsed_skills[file_path] = (key, skill)
+            if skill:
+                skills[skill.name] = skill
+
+        # 削除されたスキルのキャッシュを捨てる
+        prefix = self.skills_dir + os.sep
+        current = set(files)
+        for file_path in [p for p in _parsed_skills if p.startswith(prefix) and p not in current]:
+            _parsed_skills.pop(file_path, None)
 
         return skills
 
+    def keyword_matches(
+        self, user_input: str, skills: Optional[Dict[str, SkillConfig]] = None
+    ) -> List[SkillConfig]:
+        """Skills whose matches_input(user_input) is True, in skills order (index-backed)."""
+        if skills is None:
+            skills = self.load_skills()
+        return self._match_index.match(user_input, skills)
+
     def _parse_skill_file(self, file_path: str) -> Optional[SkillConfig]:
         """Parse SKILL.md file and return SkillConfig"""
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -459,9 +440,8 @@ class SkillLoader:
         scores: Dict[str, float] = {}
 
         # キーワードベースのマッチング（スコア = 0 で最優先）
-        for skill in skills.values():
-            if skill.matches_input(user_input):
-                scores[skill.name] = 0.0  # キーワードマッチは最優先
+        for skill in self.keyword_matches(user_input, skills):
+            scores[skill.name] = 0.0  # キーワードマッチは最優先
 
         # セマンティックマッチング（有効な場合）
         should_use_semantic = use_semantic if use_semantic is not None else self.use_semantic
@@ -5,23 +5,31 @@ from local and remote registries.
 """
 
 import json
+from contextvars import ContextVar
 from typing import Optional
 from .skill_loader import SkillLoader
 
 # グローバルなスキルローダーとロード済みスキルのキャッシュ
 _skill_loader: Optional[SkillLoader] = None
-_loaded_skills: dict = {}  # {skill_name: SkillConfig}
+_global_loaded_skills: dict = {}  # {skill_name: SkillConfig}
+# Orchestrator のリクエストごとのロード済みスキル（並行セッションごとに分離）
+# to_thread で実行されるツールからも同じ dict を更新できるよう、dict 自体は差し替えずに変更する
+_session_loaded_skills: ContextVar[Optional[dict]] = ContextVar("_session_loaded_skills", default=None)
+
+
+def _loaded() -> dict:
+    skills = _session_loaded_skills.get()
+    return _global_loaded_skills if skills is None else skills
 
 
 def get_loaded_skills() -> dict:
     """Get all currently loaded skills (for use by Orchestrator)."""
-    return _loaded_skills
+    return _loaded()
 
 
 def clear_session_skills():
     """Clear loaded skills at session start."""
-    global _loaded_skills
-    _loaded_skills = {}
+    _session_loaded_skills.set({})
 
 
 def _get_loader() -> SkillLoader:
@@ -81,28 +89,29 @@ def search_skills(query: str, include_remote: bool = True) -> str:
                             "name": name,
                             "description": local_skills[name].description[:200],
                             "source": "local",
-                            "loaded": name in _loaded_skills
+                            "loaded": name in _loaded()
                         })
                     else:
                         results.append({
                             "name": name,
                             "description": r.get("description", "")[:200],
                             "source": "remote:anthropics",
-                            "loaded": name in _loaded_skills
+                            "loaded": name in _loaded()
                         })
         except Exception:
             # セマンティック検索失敗時はキーワード検索にフォールバック
             pass
     
     # ローカルスキルをキーワード検索（セマンティック検索でヒットしなかったもの）
-    for name, skill in local_skills.items():
-        if name not in matched_names and skill.matches_input(query):
+    for skill in loader.keyword_matches(query, local_skills):
+        name = skill.name
+        if name not in matched_names:
             matched_names.add(name)
             results.append({
                 "name": name,
                 "description": skill.description[:200],
                 "source": "local",
-                "loaded": name in _loaded_skills
+                "loaded": name in _loaded()
             })
     
     if not results:
@@ -134,12 +143,12 @@ def load_skill(skill_name: str, source: str = "auto") -> str:
         load_skill("pdf")
         load_skill("frontend-design", source="remote")
     """
-    global _loaded_skills
+    loaded_skills = _loaded()
     loader = _get_loader()
     
     # 既にロード済みならキャッシュから返す
-    if skill_name in _loaded_skills:
-        skill = _loaded_skills[skill_name]
+    if skill_name in loaded_skills:
+        skill = loaded_skills[skill_name]
         return f"[Skill: {skill.name} (cached)]\n\n{skill.content}"
     
     skill = None
@@ -161,7 +170,7 @@ def load_skill(skill_name: str, source: str = "auto") -> str:
         return f"Error: Skill '{skill_name}' not found. Use search_skills() to find available skills."
     
     # キャッシュに保存
-    _loaded_skills[skill_name] = skill
+    loaded_skills[skill_name] = skill
     
     # スキルの内容を返す
     result = f"""[Skill: {skill.name} v{skill.version}]
@@ -181,12 +190,13 @@ def list_loaded_skills() -> str:
     Returns:
         JSON string with list of loaded skill names and descriptions
     """
-    if not _loaded_skills:
+    loaded_skills = _loaded()
+    if not loaded_skills:
         return json.dumps({"message": "No skills currently loaded", "skills": []})
     
     skills = [
         {"name": name, "description": skill.description[:100]}
-        for name, skill in _loaded_skills.items()
+        for name, skill in loaded_skills.items()
     ]
     
     return json.dumps({
@@ -201,9 +211,9 @@ def clear_loaded_skills() -> str:
     Returns:
         Confirmation message
     """
-    global _loaded_skills
-    count = len(_loaded_skills)
-    _loaded_skills = {}
+    loaded_skills = _loaded()
+    count = len(loaded_skills)
+    loaded_skills.clear()
     return f"Cleared {count} loaded skills from cache."
 
 
@@ -3,17 +3,17 @@
 """
 
 import os
+from contextvars import ContextVar
 from pathlib import Path
 from typing import Optional
 
-# 現在のセッションID（todo.py と同様のパターン）
-_current_session_id: Optional[str] = None
+# 現在のセッションID（todo.py と同様のパターン、並行セッションごとに分離）
+_current_session_id_var: ContextVar[Optional[str]] = ContextVar("_stats_current_session_id", default=None)
 
 
 def set_current_session(session_id: str) -> None:
     """現在のセッションIDを設定（Orchestrator から呼ばれる）"""
-    global _current_session_id
-    _current_session_id = session_id
+    _current_session_id_var.set(session_id)
 
 
 def _get_tracker():
@@ -107,8 +107,8 @@ def get_session_stats() -> str:
     - 同じエージェントに何度も振っていないかチェック
     - 失敗したエージェントを避ける
     """
-    global _current_session_id
-    
+    _current_session_id = _current_session_id_var.get()
+
     if not _current_session_id:
         return "セッションが開始されていません。"
     
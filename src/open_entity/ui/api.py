@@ -8,10 +8,8 @@ import secrets
 import re
 import asyncio
 import base64
-import queue
 import tempfile
 import threading
-import time
 import uuid
 from typing import Optional, Any, Dict, List, Tuple
 from fastapi import FastAPI, HTTPException, WebSocket, Query, Request
@@ -31,6 +29,9 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from open_entity.core.orchestrator import Orchestrator
+from open_entity.core.orchestrator_pool import OrchestratorPool, orchestrator_pool_enabled
+from open_entity.core.run_context import request_scope
+from open_entity.ui.sse_bridge import SSEEventBridge
 from open_entity.storage.session_logger import SessionLogger
 from open_entity.tools.discovery import _find_profiles_dir
 from open_entity.cancellation import (
@@ -364,19 +365,34 @@ class ApprovalManager:
 approval_manager = ApprovalManager()
 
 
-def get_orchestrator(profile: str, provider: str = None, verbose: bool = False, working_directory: str = None) -> Orchestrator:
+def _build_orchestrator(profile: str, provider: str = None, model: str = None, working_directory: str = None, verbose: bool = False) -> Orchestrator:
     """Orchestratorインスタンスを新規生成"""
-    # 作業ディレクトリ: 引数 > 環境変数 > カレントディレクトリ
-    work_dir = working_directory or os.getenv("MOCO_WORKING_DIRECTORY") or os.getcwd()
     return Orchestrator(
         profile=profile,
         provider=provider,
+        model=model,
         session_logger=session_logger,
         verbose=verbose,
-        working_directory=work_dir
+        working_directory=working_directory
     )
 
 
+# 構築済み Orchestrator を (profile, provider, model, working_directory, verbose) ごとに使い回す
+orchestrator_pool = OrchestratorPool.from_env(_build_orchestrator)
+
+
+def get_orchestrator(profile: str, provider: str = None, verbose: bool = False, working_directory: str = None, model: str = None) -> Orchestrator:
+    """Orchestratorインスタンスを取得（プールから再利用、MOCO_ORCHESTRATOR_POOL=off なら新規生成）
+
+    進捗コールバックは構築時に渡さず、request_scope() 内で attach_progress_callback を使うこと。
+    """
+    # 作業ディレクトリ: 引数 > 環境変数 > カレントディレクトリ
+    work_dir = working_directory or os.getenv("MOCO_WORKING_DIRECTORY") or os.getcwd()
+    if not orchestrator_pool_enabled():
+        return _build_orchestrator(profile, provider, model, work_dir, verbose)
+    return orchestrator_pool.get(profile, provider, model, work_dir, verbose)
+
+
 # 一時ファイルを管理するためのディレクトリ
 _TEMP_ATTACHMENTS_DIR = os.path.join(tempfile.gettempdir(), "moco_attachments")
 os.makedirs(_TEMP_ATTACHMENTS_DIR, exist_ok=True)
@@ -1124,49 +1140,31 @@ async def chat_stream(req: ChatRequest, request: Request):
     """チャット（ストリーミング）- Server-Sent Events with real-time tool updates"""
     _verify_api_token(request)
 
-    # イベントキュー（スレッド間通信用）
-    event_queue = queue.Queue()
-
-    # thinking イベントのバッチ化用
-    thinking_buffer = ""
-    last_thinking_time = 0
+    # 実行スレッドからイベントループへのイベントブリッジ
+    # （連続する chunk / thinking は送信時に1フレームにまとまる）
+    bridge = SSEEventBridge.from_env(asyncio.get_running_loop())
     last_agent_name = "orchestrator"
 
     # 進捗コールバック
     def progress_callback(event_type: str, name: str = None, detail: str = "", agent_name: str = None, parent_agent: str = None, status: str = "running", tool_name: str = None, content: str = None, result: str = None, **kwargs):
-        nonlocal thinking_buffer, last_thinking_time, last_agent_name
+        nonlocal last_agent_name
         
         current_agent = agent_name or last_agent_name or "orchestrator"
         last_agent_name = current_agent
 
         if event_type == "thinking":
-            thinking_buffer += (content or "")
-            current_time = time.time()
-            # 100文字以上、または0.2秒経過したら送信
-            if len(thinking_buffer) >= 100 or (current_time - last_thinking_time) >= 0.2:
-                event_queue.put({
-                    "type": "thinking",
-                    "content": thinking_buffer,
-                    "agent": current_agent
-                })
-                thinking_buffer = ""
-                last_thinking_time = current_time
-            return
-
-        # 思考以外のイベントが発生した場合はバッファをフラッシュ（順序維持）
-        if thinking_buffer:
-            event_queue.put({
+            bridge.put({
                 "type": "thinking",
-                "content": thinking_buffer,
+                "content": content or "",
                 "agent": current_agent
             })
-            thinking_buffer = ""
-            
+            return
+
         if event_type == "flush":
             return
 
         if event_type == "chunk":
-            event_queue.put({
+            bridge.put({
                 "type": "chunk",
                 "content": content,
                 "agent": current_agent
@@ -1189,14 +1187,14 @@ async def chat_stream(req: ChatRequest, request: Request):
         if event_type == "recall":
             results = kwargs.get("results", [])
             for res in results:
-                event_queue.put({
+                bridge.put({
                     "type": "recall",
                     "recall_type": "Memory",
                     "query": detail or "Semantic Recall",
                     "details": res.get("content", "") if isinstance(res, dict) else str(res)
                 })
         elif event_type == "delegate" and status == "running":
-            event_queue.put({
+            bridge.put({
                 "type": "recall",
                 "recall_type": "Delegation",
                 "query": f"→ @{clean_name}",
@@ -1204,7 +1202,7 @@ async def chat_stream(req: ChatRequest, request: Request):
             })
         elif event_type == "tool" and status == "completed":
             # ツール実行結果もインサイトに表示
-            event_queue.put({
+            bridge.put({
                 "type": "recall",
                 "recall_type": "Tool",
                 "query": f"🛠️ {tool_name or clean_name}",
@@ -1222,19 +1220,15 @@ async def chat_stream(req: ChatRequest, request: Request):
             "name": clean_name,
             "detail": detail
         }
-        event_queue.put(data)
-
-    # Orchestrator をコールバック付きで作成
-    # 作業ディレクトリ: リクエスト > 環境変数 > カレントディレクトリ
-    work_dir = req.working_directory or os.getenv("MOCO_WORKING_DIRECTORY") or os.getcwd()
-    orchestrator = Orchestrator(
-        profile=req.profile,
-        provider=req.provider,
+        bridge.put(data)
+
+    # Orchestrator を取得（コールバックは実行スレッドのリクエストスコープで設定する）
+    orchestrator = get_orchestrator(
+        req.profile,
+        req.provider,
+        req.verbose,
+        req.working_directory,
         model=req.model,  # OpenRouter用モデル名
-        session_logger=session_logger,
-        verbose=req.verbose,
-        progress_callback=progress_callback,
-        working_directory=work_dir
     )
 
     session_id = req.session_id
@@ -1251,7 +1245,6 @@ async def chat_stream(req: ChatRequest, request: Request):
 
     # 結果を格納する変数
     result_holder = {"response": None, "error": None, "cancelled": False, "temp_files": temp_files}
-    stop_event = threading.Event()
 
     # プロンプトの拡張
     expanded_message = req.message
@@ -1270,74 +1263,84 @@ async def chat_stream(req: ChatRequest, request: Request):
 
     def run_orchestrator():
         try:
-            result_holder["response"] = orchestrator.run_sync(expanded_message, session_id=session_id)
-            # 完了直前に強制フラッシュ
-            progress_callback(event_type="flush")
+            # プールの Orchestrator は他のリクエストと共有されるため、このリクエストのスコープにだけ設定する
+            with request_scope():
+                orchestrator.attach_progress_callback(progress_callback)
+                result_holder["response"] = orchestrator.run_sync(expanded_message, session_id=session_id)
         except OperationCancelled:
             result_holder["cancelled"] = True
             # キャンセル時は特別なイベントを投げる
-            event_queue.put({"type": "cancelled", "message": "Task was cancelled by user."})
+            bridge.put({"type": "cancelled", "message": "Task was cancelled by user."})
         except Exception as e:
             result_holder["error"] = str(e)
         finally:
             # clear_cancel_event はバックエンド側の check_cancelled 内でも呼ばれる可能性があるが、
             # 万が一の漏れを防ぐためここでも呼ぶ。ただし二重呼び出しは問題ない設計。
             clear_cancel_event(session_id)
-            if not stop_event.is_set():
-                event_queue.put({"type": "done"})
+            bridge.put({"type": "done"})
+            bridge.close()
 
     # バックグラウンドで実行
     thread = threading.Thread(target=run_orchestrator, daemon=True)
     thread.start()
 
+    def sse(event: Dict[str, Any]) -> str:
+        return f"data: {json.dumps(event)}\n\n"
+
     async def generate():
         # 開始イベント
-        yield f"data: {json.dumps({'type': 'start', 'session_id': session_id})}\n\n"
-        await asyncio.sleep(0.01)
+        yield sse({'type': 'start', 'session_id': session_id})
 
         has_sent_chunks = False
 
         try:
             while True:
-                try:
-                    # ノンブロッキングでキューをチェック
-                    event = event_queue.get(timeout=0.1)
-
+                # 溜まったイベントをまとめて受け取り、1回の書き込みで送る
+                events = await bridge.drain()
+                frames = []
+                finished = not events
+                for event in events:
                     if event["type"] == "done":
-                        # 完了 - チャンクが一度も送られていない場合のみ、最終結果を送信
-                        if result_holder["cancelled"]:
-                            # キャンセルメッセージは別途送信済み（type: cancelled）だが、
-                            # クライアント側の処理確実化のために status: cancelled も送る
-                            yield f"data: {json.dumps({'type': 'status', 'status': 'cancelled', 'content': 'Operation cancelled.'})}\n\n"
-                        elif result_holder["error"]:
-                            yield f"data: {json.dumps({'type': 'error', 'message': result_holder['error']})}\n\n"
-                        elif not has_sent_chunks:
-                            response = result_holder["response"] or ""
-                            # verbose でない場合はフィルタリング
-                            response = filter_response_for_display(response, req.verbose)
-                            # 結果をチャンクで送信
-                            chunk_size = 100
-                            for i in range(0, len(response), chunk_size):
-                                chunk = response[i:i+chunk_size]
-                                yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
-                                await asyncio.sleep(0.01)
-
-                        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                        finished = True
                         break
-                    elif event["type"] == "chunk":
+                    if event["type"] == "chunk":
                         has_sent_chunks = True
-                        yield f"data: {json.dumps(event)}\n\n"
-                        await asyncio.sleep(0.01)
-                    else:
-                        # 進捗イベント
-                        yield f"data: {json.dumps(event)}\n\n"
-                        await asyncio.sleep(0.01)
-
-                except queue.Empty:
-                    # キューが空 - 少し待つ
-                    await asyncio.sleep(0.05)
+                    frames.append(sse(event))
+
+                if finished and bridge.stalled:
+                    # 送信が詰まってイベントを破棄した（done も届かない）。通常の完了としては扱わない
+                    running = thread.is_alive()
+                    frames.append(sse({'type': 'status', 'status': 'stalled', 'running': running, 'session_id': session_id}))
+                    frames.append(sse({
+                        'type': 'error',
+                        'message': 'Stream stalled and events were dropped'
+                                   + ('; the task is still running' if running else '')
+                                   + '. Reload the session to see the result.',
+                    }))
+                elif finished:
+                    # 完了 - チャンクが一度も送られていない場合のみ、最終結果を送信
+                    if result_holder["cancelled"]:
+                        # キャンセルメッセージは別途送信済み（type: cancelled）だが、
+                        # クライアント側の処理確実化のために status: cancelled も送る
+                        frames.append(sse({'type': 'status', 'status': 'cancelled', 'content': 'Operation cancelled.'}))
+                    elif result_holder["error"]:
+                        frames.append(sse({'type': 'error', 'message': result_holder['error']}))
+                    elif not has_sent_chunks:
+                        response = result_holder["response"] or ""
+                        # verbose でない場合はフィルタリング
+                        response = filter_response_for_display(response, req.verbose)
+                        chunk_size = bridge.max_frame_chars
+                        for i in range(0, len(response), chunk_size):
+                            frames.append(sse({'type': 'chunk', 'content': response[i:i + chunk_size]}))
+                    frames.append(sse({'type': 'done'}))
+
+                if frames:
+                    yield "".join(frames)
+                if finished:
+                    break
         finally:
-            stop_event.set()
+            # 切断時も実行スレッドを待たせないようにする
+            bridge.detach()
             # 一時ファイルのクリーンアップ
             for temp_file in result_holder.get("temp_files", []):
                 try:
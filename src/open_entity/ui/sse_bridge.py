@@ -0,0 +1,180 @@
+"""
+スレッドで動く Orchestrator のイベントを asyncio の SSE ジェネレーターへ渡すブリッジ
+
+/api/chat/stream は Orchestrator.run_sync を別スレッドで実行する。
+以前は queue.Queue をイベントループ上でブロッキング取得していたため、
+ポーリングのたびに他の接続まで止まっていた。
+
+- 生産側（任意のスレッド）: put() でイベントを積み、loop.call_soon_threadsafe で消費側を起こす
+- 消費側（イベントループ）: await drain() で溜まったイベントをまとめて受け取る
+- 連続する chunk / thinking は同じエージェントなら1フレームにまとめる
+- 送信は最短 min_flush_interval 秒ごとにまとめて行い、高負荷時の書き込み回数を抑える
+- 接続ごとのバッファ上限を超えたら生産側を待たせる（バックプレッシャー）。
+  一定時間消費されなければ接続が詰まったとみなして以降のイベントを破棄する
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# まとめる対象のイベント
+COALESCE_TYPES = ("chunk", "thinking")
+DEFAULT_MAX_BUFFER_BYTES = 1024 * 1024
+DEFAULT_MAX_FRAME_CHARS = 4096
+DEFAULT_PRODUCER_TIMEOUT = 30.0
+DEFAULT_MIN_FLUSH_INTERVAL = 0.02
+
+
+def _event_size(event: Dict[str, Any]) -> int:
+    """バッファ上限の判定用の概算サイズ"""
+    size = 64
+    for value in event.values():
+        if isinstance(value, str):
+            size += len(value)
+    return size
+
+
+class SSEEventBridge:
+    """
+    1接続分のイベントブリッジ
+
+    Args:
+        loop: 消費側のイベントループ
+        max_buffer_bytes: 未送信イベントの上限（概算バイト数）
+        max_frame_chars: chunk / thinking をまとめる最大文字数
+        producer_timeout: バッファが空くのを生産側が待つ最大秒数
+        min_flush_interval: drain が返る最短間隔（秒、0 で即時）
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        max_buffer_bytes: int = DEFAULT_MAX_BUFFER_BYTES,
+        max_frame_chars: int = DEFAULT_MAX_FRAME_CHARS,
+        producer_timeout: float = DEFAULT_PRODUCER_TIMEOUT,
+        min_flush_interval: float = DEFAULT_MIN_FLUSH_INTERVAL,
+    ):
+        self.loop = loop
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_frame_chars = max_frame_chars
+        self.producer_timeout = producer_timeout
+        self.min_flush_interval = min_flush_interval
+        self._last_flush = 0.0
+        self._cond = threading.Condition()
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._bytes = 0
+        self._closed = False
+        self._detached = False
+        # 消費が止まり生産側がイベントを破棄し始めた（実行自体は続いている）
+        self.stalled = False
+        self._wake_scheduled = False
+        self._wakeup = asyncio.Event()
+        self.stats = {"events": 0, "frames": 0, "coalesced": 0, "dropped": 0, "waits": 0}
+
+    @classmethod
+    def from_env(cls, loop: asyncio.AbstractEventLoop) -> "SSEEventBridge":
+        try:
+            max_buffer = int(os.environ.get("MOCO_SSE_MAX_BUFFER", DEFAULT_MAX_BUFFER_BYTES))
+        except ValueError:
+            max_buffer = DEFAULT_MAX_BUFFER_BYTES
+        try:
+            flush_interval = float(os.environ.get("MOCO_SSE_FLUSH_INTERVAL", DEFAULT_MIN_FLUSH_INTERVAL))
+        except ValueError:
+            flush_interval = DEFAULT_MIN_FLUSH_INTERVAL
+        return cls(loop, max_buffer_bytes=max_buffer, min_flush_interval=flush_interval)
+
+    # -- producer side -----------------------------------------------------
+    def put(self, event: Dict[str, Any]) -> bool:
+        """イベントを積む（任意のスレッドから）。破棄した場合 False"""
+        size = _event_size(event)
+        with self._cond:
+            if self._detached or self._closed:
+                self.stats["dropped"] += 1
+                return False
+            if self._bytes + size > self.max_buffer_bytes and self._pending:
+                self.stats["waits"] += 1
+                drained = self._cond.wait_for(
+                    lambda: self._detached or not self._pending or self._bytes + size <= self.max_buffer_bytes,
+                    timeout=self.producer_timeout,
+                )
+                if not drained:
+                    logger.warning("SSE consumer stalled; dropping further events for this stream")
+                    self._detached = True
+                    self.stalled = True
+                if self._detached:
+                    self.stats["dropped"] += 1
+                    return False
+            self.stats["events"] += 1
+            last = self._pending[-1] if self._pending else None
+            if (
+                last is not None
+                and event.get("type") in COALESCE_TYPES
+                and last.get("type") == event.get("type")
+                and last.get("agent") == event.get("agent")
+                and len(last.get("content") or "") + len(event.get("content") or "") <= self.max_frame_chars
+            ):
+                last["content"] = (last.get("content") or "") + (event.get("content") or "")
+                self.stats["coalesced"] += 1
+            else:
+                self._pending.append(dict(event))
+            self._bytes += size
+            wake = not self._wake_scheduled
+            self._wake_scheduled = True
+        if wake:
+            self._notify()
+        return True
+
+    def close(self) -> None:
+        """生産側の終了（以降の put は破棄）"""
+        with self._cond:
+            self._closed = True
+            self._wake_scheduled = True
+        self._notify()
+
+    def _notify(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # イベントループが既に終了している
+            pass
+
+    # -- consumer side -----------------------------------------------------
+    async def drain(self) -> List[Dict[str, Any]]:
+        """
+        溜まったイベントをまとめて返す。生産側が終了して空なら []
+
+        stalled が立っている場合の [] は実行の完了ではない（以降のイベントが破棄された）。
+        """
+        # 前回の送信から間がなければ少し待ってまとめる
+        remaining = self._last_flush + self.min_flush_interval - self.loop.time()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        while True:
+            with self._cond:
+                if self._pending:
+                    batch = list(self._pending)
+                    self._pending.clear()
+                    self._bytes = 0
+                    self._wake_scheduled = False
+                    self.stats["frames"] += len(batch)
+                    self._cond.notify_all()
+                    self._last_flush = self.loop.time()
+                    return batch
+                if self._closed or self._detached:
+                    return []
+                self._wake_scheduled = False
+                self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def detach(self) -> None:
+        """消費側の終了（クライアント切断など）。待っている生産側を解放する"""
+        with self._cond:
+            self._detached = True
+            self._pending.clear()
+            self._bytes = 0
+            self._cond.notify_all()
@@ -0,0 +1,162 @@
+"""
+/api/chat/stream の負荷テスト
+
+Web API を子プロセスの uvicorn で起動し、N 本の SSE ストリームを同時に張って
+イベントの配送遅延（生成 → クライアント受信）と、負荷中の /health の応答時間
+（イベントループが詰まっていないか）を計測する。
+
+LLM 呼び出しを含めずストリーミング経路だけを測るため、Orchestrator は
+一定間隔で chunk / tool イベントを出す合成実装に差し替える。
+
+使い方:
+    python -m open_entity.ui.sse_loadtest --streams 100 --events 200 --interval 0.005
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+
+class _SyntheticOrchestrator:
+    """一定間隔で進捗イベントを出すだけの Orchestrator 代替"""
+
+    def __init__(self, events: int, interval: float):
+        self.events = events
+        self.interval = interval
+        self._callback = None
+
+    def create_session(self, title: str = "New Session", **metadata) -> str:
+        return uuid.uuid4().hex
+
+    def attach_progress_callback(self, callback) -> None:
+        self._callback = callback
+
+    def run_sync(self, user_input: str, session_id: Optional[str] = None) -> str:
+        for i in range(self.events):
+            if i % 20 == 0:
+                self._callback(event_type="tool", name="read_file", tool_name="read_file", status="completed", result="ok")
+            # 送信時刻を本文に埋め込み、受信側で遅延を計算する
+            self._callback(event_type="chunk", content=f"{time.perf_counter():.6f} ")
+            time.sleep(self.interval)
+        return ""
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _serve(port_queue, events: int, interval: float) -> None:
+    """サーバープロセス本体（クライアントと GIL を共有しないよう別プロセスで動かす）"""
+    import uvicorn
+    from . import api
+
+    api.get_orchestrator = lambda *args, **kwargs: _SyntheticOrchestrator(events, interval)
+    config = uvicorn.Config(api.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port_queue.put(server.servers[0].sockets[0].getsockname()[1])
+    thread.join()
+
+
+async def _run_streams(base_url: str, streams: int) -> Dict[str, Any]:
+    import httpx
+
+    latencies: List[float] = []
+    first_event: List[float] = []
+    health: List[float] = []
+    errors = 0
+    done = asyncio.Event()
+
+    async def one(client: "httpx.AsyncClient") -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        got_first = False
+        try:
+            async with client.stream("POST", f"{base_url}/api/chat/stream", json={"message": "load test"}) as response:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    now = time.perf_counter()
+                    event = json.loads(line[6:])
+                    if event.get("type") == "chunk":
+                        if not got_first:
+                            first_event.append(now - started)
+                            got_first = True
+                        for stamp in event.get("content", "").split():
+                            latencies.append(now - float(stamp))
+                    elif event.get("type") in ("done", "error"):
+                        if event.get("type") == "error":
+                            errors += 1
+                        break
+        except Exception:
+            errors += 1
+
+    async def probe(client: "httpx.AsyncClient") -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get(f"{base_url}/health")
+            health.append(time.perf_counter() - started)
+            await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=streams + 10, max_keepalive_connections=streams + 10)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        prober = asyncio.create_task(probe(client))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client) for _ in range(streams)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    ms = lambda v: round(v * 1000, 2) if v is not None else None  # noqa: E731
+    return {
+        "streams": streams,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "events": len(latencies),
+        "event_p50_ms": ms(_percentile(latencies, 0.5)),
+        "event_p99_ms": ms(_percentile(latencies, 0.99)),
+        "first_event_p99_ms": ms(_percentile(first_event, 0.99)),
+        "health_p50_ms": ms(statistics.median(health) if health else None),
+        "health_p99_ms": ms(_percentile(health, 0.99)),
+    }
+
+
+def run_loadtest(streams: int = 100, events: int = 200, interval: float = 0.005) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    port_queue = ctx.Queue()
+    server = ctx.Process(target=_serve, args=(port_queue, events, interval), daemon=True)
+    server.start()
+    try:
+        port = port_queue.get(timeout=120)
+        return asyncio.run(_run_streams(f"http://127.0.0.1:{port}", streams))
+    finally:
+        server.terminate()
+        server.join(10)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="/api/chat/stream load test")
+    parser.add_argument("--streams", type=int, default=100, help="同時ストリーム数")
+    parser.add_argument("--events", type=int, default=200, help="ストリームあたりの chunk 数")
+    parser.add_argument("--interval", type=float, default=0.005, help="chunk の間隔（秒）")
+    args = parser.parse_args(argv)
+
+    result = run_loadtest(args.streams, args.events, args.interval)
+    for key, value in result.items():
+        print(f"{key:<20} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+CostTracker の累計・内訳のテスト
+
+- 記録時に更新する累計が明細から計算した値と一致すること
+- max_records を超えて明細を破棄しても累計・内訳は残ること
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from open_entity.core.cost_tracker import CostTracker, TokenUsage
+
+MODELS = ("gemini-2.0-flash", "gpt-4o", "claude-3-5-sonnet")
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _fill(tracker: CostTracker, n: int, seed: int = 0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        records.append(tracker.record(
+            provider=rng.choice(("gemini", "openai", "anthropic")),
+            model=rng.choice(MODELS),
+            usage=TokenUsage(input_tokens=rng.randint(1, 5000), output_tokens=rng.randint(1, 2000)),
+            session_id=rng.choice(("s1", "s2", None)),
+            agent_name=rng.choice(("coder", "reviewer", None)),
+            timestamp=BASE + timedelta(minutes=7 * i),
+        ))
+    return records
+
+
+class TestRunningAggregates:
+    def test_totals_match_records(self):
+        tracker = CostTracker(max_records=None)
+        records = _fill(tracker, 300)
+
+        assert tracker.get_total_cost() == pytest.approx(sum(r.cost_usd for r in records))
+        tokens = tracker.get_total_tokens()
+        assert tokens.input_tokens == sum(r.usage.input_tokens for r in records)
+        assert tokens.output_tokens == sum(r.usage.output_tokens for r in records)
+        for session_id in ("s1", "s2"):
+            expected = sum(r.cost_usd for r in records if r.session_id == session_id)
+            assert tracker.get_cost_by_session(session_id) == pytest.approx(expected)
+        for agent in ("coder", "reviewer"):
+            expected = sum(r.cost_usd for r in records if r.agent_name == agent)
+            assert tracker.get_cost_by_agent(agent) == pytest.approx(expected)
+        for provider in ("gemini", "openai", "anthropic"):
+            expected = sum(r.cost_usd for r in records if r.provider == provider)
+            assert tracker.get_cost_by_provider(provider.upper()) == pytest.approx(expected)
+
+    def test_period_cost_matches_records(self):
+        tracker = CostTracker(max_records=None)
+        records = _fill(tracker, 300)
+        start = BASE + timedelta(hours=3, minutes=20)
+        end = BASE + timedelta(hours=20, minutes=5)
+        expected = sum(r.cost_usd for r in records if start <= r.timestamp <= end)
+        assert tracker.get_cost_by_period(start, end) == pytest.approx(expected)
+
+    def test_indexed_record_queries(self):
+        tracker = CostTracker(max_records=None)
+        records = _fill(tracker, 100)
+        found = tracker.get_records(session_id="s1", agent_name="coder")
+        expected = [r for r in records if r.session_id == "s1" and r.agent_name == "coder"]
+        assert sorted(found, key=lambda r: r.timestamp) == expected
+        assert tracker.get_records(limit=5) == sorted(records, key=lambda r: r.timestamp, reverse=True)[:5]
+
+
+class TestRollup:
+    def test_totals_survive_dropped_records(self):
+        tracker = CostTracker(max_records=50)
+        records = _fill(tracker, 200)
+
+        assert len(tracker.get_records()) == 50
+        assert tracker.get_records() == sorted(records[-50:], key=lambda r: r.timestamp, reverse=True)
+        assert tracker.get_total_cost() == pytest.approx(sum(r.cost_usd for r in records))
+        expected = sum(r.cost_usd for r in records if r.session_id == "s1")
+        assert tracker.get_cost_by_session("s1") == pytest.approx(expected)
+
+        summary = tracker.get_summary()
+        assert summary.record_count == 200
+        assert summary.total_cost == pytest.approx(sum(r.cost_usd for r in records))
+        assert summary.period_start == records[0].timestamp
+        assert sum(summary.breakdown_by_model.values()) == pytest.approx(summary.total_cost)
+
+    def test_whole_hours_use_rolled_up_buckets(self):
+        tracker = CostTracker(max_records=10)
+        records = _fill(tracker, 100)
+        # 破棄済みの明細も、期間に完全に含まれる時間帯の累計として反映される
+        start = BASE
+        end = BASE + timedelta(hours=5)
+        expected = sum(r.cost_usd for r in records if start <= r.timestamp < end)
+        assert tracker.get_cost_by_period(start, end) == pytest.approx(expected)
+
+    def test_clear_resets_aggregates(self):
+        tracker = CostTracker(max_records=10)
+        _fill(tracker, 30)
+        tracker.clear()
+        assert tracker.get_total_cost() == 0
+        assert tracker.get_summary().record_count == 0
+        assert tracker.get_records() == []
@@ -0,0 +1,61 @@
+"""
+EmbeddingService のテスト
+
+- 単独の embed() は集約ウィンドウを待たずに送信すること
+- 同時の embed() は少ない API 呼び出しにまとめられること
+"""
+
+import threading
+import time
+
+from open_entity.core.embedding_service import EmbeddingService
+
+
+class _FakeEmbeddings:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def create(self, model, input):
+        with self._lock:
+            self.batches.append(list(input))
+        time.sleep(self.delay)
+        data = [type("D", (), {"index": i, "embedding": [float(len(t)), 1.0]})() for i, t in enumerate(input)]
+        return type("R", (), {"data": data})()
+
+
+class _FakeClient:
+    def __init__(self, delay=0.0):
+        self.embeddings = _FakeEmbeddings(delay)
+
+
+def test_single_embed_does_not_wait_for_the_window():
+    client = _FakeClient()
+    service = EmbeddingService("openai", "m", client=client, batch_window_ms=500)
+    started = time.monotonic()
+    assert service.embed("abc") == [3.0, 1.0]
+    assert time.monotonic() - started < 0.4
+    assert service.get_stats()["api_calls"] == 1
+
+
+def test_concurrent_embeds_are_batched():
+    client = _FakeClient(delay=0.05)
+    service = EmbeddingService("openai", "m", client=client, batch_window_ms=10)
+    texts = [f"text {i}" * (i + 1) for i in range(20)]
+    results = {}
+
+    def run(text):
+        results[text] = service.embed(text)
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in texts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert {t: v[0] for t, v in results.items()} == {t: float(len(t)) for t in texts}
+    assert len(client.embeddings.batches) < len(texts)
+    stats = service.get_stats()
+    assert stats["misses"] == len(texts)
+    assert stats["api_calls"] == len(client.embeddings.batches)
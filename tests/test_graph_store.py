@@ -0,0 +1,55 @@
+"""
+GraphStore のテスト
+
+- get_related は近傍を階層ごとに1回のクエリでロードすること
+"""
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("networkx")
+
+from open_entity.memory import graph  # noqa: E402
+from open_entity.memory.db import init_db  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "memory.db")
+    init_db(path)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO memories (id, content) VALUES (?, 'x')", [(i,) for i in range(1, 8)])
+    conn.commit()
+    conn.close()
+    # a -> b -> c -> d、b -> e、f -> c
+    store = graph.GraphStore(path)
+    for memory_id, (sub, obj) in enumerate([("a", "b"), ("b", "c"), ("c", "d"), ("b", "e"), ("f", "c")], 1):
+        store.add_relation(sub, "rel", obj, memory_id)
+    return path
+
+
+def test_get_related_loads_one_query_per_hop(db_path, monkeypatch):
+    calls = []
+    original = graph.get_conn
+
+    def counting_get_conn(path):
+        calls.append(path)
+        return original(path)
+
+    monkeypatch.setattr(graph, "get_conn", counting_get_conn)
+    store = graph.GraphStore(db_path)
+    related = store.get_related("a", max_hops=3)
+
+    assert len(calls) == 3
+    assert {(r["subject"], r["object"]) for r in related} == {
+        ("a", "b"), ("b", "c"), ("b", "e"), ("c", "d"), ("f", "c"),
+    }
+    assert related[0] == {"subject": "a", "predicate": "rel", "object": "b", "memory_id": 1}
+
+
+def test_get_related_respects_max_hops(db_path):
+    store = graph.GraphStore(db_path)
+    assert {(r["subject"], r["object"]) for r in store.get_related("a", max_hops=1)} == {("a", "b")}
+    assert store.get_related("a", max_hops=0) == []
+    assert store.get_related("missing") == []
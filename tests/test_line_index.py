@@ -0,0 +1,102 @@
+"""
+行オフセットインデックスのテスト
+
+LineIndex で切り出したウィンドウが、ファイル全体を splitlines() した結果の
+スライスと一致することを確認する。
+"""
+
+import os
+import random
+
+import pytest
+
+from open_entity.tools import line_index as li
+
+
+def _write(path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _random_lines(rng: random.Random, n: int):
+    alphabet = "abc xyz 012 日本語 é\t"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(n)]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    with li._cache_lock:
+        li._cache.clear()
+    yield
+    with li._cache_lock:
+        li._cache.clear()
+
+
+CASES = {
+    "lf_trailing": lambda lines: "\n".join(lines) + "\n",
+    "lf_no_trailing": lambda lines: "\n".join(lines),
+    "crlf": lambda lines: "\r\n".join(lines) + "\r\n",
+    "blank_lines": lambda lines: "\n\n".join(lines) + "\n\n",
+}
+
+
+class TestLineIndex:
+    @pytest.mark.parametrize("case", sorted(CASES))
+    @pytest.mark.parametrize("n_lines", [0, 1, 63, 64, 65, 128, 1000])
+    def test_windows_match_splitlines(self, tmp_path, case, n_lines):
+        rng = random.Random(n_lines)
+        text = CASES[case](_random_lines(rng, n_lines))
+        path = tmp_path / "file.txt"
+        _write(path, text.encode("utf-8"))
+        expected = text.splitlines()
+
+        index = li.get_line_index(str(path))
+        assert index is not None
+        assert index.line_count == len(expected)
+        windows = [(0, 10), (0, len(expected) + 5), (63, 2), (64, 64), (len(expected) - 1, 3), (len(expected) + 3, 5)]
+        windows += [(rng.randint(0, max(0, len(expected))), rng.randint(1, 200)) for _ in range(20)]
+        for start, count in windows:
+            assert index.read_lines(start, count) == expected[max(0, start):max(0, start) + count], (start, count)
+
+    @pytest.mark.parametrize("separator", ["\r", "\x0b", "\x0c", "\u2028", "\x85"])
+    def test_other_line_breaks_are_not_indexed(self, tmp_path, separator):
+        path = tmp_path / "file.txt"
+        _write(path, f"a\nb{separator}c\n".encode("utf-8"))
+        assert li.get_line_index(str(path)) is None
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.txt"
+        _write(path, b"")
+        index = li.get_line_index(str(path))
+        assert index.line_count == 0
+        assert index.read_lines(0, 10) == []
+
+    def test_cache_is_invalidated_on_change(self, tmp_path):
+        path = tmp_path / "file.txt"
+        _write(path, b"one\ntwo\n")
+        first = li.get_line_index(str(path))
+        assert li.get_line_index(str(path)) is first
+        _write(path, b"one\ntwo\nthree\nfour\n")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        second = li.get_line_index(str(path))
+        assert second is not first
+        assert second.read_lines(2, 5) == ["three", "four"]
+
+    def test_prime_from_written_content(self, tmp_path):
+        path = tmp_path / "file.txt"
+        content = "\n".join(f"line {i}" for i in range(300)) + "\n"
+        _write(path, content.encode("utf-8"))
+        li.prime_line_index(str(path), content)
+        index = li.get_line_index(str(path))
+        assert index.line_count == 300
+        assert index.read_lines(250, 3) == ["line 250", "line 251", "line 252"]
+        assert li.get_cache_info()[0] == 1
+
+    def test_prime_with_mismatched_size_invalidates(self, tmp_path):
+        path = tmp_path / "file.txt"
+        _write(path, b"a\r\nb\r\n")
+        li.get_line_index(str(path))
+        # 改行変換などでファイルと内容のサイズが合わない場合は破棄のみ
+        li.prime_line_index(str(path), "a\nb\n")
+        assert li.get_cache_info()[0] == 0
@@ -0,0 +1,131 @@
+"""
+LLMResponseCache のテスト
+
+- 完全一致層は名前空間（provider / model / temperature / max_tokens / response_format）ごとに区別すること
+- TTL を過ぎた応答はメモリ層・SQLite 層のどちらからも返さないこと
+- _prune は件数上限を超えた古い応答を削除し、類似層を読み直すこと
+- 類似層はしきい値以上の類似度でだけヒットすること
+- 名前空間は _parse_ns で元に戻ること
+"""
+
+import pytest
+
+from open_entity.core import llm_cache
+from open_entity.core.llm_cache import LLMResponseCache
+
+NS = LLMResponseCache.namespace("openai", "gpt-4o-mini", 0.0, 256, "json")
+
+# 「cat」との類似度: kitten ≈ 0.990 / near = 0.96 / dog = 0
+_VECTORS = {
+    "cat": [1.0, 0.0, 0.0],
+    "kitten": [0.99, 0.14, 0.0],
+    "near": [0.96, 0.28, 0.0],
+    "dog": [0.0, 1.0, 0.0],
+    "bird": [0.0, 0.0, 1.0],
+    "fish": [0.0, 0.6, 0.8],
+    "frog": [0.6, 0.0, 0.8],
+}
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+
+def _semantic_cache(path=None, **kwargs):
+    return LLMResponseCache(path=path, semantic_threshold=0.97, embed_fn=_VECTORS.__getitem__, **kwargs)
+
+
+def test_exact_hit_and_namespace_miss(clock):
+    cache = LLMResponseCache()
+    cache.put(NS, "prompt", "answer")
+    assert cache.get(NS, "prompt") == "answer"
+    assert cache.get(NS, "other prompt") is None
+    for other in [
+        LLMResponseCache.namespace("zai", "gpt-4o-mini", 0.0, 256, "json"),
+        LLMResponseCache.namespace("openai", "gpt-4o", 0.0, 256, "json"),
+        LLMResponseCache.namespace("openai", "gpt-4o-mini", 0.3, 256, "json"),
+        LLMResponseCache.namespace("openai", "gpt-4o-mini", 0.0, 512, "json"),
+        LLMResponseCache.namespace("openai", "gpt-4o-mini", 0.0, 256, None),
+    ]:
+        assert cache.get(other, "prompt") is None
+    stats = cache.get_stats()
+    assert (stats["exact_hits"], stats["misses"], stats["stores"]) == (1, 6, 1)
+
+
+def test_ttl_expiry_in_memory_tier(clock):
+    cache = LLMResponseCache(ttl=10)
+    cache.put(NS, "prompt", "answer")
+    clock.now += 9
+    assert cache.get(NS, "prompt") == "answer"
+    clock.now += 2
+    assert cache.get(NS, "prompt") is None
+    assert cache.get_stats()["memory_entries"] == 0
+
+
+def test_ttl_expiry_in_sqlite_tier(clock, tmp_path):
+    path = tmp_path / "llm_cache.db"
+    LLMResponseCache(path=path, ttl=10).put(NS, "prompt", "answer")
+
+    # 別インスタンス（メモリ層は空）は SQLite から読む
+    cache = LLMResponseCache(path=path, ttl=10)
+    clock.now += 9
+    assert cache.get(NS, "prompt") == "answer"
+    cache._memory.clear()
+    clock.now += 2
+    assert cache.get(NS, "prompt") is None
+
+
+def test_prune_evicts_oldest_past_max_entries_and_reloads_vectors(clock, tmp_path):
+    cache = _semantic_cache(tmp_path / "llm_cache.db", max_entries=3)
+    for i, text in enumerate(["cat", "dog", "bird", "fish", "frog"]):
+        clock.now += 1
+        cache.put(NS, f"prompt {text}", f"answer {i}", semantic=True, semantic_text=text)
+
+    with cache._lock:
+        cache._prune(clock.time())
+    assert cache.stats["evictions"] == 2
+    assert cache._vectors_loaded is False
+    remaining = {row[0] for row in cache._conn.execute("SELECT response FROM responses")}
+    assert remaining == {"answer 2", "answer 3", "answer 4"}
+
+    # 類似層は SQLite に残った分だけを読み直す
+    assert cache.get(NS, "unseen", semantic=True, semantic_text="cat") is None
+    assert {k for v in cache._vectors.values() for k in v} == {
+        cache.key(NS, f"prompt {text}") for text in ["bird", "fish", "frog"]
+    }
+    assert cache.get(NS, "unseen", semantic=True, semantic_text="bird") == "answer 2"
+
+
+def test_semantic_hit_and_miss_around_threshold(clock):
+    cache = _semantic_cache()
+    cache.put(NS, "classify: cat", "animal", semantic=True, semantic_text="cat")
+    assert cache.get(NS, "classify: kitten", semantic=True, semantic_text="kitten") == "animal"
+    assert cache.get(NS, "classify: near", semantic=True, semantic_text="near") is None
+    assert cache.get(NS, "classify: dog", semantic=True, semantic_text="dog") is None
+    # semantic=False なら類似層は使わない
+    assert cache.get(NS, "classify: kitten", semantic_text="kitten") is None
+    # 別の名前空間の embedding とは比較しない
+    other = LLMResponseCache.namespace("openai", "gpt-4o", 0.0, 256, "json")
+    assert cache.get(other, "classify: kitten", semantic=True, semantic_text="kitten") is None
+    stats = cache.get_stats()
+    assert (stats["semantic_hits"], stats["misses"]) == (1, 4)
+
+
+@pytest.mark.parametrize("ns", [
+    NS,
+    LLMResponseCache.namespace("gemini", "gemini-2.0-flash", 0.3, None, None),
+    LLMResponseCache.namespace("openrouter", "moonshotai/kimi-k2", 1, 16384, "json"),
+])
+def test_namespace_round_trip(ns):
+    assert LLMResponseCache._parse_ns(LLMResponseCache._ns_id(ns)) == ns
@@ -0,0 +1,134 @@
+"""
+llm_provider のクライアントプールと再試行のテスト
+
+- 呼び出しごとに別のイベントループ（asyncio.run）でも同じ非同期クライアントを使うこと
+- 同時実行枠は呼び出し元のループをまたいで共有されること
+- 429 / 5xx は再試行し、それ以外の 4xx は再試行しないこと
+- Retry-After に従い、RETRY_MAX_DELAY を超える値は頭打ちにすること
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from open_entity.core import llm_provider
+
+
+class _FakeCompletions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    async def create(self, **kwargs):
+        owner = self.owner
+        with owner.lock:
+            owner.loops.add(asyncio.get_running_loop())
+            owner.active += 1
+            owner.max_active = max(owner.max_active, owner.active)
+        await asyncio.sleep(0.02)
+        with owner.lock:
+            owner.active -= 1
+        if owner.errors:
+            raise owner.errors.pop(0)
+        message = type("M", (), {"content": f"echo {kwargs['messages'][-1]['content']}"})()
+        return type("R", (), {"choices": [type("C", (), {"message": message})()]})()
+
+
+class _FakeAsyncOpenAI:
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.lock = threading.Lock()
+        self.loops = set()
+        self.active = 0
+        self.max_active = 0
+        self.errors = []
+        self.closed = False
+        self.chat = type("Chat", (), {"completions": _FakeCompletions(self)})()
+        _FakeAsyncOpenAI.instances.append(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        headers = {} if retry_after is None else {"retry-after": retry_after}
+        self.response = type("Resp", (), {"headers": headers})()
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(llm_provider, "OPENAI_AVAILABLE", True)
+    monkeypatch.setattr(llm_provider, "AsyncOpenAI", _FakeAsyncOpenAI, raising=False)
+    monkeypatch.setattr(llm_provider, "RETRY_BASE_DELAY", 0.0)
+    _FakeAsyncOpenAI.instances = []
+    llm_provider.reset_llm_clients()
+    yield _FakeAsyncOpenAI.instances
+    llm_provider.reset_llm_clients()
+
+
+def _generate(prompt):
+    return asyncio.run(llm_provider.agenerate_text(prompt, provider="openai", model="m"))
+
+
+def test_async_client_is_reused_across_caller_loops(fake_openai):
+    assert [_generate(f"p{i}") for i in range(3)] == ["echo p0", "echo p1", "echo p2"]
+    assert len(fake_openai) == 1
+    client = fake_openai[0]
+    assert client.loops == {llm_provider._llm_loop.loop}
+
+    llm_provider.reset_llm_clients()
+    assert _generate("again") == "echo again"
+    assert len(fake_openai) == 2
+    assert client.closed
+
+
+def test_concurrency_limit_spans_caller_loops(fake_openai, monkeypatch):
+    monkeypatch.setenv("MOCO_LLM_MAX_CONCURRENCY", "2")
+    threads = [threading.Thread(target=_generate, args=(f"p{i}",)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    assert len(fake_openai) == 1
+    assert fake_openai[0].max_active == 2
+
+
+def test_retryable_errors_are_retried(fake_openai, monkeypatch):
+    monkeypatch.setenv("MOCO_LLM_MAX_RETRIES", "2")
+    _generate("warm")
+    client = fake_openai[0]
+    client.errors = [_StatusError(429), _StatusError(503)]
+    assert _generate("p") == "echo p"
+
+    client.errors = [_StatusError(400)]
+    with pytest.raises(_StatusError):
+        _generate("p")
+    assert client.errors == []
+
+
+@pytest.mark.parametrize("status, expected", [
+    (408, True), (409, True), (429, True), (500, True), (503, True),
+    (400, False), (401, False), (403, False), (404, False), (422, False),
+])
+def test_is_retryable_by_status(status, expected):
+    assert llm_provider._is_retryable(_StatusError(status)) is expected
+
+
+def test_is_retryable_connection_errors():
+    assert llm_provider._is_retryable(ConnectionError("reset"))
+    assert llm_provider._is_retryable(TimeoutError())
+    assert not llm_provider._is_retryable(ValueError("bad"))
+
+
+def test_retry_after_is_honoured_and_capped():
+    assert llm_provider._retry_delay(_StatusError(429, "2"), 0) == 2.0
+    assert llm_provider._retry_delay(_StatusError(429, "100"), 0) == llm_provider.RETRY_MAX_DELAY
+    for attempt in range(10):
+        delay = llm_provider._retry_delay(_StatusError(429, "soon"), attempt)
+        assert 0 <= delay <= min(llm_provider.RETRY_MAX_DELAY, llm_provider.RETRY_BASE_DELAY * 2 ** attempt)
+    assert 0 <= llm_provider._retry_delay(_StatusError(503), 0) <= llm_provider.RETRY_BASE_DELAY
@@ -0,0 +1,144 @@
+"""
+記憶ストアのテスト
+
+- EmbeddingMatrix の一括スコアが従来の cos_sim（1件ずつ）と一致すること
+- JSON 形式の embedding が float32 BLOB 列へ移行されること
+- FTS5 trigram 検索で短いトークン（"AI" 等）も取りこぼさないこと
+"""
+
+import json
+import random
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from open_entity.memory.db import init_db  # noqa: E402
+from open_entity.memory.serialization import deserialize_embedding_blob  # noqa: E402
+from open_entity.memory.service import MemoryService  # noqa: E402
+from open_entity.memory.similarity import cos_sim  # noqa: E402
+from open_entity.memory.vector_index import EmbeddingMatrix  # noqa: E402
+
+
+def _vector(rng: random.Random, dim: int):
+    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+class TestEmbeddingMatrix:
+    def test_scores_match_per_row_cos_sim(self):
+        rng = random.Random(0)
+        matrix = EmbeddingMatrix()
+        embeddings = {i: _vector(rng, 32) for i in range(200)}
+        # 次元の異なる古い行・embedding なし・ゼロベクトル
+        embeddings[500] = _vector(rng, 16)
+        embeddings[501] = []
+        embeddings[502] = [0.0] * 32
+        for memory_id, emb in embeddings.items():
+            matrix.add(memory_id, emb)
+
+        query = _vector(rng, 32)
+        ids = list(embeddings) + [999]
+        scores = matrix.cosine(query, ids)
+
+        for memory_id, emb in embeddings.items():
+            if not emb:
+                assert memory_id not in scores
+                continue
+            assert scores[memory_id] == pytest.approx(cos_sim(query, emb), abs=1e-5)
+        assert 999 not in scores
+
+    def test_replace_and_remove(self):
+        matrix = EmbeddingMatrix()
+        matrix.add(1, [1.0, 0.0])
+        matrix.add(1, [0.0, 1.0])
+        matrix.add(2, [1.0, 1.0])
+        assert matrix.cosine([0.0, 1.0], [1])[1] == pytest.approx(1.0)
+        matrix.remove(2)
+        assert 2 not in matrix
+        assert matrix.missing([1, 2]) == [2]
+
+    def test_eviction_keeps_capacity(self):
+        matrix = EmbeddingMatrix(max_items=10)
+        for i in range(25):
+            matrix.add(i, [float(i + 1), 1.0])
+        assert len(matrix) <= 10
+        assert 24 in matrix
+        scores = matrix.cosine([1.0, 0.0], range(25))
+        for memory_id, score in scores.items():
+            assert score == pytest.approx(cos_sim([1.0, 0.0], [float(memory_id + 1), 1.0]), abs=1e-5)
+
+
+class TestEmbeddingBlobMigration:
+    def test_json_embeddings_are_migrated(self, tmp_path):
+        db_path = str(tmp_path / "memory.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE memories (id INTEGER PRIMARY KEY AUTOINCREMENT, channel_id TEXT, "
+            "content TEXT NOT NULL, type TEXT DEFAULT 'knowledge', keywords TEXT, source TEXT, "
+            "embedding TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+        rng = random.Random(1)
+        originals = {}
+        for i in range(30):
+            emb = _vector(rng, 8)
+            cur = conn.execute(
+                "INSERT INTO memories (content, keywords, embedding) VALUES (?, '[]', ?)",
+                (f"memory {i}", json.dumps(emb)),
+            )
+            originals[cur.lastrowid] = emb
+        conn.execute("INSERT INTO memories (content, keywords, embedding) VALUES ('no embedding', '[]', '')")
+        conn.commit()
+        conn.close()
+
+        init_db(db_path)
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT id, embedding, embedding_blob FROM memories").fetchall()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.close()
+        assert version >= 1
+        for memory_id, emb_json, emb_blob in rows:
+            if memory_id in originals:
+                assert emb_json is None
+                restored = deserialize_embedding_blob(emb_blob)
+                assert list(restored) == pytest.approx(originals[memory_id], abs=1e-6)
+            else:
+                assert emb_blob is None
+
+        # 2回目以降は何もしない
+        init_db(db_path)
+
+
+class TestKeywordSearch:
+    @pytest.fixture
+    def service(self, tmp_path):
+        service = MemoryService(db_path=str(tmp_path / "memory.db"), graph_enabled=False)
+        conn = service._get_conn()
+        for content in ("AI is everywhere", "agent framework notes", "unrelated text", "短い語の記憶"):
+            conn.execute(
+                "INSERT INTO memories (content, type, keywords, created_at) VALUES (?, 'knowledge', '[]', datetime('now'))",
+                (content,),
+            )
+        conn.commit()
+        conn.close()
+        return service
+
+    def _search(self, service, query):
+        return [m["content"] for m in service._fetch_memories(keyword_search=query, include_embeddings=False)]
+
+    def test_long_tokens_use_fts(self, service):
+        assert self._search(service, "agent") == ["agent framework notes"]
+
+    def test_short_tokens_only(self, service):
+        assert self._search(service, "AI") == ["AI is everywhere"]
+
+    def test_mixed_short_and_long_tokens(self, service):
+        results = self._search(service, "AI agent")
+        # FTS のヒットが先、短いトークンの LIKE 一致も含まれる
+        assert results[0] == "agent framework notes"
+        assert "AI is everywhere" in results
+        assert "unrelated text" not in results
+
+    def test_short_japanese_token(self, service):
+        assert "短い語の記憶" in self._search(service, "記憶 framework")
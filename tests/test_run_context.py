@@ -0,0 +1,59 @@
+"""
+ConcurrencyLimiter のテスト
+
+- 別スレッド・別イベントループ（run_sync 相当）からの実行にも同じ上限がかかること
+- 待機中にキャンセルされても枠が失われないこと
+"""
+
+import asyncio
+import threading
+import time
+
+from open_entity.core.run_context import ConcurrencyLimiter
+
+
+def _run_in_threads(limiter, keys, hold=0.05):
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+
+    async def job(key):
+        async with limiter.acquire(key):
+            with lock:
+                active["now"] += 1
+                active["max"] = max(active["max"], active["now"])
+            await asyncio.sleep(hold)
+            with lock:
+                active["now"] -= 1
+
+    threads = [threading.Thread(target=lambda k=key: asyncio.run(job(k))) for key in keys]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    return active["max"]
+
+
+def test_per_key_limit_spans_loops():
+    limiter = ConcurrencyLimiter(max_per_key=1)
+    assert _run_in_threads(limiter, ["SES-1"] * 4) == 1
+
+
+def test_total_limit_spans_loops():
+    limiter = ConcurrencyLimiter(max_total=2, max_per_key=1)
+    assert _run_in_threads(limiter, [f"SES-{i}" for i in range(6)]) == 2
+
+
+def test_cancelled_waiter_does_not_lose_the_slot():
+    limiter = ConcurrencyLimiter(max_per_key=1)
+
+    async def run():
+        async with limiter.acquire("SES-1"):
+            waiter = asyncio.create_task(limiter.acquire("SES-1").__aenter__())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        started = time.monotonic()
+        async with limiter.acquire("SES-1"):
+            return time.monotonic() - started
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=2)) < 1
@@ -0,0 +1,119 @@
+"""
+SemanticMemory のテスト
+
+- 削除・置き換えでインデックスから該当ベクトルが消えること
+- 保存前に削除→追加してから再起動しても、古いベクトルが新しい文書に紐付かないこと
+- 旧スキーマ（doc_id 主キーのみ）からの移行
+"""
+
+import hashlib
+import sqlite3
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from open_entity.storage import semantic_memory as sm  # noqa: E402
+
+DIM = 16
+
+
+def _fake_embedding(self, text: str) -> np.ndarray:
+    """単語ハッシュの bag-of-words（決定的）"""
+    vec = np.zeros(DIM, dtype="float32")
+    for word in text.lower().split():
+        vec[int(hashlib.md5(word.encode()).hexdigest(), 16) % DIM] += 1.0
+    return vec
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(sm.SemanticMemory, "_get_embedding", _fake_embedding)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "semantic.db")
+
+
+def _open(db_path: str) -> "sm.SemanticMemory":
+    return sm.SemanticMemory(db_path=db_path, persist_every=1000)
+
+
+class TestSemanticMemory:
+    def test_add_and_search(self, db_path):
+        memory = _open(db_path)
+        memory.add_document("a", "apple banana")
+        memory.add_document("b", "zebra crossing")
+        results = memory.search("banana", top_k=1)
+        assert [r["doc_id"] for r in results] == ["a"]
+
+    def test_replace_removes_old_vector(self, db_path):
+        memory = _open(db_path)
+        memory.add_document("a", "apple banana")
+        memory.add_document("a", "zebra crossing")
+        assert memory.index.ntotal == 1
+        results = memory.search("zebra crossing", top_k=5)
+        assert [(r["doc_id"], r["content"]) for r in results] == [("a", "zebra crossing")]
+
+    def test_delete_removes_vector(self, db_path):
+        memory = _open(db_path)
+        memory.add_document("a", "apple banana")
+        memory.add_document("b", "zebra crossing")
+        assert memory.delete_document("b") is True
+        assert memory.index.ntotal == 1
+        assert [r["doc_id"] for r in memory.search("zebra", top_k=5)] == ["a"]
+
+    def test_unsaved_delete_then_add_survives_restart(self, db_path):
+        memory = _open(db_path)
+        memory.add_document("a", "apple banana")
+        memory.add_document("b", "banana bread")
+        memory._save_index()
+        # 以下の変更はインデックスに保存されないまま終了する
+        memory.delete_document("b")
+        memory.add_document("c", "zebra crossing")
+
+        reopened = _open(db_path)
+        assert reopened.index.ntotal == 2
+        results = reopened.search("banana", top_k=2)
+        pairs = {(r["doc_id"], r["content"]): r["score"] for r in results}
+        assert ("a", "apple banana") in pairs
+        # 削除した b のベクトルが c に紐付いていない（c は banana と距離 0 にならない）
+        assert pairs.get(("c", "zebra crossing"), 1.0) > 0.0
+        top = reopened.search("zebra crossing", top_k=1)
+        assert [(r["doc_id"], r["score"]) for r in top] == [("c", 0.0)]
+
+    def test_ids_are_not_reused(self, db_path):
+        memory = _open(db_path)
+        memory.add_document("a", "apple")
+        memory.add_document("b", "banana")
+        conn = sqlite3.connect(db_path)
+        (b_id,) = conn.execute("SELECT id FROM semantic_documents WHERE doc_id = 'b'").fetchone()
+        conn.close()
+        memory.delete_document("b")
+        memory.add_document("c", "cherry")
+        conn = sqlite3.connect(db_path)
+        (c_id,) = conn.execute("SELECT id FROM semantic_documents WHERE doc_id = 'c'").fetchone()
+        conn.close()
+        assert c_id > b_id
+
+    def test_migrates_legacy_table(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE semantic_documents (doc_id TEXT PRIMARY KEY, content TEXT NOT NULL, "
+            "metadata TEXT, embedding BLOB, created_at TIMESTAMP NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO semantic_documents VALUES (?, ?, ?, ?, ?)",
+            ("old", "legacy apple", "{}", _fake_embedding(None, "legacy apple").tobytes(), "2024-01-01"),
+        )
+        conn.commit()
+        conn.close()
+
+        memory = _open(db_path)
+        conn = sqlite3.connect(db_path)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(semantic_documents)")]
+        conn.close()
+        assert "id" in columns
+        assert [r["doc_id"] for r in memory.search("legacy apple", top_k=1)] == ["old"]
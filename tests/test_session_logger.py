@@ -0,0 +1,74 @@
+"""
+SessionLogger の書き込みキュー（write-behind）のテスト
+
+- 書き込み直後の読み込みで自分の書き込みが見えること
+- バックグラウンドのコミットが遅くても、コミット中のバッチを待ってから読むこと
+- SESSION_DB_DURABILITY=sync では直接の書き込みも synchronous=FULL で行うこと
+"""
+
+import threading
+import time
+
+import pytest
+
+from open_entity.storage import session_logger as sl
+
+
+@pytest.fixture
+def logger(tmp_path):
+    return sl.SessionLogger(db_path=str(tmp_path / "sessions.db"), background_summary=False)
+
+
+class TestWriteBehind:
+    def test_read_after_write(self, logger):
+        session_id = logger.create_session(profile="test")
+        for i in range(20):
+            logger.log_agent_message(session_id, "user", f"message {i}")
+            messages = logger.get_messages(session_id, limit=100)
+            assert f"message {i}" in [m["content"] for m in messages]
+
+    def test_read_after_write_with_slow_writer(self, logger, monkeypatch):
+        session_id = logger.create_session(profile="test")
+        writer = logger._writer
+        original_write = sl._WriteBehindQueue._write
+        writing = threading.Event()
+
+        def slow_write(self, conn, messages, events, touched):
+            writing.set()
+            time.sleep(0.2)
+            return original_write(self, conn, messages, events, touched)
+
+        monkeypatch.setattr(sl._WriteBehindQueue, "_write", slow_write)
+
+        for i in range(5):
+            writing.clear()
+            logger.log_agent_message(session_id, "user", f"slow {i}")
+            # バックグラウンドのスレッドがバッチを取り出してコミットし始めるまで待つ
+            assert writing.wait(2.0)
+            assert writer.has_pending()
+            messages = logger.get_messages(session_id, limit=100)
+            assert f"slow {i}" in [m["content"] for m in messages]
+
+    def test_flush_commits_everything(self, logger):
+        session_id = logger.create_session(profile="test")
+        for i in range(50):
+            logger.log_agent_message(session_id, "assistant", f"m{i}")
+        logger.flush()
+        assert not logger._writer.has_pending()
+        assert len(logger.get_messages(session_id, limit=100)) == 50
+
+
+class TestDurability:
+    @staticmethod
+    def _synchronous(logger):
+        return logger._get_connection().execute("PRAGMA synchronous").fetchone()[0]
+
+    def test_sync_mode_keeps_full_on_direct_writes(self, tmp_path):
+        db_path = str(tmp_path / "sessions.db")
+        batched = sl.SessionLogger(db_path=db_path, background_summary=False)
+        sync = sl.SessionLogger(db_path=db_path, durability="sync", background_summary=False)
+        # 同じスレッドの接続を共有していてもモードごとの設定になる（FULL=2, NORMAL=1）
+        assert self._synchronous(batched) == 1
+        assert self._synchronous(sync) == 2
+        sync.create_session(profile="test")
+        assert self._synchronous(sync) == 2
@@ -0,0 +1,143 @@
+"""
+スキルのキーワードマッチ用インデックスのテスト
+
+SkillMatchIndex / SkillConfig.matches_input の結果が、インデックス化前の
+matches_input（下の _reference_matches）と一致することを確認する。
+"""
+
+import random
+
+from open_entity.tools.skill_index import SkillMatchIndex
+from open_entity.tools.skill_loader import SkillConfig
+
+STOP_WORDS = {
+    'this', 'that', 'with', 'from', 'when', 'user', 'asks', 'create',
+    'build', 'make', 'code', 'using', 'includes', 'examples', 'skill',
+    'guide', 'helps', 'uses', 'like', 'such', 'also', 'some', 'more',
+    'than', 'into', 'your', 'they', 'will', 'have', 'been', 'about',
+    'the', 'and', 'for', 'are', 'not', 'can', 'use', 'how', 'its',
+}
+
+VOCABULARY = (
+    "browser navigate navigation click clicking scrape scraping page pages pdf "
+    "excel spreadsheet chart charts data analysis report docker deploy deployment "
+    "review reviewer git commit branch test testing pytest api rest graphql image "
+    "resize convert video audio transcribe translate japanese email send calendar "
+    "the and for with code skill make use web db sql query ai ui"
+).split()
+
+
+def _reference_matches(skill: SkillConfig, user_input: str) -> bool:
+    """インデックス化前の SkillConfig.matches_input と同じ判定"""
+    if skill.disable_model_invocation:
+        return False
+    input_lower = user_input.lower()
+    name = skill.name
+    for variant in (name.lower(), name.replace('-', ' ').lower(), name.replace('-', '').lower()):
+        if variant in input_lower:
+            return True
+    name_parts = name.lower().split('-')
+    if len(name_parts) >= 2:
+        if all(part in input_lower for part in name_parts if len(part) >= 3):
+            return True
+    if skill.description:
+        desc_lower = skill.description.lower()
+        keywords = set()
+        for word in desc_lower.split():
+            word_clean = word.strip('.,()[]/:')
+            if len(word_clean) >= 3:
+                keywords.add(word_clean)
+        keywords -= STOP_WORDS
+        words = set()
+        for w in input_lower.split():
+            w_clean = w.strip('.,()[]/:?!')
+            if len(w_clean) >= 3:
+                words.add(w_clean)
+        if len(words & keywords) >= 2:
+            return True
+        for kw in keywords:
+            if len(kw) >= 5 and kw in input_lower:
+                return True
+        for w in words:
+            if len(w) >= 5 and w in desc_lower:
+                return True
+        for w in words:
+            if len(w) < 4:
+                continue
+            stem = w[:5] if len(w) >= 5 else w[:4]
+            for kw in keywords:
+                if len(kw) >= len(stem) and kw[:len(stem)] == stem:
+                    return True
+    return False
+
+
+def _skill(name: str, description: str, disabled: bool = False) -> SkillConfig:
+    return SkillConfig(
+        name=name, description=description, version="1.0", content="", disable_model_invocation=disabled
+    )
+
+
+def _random_text(rng: random.Random, n: int) -> str:
+    words = [rng.choice(VOCABULARY) for _ in range(n)]
+    punct = ("", "", "", ".", ",", "?", "!", ":")
+    return " ".join(w + rng.choice(punct) for w in words)
+
+
+def _random_skills(rng: random.Random, count: int):
+    skills = {}
+    for i in range(count):
+        parts = rng.sample(VOCABULARY, rng.randint(1, 3))
+        name = "-".join(parts) + (f"-{i}" if rng.random() < 0.3 else "")
+        description = _random_text(rng, rng.randint(0, 12)) if rng.random() > 0.1 else ""
+        skills[name] = _skill(name, description, disabled=rng.random() < 0.05)
+    return skills
+
+
+def _expected(skills, user_input):
+    return [s for s in skills.values() if _reference_matches(s, user_input)]
+
+
+class TestSkillMatchIndex:
+    def test_matches_reference_on_random_inputs(self):
+        rng = random.Random(7)
+        skills = _random_skills(rng, 150)
+        index = SkillMatchIndex()
+        for _ in range(400):
+            user_input = _random_text(rng, rng.randint(1, 10))
+            expected = _expected(skills, user_input)
+            assert index.match(user_input, skills) == expected, user_input
+            assert [s for s in skills.values() if s.matches_input(user_input)] == expected
+
+    def test_known_cases(self):
+        skills = {
+            "web-scraper": _skill("web-scraper", "Scrape pages and extract data"),
+            "pdf": _skill("pdf", "Fill and merge PDF documents"),
+            "browser-nav": _skill("browser-nav", "Navigate websites with a browser"),
+            "hidden": _skill("hidden", "Navigate websites with a browser", disabled=True),
+        }
+        index = SkillMatchIndex()
+        names = lambda text: [s.name for s in index.match(text, skills)]  # noqa: E731
+        assert names("please use the web scraper") == ["web-scraper"]
+        assert names("merge these PDF files") == ["pdf"]
+        assert names("navigation on that site") == ["browser-nav"]
+        assert names("nothing relevant here") == []
+
+    def test_incremental_replace_and_remove(self):
+        rng = random.Random(11)
+        skills = _random_skills(rng, 60)
+        index = SkillMatchIndex()
+        inputs = [_random_text(rng, rng.randint(1, 8)) for _ in range(60)]
+        for user_input in inputs:
+            assert index.match(user_input, skills) == _expected(skills, user_input)
+
+        # SKILL.md の更新（オブジェクトの差し替え）と削除・追加
+        names = list(skills)
+        for name in names[:10]:
+            skills[name] = _skill(name, _random_text(rng, 8))
+        for name in names[10:20]:
+            del skills[name]
+        skills.update(_random_skills(random.Random(12), 10))
+
+        for user_input in inputs:
+            assert index.match(user_input, skills) == _expected(skills, user_input)
+        assert len(index) == sum(1 for s in skills.values() if not s.disable_model_invocation)
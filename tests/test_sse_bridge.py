@@ -0,0 +1,52 @@
+"""
+SSEEventBridge のテスト
+
+- 連続する chunk が1フレームにまとまること
+- 消費が止まった場合に stalled が立ち、drain() の [] と通常の完了を区別できること
+"""
+
+import asyncio
+import threading
+
+from open_entity.ui.sse_bridge import SSEEventBridge
+
+
+def test_chunks_are_coalesced():
+    async def run():
+        bridge = SSEEventBridge(asyncio.get_running_loop(), min_flush_interval=0)
+        for text in ("a", "b", "c"):
+            bridge.put({"type": "chunk", "content": text, "agent": "orchestrator"})
+        bridge.close()
+        first = await bridge.drain()
+        rest = await bridge.drain()
+        return first, rest, bridge.stalled
+
+    first, rest, stalled = asyncio.run(run())
+    assert [e["content"] for e in first] == ["abc"]
+    assert rest == []
+    assert stalled is False
+
+
+def test_stalled_consumer_is_reported():
+    async def run():
+        bridge = SSEEventBridge(
+            asyncio.get_running_loop(), max_buffer_bytes=200, producer_timeout=0.1, min_flush_interval=0
+        )
+
+        def produce():
+            for _ in range(10):
+                bridge.put({"type": "progress", "detail": "x" * 100})
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        # 消費しないまま生産側のタイムアウトを待つ
+        await asyncio.to_thread(producer.join)
+        batch = await bridge.drain()
+        rest = await bridge.drain()
+        return batch, rest, bridge
+
+    batch, rest, bridge = asyncio.run(run())
+    assert len(batch) == 1
+    assert rest == []
+    assert bridge.stalled is True
+    assert bridge.stats["dropped"] == 9
@@ -0,0 +1,75 @@
+"""
+SummaryWorker / ContextCompressor の事前要約のテスト
+
+- 開始前の同じキーの投入は最新の引数に差し替えられ、実行中なら投入されないこと
+- 事前要約がまだ無ければ圧縮を見送り、ハード上限を超えたら同期的に圧縮すること
+"""
+
+import threading
+
+from open_entity.core import summary_worker
+from open_entity.core.context_compressor import ContextCompressor
+from open_entity.core.summary_worker import SummaryWorker
+
+
+def test_queued_submit_is_coalesced_and_running_is_deduplicated():
+    worker = SummaryWorker(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def busy():
+        started.set()
+        release.wait(5)
+
+    worker.submit("busy", busy)
+    assert started.wait(5)
+    calls = []
+    assert worker.submit("key", calls.append, 1)
+    assert worker.submit("key", calls.append, 2)
+    assert worker.submit("busy", calls.append, 3) is False
+    release.set()
+    assert worker.wait("key", timeout=5)
+    assert calls == [2]
+    stats = worker.get_stats()
+    assert stats["coalesced"] == 1
+    assert stats["deduplicated"] == 1
+
+
+def test_pending_keys_are_bounded():
+    worker = SummaryWorker(max_workers=1, max_pending=2)
+    release = threading.Event()
+    assert worker.submit("a", release.wait, 5)
+    assert worker.submit("b", release.wait, 5)
+    assert worker.submit("c", release.wait, 5) is False
+    release.set()
+    assert worker.get_stats()["dropped"] == 1
+
+
+def _messages(n, size):
+    messages = [{"role": "system", "content": "sys"}]
+    for i in range(n):
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": f"{i} " + "x" * size})
+    messages.append({"role": "user", "content": "current"})
+    return messages
+
+
+def test_compression_is_deferred_until_hard_limit(monkeypatch):
+    monkeypatch.setattr(summary_worker, "_worker", SummaryWorker())
+    compressor = ContextCompressor(max_tokens=100, summary_model="m", prefetch_ratio=0.8, hard_limit_ratio=1e9)
+    release = threading.Event()
+
+    def slow_summary(messages, provider):
+        release.wait(5)
+        return "summary"
+
+    monkeypatch.setattr(compressor, "_generate_summary", slow_summary)
+    messages = _messages(6, 200)
+    compressed, done = compressor.compress_if_needed(messages, "openai")
+    assert done is False and compressed is messages
+
+    # ハード上限を下げると事前要約の完了を待って圧縮する
+    compressor.hard_max_tokens = 100
+    threading.Timer(0.05, release.set).start()
+    compressed, done = compressor.compress_if_needed(messages, "openai")
+    assert done is True
+    assert "summary" in compressed[1]["content"]
+    assert compressed[-1]["content"] == "current"
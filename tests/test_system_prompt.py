@@ -0,0 +1,70 @@
+"""
+システムプロンプトの静的プレフィックスキャッシュのテスト
+
+- 同じランタイムを並行セッションで使っても、各プロンプトには自分のスキルだけが入ること
+- キーごとにキャッシュされ、同じキーでは再構築しないこと
+"""
+
+import threading
+
+from open_entity.core.run_context import request_scope
+from open_entity.core.runtime import AgentRuntime
+from open_entity.core.system_prompt import PromptSegment, SystemPromptBuilder
+from open_entity.tools.discovery import AgentConfig
+from open_entity.tools.skill_loader import SkillConfig
+
+
+def _skill(name):
+    return SkillConfig(name=name, description=f"{name} skill", version="1.0", content=f"use {name}")
+
+
+def test_concurrent_sessions_get_their_own_skills(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    config = AgentConfig(name="a", description="d", system_prompt="base {{SESSION_CONTEXT}}", tools=[])
+    runtime = AgentRuntime(config, {}, provider="openai", model="gpt-4o")
+    monkeypatch.setattr(runtime, "_build_session_context", lambda: "ctx")
+    errors = []
+    start = threading.Barrier(2)
+
+    def session(own, other):
+        with request_scope():
+            runtime.skills = [_skill(own)]
+            start.wait()
+            for _ in range(200):
+                prompt = runtime._get_system_prompt()
+                if f"Skill: {own}" not in prompt or f"Skill: {other}" in prompt or "## Session Context" not in prompt:
+                    errors.append((own, prompt))
+                    return
+
+    threads = [
+        threading.Thread(target=session, args=("alpha", "beta")),
+        threading.Thread(target=session, args=("beta", "alpha")),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    assert errors == []
+    assert runtime._prompt_builder.rebuilds == 2
+
+
+def test_builder_caches_per_key():
+    builder = SystemPromptBuilder(max_prefixes=2)
+    calls = []
+
+    def factory(text):
+        def build():
+            calls.append(text)
+            return [PromptSegment("agent", text)], ("{{AGENT_STATS}}",) if text == "a" else ()
+        return build
+
+    a = builder.static_prefix("a", factory("a"))
+    b = builder.static_prefix("b", factory("b"))
+    assert builder.static_prefix("a", factory("a")) is a
+    assert a.placeholders == frozenset({"{{AGENT_STATS}}"}) and b.placeholders == frozenset()
+    assert a.prefix_hash != b.prefix_hash
+    assert builder.build(a.prefix, [PromptSegment("context", "ctx")]) == "a\n\nctx"
+    # 上限を超えると最も使われていないキー（b）が破棄される
+    builder.static_prefix("c", factory("c"))
+    builder.static_prefix("b", factory("b"))
+    assert calls == ["a", "b", "c", "b"]